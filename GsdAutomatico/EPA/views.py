@@ -9,6 +9,7 @@ from Secao_operacoes.models import Missao
 from Secao_pessoal.models import Efetivo
 from .models import EscalaMissaoEPA
 from auditoria.utils import registrar, resolver_label
+from login.grupos import pertence
 
 _EPA_PERMISSAO_MAP = {
     'EPA - Missões': 'EPA- Missões',
@@ -24,7 +25,7 @@ _EPA_Q = (
 
 
 def is_epa_missoes(user):
-    return user.is_superuser or user.groups.filter(name='EPA - Missões').exists()
+    return user.is_superuser or pertence(user, 'EPA - Missões')
 
 
 def epa_missoes_required(view_func):
@@ -4,18 +4,20 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST
 from django.utils import timezone
 
+from login.grupos import pertence
+
 from Secao_operacoes.models import Missao
-from Secao_pessoal.models import Efetivo
+from Secao_pessoal.models import Efetivo, SETOR_ESI
 from .models import EscalaMissaoESI
 
 
 def is_esi(user):
-    return user.is_superuser or user.groups.filter(name='ESI').exists()
+    return user.is_superuser or pertence(user, 'ESI')
 
 
 def is_esi_missoes(user):
     """Acesso à parte de Missões da ESI — grupo ESI-Missões, ESI completo ou superuser."""
-    return user.is_superuser or user.groups.filter(name__in=['ESI', 'ESI-Missões']).exists()
+    return user.is_superuser or pertence(user, 'ESI', 'ESI-Missões')
 
 
 def esi_required(view_func):
@@ -111,7 +113,7 @@ def missao_escala(request, missao_id):
     escala, _ = EscalaMissaoESI.objects.get_or_create(missao=missao)
 
     efetivo_esi = Efetivo.objects.filter(
-        setor__icontains='ESI'
+        setor_chave=SETOR_ESI
     ).order_by('posto', 'nome_guerra')
     if not efetivo_esi.exists():
         efetivo_esi = Efetivo.objects.filter(ativo=True).order_by('posto', 'nome_guerra')
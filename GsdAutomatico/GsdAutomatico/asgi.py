@@ -22,6 +22,7 @@ from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
 from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
 import chamados.routing                                   # noqa: E402
 import informatica.routing                                 # noqa: E402
+import notificacoes.routing                                # noqa: E402
 
 application = ProtocolTypeRouter({
     # Requisições HTTP normais continuam sendo tratadas pelo Django
@@ -33,6 +34,7 @@ application = ProtocolTypeRouter({
             URLRouter(
                 chamados.routing.websocket_urlpatterns
                 + informatica.routing.websocket_urlpatterns
+                + notificacoes.routing.websocket_urlpatterns
             )
         )
     ),
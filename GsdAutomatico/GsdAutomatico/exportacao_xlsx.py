@@ -0,0 +1,131 @@
+"""
+Exportação de planilhas .xlsx em fluxo (openpyxl write-only).
+
+As views montavam um Workbook completo em memória, estilizando célula por
+célula e varrendo a planilha de novo para bordas e largura de colunas. Aqui:
+  - o workbook é write-only: cada linha vai direto para o XML da aba em disco,
+    sem manter objetos Cell; a memória não cresce com o número de linhas;
+  - os estilos são NamedStyle registrados uma vez no workbook (a célula só
+    guarda a referência ao estilo);
+  - as linhas vêm de um iterável (tipicamente `.values().iterator()`), então o
+    queryset também é lido em lotes;
+  - o arquivo final (temporário) é enviado em blocos por FileResponse, que o
+    fecha e apaga ao terminar.
+
+Uso:
+    colunas = [Coluna('POSTO', 10), Coluna('NOME COMPLETO', 45)]
+    linhas = ([v['posto'], v['nome_completo']] for v in qs.values(...).iterator(chunk_size=LOTE))
+    return resposta_xlsx('efetivo.xlsx', 'Efetivo', colunas, linhas)
+"""
+import tempfile
+from typing import NamedTuple, Optional
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Linhas lidas do banco por vez (chunk_size do iterator)
+LOTE = 2000
+
+# Nomes dos NamedStyle disponíveis para as colunas
+TITULO = 'exp_titulo'
+CABECALHO = 'exp_cabecalho'
+DADO = 'exp_dado'                # borda fina, centralizado na vertical
+DADO_CENTRO = 'exp_dado_centro'  # borda fina, centralizado, quebra de linha
+DADO_ESQUERDA = 'exp_dado_esquerda'  # borda fina, à esquerda, quebra de linha
+
+_BORDA = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+
+
+class Coluna(NamedTuple):
+    titulo: str
+    largura: float
+    estilo: Optional[str] = DADO  # None: valor sem estilo (mais barato)
+
+
+def _registrar_estilos(wb, cor_cabecalho, tamanho_cabecalho):
+    wb.add_named_style(NamedStyle(
+        name=TITULO, font=Font(bold=True, size=16, color=cor_cabecalho),
+        alignment=Alignment(horizontal='center', vertical='center'),
+    ))
+    wb.add_named_style(NamedStyle(
+        name=CABECALHO,
+        font=Font(bold=True, color='FFFFFF', size=tamanho_cabecalho),
+        fill=PatternFill(start_color=cor_cabecalho, end_color=cor_cabecalho, fill_type='solid'),
+        alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+        border=_BORDA,
+    ))
+    wb.add_named_style(NamedStyle(name=DADO, border=_BORDA, alignment=Alignment(vertical='center')))
+    wb.add_named_style(NamedStyle(
+        name=DADO_CENTRO, border=_BORDA,
+        alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+    ))
+    wb.add_named_style(NamedStyle(
+        name=DADO_ESQUERDA, border=_BORDA,
+        alignment=Alignment(horizontal='left', vertical='center', wrap_text=True),
+    ))
+
+
+def _celula(ws, valor, estilo):
+    if estilo is None:
+        return valor
+    cell = WriteOnlyCell(ws, value=valor)
+    cell.style = estilo
+    return cell
+
+
+def escrever_xlsx(destino, aba, colunas, linhas, *, cor_cabecalho='4F81BD', tamanho_cabecalho=11,
+                  titulo=None, filtro=False):
+    """
+    Grava em `destino` (caminho ou arquivo binário) uma aba com cabeçalho e as
+    `linhas` (iterável de sequências na ordem de `colunas`), consumidas uma a uma.
+    `titulo` opcional ocupa a primeira linha (mesclada); `filtro` liga o
+    autofiltro sobre cabeçalho + dados. Retorna o número de linhas de dados.
+    """
+    wb = Workbook(write_only=True)
+    _registrar_estilos(wb, cor_cabecalho, tamanho_cabecalho)
+    ws = wb.create_sheet(aba)
+
+    # Em write-only, larguras precisam ser definidas antes da primeira linha
+    for indice, coluna in enumerate(colunas, 1):
+        ws.column_dimensions[get_column_letter(indice)].width = coluna.largura
+
+    ultima_coluna = get_column_letter(len(colunas))
+    linha_cabecalho = 1
+    if titulo:
+        ws.row_dimensions[1].height = 30
+        ws.merged_cells.add(f'A1:{ultima_coluna}1')
+        ws.append([_celula(ws, titulo, TITULO)])
+        linha_cabecalho = 2
+    ws.append([_celula(ws, coluna.titulo, CABECALHO) for coluna in colunas])
+
+    estilos = [coluna.estilo for coluna in colunas]
+    total = 0
+    for valores in linhas:
+        ws.append([_celula(ws, valor, estilo) for valor, estilo in zip(valores, estilos)])
+        total += 1
+
+    if filtro:
+        ws.auto_filter.ref = f'A{linha_cabecalho}:{ultima_coluna}{linha_cabecalho + total}'
+    wb.save(destino)
+    return total
+
+
+def resposta_xlsx(nome_arquivo, aba, colunas, linhas, **opcoes):
+    """
+    Gera a planilha num arquivo temporário e devolve um FileResponse que a
+    envia em blocos (o arquivo é apagado quando a resposta é fechada).
+    `opcoes` são repassadas a escrever_xlsx.
+    """
+    arquivo = tempfile.TemporaryFile()
+    try:
+        escrever_xlsx(arquivo, aba, colunas, linhas, **opcoes)
+        arquivo.seek(0)
+    except BaseException:
+        arquivo.close()
+        raise
+    return FileResponse(arquivo, as_attachment=True, filename=nome_arquivo, content_type=CONTENT_TYPE_XLSX)
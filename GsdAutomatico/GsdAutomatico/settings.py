@@ -142,6 +142,18 @@ CELERY_BEAT_SCHEDULE = {
         # em BackupDestino.horario_execucao, dependendo de quando o beat iniciou.
         'schedule': crontab(minute='*/10'),
     },
+    'expirar-snapshots-backup': {
+        'task': 'informatica.tasks.expirar_snapshots_task',
+        'schedule': crontab(minute='*/10'),
+    },
+    'expurgar-cache-ia': {
+        'task': 'Ouvidoria.tasks.expurgar_cache_ia_task',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'manter-particoes-auditoria': {
+        'task': 'auditoria.tasks.manter_particoes_auditoria_task',
+        'schedule': crontab(hour=2, minute=15),
+    },
 }
 
 MIDDLEWARE = [
@@ -247,6 +259,55 @@ WHITENOISE_MAX_AGE = 31536000
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR.parent, 'media')
 
+# Cache em disco das páginas rasterizadas de anexos PDF (fora do MEDIA_ROOT,
+# servido apenas pela view autenticada). Limpeza LRU ao passar do limite.
+ANEXO_PAGINAS_CACHE_DIR = os.getenv('ANEXO_PAGINAS_CACHE_DIR') or os.path.join(BASE_DIR.parent, 'cache', 'anexo_paginas')
+ANEXO_PAGINAS_CACHE_MAX_MB = int(os.getenv('ANEXO_PAGINAS_CACHE_MAX_MB') or 2048)
+
+# Validade (dias) das respostas da IA guardadas em Ouvidoria.CacheRespostaIA
+IA_CACHE_TTL_DIAS = int(os.getenv('IA_CACHE_TTL_DIAS') or 30)
+
+# Pré-filtro de duplicidade de PATD (Ouvidoria.similaridade): acima do primeiro
+# limiar é duplicata sem consultar a IA; abaixo do segundo, é distinta.
+SIMILARIDADE_LIMIAR_DUPLICADA = float(os.getenv('SIMILARIDADE_LIMIAR_DUPLICADA') or 0.85)
+SIMILARIDADE_LIMIAR_DISTINTA = float(os.getenv('SIMILARIDADE_LIMIAR_DISTINTA') or 0.25)
+
+# Máximo de chamadas simultâneas à IA ao processar os acusados de um ofício
+IA_MAX_CONCORRENCIA = int(os.getenv('IA_MAX_CONCORRENCIA') or 4)
+
+# Pool de backups restaurados para exploração (informatica.backup_snapshots):
+# minutos sem acesso até o descarte e máximo de bancos restaurados simultâneos.
+BACKUP_SNAPSHOT_TTL_MINUTOS = int(os.getenv('BACKUP_SNAPSHOT_TTL_MINUTOS') or 30)
+BACKUP_SNAPSHOT_MAX = int(os.getenv('BACKUP_SNAPSHOT_MAX') or 3)
+
+# pg_dump do backup diário (formato diretório): jobs paralelos e timeout em segundos
+BACKUP_PG_JOBS = int(os.getenv('BACKUP_PG_JOBS') or 4)
+BACKUP_PG_DUMP_TIMEOUT = int(os.getenv('BACKUP_PG_DUMP_TIMEOUT') or 270)
+
+# Se definido, o envio ao servidor reserva grava neste diretório local em vez
+# de abrir SFTP (desenvolvimento/testes do informatica.backup_envio)
+BACKUP_SFTP_LOCAL_DIR = os.getenv('BACKUP_SFTP_LOCAL_DIR', '')
+
+# Lote de auditoria (auditoria.lote): descarrega ao atingir este número de
+# entradas ou quando a mais antiga passar deste tempo (segundos)
+AUDITORIA_LOTE_MAX = int(os.getenv('AUDITORIA_LOTE_MAX') or 200)
+AUDITORIA_LOTE_SEGUNDOS = float(os.getenv('AUDITORIA_LOTE_SEGUNDOS') or 5)
+
+# Partições mensais de LogAuditoria (auditoria.particoes): meses mantidos no
+# banco e diretório dos .csv.zst arquivados (fora de backups/, que é expurgado)
+AUDITORIA_RETENCAO_MESES = int(os.getenv('AUDITORIA_RETENCAO_MESES') or 24)
+AUDITORIA_ARQUIVO_DIR = os.getenv('AUDITORIA_ARQUIVO_DIR') or str(BASE_DIR.parent / 'arquivo_auditoria')
+
+# Validade do cache de grupos por usuário (login.grupos); invalidado por sinal
+GRUPOS_CACHE_SEGUNDOS = int(os.getenv('GRUPOS_CACHE_SEGUNDOS') or 300)
+
+# Validade dos contadores de não lidas (notificacoes.contadores); mantidos por
+# delta nos sinais, o TTL só limita a divergência de alterações fora deles
+NOTIFICACOES_CONTADOR_SEGUNDOS = int(os.getenv('NOTIFICACOES_CONTADOR_SEGUNDOS') or 3600)
+
+# Validade do painel da S1 em cache (Secao_pessoal.painel); invalidado por sinal
+PAINEL_S1_CACHE_SEGUNDOS = int(os.getenv('PAINEL_S1_CACHE_SEGUNDOS') or 600)
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PATD, Anexo
+from .models import PATD, Anexo, CacheRespostaIA
 
 class AnexoInline(admin.TabularInline):
     model = Anexo
@@ -28,3 +28,25 @@ class PATDAdmin(admin.ModelAdmin):
             return obj.transgressao[:75] + '...'
         return obj.transgressao
     transgressao_resumida.short_description = 'Transgressão'
+
+
+@admin.register(CacheRespostaIA)
+class CacheRespostaIAAdmin(admin.ModelAdmin):
+    list_display = ('funcao', 'versao_prompt', 'chave_resumida', 'acertos', 'criado_em', 'expira_em')
+    list_filter = ('funcao', 'versao_prompt')
+    search_fields = ('chave',)
+    readonly_fields = ('chave', 'funcao', 'versao_prompt', 'resposta', 'criado_em', 'expira_em', 'acertos')
+    actions = ['expurgar_expirados']
+
+    def chave_resumida(self, obj):
+        return obj.chave[:12]
+    chave_resumida.short_description = 'Chave'
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Remover as respostas selecionadas que já expiraram')
+    def expurgar_expirados(self, request, queryset):
+        from .cache_ia import expurgar_expirados
+        removidos = expurgar_expirados(queryset)
+        self.message_user(request, f'{removidos} resposta(s) expirada(s) removida(s).')
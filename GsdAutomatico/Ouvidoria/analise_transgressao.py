@@ -10,6 +10,8 @@ from pydantic import BaseModel, Field
 from langchain_core.output_parsers import PydanticOutputParser, StrOutputParser
 from langchain.output_parsers import BooleanOutputParser
 
+from .cache_ia import resposta_em_cache
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -35,8 +37,10 @@ if proxy_url:
 else:
     http_client = httpx.Client(verify=ssl_verify)
 
+MODELO_IA = "gpt-4.1"
+
 model = ChatOpenAI(
-    model="gpt-4.1",
+    model=MODELO_IA,
     temperature=0,
     api_key=openai_api_key,
     http_client=http_client,
@@ -104,6 +108,7 @@ class AnaliseTransgressao(BaseModel):
 
 
 # --- FUNÇÃO DE ANÁLISE (PROMPT REFINADO) ---
+@resposta_em_cache('analisar_documento_pdf', versao=1, modelo=MODELO_IA, tipo=AnaliseTransgressao)
 def analisar_documento_pdf(conteudo_pdf: str) -> AnaliseTransgressao:
     """
     Função que invoca a IA para analisar o conteúdo do PDF e extrair os dados estruturados,
@@ -200,11 +205,23 @@ CAMPO `transgressao_individual`:
 
 # --- FUNÇÕES AUXILIARES ---
 
-def enquadra_item(transgressao):
-    class Item(BaseModel):
-        item: list = Field(description="Defina uma lista de dicionários python com a chave 'numero' e o valor sendo o número do item escolhido e a chave 'descricao' e o valor sendo a descrição do item. Cada item da lista deve ser um dicionário com um item que foi enquadrado.")
+# Modelos de saída em nível de módulo para que o cache (Ouvidoria.cache_ia)
+# consiga reconstruir as respostas gravadas.
+class ItensEnquadrados(BaseModel):
+    item: list = Field(description="Defina uma lista de dicionários python com a chave 'numero' e o valor sendo o número do item escolhido e a chave 'descricao' e o valor sendo a descrição do item. Cada item da lista deve ser um dicionário com um item que foi enquadrado.")
+
+
+class CircunstanciasApuradas(BaseModel):
+    item: list = Field(description="""Defina uma lista contendo um único dicionário python. O dicionário deve ter a chave 'agravantes' com uma lista das letras correspondentes, e a chave 'atenuantes' com uma lista das letras correspondentes.""")
+
 
-    parser = PydanticOutputParser(pydantic_object=Item)
+class PunicaoSugerida(BaseModel):
+    punicao: dict = Field(description="Defina um dicionário python onde uma chave será 'punicao' e o respectivo valor será a punição definida e outra chave será 'explicacao' e o respectivo valor será a explicação do porquê você definiu esta punição")
+
+
+@resposta_em_cache('enquadra_item', versao=1, modelo=MODELO_IA, tipo=ItensEnquadrados)
+def enquadra_item(transgressao):
+    parser = PydanticOutputParser(pydantic_object=ItensEnquadrados)
 
     sys_prompt = """
 Você é um especialista em enquadramento disciplinar militar. Sua tarefa é identificar SOMENTE os itens do RDAER que se aplicam diretamente ao fato descrito na transgressão.
@@ -335,11 +352,9 @@ REGRAS OBRIGATÓRIAS:
     return resposta
 
 
+@resposta_em_cache('verifica_agravante_atenuante', versao=1, modelo=MODELO_IA, tipo=CircunstanciasApuradas)
 def verifica_agravante_atenuante(historico, transgressao, justificativa, itens, comportamento_anterior: str):
-    class Item(BaseModel):
-        item: list = Field(description="""Defina uma lista contendo um único dicionário python. O dicionário deve ter a chave 'agravantes' com uma lista das letras correspondentes, e a chave 'atenuantes' com uma lista das letras correspondentes.""")
-
-    parser = PydanticOutputParser(pydantic_object=Item)
+    parser = PydanticOutputParser(pydantic_object=CircunstanciasApuradas)
 
     sys_prompt = """
     # Contexto #
@@ -399,12 +414,9 @@ def verifica_agravante_atenuante(historico, transgressao, justificativa, itens,
     return resposta
 
 
+@resposta_em_cache('sugere_punicao', versao=1, modelo=MODELO_IA, tipo=PunicaoSugerida)
 def sugere_punicao(transgressao, agravantes, atenuantes, itens, observacao):
-
-    class Formatador(BaseModel):
-        punicao: dict = Field(description="Defina um dicionário python onde uma chave será 'punicao' e o respectivo valor será a punição definida e outra chave será 'explicacao' e o respectivo valor será a explicação do porquê você definiu esta punição")
-
-    parser = PydanticOutputParser(pydantic_object=Formatador)
+    parser = PydanticOutputParser(pydantic_object=PunicaoSugerida)
 
     sys_prompt = """
     # Contexto #
@@ -492,6 +504,7 @@ def analisar_e_resumir_defesa(alegacao_defesa: str):
 
     return resposta
 
+@resposta_em_cache('reescrever_ocorrencia', versao=1, modelo=MODELO_IA)
 def reescrever_ocorrencia(transgressao: str):
     """
     Reescreve a descrição da transgressão de forma formal e objetiva para
@@ -591,6 +604,7 @@ Texto original:
     return chain.invoke({})
 
 
+@resposta_em_cache('verifica_similaridade', versao=1, modelo=MODELO_IA)
 def verifica_similaridade(transgressao_nova, transgressao_antiga):
 
     sys_prompt = f"""Você é um especialista em análise de textos.
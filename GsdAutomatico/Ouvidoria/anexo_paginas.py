@@ -0,0 +1,192 @@
+"""
+Cache em disco das páginas rasterizadas de anexos PDF.
+
+Cada página vira um PNG em ANEXO_PAGINAS_CACHE_DIR, identificado pelo hash
+do conteúdo do PDF, número da página e escala. O visualizador referencia as
+páginas por URL (ver anexo_pagina_imagem) e a exportação lê os PNGs direto
+do disco, de modo que o fitz só rasteriza cada página uma vez.
+
+Quando o tamanho total passa de ANEXO_PAGINAS_CACHE_MAX_MB, os ficheiros
+menos usados recentemente (mtime, atualizado a cada acerto) são removidos.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import fitz
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Escala usada pelo visualizador de documentos (220 DPI) e pela lista de anexos (~108 DPI)
+ESCALA_VISUALIZADOR = 220 / 72
+ESCALA_MINIATURA = 1.5
+
+# Acertos só atualizam o mtime se o último toque tiver mais que isto (evita escrita por request)
+_TOQUE_MIN_SEGUNDOS = 300
+
+_limpeza_lock = threading.Lock()
+_bytes_desde_limpeza = [0]
+
+
+def _cache_dir():
+    return settings.ANEXO_PAGINAS_CACHE_DIR
+
+
+def _max_bytes():
+    return settings.ANEXO_PAGINAS_CACHE_MAX_MB * 1024 * 1024
+
+
+def _formatar_escala(escala):
+    return f'{escala:.4f}'
+
+
+def hash_arquivo(path):
+    """
+    SHA-256 do conteúdo do ficheiro, memorizado no cache do Django por
+    (path, tamanho, mtime) para não reler PDFs grandes a cada request.
+    """
+    st = os.stat(path)
+    chave = 'anexo_hash:' + hashlib.sha1(
+        f'{path}:{st.st_size}:{st.st_mtime_ns}'.encode()
+    ).hexdigest()
+    digest = cache.get(chave)
+    if digest:
+        return digest
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    digest = h.hexdigest()
+    cache.set(chave, digest, 60 * 60 * 24 * 7)
+    return digest
+
+
+def _caminho_pagina(digest, pagina, escala):
+    return os.path.join(_cache_dir(), digest[:2], f'{digest}_p{pagina}_s{_formatar_escala(escala)}.png')
+
+
+def _tocar(path):
+    """Marca o ficheiro como usado recentemente (base da ordem LRU)."""
+    try:
+        if time.time() - os.stat(path).st_mtime > _TOQUE_MIN_SEGUNDOS:
+            os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _gravar_atomico(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _registrar_escrita(nbytes):
+    # Varre o diretório só depois de ~5% do limite em escritas novas
+    with _limpeza_lock:
+        _bytes_desde_limpeza[0] += nbytes
+        if _bytes_desde_limpeza[0] < _max_bytes() // 20:
+            return
+        _bytes_desde_limpeza[0] = 0
+    limpar_cache()
+
+
+def limpar_cache(max_bytes=None):
+    """Remove as páginas menos usadas até o cache ficar em 90% do limite."""
+    max_bytes = _max_bytes() if max_bytes is None else max_bytes
+    base = _cache_dir()
+    if not os.path.isdir(base):
+        return 0
+    entradas = []
+    total = 0
+    for sub in os.scandir(base):
+        if not sub.is_dir():
+            continue
+        for entry in os.scandir(sub.path):
+            if not entry.name.endswith('.png'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entradas.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+    if total <= max_bytes:
+        return 0
+
+    alvo = int(max_bytes * 0.9)
+    removidos = 0
+    for _mtime, size, path in sorted(entradas):
+        if total <= alvo:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removidos += 1
+        except OSError:
+            pass
+    logger.info("Cache de páginas de anexos: %d ficheiros removidos (LRU).", removidos)
+    return removidos
+
+
+def contar_paginas(path):
+    """Número de páginas do PDF, memorizado pelo hash do conteúdo."""
+    digest = hash_arquivo(path)
+    chave = f'anexo_paginas:{digest}'
+    total = cache.get(chave)
+    if total is None:
+        with fitz.open(path) as doc:
+            total = doc.page_count
+        cache.set(chave, total, 60 * 60 * 24 * 7)
+    return total
+
+
+def rasterizar_paginas(path, escala):
+    """
+    Retorna a lista de caminhos dos PNGs de todas as páginas do PDF.
+    `escala` pode ser um número ou uma função (fitz.Rect da página) -> número,
+    para exportações que ajustam cada página ao tamanho da folha de destino.
+    """
+    digest = hash_arquivo(path)
+    caminhos = []
+    with fitz.open(path) as doc:
+        for indice, page in enumerate(doc):
+            e = escala(page.rect) if callable(escala) else escala
+            caminhos.append(_obter_pagina(doc, page, digest, indice + 1, e))
+    return caminhos
+
+
+def pagina_png(path, pagina, escala):
+    """Caminho do PNG de uma página (1-based), rasterizando só se ainda não existir."""
+    digest = hash_arquivo(path)
+    destino = _caminho_pagina(digest, pagina, escala)
+    if os.path.exists(destino):
+        _tocar(destino)
+        return destino
+    with fitz.open(path) as doc:
+        if pagina < 1 or pagina > doc.page_count:
+            raise IndexError(f'Página {pagina} inexistente')
+        return _obter_pagina(doc, doc[pagina - 1], digest, pagina, escala)
+
+
+def _obter_pagina(doc, page, digest, pagina, escala):
+    destino = _caminho_pagina(digest, pagina, escala)
+    if os.path.exists(destino):
+        _tocar(destino)
+        return destino
+    pix = page.get_pixmap(matrix=fitz.Matrix(escala, escala), alpha=False)
+    data = pix.tobytes('png')
+    _gravar_atomico(destino, data)
+    _registrar_escrita(len(data))
+    return destino
@@ -0,0 +1,39 @@
+"""
+Assinaturas de militares (Efetivo.assinatura) servidas por URL.
+
+O campo guarda a imagem como data URI base64. Em vez de repetir esse payload
+em cada página renderizada, o HTML referencia /Ouvidoria/assinatura/efetivo/<pk>/
+com ?v=<hash>: como a URL muda junto com o conteúdo, o navegador pode manter a
+imagem em cache indefinidamente, e a exportação PDF resolve a mesma URL direto
+do banco pelo url_fetcher do WeasyPrint.
+"""
+import base64
+import binascii
+import hashlib
+
+from django.urls import reverse
+
+
+def versao_assinatura(data_uri):
+    """Hash curto do conteúdo da assinatura — usado como ETag e no ?v= da URL."""
+    return hashlib.sha1(data_uri.encode('utf-8')).hexdigest()[:16]
+
+
+def decodificar_assinatura(data_uri):
+    """Converte 'data:image/...;base64,...' em (bytes, mime). Retorna (None, None) se inválido."""
+    if not data_uri or ';base64,' not in data_uri:
+        return None, None
+    header, b64 = data_uri.split(';base64,', 1)
+    mime = header[5:] if header.startswith('data:') else 'image/png'
+    try:
+        return base64.b64decode(b64), mime or 'image/png'
+    except (binascii.Error, ValueError):
+        return None, None
+
+
+def url_assinatura_efetivo(efetivo):
+    """URL versionada da assinatura do militar, ou None se ele não tiver assinatura."""
+    if not efetivo or not efetivo.assinatura:
+        return None
+    return (reverse('Ouvidoria:assinatura_efetivo', args=[efetivo.pk])
+            + f'?v={versao_assinatura(efetivo.assinatura)}')
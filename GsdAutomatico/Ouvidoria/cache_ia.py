@@ -0,0 +1,135 @@
+"""
+Cache persistente das respostas da IA (Ouvidoria.analise_transgressao).
+
+Cada chamada é identificada por SHA-256 de (função, versão do prompt, modelo,
+entrada normalizada). A resposta fica em CacheRespostaIA até expirar
+(IA_CACHE_TTL_DIAS); reenviar o mesmo ofício ou repetir a mesma análise
+devolve o resultado gravado sem chamar a OpenAI.
+
+Ao alterar o prompt de uma função, incremente o `versao` do decorator para
+que as respostas antigas deixem de ser usadas.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import re
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_ESPACOS = re.compile(r'\s+')
+
+
+def _normalizar(valor):
+    """Normaliza a entrada: unicode NFC, espaços colapsados, dicts ordenados."""
+    if isinstance(valor, str):
+        return _ESPACOS.sub(' ', unicodedata.normalize('NFC', valor)).strip()
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in sorted(valor.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if hasattr(valor, 'model_dump'):
+        return _normalizar(valor.model_dump())
+    return valor
+
+
+def chave_cache(funcao, versao, modelo, kwargs):
+    payload = json.dumps(_normalizar(kwargs), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(f'{funcao}|v{versao}|{modelo}|{payload}'.encode('utf-8')).hexdigest()
+
+
+def _ler(chave):
+    from .models import CacheRespostaIA
+    registro = (CacheRespostaIA.objects
+                .filter(chave=chave, expira_em__gt=timezone.now())
+                .values_list('pk', 'resposta').first())
+    if registro is None:
+        return None
+    CacheRespostaIA.objects.filter(pk=registro[0]).update(acertos=F('acertos') + 1)
+    return registro[1]
+
+
+def _gravar(chave, funcao, versao, resposta):
+    from .models import CacheRespostaIA
+    expira_em = timezone.now() + timedelta(days=settings.IA_CACHE_TTL_DIAS)
+    try:
+        CacheRespostaIA.objects.update_or_create(
+            chave=chave,
+            defaults={'funcao': funcao, 'versao_prompt': versao, 'resposta': resposta,
+                      'expira_em': expira_em, 'acertos': 0},
+        )
+    except IntegrityError:
+        # Outro worker gravou a mesma chave ao mesmo tempo — resultado equivalente
+        pass
+
+
+def resposta_em_cache(funcao, versao, modelo, tipo=None):
+    """
+    Decorator para funções que chamam a IA. Os argumentos são vinculados à
+    assinatura da função para que chamadas posicionais e nomeadas gerem a
+    mesma chave. `tipo` é o modelo Pydantic devolvido pela função (a resposta
+    é gravada com model_dump() e reconstruída com model_validate()).
+
+    A função decorada ganha `.recalcular(...)`, que ignora o cache na leitura
+    mas grava a nova resposta (usado pelas ações de "regenerar").
+    """
+    def decorator(fn):
+        assinatura = inspect.signature(fn)
+
+        def _chave(args, kwargs):
+            vinculados = assinatura.bind(*args, **kwargs)
+            vinculados.apply_defaults()
+            return chave_cache(funcao, versao, modelo, dict(vinculados.arguments))
+
+        def _serializar(resultado):
+            return resultado.model_dump() if tipo is not None else resultado
+
+        def _desserializar(resposta):
+            return tipo.model_validate(resposta) if tipo is not None else resposta
+
+        def _chamar_e_gravar(chave, args, kwargs):
+            resultado = fn(*args, **kwargs)
+            try:
+                _gravar(chave, funcao, versao, _serializar(resultado))
+            except Exception as e:
+                logger.warning("Falha ao gravar cache de IA (%s): %s", funcao, e)
+            return resultado
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            chave = _chave(args, kwargs)
+            try:
+                resposta = _ler(chave)
+            except Exception as e:
+                logger.warning("Falha ao ler cache de IA (%s): %s", funcao, e)
+                resposta = None
+            if resposta is not None:
+                logger.debug("Cache de IA: acerto em %s (%s)", funcao, chave[:12])
+                return _desserializar(resposta)
+            return _chamar_e_gravar(chave, args, kwargs)
+
+        def recalcular(*args, **kwargs):
+            return _chamar_e_gravar(_chave(args, kwargs), args, kwargs)
+
+        wrapper.recalcular = recalcular
+        return wrapper
+    return decorator
+
+
+def expurgar_expirados(queryset=None):
+    """
+    Remove as respostas vencidas (só dentre `queryset`, se informado).
+    Retorna a quantidade removida.
+    """
+    from .models import CacheRespostaIA
+    queryset = CacheRespostaIA.objects.all() if queryset is None else queryset
+    removidos, _ = queryset.filter(expira_em__lte=timezone.now()).delete()
+    return removidos
@@ -2,6 +2,7 @@ from django import forms
 from django.db.models import Q
 from .models import PATD
 from Secao_pessoal.models import Efetivo
+from Secao_pessoal.forms import AssinaturaEfetivoFormMixin
 import json
 import re
 from num2words import num2words
@@ -18,13 +19,12 @@ class AtribuirOficialForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
 
-        # Sempre filtra por oficial=True com assinatura cadastrada.
-        # A assinatura é um campo de texto, então excluímos nulos e strings vazias.
+        # Sempre filtra por oficial=True com assinatura cadastrada
+        # (tabela EfetivoAssinatura; sem registro ou com imagem vazia fica de fora).
         self.fields['oficial_responsavel'].queryset = (
             Efetivo.objects
             .filter(oficial=True)
-            .exclude(assinatura__isnull=True)
-            .exclude(assinatura__exact='')
+            .assinados()
             .order_by('posto', 'nome_guerra')
         )
             
@@ -40,14 +40,13 @@ class ComandanteAprovarForm(forms.Form):
     """
     senha_comandante = forms.CharField(widget=forms.PasswordInput, label="Sua Senha")
 
-class MilitarForm(forms.ModelForm):
+class MilitarForm(AssinaturaEfetivoFormMixin, forms.ModelForm):
     # Formulário para criar e atualizar registros de Militares.
     class Meta:
         model = Efetivo
         fields = [
             'posto', 'quad', 'especializacao', 'saram', 'nome_completo',
             'nome_guerra', 'turma', 'situacao', 'om', 'setor', 'subsetor', 'oficial',
-            'assinatura' # Campo adicionado para futuras implementações
         ]
         widgets = {
             'posto': forms.TextInput(attrs={'placeholder': 'Ex: Capitão'}),
@@ -61,7 +60,6 @@ class MilitarForm(forms.ModelForm):
             'om': forms.TextInput(attrs={'placeholder': 'Ex: CINDACTA IV'}),
             'setor': forms.TextInput(attrs={'placeholder': 'Ex: Divisão de Operações'}),
             'subsetor': forms.TextInput(attrs={'placeholder': 'Ex: Seção de Busca e Salvamento'}),
-            'assinatura': forms.HiddenInput(), # Oculto por enquanto
         }
 
 class PATDForm(forms.ModelForm):
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.24 on 2026-10-17 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Ouvidoria', '0081_patd_militar_set_null_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheRespostaIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64, unique=True, verbose_name='Chave (SHA-256)')),
+                ('funcao', models.CharField(db_index=True, max_length=100, verbose_name='Função')),
+                ('versao_prompt', models.PositiveIntegerField(verbose_name='Versão do Prompt')),
+                ('resposta', models.JSONField(verbose_name='Resposta')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('expira_em', models.DateTimeField(db_index=True, verbose_name='Expira em')),
+                ('acertos', models.PositiveIntegerField(default=0, verbose_name='Acertos')),
+            ],
+            options={
+                'verbose_name': 'Resposta de IA em Cache',
+                'verbose_name_plural': 'Respostas de IA em Cache',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
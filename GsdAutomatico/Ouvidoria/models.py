@@ -101,6 +101,42 @@ class Anexo(models.Model):
     def __str__(self):
         return f"Anexo para PATD {self.patd.numero_patd} - {os.path.basename(self.arquivo.name)}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # A PATD em memória que criou este anexo precisa enxergá-lo no índice
+        if Anexo.patd.is_cached(self):
+            self.patd.invalidar_anexo_index()
+
+    def delete(self, *args, **kwargs):
+        if Anexo.patd.is_cached(self):
+            self.patd.invalidar_anexo_index()
+        return super().delete(*args, **kwargs)
+
+
+class AnexoIndex:
+    """
+    Anexos de uma PATD agrupados por tipo, carregados numa única consulta.
+    Respeita prefetch_related('anexos') — nesse caso não faz consulta nenhuma.
+    """
+
+    def __init__(self, anexos):
+        self._por_tipo = {}
+        for anexo in sorted(anexos, key=lambda a: a.pk):
+            self._por_tipo.setdefault(anexo.tipo, []).append(anexo)
+
+    def tem(self, tipo):
+        return bool(self._por_tipo.get(tipo))
+
+    def de(self, *tipos):
+        """Lista dos anexos dos tipos informados, em ordem de criação."""
+        if len(tipos) == 1:
+            return list(self._por_tipo.get(tipos[0], []))
+        return sorted((a for t in tipos for a in self._por_tipo.get(t, [])), key=lambda a: a.pk)
+
+    def primeiro(self, tipo):
+        anexos = self._por_tipo.get(tipo)
+        return anexos[0] if anexos else None
+
 
 class PATDManager(models.Manager):
     def get_queryset(self):
@@ -363,6 +399,21 @@ class PATD(models.Model):
             # Se não houver punição definida, não altera a natureza
             pass
         
+    @property
+    def anexo_index(self):
+        """AnexoIndex desta PATD, carregado na primeira leitura e reaproveitado depois."""
+        index = getattr(self, '_anexo_index', None)
+        if index is None:
+            index = AnexoIndex(self.anexos.all())
+            self._anexo_index = index
+        return index
+
+    def invalidar_anexo_index(self):
+        self._anexo_index = None
+        # Sem isto, uma PATD vinda de prefetch_related('anexos') remontaria o
+        # índice com a lista antiga
+        getattr(self, '_prefetched_objects_cache', {}).pop('anexos', None)
+
     @property
     def mostrar_resumo_analise(self):
         return self.status in {
@@ -411,8 +462,12 @@ class PATD(models.Model):
 
         is_new = self.pk is None
         if not is_new:
-            # CORREÇÃO: Usar all_objects em vez de objects para não dar erro ao restaurar
-            orig = PATD.all_objects.get(pk=self.pk)
+            # Valores de quando a PATD foi carregada (rastreados pela auditoria, sem
+            # SELECT extra); inclui PATDs na lixeira, para não dar erro ao restaurar
+            from auditoria.registry import valores_originais
+            orig = valores_originais(self, ['status', 'oficial_responsavel_id'])
+            if orig is None:
+                raise PATD.DoesNotExist(f"PATD {self.pk} não existe mais no banco.")
 
             STATUS_AGUARDANDO_ATRIBUICAO = {'definicao_oficial', 'preclusao', 'prazo_expirado'}
             # Dispara o fluxo de atribuição quando:
@@ -421,14 +476,14 @@ class PATD(models.Model):
             #   (cobre re-atribuição do mesmo oficial pós-defesa)
             is_assigning = (
                 self.oficial_responsavel_id is not None and (
-                    orig.oficial_responsavel_id != self.oficial_responsavel_id or
-                    orig.status in STATUS_AGUARDANDO_ATRIBUICAO
+                    orig['oficial_responsavel_id'] != self.oficial_responsavel_id or
+                    orig['status'] in STATUS_AGUARDANDO_ATRIBUICAO
                 )
             )
             if is_assigning and self.oficial_aceitou is not True:
-                if orig.status in ('definicao_oficial',):
+                if orig['status'] in ('definicao_oficial',):
                     self.status_anterior = 'em_apuracao'
-                elif orig.status in ('preclusao', 'prazo_expirado', 'apuracao_preclusao'):
+                elif orig['status'] in ('preclusao', 'prazo_expirado', 'apuracao_preclusao'):
                     self.status_anterior = 'apuracao_preclusao'
                 self.status = 'aguardando_aprovacao_atribuicao'
                 self.oficial_aceitou = None
@@ -474,4 +529,25 @@ class AlegacaoDefesaLog(models.Model):
         ordering = ['-data_alteracao']
 
     def __str__(self):
-        return f"PATD {self.patd.numero_patd} – alterado em {self.data_alteracao.strftime('%d/%m/%Y %H:%M')}"
\ No newline at end of file
+        return f"PATD {self.patd.numero_patd} – alterado em {self.data_alteracao.strftime('%d/%m/%Y %H:%M')}"
+
+class CacheRespostaIA(models.Model):
+    """
+    Respostas já obtidas da IA (Ouvidoria.analise_transgressao), indexadas por
+    hash de (função, versão do prompt, entrada normalizada). Ver Ouvidoria.cache_ia.
+    """
+    chave = models.CharField(max_length=64, unique=True, verbose_name="Chave (SHA-256)")
+    funcao = models.CharField(max_length=100, db_index=True, verbose_name="Função")
+    versao_prompt = models.PositiveIntegerField(verbose_name="Versão do Prompt")
+    resposta = models.JSONField(verbose_name="Resposta")
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    expira_em = models.DateTimeField(db_index=True, verbose_name="Expira em")
+    acertos = models.PositiveIntegerField(default=0, verbose_name="Acertos")
+
+    class Meta:
+        verbose_name = "Resposta de IA em Cache"
+        verbose_name_plural = "Respostas de IA em Cache"
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f"{self.funcao} v{self.versao_prompt} – {self.chave[:12]}"
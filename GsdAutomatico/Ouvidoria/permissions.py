@@ -1,3 +1,5 @@
+from login.grupos import pertence
+
 # Constants for group names
 OUVIDORIA_S2 = "S2 - Ouvidoria"
 OUVIDORIA_CB = "CB - Ouvidoria"
@@ -15,7 +17,7 @@ def is_in_group(user, group_name):
     """
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name=group_name).exists()
+    return pertence(user, group_name)
 
 def is_ouvidoria_member(user):
     """
@@ -26,7 +28,7 @@ def is_ouvidoria_member(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=OUVIDORIA_GROUPS).exists()
+    return pertence(user, *OUVIDORIA_GROUPS)
 
 def can_edit_patd(user):
     """
@@ -38,7 +40,7 @@ def can_edit_patd(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=OUVIDORIA_EDIT_PATD_GROUPS).exists()
+    return pertence(user, *OUVIDORIA_EDIT_PATD_GROUPS)
 
 
 def can_delete_patd(user):
@@ -50,7 +52,7 @@ def can_delete_patd(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=[OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE]).exists()
+    return pertence(user, OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE)
 
 def can_edit_apuracao(user):
     """
@@ -61,7 +63,7 @@ def can_edit_apuracao(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=[OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE, OUVIDORIA_APURADOR]).exists()
+    return pertence(user, OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE, OUVIDORIA_APURADOR)
 
 def is_apurador(user):
     """Verifica se o usuário pertence ao grupo Apurador - Ouvidoria."""
@@ -69,7 +71,7 @@ def is_apurador(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name=OUVIDORIA_APURADOR).exists()
+    return pertence(user, OUVIDORIA_APURADOR)
     
 def can_edit_transgressao(user):
     """
@@ -80,7 +82,7 @@ def can_edit_transgressao(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=[OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE]).exists()
+    return pertence(user, OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE)
 
 def can_finalizar_ouvidoria(user):
     """
@@ -91,7 +93,7 @@ def can_finalizar_ouvidoria(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=[OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE]).exists()
+    return pertence(user, OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE)
 
 def can_change_patd_date(user):
     """
@@ -102,7 +104,7 @@ def can_change_patd_date(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=[OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE]).exists()
+    return pertence(user, OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE)
 
 def can_manage_absences(user):
     """
@@ -112,7 +114,7 @@ def can_manage_absences(user):
         return False
     if user.is_superuser:
         return True
-    return user.groups.filter(name__in=[OUVIDORIA_CB, OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE]).exists()
+    return pertence(user, OUVIDORIA_CB, OUVIDORIA_ADJUNTO, OUVIDORIA_CHEFE)
 
 # Redefine has_ouvidoria_access to use the new logic for backward compatibility in the short term.
 def has_ouvidoria_access(user):
@@ -123,4 +125,8 @@ def has_comandante_access(user):
     """Verifica se o utilizador pertence ao grupo 'Comandante' ou é um superutilizador."""
     if not user.is_authenticated:
         return False
-    return user.groups.filter(name=COMANDANTE).exists() or user.is_superuser
+    return user.is_superuser or pertence(user, COMANDANTE)
+
+def has_patd_detail_access(user):
+    """Quem pode ver o detalhe da PATD (e as assinaturas exibidas nele): Ouvidoria ou Comandante."""
+    return has_ouvidoria_access(user) or has_comandante_access(user)
@@ -0,0 +1,140 @@
+"""
+Pré-filtro local de similaridade antes de consultar a IA (verifica_similaridade).
+
+Os textos são normalizados (minúsculas, sem acentos nem pontuação) e
+representados por TF-IDF de n-gramas de caracteres. A nova transgressão é
+comparada com todas as PATDs candidatas numa única multiplicação de matrizes
+(numpy), obtendo a similaridade do cosseno de cada uma:
+
+  - score >= SIMILARIDADE_LIMIAR_DUPLICADA  -> duplicata, sem chamar a IA;
+  - score <  SIMILARIDADE_LIMIAR_DISTINTA   -> distinta, sem chamar a IA;
+  - entre os dois limiares                  -> a IA decide (maior score primeiro).
+
+As chamadas evitadas/realizadas são contabilizadas no cache do Django
+(ver metricas_similaridade).
+"""
+import logging
+import re
+import unicodedata
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+_NAO_ALFANUM = re.compile(r'[^a-z0-9]+')
+_TAMANHO_NGRAMA = 4
+
+_METRICA_EVITADAS = 'similaridade:ia_evitadas'
+_METRICA_CONSULTADAS = 'similaridade:ia_consultadas'
+
+
+def normalizar_texto(texto):
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return _NAO_ALFANUM.sub(' ', texto).strip()
+
+
+def _ngramas(texto):
+    # Cada palavra com bordas, para que palavras curtas também gerem n-gramas
+    grams = {}
+    for palavra in texto.split():
+        palavra = f' {palavra} '
+        if len(palavra) <= _TAMANHO_NGRAMA:
+            grams[palavra] = grams.get(palavra, 0) + 1
+            continue
+        for i in range(len(palavra) - _TAMANHO_NGRAMA + 1):
+            g = palavra[i:i + _TAMANHO_NGRAMA]
+            grams[g] = grams.get(g, 0) + 1
+    return grams
+
+
+def pontuar(texto, candidatos):
+    """
+    Similaridade do cosseno (0..1) entre `texto` e cada texto de `candidatos`,
+    calculada numa única passagem vetorizada. Retorna um np.ndarray.
+    """
+    if not candidatos:
+        return np.zeros(0)
+    docs = [_ngramas(normalizar_texto(t)) for t in [texto, *candidatos]]
+
+    vocabulario = {}
+    for d in docs:
+        for g in d:
+            vocabulario.setdefault(g, len(vocabulario))
+    if not vocabulario:
+        return np.zeros(len(candidatos))
+
+    matriz = np.zeros((len(docs), len(vocabulario)), dtype=np.float32)
+    for linha, d in enumerate(docs):
+        for g, freq in d.items():
+            matriz[linha, vocabulario[g]] = freq
+
+    # TF sublinear + IDF suavizado sobre o próprio lote
+    df = np.count_nonzero(matriz, axis=0)
+    idf = np.log((1 + len(docs)) / (1 + df)) + 1.0
+    np.log1p(matriz, out=matriz)
+    matriz *= idf
+
+    normas = np.linalg.norm(matriz, axis=1)
+    normas[normas == 0] = 1.0
+    matriz /= normas[:, None]
+    return matriz[1:] @ matriz[0]
+
+
+def _registrar(evitadas, consultadas):
+    for chave, valor in ((_METRICA_EVITADAS, evitadas), (_METRICA_CONSULTADAS, consultadas)):
+        if not valor:
+            continue
+        try:
+            cache.add(chave, 0, None)
+            cache.incr(chave, valor)
+        except Exception as e:
+            logger.debug("Falha ao registrar métrica de similaridade: %s", e)
+
+
+def metricas_similaridade():
+    """Totais acumulados de chamadas à IA evitadas e realizadas pelo pré-filtro."""
+    return {
+        'ia_evitadas': cache.get(_METRICA_EVITADAS, 0),
+        'ia_consultadas': cache.get(_METRICA_CONSULTADAS, 0),
+    }
+
+
+def encontrar_duplicata(transgressao, patds_existentes):
+    """
+    Retorna a primeira PATD de `patds_existentes` com teor similar a
+    `transgressao`, ou None. Só consulta verifica_similaridade para as
+    candidatas que ficam na faixa ambígua entre os limiares.
+    """
+    from .analise_transgressao import verifica_similaridade
+
+    patds = list(patds_existentes)
+    if not patds:
+        return None
+
+    limiar_duplicada = settings.SIMILARIDADE_LIMIAR_DUPLICADA
+    limiar_distinta = settings.SIMILARIDADE_LIMIAR_DISTINTA
+    scores = pontuar(transgressao, [p.transgressao for p in patds])
+    ordem = np.argsort(-scores, kind='stable')
+
+    if scores[ordem[0]] >= limiar_duplicada:
+        _registrar(evitadas=len(patds), consultadas=0)
+        logger.info("Duplicidade resolvida localmente: PATD %s (score=%.2f)",
+                    patds[ordem[0]].numero_patd, scores[ordem[0]])
+        return patds[ordem[0]]
+
+    texto_novo = transgressao.strip().lower()
+    consultadas = 0
+    encontrada = None
+    for indice in ordem:
+        if scores[indice] < limiar_distinta:
+            break
+        consultadas += 1
+        if verifica_similaridade(texto_novo, patds[indice].transgressao.strip().lower()):
+            encontrada = patds[indice]
+            break
+
+    _registrar(evitadas=len(patds) - consultadas, consultadas=consultadas)
+    return encontrada
@@ -1,4 +1,5 @@
 import logging
+import os
 import openai
 from celery import shared_task
 
@@ -31,7 +32,8 @@ def regenerar_ocorrencia_task(self, patd_pk):
     from .analise_transgressao import reescrever_ocorrencia
     patd = PATD.objects.get(pk=patd_pk)
     try:
-        nova_ocorrencia = reescrever_ocorrencia(patd.transgressao)
+        # Regenerar = pedir outra resposta à IA, não a que está em cache
+        nova_ocorrencia = reescrever_ocorrencia.recalcular(patd.transgressao)
         patd.ocorrencia_reescrita = nova_ocorrencia
         patd.comprovante = nova_ocorrencia
         patd.save(update_fields=['ocorrencia_reescrita', 'comprovante'])
@@ -80,7 +82,7 @@ def regenerar_punicao_task(self, patd_pk):
     patd = PATD.objects.get(pk=patd_pk)
     try:
         _circ = patd.circunstancias if isinstance(patd.circunstancias, dict) else {}
-        punicao_obj = sugere_punicao(
+        punicao_obj = sugere_punicao.recalcular(
             transgressao=patd.transgressao,
             agravantes=_circ.get('agravantes', []),
             atenuantes=_circ.get('atenuantes', []),
@@ -103,6 +105,11 @@ def analisar_punicao_task(self, patd_pk, force_reanalyze=False):
     from .analise_transgressao import enquadra_item, verifica_agravante_atenuante, sugere_punicao
 
     patd = PATD.objects.select_related('militar').get(pk=patd_pk)
+    if force_reanalyze:
+        # Ignora o cache de respostas da IA (Ouvidoria.cache_ia) e grava as novas
+        enquadra_item = enquadra_item.recalcular
+        verifica_agravante_atenuante = verifica_agravante_atenuante.recalcular
+        sugere_punicao = sugere_punicao.recalcular
     try:
         itens_obj = enquadra_item(patd.transgressao)
         patd.itens_enquadrados = [item for item in itens_obj.item]
@@ -165,3 +172,25 @@ def analisar_punicao_task(self, patd_pk, force_reanalyze=False):
     except Exception as exc:
         logger.error("analisar_punicao_task falhou (pk=%s): %s", patd_pk, exc, exc_info=True)
         _retry_task(self, exc, patd_pk, "analisar_punicao_task")
+
+
+@shared_task(bind=True, max_retries=2, time_limit=600)
+def exportar_patd_pdf_task(self, patd_pk):
+    """Gera (ou reaproveita) o PDF da PATD em media/patd_<pk>/exports/."""
+    from .views.documents import _PATD_EXPORT_QS, gerar_pdf_patd
+    patd = _PATD_EXPORT_QS.get(pk=patd_pk)
+    try:
+        path = gerar_pdf_patd(patd)
+        return {'arquivo': os.path.basename(path)}
+    except Exception as exc:
+        logger.error("exportar_patd_pdf_task falhou (pk=%s): %s", patd_pk, exc, exc_info=True)
+        raise self.retry(exc=exc, countdown=_DEFAULT_DELAY)
+
+
+@shared_task
+def expurgar_cache_ia_task():
+    """Remove diariamente as respostas da IA vencidas (CacheRespostaIA)."""
+    from .cache_ia import expurgar_expirados
+    removidos = expurgar_expirados()
+    logger.info("Cache de IA: %d resposta(s) expirada(s) removida(s).", removidos)
+    return removidos
@@ -1,17 +1,18 @@
 from django import template
 from Ouvidoria import permissions
+from login.grupos import pertence
 
 register = template.Library()
 
 
 @register.filter(name='is_informatica_admin')
 def is_informatica_admin_filter(user):
-    return user.is_staff or user.groups.filter(name='informatica-admin').exists()
+    return user.is_staff or pertence(user, 'informatica-admin')
 
 
 @register.filter(name='is_informatica_secao')
 def is_informatica_secao_filter(user):
-    return user.is_staff or user.groups.filter(name__in=['informatica-admin', 'informatica-secao']).exists()
+    return user.is_staff or pertence(user, 'informatica-admin', 'informatica-secao')
 
 
 @register.filter(name='user_foto_url')
@@ -1,3 +1,62 @@
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from Secao_pessoal.models import AssinaturaEfetivo, Efetivo
+
+from .forms import AtribuirOficialForm
+from .models import PATD, Anexo
+
+
+class AtribuirOficialFormTests(TestCase):
+
+    def test_lista_so_oficiais_com_assinatura(self):
+        com = Efetivo.objects.create(posto='CP', nome_guerra='ASSINADO', nome_completo='A', oficial=True, situacao='ATIVO')
+        AssinaturaEfetivo.objects.create(efetivo=com, imagem='data:image/png;base64,AAAA')
+        vazia = Efetivo.objects.create(posto='CP', nome_guerra='VAZIA', nome_completo='B', oficial=True, situacao='ATIVO')
+        AssinaturaEfetivo.objects.create(efetivo=vazia, imagem='')
+        Efetivo.objects.create(posto='1T', nome_guerra='SEM', nome_completo='C', oficial=True, situacao='ATIVO')
+        praca = Efetivo.objects.create(posto='CB', nome_guerra='PRACA', nome_completo='D', situacao='ATIVO')
+        AssinaturaEfetivo.objects.create(efetivo=praca, imagem='data:image/png;base64,AAAA')
+
+        form = AtribuirOficialForm()
+
+        self.assertEqual(list(form.fields['oficial_responsavel'].queryset), [com])
+
+
+class AssinaturaEfetivoViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()  # grupos do usuário (login.grupos) ficam no cache entre testes
+        self.militar = Efetivo.objects.create(posto='CL', nome_guerra='CMT', nome_completo='E', oficial=True, situacao='ATIVO')
+        AssinaturaEfetivo.objects.create(efetivo=self.militar, imagem='data:image/png;base64,iVBORw0KGgo=')
+        self.url = reverse('Ouvidoria:assinatura_efetivo', args=[self.militar.pk])
+
+    def _usuario(self, grupo=None):
+        user = User.objects.create_user(username=f'u_{grupo or "sem"}', password='x')
+        if grupo:
+            user.groups.add(Group.objects.get_or_create(name=grupo)[0])
+        self.client.force_login(user)
+
+    def test_comandante_ve_a_assinatura_do_detalhe_da_patd(self):
+        self._usuario('Comandante')
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'image/png')
+
+    def test_usuario_sem_acesso_a_patd_e_barrado(self):
+        self._usuario()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class AnexoIndexTests(TestCase):
+
+    def test_anexo_novo_aparece_na_patd_vinda_de_prefetch(self):
+        patd = PATD.objects.prefetch_related('anexos').get(pk=PATD.objects.create(transgressao='x').pk)
+        self.assertFalse(patd.anexo_index.tem('documento_final'))
+
+        Anexo.objects.create(patd=patd, arquivo='patd_anexos/final.pdf', tipo='documento_final')
+
+        with self.assertNumQueries(1):
+            self.assertTrue(patd.anexo_index.tem('documento_final'))
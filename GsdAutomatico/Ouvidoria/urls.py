@@ -102,4 +102,6 @@ urlpatterns = [
     path('api/search-militares/', views.search_militares_json, name='search_militares_json'),
     path('api/enquadrar-itens/', views.enquadrar_itens_view, name='enquadrar_itens'),
     path('anexo/<int:pk>/excluir/', views.excluir_anexo, name='excluir_anexo'),
+    path('anexo/<int:pk>/pagina/<int:pagina>/', views.anexo_pagina_imagem, name='anexo_pagina_imagem'),
+    path('assinatura/efetivo/<int:pk>/', views.assinatura_efetivo, name='assinatura_efetivo'),
 ]
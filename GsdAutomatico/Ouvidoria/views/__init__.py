@@ -35,6 +35,7 @@ from .signatures import (
     salvar_assinatura_testemunha,
     remover_assinatura,
     lista_oficiais,
+    assinatura_efetivo,
     salvar_assinatura_padrao,
     gerenciar_configuracoes_padrao,
 )
@@ -71,6 +72,7 @@ from .documents import (
     exportar_patd_docx,
     preview_patd_pdf,
     exportar_patd_pdf,
+    anexo_pagina_imagem,
     upload_ficha_individual,
     upload_formulario_resumo,
 )
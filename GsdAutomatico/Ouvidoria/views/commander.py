@@ -60,15 +60,16 @@ def _check_and_advance_reconsideracao_status(patd_pk):
             # Garante que estamos a verificar o estado mais recente, incluindo
             # a atualização da assinatura que acabou de ser salva.
             patd.refresh_from_db()
+            patd.invalidar_anexo_index()
 
             # Detailed logging for debugging
             logger.info(f"PATD {patd.pk} (Reconsideration Check):")
             logger.info(f"  - Current status: {patd.status}")
             logger.info(f"  - Has texto_reconsideracao: {bool(patd.texto_reconsideracao)}")
-            logger.info(f"  - Anexos (tipo='reconsideracao') count: {patd.anexos.filter(tipo='reconsideracao').count()}")
+            logger.info(f"  - Anexos (tipo='reconsideracao') count: {len(patd.anexo_index.de('reconsideracao'))}")
             logger.info(f"  - Has assinatura_reconsideracao: {bool(patd.assinatura_reconsideracao)}")
 
-            has_content = bool(patd.texto_reconsideracao or patd.anexos.filter(tipo='reconsideracao').exists())
+            has_content = bool(patd.texto_reconsideracao or patd.anexo_index.tem('reconsideracao'))
             
             # Primeiro, tenta verificar pelo campo do modelo (que deveria estar atualizado)
             has_signature_db_field = bool(patd.assinatura_reconsideracao)
@@ -1,13 +1,17 @@
-import io, json, os, re, logging, base64, uuid, traceback
-import tempfile, subprocess
+import io, json, os, re, logging, base64, uuid, traceback, hashlib
+import tempfile, subprocess, mimetypes
+from pathlib import Path
+from urllib.parse import urlparse, unquote
+from urllib.request import url2pathname
 from datetime import datetime, timedelta
 
 from django.conf import settings
 from django.utils import timezone
 
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import resolve, Resolver404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.core.files.base import ContentFile
@@ -23,6 +27,8 @@ from bs4 import BeautifulSoup, NavigableString
 import fitz
 
 from ..models import PATD, Configuracao, Anexo, AlegacaoDefesaLog
+from ..assinaturas import decodificar_assinatura, url_assinatura_efetivo
+from ..anexo_paginas import rasterizar_paginas, pagina_png, ESCALA_VISUALIZADOR, ESCALA_MINIATURA
 from Secao_pessoal.models import Efetivo
 from .decorators import ouvidoria_required, oficial_responsavel_required, comandante_redirect
 from .helpers import (
@@ -37,6 +43,11 @@ from auditoria.utils import registrar, resolver_label
 
 logger = logging.getLogger(__name__)
 
+# Exportações leem militar/oficial/testemunhas e os anexos várias vezes por documento
+_PATD_EXPORT_QS = PATD.objects.select_related(
+    'militar', 'oficial_responsavel', 'testemunha1', 'testemunha2'
+).prefetch_related('anexos')
+
 _PATD_PERMISSAO_MAP = {
     OUVIDORIA_CHEFE: 'Chefe- Ouvidoria',
     OUVIDORIA_APURADOR: 'Apurador- Ouvidoria',
@@ -53,7 +64,7 @@ def salvar_alegacao_defesa(request, pk):
     try:
         patd = get_object_or_404(PATD, pk=pk)
 
-        if patd.alegacao_defesa or patd.anexos.filter(tipo='defesa').exists():
+        if patd.alegacao_defesa or patd.anexo_index.tem('defesa'):
             return JsonResponse({
                 'status': 'error',
                 'message': 'A alegação de defesa já foi enviada e não pode ser alterada.'
@@ -428,8 +439,8 @@ def upload_formulario_resumo(request, pk):
 
 
 def _try_advance_from_confeccao(patd):
-    tem_ficha = patd.anexos.filter(tipo='ficha_individual').exists()
-    tem_resumo = patd.anexos.filter(tipo='formulario_resumo').exists()
+    tem_ficha = patd.anexo_index.tem('ficha_individual')
+    tem_resumo = patd.anexo_index.tem('formulario_resumo')
     if tem_ficha and tem_resumo:
         patd.status = 'ciencia_militar'
         patd.save(update_fields=['status'])
@@ -750,115 +761,282 @@ def preview_patd_pdf(request, pk):
     return exportar_patd_docx(request, pk)
 
 
+# ── Exportação PDF (cache em disco por fingerprint) ─────────────────────────
+# O PDF final é gravado em MEDIA_ROOT/patd_<pk>/exports/ com o fingerprint no
+# nome. Qualquer alteração na PATD, nos anexos ou nas assinaturas muda o
+# fingerprint e força nova geração; downloads repetidos viram stream do ficheiro.
+# Incrementar _PDF_EXPORT_VERSION invalida todos os PDFs já gerados.
+
+_PDF_EXPORT_VERSION = 1
+
+
+def _pdf_export_dir(patd):
+    return os.path.join(settings.MEDIA_ROOT, f'patd_{patd.pk}', 'exports')
+
+
+def _fingerprint_pdf_patd(patd, document_pages_raw):
+    """
+    Calcula o fingerprint do PDF exportado a partir do HTML das páginas
+    (que já reflete campos da PATD, templates e configuração) somado aos
+    ficheiros que só são embutidos na etapa final: anexos e assinaturas.
+    """
+    h = hashlib.sha256()
+    h.update(f'v{_PDF_EXPORT_VERSION}'.encode())
+    for item in document_pages_raw:
+        h.update(item.encode('utf-8'))
+        h.update(b'\0')
+
+    for anexo in sorted(patd.anexos.all(), key=lambda a: a.pk):
+        try:
+            size = anexo.arquivo.size
+        except (OSError, ValueError):
+            size = -1
+        h.update(f'anexo:{anexo.pk}:{anexo.tipo}:{anexo.arquivo.name}:{size}\0'.encode())
+
+    for field in ('assinatura_alegacao_defesa', 'assinatura_reconsideracao', 'assinatura_oficial',
+                  'assinatura_testemunha1', 'assinatura_testemunha2', 'assinatura_cmd_gsd_despacho'):
+        f = getattr(patd, field)
+        h.update(f'{field}:{f.name if f else ""}\0'.encode())
+    h.update(json.dumps(patd.assinaturas_militar or []).encode())
+
+    if not patd.assinatura_cmd_gsd_despacho:
+        from informatica.models import ConfiguracaoComandantes
+        _cmd_gsd = ConfiguracaoComandantes.get_instance().comandante_gsd
+        cmd_assinatura = getattr(_cmd_gsd, 'assinatura', None) if _cmd_gsd else None
+        if cmd_assinatura:
+            h.update(str(getattr(cmd_assinatura, 'name', cmd_assinatura)).encode())
+    return h.hexdigest()
+
+
+def localizar_pdf_exportado(patd):
+    """
+    Retorna (caminho, fingerprint) do PDF da PATD no estado atual.
+    O caminho pode ainda não existir — nesse caso o PDF precisa ser gerado.
+    """
+    document_pages_raw = get_document_pages(patd, for_docx=True)
+    fingerprint = _fingerprint_pdf_patd(patd, document_pages_raw)
+    path = os.path.join(_pdf_export_dir(patd), f'PATD_{fingerprint[:32]}.pdf')
+    return path, fingerprint, document_pages_raw
+
+
+def gerar_pdf_patd(patd):
+    """
+    Garante que o PDF da PATD no estado atual existe em disco e retorna o caminho.
+    Gravação atômica (tempfile + os.replace) para que workers concorrentes nunca
+    sirvam um ficheiro parcial; versões antigas da mesma PATD são removidas.
+    """
+    path, _fingerprint, document_pages_raw = localizar_pdf_exportado(patd)
+    if os.path.exists(path):
+        return path
+
+    pdf_bytes = _render_pdf_patd(patd, document_pages_raw)
+
+    export_dir = os.path.dirname(path)
+    os.makedirs(export_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=export_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    for name in os.listdir(export_dir):
+        old = os.path.join(export_dir, name)
+        if old != path and name.endswith('.pdf'):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
+
+def _servir_pdf_exportado(request, patd, path):
+    filename_base = f"PATD_{patd.numero_patd or patd.pk}"
+    response = FileResponse(open(path, 'rb'), content_type='application/pdf',
+                            as_attachment=True, filename=f'{filename_base}.pdf')
+    _set_download_cookie(request, response)
+    return response
+
+
 @login_required
 @ouvidoria_required
 def exportar_patd_pdf(request, pk):
-    """Gera PDF idêntico ao visualizador usando WeasyPrint com todas as imagens em base64."""
-    import re as _re
-    from django.conf import settings as _settings
-    from django.contrib.staticfiles import finders as _finders
+    """
+    Serve o PDF da PATD a partir do cache em disco quando o conteúdo não mudou.
+    Com ?async=1 a geração é delegada ao Celery (resposta 202 com task_id para
+    polling em /api/task/<id>/); sem o parâmetro gera de forma síncrona.
+    """
+    patd = get_object_or_404(_PATD_EXPORT_QS, pk=pk)
+    path, _fingerprint, _pages = localizar_pdf_exportado(patd)
 
-    patd = get_object_or_404(PATD, pk=pk)
-    document_pages_raw = get_document_pages(patd, for_docx=True)
+    if request.GET.get('async'):
+        if os.path.exists(path):
+            return JsonResponse({'status': 'ready'})
+        from ..tasks import exportar_patd_pdf_task
+        task = exportar_patd_pdf_task.delay(patd.pk)
+        return JsonResponse({'status': 'pending', 'task_id': task.id}, status=202)
 
-    PB = '<div class="manual-page-break"></div>'
+    if not os.path.exists(path):
+        try:
+            path = gerar_pdf_patd(patd)
+        except Exception as e:
+            logger.error("WeasyPrint falhou ao gerar PDF PATD %s: %s", pk, e)
+            return HttpResponse('Erro ao gerar PDF.', status=500)
+    return _servir_pdf_exportado(request, patd, path)
+
+
+# ── Recursos da exportação PDF ───────────────────────────────────────────────
+# O HTML da exportação referencia imagens por URL (/media/..., /static/...,
+# assinatura_efetivo, file:// do cache de páginas). _export_url_fetcher resolve
+# essas URLs direto do disco/banco para o WeasyPrint, sem base64 no HTML.
 
-    # ── Helpers base64 ────────────────────────────────────────────────────────
+_EXPORT_BASE_URL = 'http://exportacao.local/'
 
-    def _file_to_b64(path):
+
+def _media_path(media_url):
+    rel = media_url.lstrip('/')
+    media_prefix = settings.MEDIA_URL.lstrip('/')
+    if rel.startswith(media_prefix):
+        rel = rel[len(media_prefix):]
+    return os.path.join(settings.MEDIA_ROOT, rel)
+
+
+def _static_path(src):
+    """Resolve qualquer URL /Static/... ou /static/... para path no disco."""
+    filename = src.rstrip('/').split('/')[-1].split('?')[0]
+    path = finders.find(f'img/{filename}') or finders.find(filename)
+    if not path:
+        for base in [settings.STATIC_ROOT, getattr(settings, 'STATICFILES_DIRS', [None])[0] or '']:
+            for candidate in [os.path.join(base, 'img', filename), os.path.join(base, filename)]:
+                if os.path.exists(candidate):
+                    return candidate
+    return path
+
+
+def _dentro_de(path, raizes):
+    real = os.path.realpath(path)
+    return any(real.startswith(os.path.realpath(r) + os.sep) for r in raizes if r)
+
+
+def _export_url_fetcher(url, *args, **kwargs):
+    """
+    url_fetcher do WeasyPrint: lê mídia, estáticos, páginas rasterizadas e
+    assinaturas de militares direto da origem. file:// só é aceito dentro do
+    MEDIA_ROOT e do cache de páginas de anexos.
+    """
+    parsed = urlparse(url)
+    path = None
+    if parsed.scheme == 'file':
+        path = url2pathname(parsed.path)
+        if not _dentro_de(path, [settings.MEDIA_ROOT, settings.ANEXO_PAGINAS_CACHE_DIR]):
+            raise ValueError(f'Acesso negado na exportação: {url}')
+    elif parsed.netloc == urlparse(_EXPORT_BASE_URL).netloc:
+        rota = unquote(parsed.path)
+        if rota.startswith(settings.MEDIA_URL):
+            path = _media_path(rota)
+            if not _dentro_de(path, [settings.MEDIA_ROOT]):
+                raise ValueError(f'Acesso negado na exportação: {url}')
+        elif rota.lower().startswith('/static/'):
+            path = _static_path(rota)
+        else:
+            try:
+                match = resolve(rota)
+            except Resolver404:
+                match = None
+            if match and match.url_name == 'assinatura_efetivo':
+                data_uri = (Efetivo.objects.filter(pk=match.kwargs['pk'])
+                            .values_list('assinatura_registro__imagem', flat=True).first())
+                content, mime = decodificar_assinatura(data_uri)
+                if content is not None:
+                    return {'string': content, 'mime_type': mime, 'redirected_url': url}
         if not path or not os.path.exists(path):
-            return None
-        ext = os.path.splitext(path)[1].lower().lstrip('.')
-        mime = {'png':'image/png','jpg':'image/jpeg','jpeg':'image/jpeg',
-                'gif':'image/gif','webp':'image/webp','bmp':'image/bmp',
-                'svg':'image/svg+xml'}.get(ext, 'image/png')
-        with open(path, 'rb') as f:
-            return f'data:{mime};base64,{base64.b64encode(f.read()).decode()}'
-
-    def _field_to_b64(field):
+            raise ValueError(f'Recurso não encontrado na exportação: {url}')
+    else:
+        from weasyprint import default_url_fetcher
+        return default_url_fetcher(url, *args, **kwargs)
+    return {
+        'file_obj': open(path, 'rb'),
+        'mime_type': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+        'redirected_url': url,
+    }
+
+
+def _render_pdf_patd(patd, document_pages_raw):
+    """
+    Gera PDF idêntico ao visualizador usando WeasyPrint. As imagens ficam como
+    URLs no HTML e são lidas do disco por _export_url_fetcher.
+    """
+    import re as _re
+
+    PB = '<div class="manual-page-break"></div>'
+
+    def _field_src(field):
         if not field or not field.name:
             return None
         try:
-            return _file_to_b64(field.path)
+            return field.url if os.path.exists(field.path) else None
         except Exception:
             return None
 
-    def _media_path(media_url):
-        rel = media_url.lstrip('/')
-        media_prefix = _settings.MEDIA_URL.lstrip('/')
-        if rel.startswith(media_prefix):
-            rel = rel[len(media_prefix):]
-        return os.path.join(_settings.MEDIA_ROOT, rel)
-
-    def _static_path(src):
-        """Resolve qualquer URL /Static/... ou /static/... para path no disco."""
-        filename = src.rstrip('/').split('/')[-1].split('?')[0]
-        path = _finders.find(f'img/{filename}') or _finders.find(filename)
-        if not path:
-            for base in [_settings.STATIC_ROOT, getattr(_settings, 'STATICFILES_DIRS', [None])[0] or '']:
-                for candidate in [os.path.join(base, 'img', filename), os.path.join(base, filename)]:
-                    if os.path.exists(candidate):
-                        return candidate
-        return path
-
     def _pdf_to_imgs(path):
-        """Converte PDF em lista de <img> base64 via fitz ajustado à página de destino."""
-        imgs = []
+        """
+        Converte PDF em lista de URIs file:// das páginas rasterizadas, ajustadas à
+        página de destino. Os PNGs vêm do cache em disco (Ouvidoria.anexo_paginas)
+        e o WeasyPrint os lê direto do disco, sem base64 no HTML.
+        """
+        # Dimensões de destino em pontos (1 cm = 28.346 pt)
+        dest_w_pt = _meta['w'] * 28.346
+        dest_h_pt = _meta['h'] * 28.346
+
+        def _escala(pr):
+            # Calcula escala para caber inteiro na página de destino (sem cortar)
+            return min(dest_w_pt / pr.width, dest_h_pt / pr.height) if pr.width and pr.height else 1.0
+
         try:
-            # Dimensões de destino em pontos (1 cm = 28.346 pt)
-            dest_w_pt = _meta['w'] * 28.346
-            dest_h_pt = _meta['h'] * 28.346
-            doc = fitz.open(path)
-            for page in doc:
-                pr = page.rect
-                src_w, src_h = pr.width, pr.height
-                # Calcula escala para caber inteiro na página de destino (sem cortar)
-                scale = min(dest_w_pt / src_w, dest_h_pt / src_h) if src_w and src_h else 1.0
-                mat = fitz.Matrix(scale, scale)
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                b64 = base64.b64encode(pix.tobytes('png')).decode()
-                imgs.append(f'data:image/png;base64,{b64}')
-            doc.close()
+            return [Path(p).as_uri() for p in rasterizar_paginas(path, _escala)]
         except Exception as e:
             logger.error("fitz falhou em %s: %s", path, e)
-        return imgs
+            return []
 
     # ── Assinaturas ───────────────────────────────────────────────────────────
 
     SIG_STYLE = 'height:90px;display:block;margin:4px auto;'  # centralizado + maior
 
     def _sig_img(field):
-        b64 = _field_to_b64(field)
-        return (f'<p style="text-align:center;margin:0;"><img src="{b64}" style="{SIG_STYLE}"/></p>'
-                if b64 else '<span style="color:#888;font-style:italic;">[Sem assinatura]</span>')
+        src = _field_src(field)
+        return (f'<p style="text-align:center;margin:0;"><img src="{src}" style="{SIG_STYLE}"/></p>'
+                if src else '<span style="color:#888;font-style:italic;">[Sem assinatura]</span>')
 
     cmd_sig_html = '<span style="color:#888;font-style:italic;">[Sem assinatura]</span>'
     # Prioridade: assinatura salva no despacho → assinatura padrão do comandante GSD
     if patd.assinatura_cmd_gsd_despacho:
-        b64 = _field_to_b64(patd.assinatura_cmd_gsd_despacho)
-        if b64:
-            cmd_sig_html = f'<p style="text-align:center;margin:0;"><img src="{b64}" style="{SIG_STYLE}"/></p>'
+        src = _field_src(patd.assinatura_cmd_gsd_despacho)
+        if src:
+            cmd_sig_html = f'<p style="text-align:center;margin:0;"><img src="{src}" style="{SIG_STYLE}"/></p>'
     else:
         from informatica.models import ConfiguracaoComandantes
         _cmd_gsd = ConfiguracaoComandantes.get_instance().comandante_gsd
         cmd_assinatura = getattr(_cmd_gsd, 'assinatura', None) if _cmd_gsd else None
         if cmd_assinatura:
             if isinstance(cmd_assinatura, str) and cmd_assinatura.startswith('data:'):
-                cmd_sig_html = f'<p style="text-align:center;margin:0;"><img src="{cmd_assinatura}" style="{SIG_STYLE}"/></p>'
+                src = url_assinatura_efetivo(_cmd_gsd)
+                cmd_sig_html = f'<p style="text-align:center;margin:0;"><img src="{src}" style="{SIG_STYLE}"/></p>'
             elif hasattr(cmd_assinatura, 'path'):
-                b64 = _field_to_b64(cmd_assinatura)
-                if b64:
-                    cmd_sig_html = f'<p style="text-align:center;margin:0;"><img src="{b64}" style="{SIG_STYLE}"/></p>'
+                src = _field_src(cmd_assinatura)
+                if src:
+                    cmd_sig_html = f'<p style="text-align:center;margin:0;"><img src="{src}" style="{SIG_STYLE}"/></p>'
 
     assinaturas_militar = patd.assinaturas_militar or []
     mil_idx = [0]
 
     def _mil_sig(_m):
         i = mil_idx[0]; mil_idx[0] += 1
-        if i < len(assinaturas_militar) and assinaturas_militar[i]:
-            b64 = _file_to_b64(_media_path(assinaturas_militar[i]))
-            if b64:
-                return f'<p style="text-align:center;margin:0;"><img src="{b64}" style="{SIG_STYLE}"/></p>'
+        src = assinaturas_militar[i] if i < len(assinaturas_militar) else None
+        if src and os.path.exists(_media_path(src)):
+            return f'<p style="text-align:center;margin:0;"><img src="{src}" style="{SIG_STYLE}"/></p>'
         return '<span style="color:#888;font-style:italic;">[Sem assinatura]</span>'
 
     _sig_cache = {
@@ -871,8 +1049,8 @@ def exportar_patd_pdf(request, pk):
 
     # ── Substituição universal de src (aspas simples e duplas) ───────────────
 
-    def _inline_all_srcs(html):
-        """Converte todos os src= para base64 ou fitz, independente de aspas.
+    def _normalize_srcs(html):
+        """Normaliza os src= de mídia/estáticos para caminhos locais, independente de aspas.
         Tags <embed>/<iframe> com PDF são substituídas inteiramente pelas imagens."""
 
         # 1. Substitui tags <embed> e <iframe> com PDF src pela sequência de imagens
@@ -894,19 +1072,17 @@ def exportar_patd_pdf(request, pk):
 
         html = _re.sub(r'<embed\b[^>]*/?>|<iframe\b[^>]*>.*?</iframe>', _replace_embed_tag, html, flags=_re.DOTALL)
 
-        # 2. Substitui src= de imagens (aspas simples ou duplas) por base64
+        # 2. URLs absolutas de mídia/estáticos viram caminhos relativos, resolvidos
+        #    pelo _export_url_fetcher (aspas simples ou duplas)
         def _sub(m):
             q   = m.group(1)
             src = m.group(2)
 
-            if '/media' in src and not src.lower().endswith('.pdf'):
-                b64 = _file_to_b64(_media_path(src))
-                return f'src={q}{b64}{q}' if b64 else m.group(0)
+            if src.startswith(('data:', 'file:')):
+                return m.group(0)
 
-            if '/static' in src.lower() or '/Static' in src:
-                path = _static_path(src)
-                b64 = _file_to_b64(path) if path else None
-                return f'src={q}{b64}{q}' if b64 else m.group(0)
+            if '/media' in src or '/static' in src.lower():
+                return f'src={q}{urlparse(src).path}{q}'
 
             return m.group(0)
 
@@ -929,7 +1105,7 @@ def exportar_patd_pdf(request, pk):
         html = _re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', html)
         html = _re.sub(r'<div class="page-meta"[^>]*></div>', '', html)
         html = _re.sub(r'<p>(<br\s*\/?>|\s|&nbsp;)*</p>', '', html)
-        html = _inline_all_srcs(html)
+        html = _normalize_srcs(html)
         return html
 
     # ── Dimensões de página ───────────────────────────────────────────────────
@@ -967,20 +1143,21 @@ def exportar_patd_pdf(request, pk):
         ext = os.path.splitext(anexo.arquivo.name)[1].lower()
         path = anexo.arquivo.path
         if ext in ('.png','.jpg','.jpeg','.gif','.bmp','.webp'):
-            b64 = _file_to_b64(path)
+            if not os.path.exists(path):
+                return []
             # Imagem centralizada e contida na folha
-            return [f'<img src="{b64}" style="width:100%;height:100%;object-fit:contain;display:block;"/>'] if b64 else []
+            return [f'<img src="{anexo.arquivo.url}" style="width:100%;height:100%;object-fit:contain;display:block;"/>']
         elif ext == '.pdf':
-            # _pdf_to_imgs retorna lista de data URIs
+            # _pdf_to_imgs retorna lista de URIs file:// do cache de páginas
             return [f'<img src="{uri}" style="width:100%;height:100%;object-fit:contain;display:block;"/>'
                     for uri in _pdf_to_imgs(path)]
         return [f'<p style="font-style:italic;">[Anexo: {os.path.basename(anexo.arquivo.name)}]</p>']
 
     placeholder_map = {
-        '{ANEXOS_DEFESA_PLACEHOLDER}':                list(patd.anexos.filter(tipo='defesa')),
-        '{ANEXOS_RECONSIDERACAO_PLACEHOLDER}':        list(patd.anexos.filter(tipo='reconsideracao')),
-        '{ANEXO_OFICIAL_RECONSIDERACAO_PLACEHOLDER}': list(patd.anexos.filter(tipo='reconsideracao_oficial')),
-        '{FORMULARIO_RESUMO_PLACEHOLDER}':            list(patd.anexos.filter(tipo='formulario_resumo')),
+        '{ANEXOS_DEFESA_PLACEHOLDER}':                patd.anexo_index.de('defesa'),
+        '{ANEXOS_RECONSIDERACAO_PLACEHOLDER}':        patd.anexo_index.de('reconsideracao'),
+        '{ANEXO_OFICIAL_RECONSIDERACAO_PLACEHOLDER}': patd.anexo_index.de('reconsideracao_oficial'),
+        '{FORMULARIO_RESUMO_PLACEHOLDER}':            patd.anexo_index.de('formulario_resumo'),
     }
 
     # ── Montar páginas ────────────────────────────────────────────────────────
@@ -1021,20 +1198,10 @@ def exportar_patd_pdf(request, pk):
         + '</body></html>'
     )
 
-    filename_base = f"PATD_{patd.numero_patd or pk}"
-
-    try:
-        from weasyprint import HTML as WeasyprintHTML
-        pdf_bytes = WeasyprintHTML(string=full_html).write_pdf()
-    except Exception as e:
-        logger.error("WeasyPrint falhou ao gerar PDF PATD %s: %s", pk, e)
-        return HttpResponse('Erro ao gerar PDF.', status=500)
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.pdf"'
-    response.write(pdf_bytes)
-    _set_download_cookie(request, response)
-    return response
+    from weasyprint import HTML as WeasyprintHTML
+    return WeasyprintHTML(
+        string=full_html, base_url=_EXPORT_BASE_URL, url_fetcher=_export_url_fetcher,
+    ).write_pdf()
 
 
 def _set_download_cookie(request, response):
@@ -1044,6 +1211,32 @@ def _set_download_cookie(request, response):
         response.set_cookie('download_token', token, max_age=60, samesite='Lax')
 
 
+_ESCALAS_PAGINA_ANEXO = {
+    'doc': ESCALA_VISUALIZADOR,
+    'mini': ESCALA_MINIATURA,
+}
+
+
+@login_required
+def anexo_pagina_imagem(request, pk, pagina):
+    """
+    Serve o PNG de uma página de anexo PDF a partir do cache em disco.
+    Só aceita as escalas pré-definidas (?q=doc|mini) para não permitir
+    rasterizações arbitrariamente grandes.
+    """
+    anexo = get_object_or_404(Anexo, pk=pk)
+    escala = _ESCALAS_PAGINA_ANEXO.get(request.GET.get('q', 'doc'))
+    if escala is None or not anexo.arquivo.name.lower().endswith('.pdf'):
+        raise Http404
+    try:
+        path = pagina_png(anexo.arquivo.path, pagina, escala)
+    except (IndexError, FileNotFoundError):
+        raise Http404
+    response = FileResponse(open(path, 'rb'), content_type='image/png')
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
 def exportar_patd_docx(request, pk):
 
 
@@ -1056,7 +1249,7 @@ def exportar_patd_docx(request, pk):
     """
 
 
-    patd = get_object_or_404(PATD, pk=pk)
+    patd = get_object_or_404(_PATD_EXPORT_QS, pk=pk)
 
 
     context = _get_document_context(patd, for_docx=True)
@@ -1154,13 +1347,13 @@ def exportar_patd_docx(request, pk):
 
 
 
-    anexos_defesa = patd.anexos.filter(tipo='defesa')
+    anexos_defesa = patd.anexo_index.de('defesa')
 
 
-    anexos_reconsideracao = patd.anexos.filter(tipo='reconsideracao')
+    anexos_reconsideracao = patd.anexo_index.de('reconsideracao')
 
 
-    anexos_reconsideracao_oficial = patd.anexos.filter(tipo='reconsideracao_oficial')
+    anexos_reconsideracao_oficial = patd.anexo_index.de('reconsideracao_oficial')
 
 
 
@@ -1371,7 +1564,7 @@ def exportar_patd_docx(request, pk):
             # Lida com placeholders de anexo
 
 
-            if "{ANEXOS_DEFESA_PLACEHOLDER}" in text_content_for_check and anexos_defesa.exists():
+            if "{ANEXOS_DEFESA_PLACEHOLDER}" in text_content_for_check and anexos_defesa:
                 for i, anexo in enumerate(anexos_defesa):
                     if i > 0:
                         last_p = document.paragraphs[-1] if document.paragraphs else document.add_paragraph()
@@ -1382,7 +1575,7 @@ def exportar_patd_docx(request, pk):
                 last_para_was_pdf_image = False
                 continue
 
-            if "{ANEXOS_RECONSIDERACAO_PLACEHOLDER}" in text_content_for_check and anexos_reconsideracao.exists():
+            if "{ANEXOS_RECONSIDERACAO_PLACEHOLDER}" in text_content_for_check and anexos_reconsideracao:
                 for i, anexo in enumerate(anexos_reconsideracao):
                     if i > 0:
                         last_p = document.paragraphs[-1] if document.paragraphs else document.add_paragraph()
@@ -1393,7 +1586,7 @@ def exportar_patd_docx(request, pk):
                 last_para_was_pdf_image = False
                 continue
 
-            if "{ANEXO_OFICIAL_RECONSIDERACAO_PLACEHOLDER}" in text_content_for_check and anexos_reconsideracao_oficial.exists():
+            if "{ANEXO_OFICIAL_RECONSIDERACAO_PLACEHOLDER}" in text_content_for_check and anexos_reconsideracao_oficial:
                 for i, anexo in enumerate(anexos_reconsideracao_oficial):
                     if i > 0:
                         last_p = document.paragraphs[-1] if document.paragraphs else document.add_paragraph()
@@ -1404,8 +1597,8 @@ def exportar_patd_docx(request, pk):
                 last_para_was_pdf_image = False
                 continue
 
-            formulario_resumo_qs = patd.anexos.filter(tipo='formulario_resumo')
-            if "{FORMULARIO_RESUMO_PLACEHOLDER}" in text_content_for_check and formulario_resumo_qs.exists():
+            formulario_resumo_qs = patd.anexo_index.de('formulario_resumo')
+            if "{FORMULARIO_RESUMO_PLACEHOLDER}" in text_content_for_check and formulario_resumo_qs:
                 for i, anexo in enumerate(formulario_resumo_qs):
                     if i > 0:
                         last_p = document.paragraphs[-1] if document.paragraphs else document.add_paragraph()
@@ -1425,7 +1618,7 @@ def exportar_patd_docx(request, pk):
                 src = (embed_tag or img_tag).get('src', '')
                 found_anexo = False
                 if src:
-                    for anexo in patd.anexos.filter(tipo__in=['oficio_lancamento', 'ficha_individual', 'formulario_resumo']):
+                    for anexo in patd.anexo_index.de('oficio_lancamento', 'ficha_individual', 'formulario_resumo'):
                         if anexo.arquivo.url == src:
                             _append_anexo_content(document, anexo)
                             last_action_was_page_break = False
@@ -1,12 +1,15 @@
-import io, os, re, logging, base64, uuid, tempfile
+import io, os, re, logging, base64, uuid, tempfile, threading, hashlib
+from collections import namedtuple
 from uuid import uuid4
 from datetime import datetime, timedelta, date
 import locale
 from dotenv import load_dotenv
 
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.db.models import Q
+from django.urls import reverse
 from django.core.files.base import ContentFile
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.contrib.staticfiles import finders
@@ -16,9 +19,9 @@ from docx.shared import Cm, Pt, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
 from bs4 import BeautifulSoup, NavigableString
 from num2words import num2words
-import fitz  # PyMuPDF
 
 from ..models import PATD, Configuracao, Anexo
+from ..assinaturas import url_assinatura_efetivo
 from Secao_pessoal.models import Efetivo
 
 logger = logging.getLogger(__name__)
@@ -264,38 +267,62 @@ def buscar_militar_inteligente(acusado_ia):
     return None
 
 
-def _pdf_to_pages_html(pdf_path):
+def _pdf_to_pages_html(anexo):
     """
-    Converte cada página de um PDF em uma imagem base64 e retorna HTML
-    com cada página separada por um marcador de quebra de página.
+    Monta o HTML com uma <img> por página de um anexo PDF, separadas por
+    marcadores de quebra de página. As imagens são servidas por URL a partir
+    do cache em disco (ver Ouvidoria.anexo_paginas), em vez de data URIs.
     Usado para exibir o PDF fielmente no visualizador de documentos.
     """
+    from ..anexo_paginas import contar_paginas
     try:
+        pdf_path = anexo.arquivo.path
         if not os.path.exists(pdf_path):
             return '<p style="color:red;">[Erro: arquivo PDF não encontrado]</p>'
 
-        pdf_doc = fitz.open(pdf_path)
         parts = []
-        for page_num, page in enumerate(pdf_doc):
-            mat = fitz.Matrix(220 / 72, 220 / 72)
-            pix = page.get_pixmap(matrix=mat)
-            img_bytes = pix.tobytes("png")
-            b64 = base64.b64encode(img_bytes).decode('utf-8')
+        for page_num in range(contar_paginas(pdf_path)):
+            url = reverse('Ouvidoria:anexo_pagina_imagem', args=[anexo.pk, page_num + 1])
             img_html = (
-                f'<img src="data:image/png;base64,{b64}" '
+                f'<img src="{url}?q=doc" '
                 f'alt="Página {page_num + 1} do ofício" '
                 f'style="width:100%; height:auto; display:block;" />'
             )
             if page_num > 0:
                 parts.append('<div class="manual-page-break"></div>')
             parts.append(img_html)
-        pdf_doc.close()
         return ''.join(parts)
     except Exception as e:
         logger.error(f"Erro ao converter PDF para imagens HTML: {e}")
         return '<p style="color:red;">[Erro ao processar o PDF]</p>'
 
 
+def _dados_compartilhados_documentos(patd):
+    """
+    Dados do contexto que não variam entre os documentos de uma mesma PATD
+    (comandantes e histórico de comportamento). get_document_pages monta até seis
+    contextos por requisição; as consultas são feitas uma vez e guardadas na instância.
+    """
+    dados = getattr(patd, '_dados_documentos', None)
+    if dados is None:
+        from informatica.models import ConfiguracaoComandantes
+        _cmds, _ = ConfiguracaoComandantes.objects.select_related(
+            'comandante_gsd__assinatura_registro', 'comandante_bagl'
+        ).get_or_create(pk=1)
+
+        # Verifica se o militar já estava no "Mau comportamento" em alguma PATD anterior
+        patd_anteriores_mau = PATD.objects.filter(
+            militar=patd.militar,
+            comportamento="Mau comportamento"
+        )
+        if patd.pk:
+            patd_anteriores_mau = patd_anteriores_mau.exclude(pk=patd.pk)
+
+        dados = (_cmds.comandante_gsd, _cmds.comandante_bagl, patd_anteriores_mau.exists())
+        patd._dados_documentos = dados
+    return dados
+
+
 def _get_document_context(patd, for_docx=False, doc_name=None):
     """
     Função centralizada para coletar e formatar todos os dados
@@ -303,10 +330,7 @@ def _get_document_context(patd, for_docx=False, doc_name=None):
     doc_name: nome do template (ex: 'PATD_Coringa') para usar data independente por documento.
     """
     config = Configuracao.load()
-    from informatica.models import ConfiguracaoComandantes
-    _cmds = ConfiguracaoComandantes.get_instance()
-    comandante_gsd = _cmds.comandante_gsd
-    comandante_bagl = _cmds.comandante_bagl
+    comandante_gsd, comandante_bagl, comportamento_anterior_era_mau = _dados_compartilhados_documentos(patd)
     now = timezone.now()
 
     # Formatações de Data
@@ -424,16 +448,16 @@ def _get_document_context(patd, for_docx=False, doc_name=None):
     localidade_value = _circ.get('localidade', 'Rio de Janeiro')
 
     # Adiciona o anexo do ofício de lançamento ao contexto, se existir
-    oficio_anexo = patd.anexos.filter(tipo='oficio_lancamento').first()
+    oficio_anexo = patd.anexo_index.primeiro('oficio_lancamento')
     oficio_lancamento_html = ''
     if oficio_anexo:
         if for_docx:
             oficio_lancamento_html = f'<embed src="{oficio_anexo.arquivo.url}" type="application/pdf" width="100%" height="800px" />'
         else:
-            oficio_lancamento_html = _pdf_to_pages_html(oficio_anexo.arquivo.path)
+            oficio_lancamento_html = _pdf_to_pages_html(oficio_anexo)
 
     # Adiciona a ficha individual ao contexto, se existir
-    ficha_individual_anexo = patd.anexos.filter(tipo='ficha_individual').first()
+    ficha_individual_anexo = patd.anexo_index.primeiro('ficha_individual')
     ficha_individual_html = ''
     if ficha_individual_anexo:
         ext = os.path.splitext(ficha_individual_anexo.arquivo.name)[1].lower()
@@ -447,21 +471,12 @@ def _get_document_context(patd, for_docx=False, doc_name=None):
             if is_image:
                 ficha_individual_html = f'<img src="{ficha_individual_anexo.arquivo.url}" style="width:100%;height:auto;display:block;" />'
             else:
-                ficha_individual_html = _pdf_to_pages_html(ficha_individual_anexo.arquivo.path)
+                ficha_individual_html = _pdf_to_pages_html(ficha_individual_anexo)
 
     # Lógica de {comportamento} e {mudou}
     comportamento_atual_eh_mau = (patd.comportamento == "Mau comportamento")
     comportamento_display = "Mau comportamento" if comportamento_atual_eh_mau else "Bom comportamento"
 
-    # Verifica se o militar já estava no "Mau comportamento" em alguma PATD anterior
-    patd_anteriores_mau = PATD.objects.filter(
-        militar=patd.militar,
-        comportamento="Mau comportamento"
-    )
-    if patd.pk:
-        patd_anteriores_mau = patd_anteriores_mau.exclude(pk=patd.pk)
-    comportamento_anterior_era_mau = patd_anteriores_mau.exists()
-
     # "Entrou no" somente quando passa de bom → mau nesta PATD
     if comportamento_atual_eh_mau and not comportamento_anterior_era_mau:
         mudou_display = "Entrou no"
@@ -553,7 +568,7 @@ def _get_document_context(patd, for_docx=False, doc_name=None):
     # Adiciona os dados das assinaturas AO CONTEXTO APENAS SE APLICÁVEL
     # Assinatura do Oficial Apurador
     if oficial_definido and patd.oficial_responsavel and patd.oficial_responsavel.assinatura:
-        context['assinatura_oficial_data'] = patd.oficial_responsavel.assinatura
+        context['assinatura_oficial_data'] = url_assinatura_efetivo(patd.oficial_responsavel)
 
     # Assinatura do Comandante - SÓ ADICIONA SE A PATD JÁ FOI APROVADA
     status_aprovados_e_posteriores = [
@@ -570,7 +585,7 @@ def _get_document_context(patd, for_docx=False, doc_name=None):
         except Exception:
             sig_cmd_source = None
     if not sig_cmd_source and comandante_gsd and comandante_gsd.assinatura:
-        sig_cmd_source = comandante_gsd.assinatura  # base64 string (data:image/...)
+        sig_cmd_source = url_assinatura_efetivo(comandante_gsd)  # URL versionada, não o data URI
     if sig_cmd_source and patd.status in status_aprovados_e_posteriores:
         context['assinatura_comandante_data'] = sig_cmd_source
         # Atualiza o placeholder no contexto para usar a imagem
@@ -635,11 +650,7 @@ def _render_paragraph_with_placeholders(runs, context, template_name=''):
     # --- 1. Mapa char → (bold, italic, underline, font_size_pt) ---
     char_fmts = []
     for run in runs:
-        try:
-            fs = run.font.size / 12700 if run.font.size else None
-        except Exception:
-            fs = None
-        fmt = (bool(run.bold), bool(run.italic), bool(run.underline), fs)
+        fmt = (bool(run.bold), bool(run.italic), bool(run.underline), run.size_pt)
         for _ in run.text:
             char_fmts.append(fmt)
 
@@ -711,15 +722,53 @@ def _render_paragraph_with_placeholders(runs, context, template_name=''):
     return result
 
 
-def _render_paragraph_html(p, context, template_name=''):
+# ---------------------------------------------------------------------------
+# Templates DOCX compilados
+# ---------------------------------------------------------------------------
+# Tudo o que vem do .docx (parse do XML, fonte padrão, margens, estilo efetivo
+# e bordas de cada parágrafo, formatação de cada run) não depende da PATD.
+# O template é compilado uma única vez por processo numa lista de instruções
+# de renderização; a cada chamada só os placeholders do contexto são aplicados.
+# A chave do cache é (caminho, mtime): trocar o .docx em pdf/ invalida a entrada.
+
+_RunSpec = namedtuple('_RunSpec', 'text bold italic underline size_pt font_name color')
+_ParagraphSpec = namedtuple('_ParagraphSpec', 'style_attr text runs')
+_CompiledTemplate = namedtuple(
+    '_CompiledTemplate', 'mtime page_width page_height top bottom left right default_font default_size_pt items text'
+)
+
+_compiled_templates = {}
+_compiled_templates_lock = threading.Lock()
+
+
+def _compile_run(run):
+    """Extrai de um run python-docx os atributos usados na renderização."""
+    try:
+        size_pt = run.font.size / 12700 if run.font.size else None  # EMU → pt
+    except Exception:
+        size_pt = None
+    try:
+        font_name = run.font.name or None
+    except Exception:
+        font_name = None
+    try:
+        color = None
+        if run.font.color and run.font.color.type is not None:
+            color = f'#{str(run.font.color.rgb)}'
+    except Exception:
+        color = None
+    return _RunSpec(run.text, run.bold, run.italic, run.underline, size_pt, font_name, color)
+
+
+def _compile_paragraph(p):
     """
-    Converte um parágrafo python-docx em HTML preservando fielmente o DOCX:
+    Pré-calcula o estilo de um parágrafo python-docx preservando fielmente o DOCX:
     - Alinhamento (parágrafo ou herdado do estilo)
-    - Bold, Italic, Underline e tamanho de fonte por run
     - line_spacing EXACTLY convertido para line-height em pt
     - space_before / space_after como margin
     - Indentação left e first_line
     - Margem zero por padrão (sem espaço extra do browser)
+    Bold, Italic, Underline e tamanho de fonte ficam guardados por run.
     """
     from docx.enum.text import WD_LINE_SPACING as WD_LS
     alignment_map = {None: 'left', 0: 'left', 1: 'center', 2: 'right', 3: 'justify'}
@@ -782,26 +831,255 @@ def _render_paragraph_html(p, context, template_name=''):
     except Exception:
         pass
 
-    style_attr = '; '.join(para_styles)
+    return _ParagraphSpec('; '.join(para_styles), p.text, tuple(_compile_run(r) for r in p.runs))
+
+
+def _compile_empty_paragraph(p):
+    """Parágrafo sem texto: vira um <p>&nbsp;</p> estático com alinhamento e altura de linha."""
+    from docx.enum.text import WD_LINE_SPACING as WD_LS
+    alignment_map = {None: 'left', 0: 'left', 1: 'center', 2: 'right', 3: 'justify'}
+    pf = p.paragraph_format
+    sf = p.style.paragraph_format if p.style else None
+    alignment = alignment_map.get(_get_effective(pf, sf, 'alignment'), 'left')
+    empty_styles = [f'text-align: {alignment}', 'margin: 0', 'padding: 0']
+    try:
+        ls = _get_effective(pf, sf, 'line_spacing')
+        ls_rule = _get_effective(pf, sf, 'line_spacing_rule')
+        if ls is not None and ls_rule == WD_LS.EXACTLY:
+            ls_pt = ls.pt if hasattr(ls, 'pt') else ls / 12700
+            empty_styles.append(f'line-height: {ls_pt:.2f}pt')
+        elif ls is not None and isinstance(ls, (int, float)):
+            empty_styles.append(f'line-height: {ls}')
+    except Exception:
+        pass
+    return f'<p style="{"; ".join(empty_styles)}">&nbsp;</p>'
+
+
+def _compile_template(doc_path, mtime):
+    """
+    Faz o parse do .docx e devolve um _CompiledTemplate.
+    items: lista de (tipo, payload, border_info_or_None), onde tipo é
+    'html' (trecho estático), 'p' (_ParagraphSpec) ou 'tbl' (linhas → células → parágrafos).
+    """
+    document = docx.Document(doc_path)
+
+    # Extrai dimensões reais da seção principal
+    sec = document.sections[0]
+    _cm = lambda v: round(v.cm, 4) if v else 0
+
+    # Detecta fonte padrão do documento
+    _W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    default_font = None
+    # 1) Normal style
+    try:
+        default_font = document.styles['Normal'].font.name
+    except Exception:
+        pass
+    # 2) docDefaults rFonts
+    if not default_font:
+        rFonts = document.element.find(f'.//{{{_W}}}rFonts')
+        if rFonts is not None:
+            default_font = (rFonts.get(f'{{{_W}}}ascii') or
+                            rFonts.get(f'{{{_W}}}hAnsi') or
+                            rFonts.get(f'{{{_W}}}cs'))
+    # 3) Primeiro run com fonte explícita
+    if not default_font:
+        for p in document.paragraphs:
+            for r in p.runs:
+                if r.font.name:
+                    default_font = r.font.name
+                    break
+            if default_font:
+                break
+    default_font = default_font or 'Times New Roman'
+
+    # Tamanho de fonte padrão do estilo Normal
+    default_size_pt = None
+    try:
+        sz = document.styles['Normal'].font.size
+        if sz:
+            default_size_pt = round(sz / 12700, 1)
+    except Exception:
+        pass
+    default_size_pt = default_size_pt or 12
+
+    items = []
+    page_break = '<div class="manual-page-break"></div>'
+
+    # Itera o body em ordem real (parágrafos e tabelas intercalados)
+    for child in document.element.body:
+        tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
+
+        if tag == 'p':
+            p = docx.text.paragraph.Paragraph(child, document)
+
+            # Quebra de página explícita via placeholder
+            if '{nova_pagina}' in p.text:
+                items.append(('html', page_break, None))
+                continue
+
+            # Quebra de página nativa do DOCX (w:br type="page")
+            _native_pb_runs = child.findall(f'.//{{{_W}}}br[@{{{_W}}}type="page"]')
+            if _native_pb_runs:
+                items.append(('html', page_break, None))
+                # Remove os runs de page break do XML (o documento só vive durante a
+                # compilação) para renderizar o restante do parágrafo, que pode conter
+                # variáveis como {N PATD}
+                for _br in _native_pb_runs:
+                    _br_parent = _br.getparent()
+                    if _br_parent is not None:
+                        _br_parent.remove(_br)
+                # Se o parágrafo ainda tiver conteúdo após remover o break, renderiza
+                if p.text.strip():
+                    items.append(('p', _compile_paragraph(p), _get_paragraph_border_css(p)))
+                continue
+
+            # Parágrafo vazio
+            if not p.text.strip():
+                items.append(('html', _compile_empty_paragraph(p), _get_paragraph_border_css(p)))
+                continue
+
+            items.append(('p', _compile_paragraph(p), _get_paragraph_border_css(p)))
+
+        elif tag == 'tbl':
+            table = docx.table.Table(child, document)
+            rows = tuple(
+                tuple(tuple(_compile_paragraph(p) for p in cell.paragraphs) for cell in row.cells)
+                for row in table.rows
+            )
+            items.append(('tbl', rows, None))
+
+    # Texto de todos os parágrafos — usado para saber quais placeholders o template consome
+    texts = []
+    for kind, payload, _bdr in items:
+        if kind == 'p':
+            texts.append(payload.text)
+        elif kind == 'tbl':
+            texts.extend(spec.text for row in payload for cell in row for spec in cell)
+
+    return _CompiledTemplate(
+        mtime=mtime,
+        page_width=_cm(sec.page_width),
+        page_height=_cm(sec.page_height),
+        top=_cm(sec.top_margin),
+        bottom=_cm(sec.bottom_margin),
+        left=_cm(sec.left_margin),
+        right=_cm(sec.right_margin),
+        default_font=default_font,
+        default_size_pt=default_size_pt,
+        items=tuple(items),
+        text='\n'.join(texts),
+    )
+
+
+def _get_compiled_template(doc_path):
+    """Retorna o template compilado de doc_path, recompilando se o arquivo mudou."""
+    mtime = os.stat(doc_path).st_mtime_ns
+    compiled = _compiled_templates.get(doc_path)
+    if compiled is not None and compiled.mtime == mtime:
+        return compiled
+    with _compiled_templates_lock:
+        compiled = _compiled_templates.get(doc_path)
+        if compiled is None or compiled.mtime != mtime:
+            compiled = _compile_template(doc_path, mtime)
+            _compiled_templates[doc_path] = compiled
+            logger.info(f"[template] Compilado {doc_path}")
+    return compiled
+
+
+# ---------------------------------------------------------------------------
+# Cache de documentos renderizados
+# ---------------------------------------------------------------------------
+# Cada documento renderizado vai para o cache do Django (Redis em produção) sob um
+# hash do template (caminho + mtime), da fonte configurada e somente das entradas
+# do contexto que aquele template consome. Assim, alterar texto_reconsideracao
+# invalida apenas MODELO_RECONSIDERACAO — PATD, NPD e relatório seguem no cache.
+
+_RENDER_CACHE_PREFIX = 'patd_render'
+_RENDER_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _consumed_context(compiled, context, template_name=''):
+    """
+    Retorna {placeholder: valor} com as entradas do contexto que podem alterar o
+    HTML do template: as que aparecem no texto do .docx e, transitivamente, as que
+    aparecem nos valores já selecionados (_apply_context_to_text substitui em cadeia).
+    """
+    text = compiled.text
+    if template_name and ('RELATORIO_DELTA' in template_name or 'RELATORIO_JUSTIFICADO' in template_name):
+        text += '\n{pagina_alegacao}'
+    consumed = {}
+    pending = [str(ph) for ph in context if str(ph) and str(ph) in text]
+    while pending:
+        ph = pending.pop()
+        if ph in consumed:
+            continue
+        value = str(context[ph])
+        consumed[ph] = value
+        pending.extend(str(o) for o in context if str(o) and str(o) not in consumed and str(o) in value)
+    return consumed
+
+
+def _render_cache_key(doc_path, compiled, default_font, default_size_pt, context, template_name=''):
+    h = hashlib.sha256()
+    for part in (doc_path, compiled.mtime, default_font, default_size_pt, template_name):
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    for ph, value in sorted(_consumed_context(compiled, context, template_name).items()):
+        h.update(ph.encode('utf-8'))
+        h.update(b'\0')
+        h.update(value.encode('utf-8'))
+        h.update(b'\0')
+    return f'{_RENDER_CACHE_PREFIX}:{h.hexdigest()}'
+
+
+def _count_render_cache(evento):
+    """Incrementa o contador compartilhado de hits/misses (falha silenciosa se o cache cair)."""
+    key = f'{_RENDER_CACHE_PREFIX}:stats:{evento}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+    except Exception:
+        pass
+
 
-    full_text = p.text
+def render_cache_stats():
+    """Contadores de hit/miss do cache de documentos renderizados, somados entre processos."""
+    try:
+        hits = cache.get(f'{_RENDER_CACHE_PREFIX}:stats:hit', 0)
+        misses = cache.get(f'{_RENDER_CACHE_PREFIX}:stats:miss', 0)
+    except Exception:
+        hits = misses = 0
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'templates_compilados': len(_compiled_templates),
+    }
+
+
+def _render_paragraph_html(spec, context, template_name=''):
+    """Renderiza um _ParagraphSpec aplicando os placeholders do contexto."""
+    full_text = spec.text
 
     # Detecta se algum placeholder do contexto aparece no texto completo.
     # Placeholders podem estar divididos entre múltiplos runs no Word — por isso
     # a substituição deve ser feita no texto completo (p.text), não por run.
     has_any_placeholder = any(str(ph) in full_text for ph, val in context.items() if ph and val)
 
-    if has_any_placeholder or not p.runs:
+    if has_any_placeholder or not spec.runs:
         # Substitui placeholders preservando formatação por segmento
-        inner_html = _render_paragraph_with_placeholders(p.runs, context, template_name)
-        if not inner_html and not p.runs:
+        inner_html = _render_paragraph_with_placeholders(spec.runs, context, template_name)
+        if not inner_html and not spec.runs:
             # Parágrafo sem runs — substitui no texto simples sem formatação
             inner_html = _apply_context_to_text(full_text, context, template_name)
     else:
         # Sem placeholder: processa run a run para preservar formatação precisa
-        inner_html = _render_runs_html(p.runs, context, template_name)
+        inner_html = _render_runs_html(spec.runs, context, template_name)
 
-    return f'<p style="{style_attr}">{inner_html}</p>'
+    return f'<p style="{spec.style_attr}">{inner_html}</p>'
 
 
 def _render_runs_html(runs, context, template_name=''):
@@ -814,36 +1092,21 @@ def _render_runs_html(runs, context, template_name=''):
 
         # Estilo do run
         run_styles = []
-        try:
-            if run.font.name:
-                run_styles.append(f"font-family: '{run.font.name}', serif")
-        except Exception:
-            pass
-        try:
-            if run.font.size:
-                pt = run.font.size / 12700  # EMU → pt
-                run_styles.append(f'font-size: {pt:.1f}pt')
-        except Exception:
-            pass
-        try:
-            if run.font.color and run.font.color.type is not None:
-                rgb = run.font.color.rgb
-                run_styles.append(f'color: #{str(rgb)}')
-        except Exception:
-            pass
+        if run.font_name:
+            run_styles.append(f"font-family: '{run.font_name}', serif")
+        if run.size_pt:
+            run_styles.append(f'font-size: {run.size_pt:.1f}pt')
+        if run.color:
+            run_styles.append(f'color: {run.color}')
 
         # Formatação inline
-        bold = run.bold
-        italic = run.italic
-        underline = run.underline
-
         if run_styles:
             text = f'<span style="{"; ".join(run_styles)}">{text}</span>'
-        if underline:
+        if run.underline:
             text = f'<u>{text}</u>'
-        if italic:
+        if run.italic:
             text = f'<em>{text}</em>'
-        if bold:
+        if run.bold:
             text = f'<strong>{text}</strong>'
 
         result += text
@@ -893,15 +1156,15 @@ def _get_paragraph_border_css(p):
         return None
 
 
-def _render_table_html(table, context, template_name=''):
-    """Converte uma tabela python-docx em HTML."""
+def _render_table_html(rows, context, template_name=''):
+    """Converte as linhas compiladas de uma tabela em HTML."""
     html = '<table class="doc-table" style="width:100%; border-collapse:collapse; margin: 4pt 0;">'
-    for row in table.rows:
+    for row in rows:
         html += '<tr>'
-        for cell in row.cells:
+        for cell in row:
             cell_inner = ''
-            for p in cell.paragraphs:
-                cell_inner += _render_paragraph_html(p, context, template_name)
+            for spec in cell:
+                cell_inner += _render_paragraph_html(spec, context, template_name)
             # Borda e padding mínimos para manter fidelidade visual
             html += f'<td style="border: 1px solid #ccc; padding: 4pt 6pt; vertical-align: top;">{cell_inner}</td>'
         html += '</tr>'
@@ -916,6 +1179,8 @@ def _render_document_from_template(template_name, context, subfolder=None):
     espaçamento, indentação e tabelas.
     Suporta o placeholder {nova_pagina} para quebras de página.
     Injeta um elemento <div class="page-meta"> com as dimensões reais do documento.
+    O parse do .docx é feito uma vez por processo (ver _get_compiled_template) e o
+    HTML resultante fica no cache de documentos renderizados (ver _render_cache_key).
     """
     try:
         base_pdf = os.path.join(settings.BASE_DIR, 'pdf')
@@ -924,48 +1189,10 @@ def _render_document_from_template(template_name, context, subfolder=None):
             doc_path = candidate if os.path.exists(candidate) else os.path.join(base_pdf, template_name)
         else:
             doc_path = os.path.join(base_pdf, template_name)
-        document = docx.Document(doc_path)
+        compiled = _get_compiled_template(doc_path)
 
-        # Extrai dimensões reais da seção principal
-        sec = document.sections[0]
-        _cm = lambda v: round(v.cm, 4) if v else 0
-
-        # Detecta fonte padrão do documento
-        from docx.oxml.ns import qn as _qn2
-        _W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
-        default_font = None
-        # 1) Normal style
-        try:
-            default_font = document.styles['Normal'].font.name
-        except Exception:
-            pass
-        # 2) docDefaults rFonts
-        if not default_font:
-            rFonts = document.element.find(f'.//{{{_W}}}rFonts')
-            if rFonts is not None:
-                default_font = (rFonts.get(f'{{{_W}}}ascii') or
-                                rFonts.get(f'{{{_W}}}hAnsi') or
-                                rFonts.get(f'{{{_W}}}cs'))
-        # 3) Primeiro run com fonte explícita
-        if not default_font:
-            for p in document.paragraphs:
-                for r in p.runs:
-                    if r.font.name:
-                        default_font = r.font.name
-                        break
-                if default_font:
-                    break
-        default_font = default_font or 'Times New Roman'
-
-        # Tamanho de fonte padrão do estilo Normal
-        default_size_pt = None
-        try:
-            sz = document.styles['Normal'].font.size
-            if sz:
-                default_size_pt = round(sz / 12700, 1)
-        except Exception:
-            pass
-        default_size_pt = default_size_pt or 12
+        default_font = compiled.default_font
+        default_size_pt = compiled.default_size_pt
 
         # Aplica configuração global de fonte/tamanho se definida
         try:
@@ -978,79 +1205,38 @@ def _render_document_from_template(template_name, context, subfolder=None):
         except Exception:
             pass
 
+        cache_key = None
+        try:
+            cache_key = _render_cache_key(doc_path, compiled, default_font, default_size_pt, context, template_name)
+            cached_html = cache.get(cache_key)
+        except Exception:
+            cached_html = None
+        if cached_html is not None:
+            _count_render_cache('hit')
+            return cached_html
+        _count_render_cache('miss')
+
         page_meta = (
             f'<div class="page-meta" style="display:none"'
-            f' data-width="{_cm(sec.page_width)}"'
-            f' data-height="{_cm(sec.page_height)}"'
-            f' data-top="{_cm(sec.top_margin)}"'
-            f' data-bottom="{_cm(sec.bottom_margin)}"'
-            f' data-left="{_cm(sec.left_margin)}"'
-            f' data-right="{_cm(sec.right_margin)}"'
+            f' data-width="{compiled.page_width}"'
+            f' data-height="{compiled.page_height}"'
+            f' data-top="{compiled.top}"'
+            f' data-bottom="{compiled.bottom}"'
+            f' data-left="{compiled.left}"'
+            f' data-right="{compiled.right}"'
             f' data-font="{default_font}"'
             f' data-fontsize="{default_size_pt}"></div>'
         )
 
-        from docx.oxml.ns import qn as _qn
         # items: lista de (html_str, border_info_or_None)
         items = []
-
-        # Itera o body em ordem real (parágrafos e tabelas intercalados)
-        for child in document.element.body:
-            tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-
-            if tag == 'p':
-                p = docx.text.paragraph.Paragraph(child, document)
-
-                # Quebra de página explícita via placeholder
-                if '{nova_pagina}' in p.text:
-                    items.append(('<div class="manual-page-break"></div>', None))
-                    continue
-
-                # Quebra de página nativa do DOCX (w:br type="page")
-                _W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
-                _native_pb_runs = child.findall(f'.//{{{_W_NS}}}br[@{{{_W_NS}}}type="page"]')
-                if _native_pb_runs:
-                    items.append(('<div class="manual-page-break"></div>', None))
-                    # Remove os runs de page break do XML temporariamente para renderizar
-                    # o restante do parágrafo (pode conter variáveis como {N PATD})
-                    for _br in _native_pb_runs:
-                        _br_parent = _br.getparent()
-                        if _br_parent is not None:
-                            _br_parent.remove(_br)
-                    # Se o parágrafo ainda tiver conteúdo após remover o break, renderiza
-                    if p.text.strip():
-                        bdr = _get_paragraph_border_css(p)
-                        items.append((_render_paragraph_html(p, context, template_name), bdr))
-                    continue
-
-                # Parágrafo vazio
-                if not p.text.strip():
-                    from docx.enum.text import WD_LINE_SPACING as WD_LS
-                    alignment_map = {None: 'left', 0: 'left', 1: 'center', 2: 'right', 3: 'justify'}
-                    pf = p.paragraph_format
-                    sf = p.style.paragraph_format if p.style else None
-                    alignment = alignment_map.get(_get_effective(pf, sf, 'alignment'), 'left')
-                    empty_styles = [f'text-align: {alignment}', 'margin: 0', 'padding: 0']
-                    try:
-                        ls = _get_effective(pf, sf, 'line_spacing')
-                        ls_rule = _get_effective(pf, sf, 'line_spacing_rule')
-                        if ls is not None and ls_rule == WD_LS.EXACTLY:
-                            ls_pt = ls.pt if hasattr(ls, 'pt') else ls / 12700
-                            empty_styles.append(f'line-height: {ls_pt:.2f}pt')
-                        elif ls is not None and isinstance(ls, (int, float)):
-                            empty_styles.append(f'line-height: {ls}')
-                    except Exception:
-                        pass
-                    bdr = _get_paragraph_border_css(p)
-                    items.append((f'<p style="{"; ".join(empty_styles)}">&nbsp;</p>', bdr))
-                    continue
-
-                bdr = _get_paragraph_border_css(p)
-                items.append((_render_paragraph_html(p, context, template_name), bdr))
-
-            elif tag == 'tbl':
-                table = docx.table.Table(child, document)
-                items.append((_render_table_html(table, context, template_name), None))
+        for kind, payload, bdr in compiled.items:
+            if kind == 'p':
+                items.append((_render_paragraph_html(payload, context, template_name), bdr))
+            elif kind == 'tbl':
+                items.append((_render_table_html(payload, context, template_name), bdr))
+            else:
+                items.append((payload, bdr))
 
         # Agrupa parágrafos consecutivos com a mesma chave de borda num único <div>
         html_content = []
@@ -1076,7 +1262,13 @@ def _render_document_from_template(template_name, context, subfolder=None):
                 )
                 i = j
 
-        return page_meta + ''.join(html_content)
+        rendered = page_meta + ''.join(html_content)
+        if cache_key:
+            try:
+                cache.set(cache_key, rendered, timeout=_RENDER_CACHE_TIMEOUT)
+            except Exception:
+                pass
+        return rendered
 
     except FileNotFoundError:
         error_msg = f'<p style="color: red;">ERRO: Template "{template_name}" não encontrado.</p>'
@@ -1102,7 +1294,7 @@ def get_document_pages(patd, for_docx=False):
         pages_text = ''.join(p for p in pages if isinstance(p, str)) if isinstance(pages, list) else str(pages)
 
         # Cache inválido se defesa existe no modelo mas não está nas páginas cacheadas
-        has_defesa = bool(patd.alegacao_defesa or patd.anexos.filter(tipo='defesa').exists())
+        has_defesa = bool(patd.alegacao_defesa or patd.anexo_index.tem('defesa'))
         cache_has_defesa = 'data-document-id="alegacao_defesa"' in pages_text
         cache_has_oficial_sig = '{Assinatura_Imagem_Oficial_Apurador}' in pages_text
         if (has_defesa and not cache_has_defesa) or (not patd.oficial_assinou_analise and cache_has_oficial_sig):
@@ -1127,7 +1319,7 @@ def get_document_pages(patd, for_docx=False):
     PB = '<div class="manual-page-break"></div>'
 
     # 2. Alegação de Defesa (ou Preclusão)
-    if patd.alegacao_defesa or patd.anexos.filter(tipo='defesa').exists():
+    if patd.alegacao_defesa or patd.anexo_index.tem('defesa'):
         page_counter += 1
         pagina_alegacao_num = page_counter
         alegacao_context = _ctx(patd, for_docx, 'PATD_Alegacao_DF')
@@ -1140,7 +1332,7 @@ def get_document_pages(patd, for_docx=False):
         alegacao_html = f'<div data-document-id="alegacao_defesa">{alegacao_html}</div>'
         document_pages_raw.append(PB)
         document_pages_raw.append(alegacao_html)
-        if patd.anexos.filter(tipo='defesa').exists():
+        if patd.anexo_index.tem('defesa'):
             document_pages_raw.append(PB)
             document_pages_raw.append("<p>{ANEXOS_DEFESA_PLACEHOLDER}</p>")
 
@@ -1152,7 +1344,7 @@ def get_document_pages(patd, for_docx=False):
         'periodo_reconsideracao', 'em_reconsideracao',
         'aguardando_publicacao', 'aguardando_preenchimento_npd_reconsideracao',
     ]
-    if not patd.alegacao_defesa and not patd.anexos.filter(tipo='defesa').exists() and patd.status in status_preclusao_e_posteriores:
+    if not patd.alegacao_defesa and not patd.anexo_index.tem('defesa') and patd.status in status_preclusao_e_posteriores:
         page_counter += 1
         pagina_alegacao_num = page_counter
         html_content = _render_document_from_template('PRECLUSAO.docx', _ctx(patd, for_docx, 'PRECLUSAO'), subfolder=subfolder)
@@ -1180,7 +1372,7 @@ def get_document_pages(patd, for_docx=False):
         page_counter += 1
         document_pages_raw.append(PB)
         document_pages_raw.append(_render_document_from_template('MODELO_NPD.docx', _ctx(patd, for_docx, 'MODELO_NPD'), subfolder=subfolder))
-        formulario_resumo_anexo = patd.anexos.filter(tipo='formulario_resumo').first()
+        formulario_resumo_anexo = patd.anexo_index.primeiro('formulario_resumo')
         if formulario_resumo_anexo:
             document_pages_raw.append(PB)
             document_pages_raw.append("<p>{FORMULARIO_RESUMO_PLACEHOLDER}</p>")
@@ -1193,7 +1385,7 @@ def get_document_pages(patd, for_docx=False):
     if patd.status in status_reconsideracao_e_posteriores and not patd.justificado:
         page_counter += 1
         reconsideracao_context = _ctx(patd, for_docx, 'MODELO_RECONSIDERACAO')
-        if not patd.texto_reconsideracao and not patd.anexos.filter(tipo='reconsideracao').exists():
+        if not patd.texto_reconsideracao and not patd.anexo_index.tem('reconsideracao'):
             reconsideracao_context['{Texto_reconsideracao}'] = '{Botao Adicionar Reconsideracao}'
         else:
             reconsideracao_context['{Texto_reconsideracao}'] = patd.texto_reconsideracao or "[Ver documentos anexos]"
@@ -1201,14 +1393,14 @@ def get_document_pages(patd, for_docx=False):
         html_content = html_content.replace('{Assinatura Militar Arrolado}', '{Assinatura Reconsideracao}')
         document_pages_raw.append(PB)
         document_pages_raw.append(html_content)
-        if patd.anexos.filter(tipo='reconsideracao').exists():
+        if patd.anexo_index.tem('reconsideracao'):
             document_pages_raw.append(PB)
             document_pages_raw.append("<p>{ANEXOS_RECONSIDERACAO_PLACEHOLDER}</p>")
 
     # 7. Anexos da reconsideração oficial
     status_anexo_reconsideracao_oficial = ['aguardando_publicacao', 'finalizado', 'aguardando_nova_punicao']
     if patd.status in status_anexo_reconsideracao_oficial:
-        if patd.anexos.filter(tipo='reconsideracao_oficial').exists():
+        if patd.anexo_index.tem('reconsideracao_oficial'):
             document_pages_raw.append(PB)
             document_pages_raw.append("<p>{ANEXO_OFICIAL_RECONSIDERACAO_PLACEHOLDER}</p>")
 
@@ -1236,7 +1428,7 @@ def _try_advance_status_from_justificativa(patd):
     if patd.status != 'aguardando_justificativa':
         return False
 
-    has_defesa = bool(patd.alegacao_defesa or patd.anexos.filter(tipo='defesa').exists())
+    has_defesa = bool(patd.alegacao_defesa or patd.anexo_index.tem('defesa'))
     if not has_defesa:
         return False
 
@@ -6,11 +6,10 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.db.models import Q
 
 from ..models import PATD, Configuracao
 from ..permissions import has_comandante_access
-from Secao_pessoal.models import Efetivo
+from Secao_pessoal.busca import buscar_militares
 from .decorators import ouvidoria_required, comandante_required
 
 logger = logging.getLogger(__name__)
@@ -171,31 +170,8 @@ def patds_aguardando_prazo_json(request):
 def search_militares_json(request):
     """Retorna uma lista de militares para a pesquisa no modal."""
     query = request.GET.get('q', '').strip()
-    militares = Efetivo.objects.all()
-
-    if query:
-        POSTOS = {'S1', 'S2', 'CB', '1S', '2S', '3S', 'ST', 'SGT',
-                  'CAP', 'MAJ', 'TC', 'CEL', '1T', '2T', 'ASP', 'TEN'}
-        tokens = query.split()
-        if len(tokens) > 1 and tokens[0].upper() in POSTOS:
-            posto_termo = tokens[0].upper()
-            nome_termo = ' '.join(tokens[1:])
-            militares = militares.filter(
-                Q(posto__iexact=posto_termo),
-            ).filter(
-                Q(nome_guerra__icontains=nome_termo) |
-                Q(nome_completo__icontains=nome_termo)
-            )
-        else:
-            militares = militares.filter(
-                Q(nome_completo__icontains=query) |
-                Q(nome_guerra__icontains=query) |
-                Q(posto__icontains=query)
-            )
-
-    militares = militares.order_by('posto', 'nome_guerra')[:50]
-    data = list(militares.values('id', 'posto', 'nome_guerra', 'nome_completo'))
-    return JsonResponse(data, safe=False)
+    # Termos de posto ("CB SILVA", "SGT ...") são tratados pela busca compartilhada
+    return JsonResponse(buscar_militares(query, limite=50), safe=False)
 
 
 @login_required
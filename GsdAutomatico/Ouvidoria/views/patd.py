@@ -1,5 +1,7 @@
 import io, os, re, logging, traceback, tempfile, locale
 import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from django.core.files import File
@@ -13,7 +15,7 @@ from django.views.generic import ListView, CreateView, UpdateView, DeleteView, D
 from django.urls import reverse_lazy, reverse
 from django.db.models import Q, Max, Case, When, Value, IntegerField, Count
 from django.db.models.functions import TruncMonth
-from django.db import transaction
+from django.db import transaction, connection
 from django.http import JsonResponse, HttpResponse, Http404
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth import authenticate
@@ -21,10 +23,12 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.utils.decorators import method_decorator
 from django.utils import timezone
+from django.conf import settings
 
 from ..models import PATD, Configuracao, Anexo
 from ..forms import MilitarForm, PATDForm, AtribuirOficialForm, AceitarAtribuicaoForm, ComandanteAprovarForm
 from ..permissions import has_ouvidoria_access, can_delete_patd, has_comandante_access, can_edit_patd, is_apurador
+from ..permissions import has_patd_detail_access
 from ..permissions import OUVIDORIA_CHEFE, OUVIDORIA_APURADOR, OUVIDORIA_ADJUNTO, OUVIDORIA_CB, OUVIDORIA_S2, COMANDANTE
 from auditoria.utils import registrar, resolver_label
 
@@ -37,8 +41,6 @@ _PATD_PERMISSAO_MAP = {
     COMANDANTE: 'Comandante',
 }
 
-def has_patd_detail_access(user):
-    return has_ouvidoria_access(user) or has_comandante_access(user)
 from Secao_pessoal.models import Efetivo
 from Secao_pessoal.utils import get_rank_value, RANK_HIERARCHY
 from .decorators import (
@@ -53,8 +55,9 @@ from .helpers import (
 from .commander import _check_and_finalize_patd, _check_and_advance_reconsideracao_status
 from ..analise_transgressao import (
     AnaliseTransgressao, MilitarAcusado, analisar_documento_pdf,
-    verifica_similaridade, personalizar_ocorrencia, enquadra_item,
+    personalizar_ocorrencia, enquadra_item,
 )
+from ..similaridade import encontrar_duplicata
 
 logger = logging.getLogger(__name__)
 
@@ -172,6 +175,113 @@ STATUS_GROUPS = {
 }
 
 
+def _processar_acusado(acusado, transgressao_comum, data_ocorrencia, data_ocorrencia_str,
+                       protocolo_comaer_comum, oficio_transgressao_comum, data_oficio_str):
+    """
+    Processa um acusado do ofício analisado: localiza o militar, personaliza a
+    ocorrência, verifica duplicidade e pré-enquadra os itens.
+    Retorna (tipo, dados) com tipo em 'confirmacao', 'duplicata' ou 'nao_encontrado'.
+    Executado em paralelo por _processar_acusados.
+    """
+    militar = buscar_militar_inteligente(acusado)
+
+    if militar:
+        logger.info(f"Militar encontrado no BD: {militar}")
+        existing_patds = PATD.objects.filter(militar=militar, data_ocorrencia=data_ocorrencia, arquivado=False, deleted=False)
+
+        # Sempre personaliza a ocorrência para mencionar apenas este militar
+        try:
+            transgressao_acusado = personalizar_ocorrencia(
+                transgressao_comum,
+                acusado.posto_graduacao or militar.posto or '',
+                acusado.nome_guerra or militar.nome_guerra or '',
+            )
+        except Exception as _e:
+            logger.warning(f"Falha ao personalizar ocorrência para {militar}: {_e}")
+            transgressao_acusado = (acusado.transgressao_individual or '').strip() or transgressao_comum
+
+        patd_existente = encontrar_duplicata(transgressao_acusado, existing_patds)
+        if patd_existente is not None:
+            patd_url = reverse('Ouvidoria:patd_detail', kwargs={'pk': patd_existente.pk})
+            logger.info(f"PATD duplicada encontrada para {militar}: Nº {patd_existente.numero_patd}")
+            return 'duplicata', {
+                'nome_militar': str(militar),
+                'numero_patd': patd_existente.numero_patd,
+                'url': patd_url
+            }
+
+        itens_pre_enquadrados = []
+        try:
+            resultado_itens = enquadra_item(transgressao_acusado)
+            itens_pre_enquadrados = resultado_itens.item if resultado_itens and resultado_itens.item else []
+        except Exception as _e:
+            logger.warning(f"Falha ao pré-enquadrar itens para {militar}: {_e}")
+
+        return 'confirmacao', {
+            'id': militar.id,
+            'nome_guerra': militar.nome_guerra,
+            'nome_completo': militar.nome_completo,
+            'saram': militar.saram,
+            'posto': militar.posto,
+            'transgressao_individual': transgressao_acusado,
+            'itens_enquadrados': itens_pre_enquadrados,
+        }
+    else:
+        logger.warning(f"Militar '{acusado.nome_completo or acusado.nome_guerra}' não encontrado no banco de dados.")
+        nome_para_cadastro = f"{acusado.posto_graduacao or ''} {acusado.nome_completo or acusado.nome_guerra}".strip()
+        try:
+            transgressao_acusado = personalizar_ocorrencia(
+                transgressao_comum,
+                acusado.posto_graduacao or '',
+                acusado.nome_guerra or acusado.nome_completo or '',
+            )
+        except Exception as _e:
+            logger.warning(f"Falha ao personalizar ocorrência para não encontrado '{nome_para_cadastro}': {_e}")
+            transgressao_acusado = (acusado.transgressao_individual or '').strip() or transgressao_comum
+        itens_pre_enquadrados_nao_enc = []
+        try:
+            resultado_itens_nao_enc = enquadra_item(transgressao_acusado)
+            itens_pre_enquadrados_nao_enc = resultado_itens_nao_enc.item if resultado_itens_nao_enc and resultado_itens_nao_enc.item else []
+        except Exception as _e:
+            logger.warning(f"Falha ao pré-enquadrar itens para não encontrado '{nome_para_cadastro}': {_e}")
+
+        return 'nao_encontrado', {
+            'nome_completo_sugerido': nome_para_cadastro,
+            'transgressao': transgressao_acusado,
+            'data_ocorrencia': data_ocorrencia_str,
+            'protocolo_comaer': protocolo_comaer_comum,
+            'oficio_transgressao': oficio_transgressao_comum,
+            'data_oficio': data_oficio_str,
+            'itens_enquadrados': itens_pre_enquadrados_nao_enc,
+        }
+
+
+def _processar_acusado_em_thread(acusado, dados_comuns):
+    try:
+        return _processar_acusado(acusado, **dados_comuns)
+    finally:
+        # Cada thread do pool abre a sua própria conexão com o banco
+        connection.close()
+
+
+def _processar_acusados(acusados, **dados_comuns):
+    """
+    Processa os acusados em paralelo (as chamadas à IA dominam o tempo), com
+    no máximo IA_MAX_CONCORRENCIA requisições simultâneas ao ChatOpenAI.
+    Os resultados mantêm a ordem dos acusados no ofício.
+    """
+    if len(acusados) <= 1:
+        return [_processar_acusado(a, **dados_comuns) for a in acusados]
+    max_workers = min(len(acusados), settings.IA_MAX_CONCORRENCIA)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='patd-acusado') as pool:
+        # Cada thread roda numa cópia do contexto da requisição: o usuário e o
+        # lote de auditoria (auditoria.middleware/lote) continuam valendo nela
+        futuros = [
+            pool.submit(contextvars.copy_context().run, _processar_acusado_em_thread, a, dados_comuns)
+            for a in acusados
+        ]
+        return [f.result() for f in futuros]
+
 
 @login_required
 @comandante_redirect
@@ -270,20 +380,10 @@ def index(request):
             existing_patds = PATD.objects.filter(militar=militar, data_ocorrencia=data_ocorrencia, arquivado=False, deleted=False)
             
             # 2. Compara o texto da transgressão
-            is_duplicate = False
-            duplicated_patd_num = None
-
-            for patd_existente in existing_patds:
-                # Usa SequenceMatcher para comparar similaridade (acima de 80%)
-
-
-                # similarity = SequenceMatcher(None, transgressao.strip().lower(), patd_existente.transgressao.strip().lower()).ratio()
-                # if similarity > 0.8:
-                #     is_duplicate = True
-                is_duplicate = verifica_similaridade(transgressao.strip().lower(), patd_existente.transgressao.strip().lower())
-                if is_duplicate:
-                    duplicated_patd_num = patd_existente.numero_patd
-                    break
+            # Pré-filtro local (TF-IDF); a IA só é consultada nos casos ambíguos
+            patd_duplicada = encontrar_duplicata(transgressao, existing_patds)
+            is_duplicate = patd_duplicada is not None
+            duplicated_patd_num = patd_duplicada.numero_patd if patd_duplicada else None
             
             if is_duplicate:
                 return JsonResponse({
@@ -367,13 +467,9 @@ def index(request):
             
             # Check for duplicates (excluding archived and deleted)
             existing_patds = PATD.objects.filter(militar=militar, data_ocorrencia=data_ocorrencia, arquivado=False, deleted=False)
-            is_duplicate = False
-            duplicated_patd_num = None
-            for patd_existente in existing_patds:
-                if verifica_similaridade(transgressao.strip().lower(), patd_existente.transgressao.strip().lower()):
-                    is_duplicate = True
-                    duplicated_patd_num = patd_existente.numero_patd
-                    break
+            patd_duplicada = encontrar_duplicata(transgressao, existing_patds)
+            is_duplicate = patd_duplicada is not None
+            duplicated_patd_num = patd_duplicada.numero_patd if patd_duplicada else None
             
             if is_duplicate:
                 return JsonResponse({
@@ -442,7 +538,8 @@ def index(request):
                 resultado_analise: AnaliseTransgressao = analisar_documento_pdf(content)
                 if not resultado_analise.acusados:
                     logger.warning("Primeira análise retornou lista de acusados vazia. Retentando...")
-                    resultado_analise = analisar_documento_pdf(content)
+                    # recalcular: a resposta vazia pode ter vindo do cache de IA
+                    resultado_analise = analisar_documento_pdf.recalcular(content)
                 logger.info(f"Resultado da análise da IA: {resultado_analise}")
 
                 militares_para_confirmacao = []
@@ -476,82 +573,22 @@ def index(request):
                      logger.error(f"A resposta da IA não continha uma lista válida de 'acusados'. Resposta: {resultado_analise}")
                      raise ValueError("Formato de resposta inválido da IA: lista de acusados ausente ou malformada.")
 
-                for acusado in resultado_analise.acusados:
-                    militar = buscar_militar_inteligente(acusado)
-
-                    if militar:
-                        logger.info(f"Militar encontrado no BD: {militar}")
-                        existing_patds = PATD.objects.filter(militar=militar, data_ocorrencia=data_ocorrencia, arquivado=False, deleted=False)
-
-                        # Sempre personaliza a ocorrência para mencionar apenas este militar
-                        try:
-                            transgressao_acusado = personalizar_ocorrencia(
-                                transgressao_comum,
-                                acusado.posto_graduacao or militar.posto or '',
-                                acusado.nome_guerra or militar.nome_guerra or '',
-                            )
-                        except Exception as _e:
-                            logger.warning(f"Falha ao personalizar ocorrência para {militar}: {_e}")
-                            transgressao_acusado = (acusado.transgressao_individual or '').strip() or transgressao_comum
-
-                        duplicata = False
-                        for patd_existente in existing_patds:
-                            if verifica_similaridade(transgressao_acusado.strip().lower(), patd_existente.transgressao.strip().lower()):
-                                patd_url = reverse('Ouvidoria:patd_detail', kwargs={'pk': patd_existente.pk})
-                                duplicatas_encontradas.append({
-                                    'nome_militar': str(militar),
-                                    'numero_patd': patd_existente.numero_patd,
-                                    'url': patd_url
-                                })
-                                duplicata = True
-                                logger.info(f"PATD duplicada encontrada para {militar}: Nº {patd_existente.numero_patd}")
-                                break
-
-                        if not duplicata:
-                            itens_pre_enquadrados = []
-                            try:
-                                resultado_itens = enquadra_item(transgressao_acusado)
-                                itens_pre_enquadrados = resultado_itens.item if resultado_itens and resultado_itens.item else []
-                            except Exception as _e:
-                                logger.warning(f"Falha ao pré-enquadrar itens para {militar}: {_e}")
-
-                            militares_para_confirmacao.append({
-                                'id': militar.id,
-                                'nome_guerra': militar.nome_guerra,
-                                'nome_completo': militar.nome_completo,
-                                'saram': militar.saram,
-                                'posto': militar.posto,
-                                'transgressao_individual': transgressao_acusado,
-                                'itens_enquadrados': itens_pre_enquadrados,
-                            })
+                resultados = _processar_acusados(
+                    resultado_analise.acusados,
+                    transgressao_comum=transgressao_comum,
+                    data_ocorrencia=data_ocorrencia,
+                    data_ocorrencia_str=data_ocorrencia_str,
+                    protocolo_comaer_comum=protocolo_comaer_comum,
+                    oficio_transgressao_comum=oficio_transgressao_comum,
+                    data_oficio_str=data_oficio_str,
+                )
+                for tipo, dados in resultados:
+                    if tipo == 'confirmacao':
+                        militares_para_confirmacao.append(dados)
+                    elif tipo == 'duplicata':
+                        duplicatas_encontradas.append(dados)
                     else:
-                        logger.warning(f"Militar '{acusado.nome_completo or acusado.nome_guerra}' não encontrado no banco de dados.")
-                        nome_para_cadastro = f"{acusado.posto_graduacao or ''} {acusado.nome_completo or acusado.nome_guerra}".strip()
-                        try:
-                            transgressao_acusado = personalizar_ocorrencia(
-                                transgressao_comum,
-                                acusado.posto_graduacao or '',
-                                acusado.nome_guerra or acusado.nome_completo or '',
-                            )
-                        except Exception as _e:
-                            logger.warning(f"Falha ao personalizar ocorrência para não encontrado '{nome_para_cadastro}': {_e}")
-                            transgressao_acusado = (acusado.transgressao_individual or '').strip() or transgressao_comum
-                        itens_pre_enquadrados_nao_enc = []
-                        try:
-                            resultado_itens_nao_enc = enquadra_item(transgressao_acusado)
-                            itens_pre_enquadrados_nao_enc = resultado_itens_nao_enc.item if resultado_itens_nao_enc and resultado_itens_nao_enc.item else []
-                        except Exception as _e:
-                            logger.warning(f"Falha ao pré-enquadrar itens para não encontrado '{nome_para_cadastro}': {_e}")
-
-                        militares_nao_encontrados.append({
-                            'nome_completo_sugerido': nome_para_cadastro,
-                            'transgressao': transgressao_acusado,
-                            'data_ocorrencia': data_ocorrencia_str,
-                            'protocolo_comaer': protocolo_comaer_comum,
-                            'oficio_transgressao': oficio_transgressao_comum,
-                            'data_oficio': data_oficio_str,
-                            'itens_enquadrados': itens_pre_enquadrados_nao_enc,
-                        })
+                        militares_nao_encontrados.append(dados)
                 
                 total_pendentes = len(militares_para_confirmacao) + len(militares_nao_encontrados)
                 if total_pendentes > 0:
@@ -838,7 +875,9 @@ class PATDDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        patd = self.get_object()
+        # Reaproveita o objeto já carregado pelo DetailView (com anexos pré-carregados
+        # para o patd.anexo_index) em vez de repetir a consulta.
+        patd = self.object
 
         # --- INÍCIO DA MODIFICAÇÃO: Sincronização de Assinatura ---
         # Garante que a assinatura do oficial seja copiada para a PATD se for adicionada posteriormente.
@@ -921,13 +960,13 @@ class PATDDetailView(DetailView):
         s = patd.status
 
         if s == 'confeccao_fr_ficha':
-            if not patd.anexos.filter(tipo='formulario_resumo').exists():
+            if not patd.anexo_index.tem('formulario_resumo'):
                 assinaturas_pendentes.append({
                     'quem': 'Ouvidoria',
                     'descricao': 'Anexar Formulário de Resumo (FR)',
                     'urgente': True,
                 })
-            if not patd.anexos.filter(tipo='ficha_individual').exists():
+            if not patd.anexo_index.tem('ficha_individual'):
                 assinaturas_pendentes.append({
                     'quem': 'Ouvidoria',
                     'descricao': 'Anexar Ficha Individual',
@@ -1023,8 +1062,8 @@ class PATDDetailView(DetailView):
         # Não vamos mais extrair o HTML, apenas passar os metadados do arquivo.
         
         def _build_anexo_entry(a):
-            """Monta dict de metadados de um anexo. PDFs incluem lista de páginas renderizadas."""
-            import base64 as _b64
+            """Monta dict de metadados de um anexo. PDFs incluem as URLs das páginas renderizadas."""
+            from ..anexo_paginas import contar_paginas
             ext = os.path.splitext(a.arquivo.name)[1].lower().replace('.', '')
             entry = {
                 'id': a.id,
@@ -1034,37 +1073,32 @@ class PATDDetailView(DetailView):
             }
             if ext == 'pdf':
                 try:
-                    import fitz
-                    doc = fitz.open(a.arquivo.path)
-                    mat = fitz.Matrix(1.5, 1.5)  # ~108 DPI — boa qualidade sem pesar muito
-                    pages = []
-                    for page in doc:
-                        pix = page.get_pixmap(matrix=mat, alpha=False)
-                        b64 = _b64.b64encode(pix.tobytes('png')).decode()
-                        pages.append(f'data:image/png;base64,{b64}')
-                    doc.close()
-                    entry['pages'] = pages
+                    # Páginas em ~108 DPI servidas do cache em disco (rasterizadas sob demanda)
+                    entry['pages'] = [
+                        reverse('Ouvidoria:anexo_pagina_imagem', args=[a.pk, n]) + '?q=mini'
+                        for n in range(1, contar_paginas(a.arquivo.path) + 1)
+                    ]
                 except Exception as _e:
                     logger.warning("Não foi possível renderizar PDF %s: %s", a.arquivo.name, _e)
             return entry
 
-        anexos_defesa = patd.anexos.filter(tipo='defesa')
+        anexos_defesa = patd.anexo_index.de('defesa')
         context['anexos_defesa_json'] = json.dumps([_build_anexo_entry(a) for a in anexos_defesa])
 
-        anexos_reconsideracao = patd.anexos.filter(tipo='reconsideracao')
+        anexos_reconsideracao = patd.anexo_index.de('reconsideracao')
         context['anexos_reconsideracao_json'] = json.dumps([_build_anexo_entry(a) for a in anexos_reconsideracao])
 
-        ficha_individual_anexo = patd.anexos.filter(tipo='ficha_individual').first()
+        ficha_individual_anexo = patd.anexo_index.primeiro('ficha_individual')
         context['ficha_individual_anexo'] = ficha_individual_anexo
 
-        formulario_resumo_anexo = patd.anexos.filter(tipo='formulario_resumo').first()
+        formulario_resumo_anexo = patd.anexo_index.primeiro('formulario_resumo')
         context['formulario_resumo_anexo'] = formulario_resumo_anexo
         if formulario_resumo_anexo:
             context['formulario_resumo_json'] = json.dumps(_build_anexo_entry(formulario_resumo_anexo))
         else:
             context['formulario_resumo_json'] = 'null'
 
-        anexos_reconsideracao_oficial = patd.anexos.filter(tipo='reconsideracao_oficial')
+        anexos_reconsideracao_oficial = patd.anexo_index.de('reconsideracao_oficial')
         context['anexos_reconsideracao_oficial_json'] = json.dumps([_build_anexo_entry(a) for a in anexos_reconsideracao_oficial])
 
         # --- FIM DA MODIFICAÇÃO ---
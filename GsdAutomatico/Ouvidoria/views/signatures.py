@@ -4,7 +4,7 @@ from uuid import uuid4
 
 from django.db import transaction
 from django.db.models import Q
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, Http404
 from django.utils import timezone
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -12,9 +12,10 @@ from django.views.decorators.http import require_POST, require_GET
 from django.core.files.base import ContentFile
 
 from ..models import PATD, Configuracao, Anexo
+from ..assinaturas import decodificar_assinatura, url_assinatura_efetivo, versao_assinatura
 from Secao_pessoal.models import Efetivo
 from ..permissions import (
-    can_change_patd_date, OUVIDORIA_CHEFE, OUVIDORIA_APURADOR, OUVIDORIA_ADJUNTO,
+    can_change_patd_date, has_patd_detail_access, OUVIDORIA_CHEFE, OUVIDORIA_APURADOR, OUVIDORIA_ADJUNTO,
     OUVIDORIA_CB, OUVIDORIA_S2, COMANDANTE,
 )
 from .decorators import ouvidoria_required, oficial_responsavel_required
@@ -311,6 +312,32 @@ def remover_assinatura(request, pk):
         return JsonResponse({'status': 'error', 'message': 'Ocorreu um erro interno.'}, status=500)
 
 
+@login_required
+@user_passes_test(has_patd_detail_access)
+@require_GET
+def assinatura_efetivo(request, pk):
+    """
+    Serve a assinatura padrão do militar como imagem binária.
+    A URL carrega ?v=<hash> (ver url_assinatura_efetivo), então a resposta pode
+    ser cacheada como imutável; o ETag cobre requisições sem a versão.
+    """
+    data_uri = Efetivo.objects.filter(pk=pk).values_list('assinatura_registro__imagem', flat=True).first()
+    content, mime = decodificar_assinatura(data_uri)
+    if content is None:
+        raise Http404
+    etag = f'"{versao_assinatura(data_uri)}"'
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=mime)
+    response['ETag'] = etag
+    if request.GET.get('v'):
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 @require_GET
@@ -323,7 +350,12 @@ def lista_oficiais(request):
             Q(nome_guerra__icontains=query)
         )
     oficiais = oficiais.order_by('posto', 'nome_guerra')
-    data = list(oficiais.values('id', 'posto', 'nome_guerra', 'assinatura'))
+    # Assinatura vai como URL versionada, não como data URI (ver assinatura_efetivo)
+    data = [
+        {'id': o.pk, 'posto': o.posto, 'nome_guerra': o.nome_guerra,
+         'assinatura': url_assinatura_efetivo(o)}
+        for o in oficiais.com_assinatura().only('id', 'posto', 'nome_guerra', 'assinatura_registro__imagem')
+    ]
     response = JsonResponse(data, safe=False)
     response['Cache-Control'] = 'no-store, no-cache, must-revalidate'
     return response
@@ -6,6 +6,7 @@ from django.urls import reverse_lazy
 from django.db.models import Count, Q, Prefetch, Case, When, Value, IntegerField
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from Secao_pessoal.busca import buscar_militares
 from Secao_pessoal.models import Efetivo
 
 RANK_ORDER = Case(
@@ -29,10 +30,7 @@ def buscar_efetivos(request):
     q = request.GET.get('q', '').strip()
     if len(q) < 2:
         return JsonResponse([], safe=False)
-    efetivos = Efetivo.objects.filter(
-        Q(nome_completo__icontains=q) | Q(nome_guerra__icontains=q) | Q(posto__icontains=q)
-    ).values('id', 'posto', 'nome_guerra', 'nome_completo')[:20]
-    return JsonResponse(list(efetivos), safe=False)
+    return JsonResponse(buscar_militares(q, limite=20), safe=False)
 
 
 @method_decorator(login_required, name='dispatch')
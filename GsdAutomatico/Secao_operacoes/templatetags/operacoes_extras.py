@@ -1,5 +1,7 @@
 from django import template
 
+from login.grupos import pertence
+
 register = template.Library()
 
 
@@ -9,7 +11,7 @@ def is_sop_operacoes(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name='SOP - Operações').exists()
+    return pertence(user, 'SOP - Operações')
 
 
 @register.filter
@@ -18,7 +20,7 @@ def is_sop_escalas(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name='SOP- Escalas').exists()
+    return pertence(user, 'SOP- Escalas')
 
 
 @register.filter
@@ -28,7 +30,7 @@ def can_see_missoes(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name='SOP - Operações').exists()
+    return pertence(user, 'SOP - Operações')
 
 
 @register.filter
@@ -38,7 +40,7 @@ def can_see_escalas(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name='SOP- Escalas').exists()
+    return pertence(user, 'SOP- Escalas')
 
 
 @register.filter
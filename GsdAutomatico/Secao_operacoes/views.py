@@ -11,7 +11,9 @@ import os
 from django.conf import settings
 from .models import Escala, TurnoEscala, PostoEscala, Missao, ItemArmamento, ItemEquipamento, ItemHorario, ConfiguracaoOperacoes, EquipamentoCatalogo, RadioCatalogo, UniformeCatalogo, ArmamentoCatalogo, ACargaOpcao, SituacaoEspecialEfetivo
 from .forms import EscalaForm, TurnoEscalaForm, PostoEscalaForm, MissaoForm
-from Secao_pessoal.models import Efetivo
+from Secao_pessoal.busca import buscar_militares
+from Secao_pessoal.models import Efetivo, SITUACAO_BAIXADO, SITUACAO_INDISPONIVEL
+from login.grupos import pertence
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -162,7 +164,7 @@ def _is_sop_operacoes(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name='SOP - Operações').exists()
+    return pertence(user, 'SOP - Operações')
 
 
 def _is_sop_escalas(user):
@@ -170,7 +172,7 @@ def _is_sop_escalas(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name='SOP- Escalas').exists()
+    return pertence(user, 'SOP- Escalas')
 
 
 def _can_see_missoes(user):
@@ -179,7 +181,7 @@ def _can_see_missoes(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name='SOP - Operações').exists()
+    return pertence(user, 'SOP - Operações')
 
 
 def _can_see_escalas(user):
@@ -188,7 +190,7 @@ def _can_see_escalas(user):
         return False
     if user.is_superuser or user.is_staff:
         return True
-    return user.groups.filter(name__in=['SOP- Escalas']).exists()
+    return pertence(user, 'SOP- Escalas')
 
 
 def sop_required(view_func):
@@ -1282,17 +1284,12 @@ def militar_conflitos_json(request):
 
     conflitos = []
 
-    # 1. Situação do militar
-    if militar.situacao and militar.situacao.strip():
-        sit = militar.situacao.strip().upper()
-        situacoes_indisp = {'BAIXADO', 'AFASTADO', 'LICENÇA', 'DISPENSA', 'HOSPITALIZADO', 'INATIVO'}
-        for s in situacoes_indisp:
-            if s in sit:
-                conflitos.append({
-                    'tipo': 'situacao',
-                    'descricao': f'Situação atual: {militar.situacao}',
-                })
-                break
+    # 1. Situação do militar (Baixado, Afastado, Licença, Dispensa, Hospitalizado, Inativo)
+    if militar.situacao_categoria in (SITUACAO_BAIXADO, SITUACAO_INDISPONIVEL):
+        conflitos.append({
+            'tipo': 'situacao',
+            'descricao': f'Situação atual: {militar.situacao}',
+        })
 
     # 2. Turnos de escala no mesmo dia
     turnos = TurnoEscala.objects.filter(militar=militar, data=data).select_related('escala', 'posto')
@@ -1332,13 +1329,11 @@ def militar_conflitos_json(request):
 @sop_required
 def efetivo_busca_json(request):
     q = request.GET.get('q', '').strip()
-    qs = Efetivo.objects.filter(deleted=False).order_by('posto', 'nome_guerra')
-    if q:
-        qs = qs.filter(nome_guerra__icontains=q) | qs.filter(nome_completo__icontains=q) | qs.filter(posto__icontains=q)
+    militares = buscar_militares(q, limite=30, campos=('id', 'posto', 'nome_guerra', 'oficial'))
     return JsonResponse([{
-        'id': e.pk, 'posto': e.posto, 'nome_guerra': e.nome_guerra,
-        'label': f"{e.posto} {e.nome_guerra}".strip(), 'oficial': e.oficial,
-    } for e in qs[:30]], safe=False)
+        'id': e['id'], 'posto': e['posto'], 'nome_guerra': e['nome_guerra'],
+        'label': f"{e['posto']} {e['nome_guerra']}".strip(), 'oficial': e['oficial'],
+    } for e in militares], safe=False)
 
 
 @sop_required
@@ -0,0 +1,69 @@
+"""
+Busca de militares compartilhada pelos autocompletes (INSPSAU, OMIS, PATD,
+caixa de entrada, SCIM).
+
+Cada termo da consulta vira um `busca LIKE '%termo%'` sobre Efetivo.busca
+(nome de guerra, nome completo e SARAM normalizados por texto_busca), servido
+pelo índice trigram efetivo_busca_trgm; um primeiro termo que é um posto ("CB",
+"SGT", "TEN"...) filtra a coluna posto. No Postgres o resultado é ordenado
+pela similaridade (word_similarity) com a consulta. O número de linhas é
+sempre limitado e só as colunas pedidas pelo widget são lidas.
+
+Sem termos, devolve os primeiros militares em ordem de posto/nome de guerra.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Q
+
+from .models import Efetivo, texto_busca
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 50
+CAMPOS = ('id', 'posto', 'nome_guerra', 'nome_completo')
+
+# Termo digitado -> valores de Efetivo.posto
+_POSTOS = {
+    'CL': ['CL'], 'CEL': ['CL'], 'TC': ['TC'], 'MJ': ['MJ'], 'MAJ': ['MJ'],
+    'CP': ['CP'], 'CAP': ['CP'], '1T': ['1T'], '2T': ['2T'], 'TEN': ['1T', '2T'],
+    'ASP': ['ASP'], 'SO': ['SO'], 'ST': ['SO'], '1S': ['1S'], '2S': ['2S'], '3S': ['3S'],
+    'SGT': ['1S', '2S', '3S'], 'CB': ['CB'], 'S1': ['S1'], 'S2': ['S2'], 'REC': ['REC'],
+}
+
+
+def buscar_militares(q, limite=LIMITE_PADRAO, campos=CAMPOS, queryset=None):
+    """
+    Lista de dicts (`campos`) dos militares que casam com `q`, os mais
+    parecidos primeiro. `queryset` restringe o universo (padrão: Efetivo.objects).
+    """
+    qs = Efetivo.objects.all() if queryset is None else queryset
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+
+    termos = texto_busca(q).split()
+    if not termos:
+        return list(qs.order_by('posto', 'nome_guerra').values(*campos)[:limite])
+
+    # Só o primeiro termo pode ser um posto, e só se vier seguido de outro
+    # ("cb silva"). Sozinho ("so", "cap", "rec") também é começo de nome
+    # (Soares, Capistrano, Recife): casa o posto OU o texto.
+    postos = _POSTOS.get(termos[0].upper())
+    if postos:
+        filtro = Q(posto__in=postos)
+        if len(termos) == 1:
+            filtro |= Q(busca__contains=termos[0])
+        qs = qs.filter(filtro)
+        termos = termos[1:]
+    for termo in termos:
+        qs = qs.filter(busca__contains=termo)
+
+    if termos and connection.vendor == 'postgresql':
+        qs = qs.annotate(relevancia=TrigramWordSimilarity(' '.join(termos), 'busca'))
+        qs = qs.order_by('-relevancia', 'nome_guerra')
+    else:
+        qs = qs.order_by('posto', 'nome_guerra')
+    return list(qs.values(*campos)[:limite])
+
+
+def ids_militares(q, limite=LIMITE_MAXIMO, queryset=None):
+    """Só os ids (para combinar com filtros em outras tabelas, ex.: usuários)."""
+    return [m['id'] for m in buscar_militares(q, limite=limite, campos=('id',), queryset=queryset)]
+
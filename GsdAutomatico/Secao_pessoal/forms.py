@@ -19,7 +19,29 @@ _TLP_CHOICES = [
 ]
 
 
-class MilitarForm(forms.ModelForm):
+class AssinaturaEfetivoFormMixin(forms.Form):
+    """
+    Campo oculto 'assinatura' para ModelForms de Efetivo. A assinatura não é
+    mais coluna do Efetivo (ver AssinaturaEfetivo), então é lida e gravada
+    pela propriedade Efetivo.assinatura.
+    """
+    assinatura = forms.CharField(required=False, widget=forms.HiddenInput())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk and 'assinatura' not in self.initial:
+            self.initial['assinatura'] = self.instance.assinatura
+
+    def save(self, commit=True):
+        instance = super().save(commit=False)
+        instance.assinatura = self.cleaned_data.get('assinatura')
+        if commit:
+            instance.save()
+            self._save_m2m()
+        return instance
+
+
+class MilitarForm(AssinaturaEfetivoFormMixin, forms.ModelForm):
     # Formulário para criar e atualizar registros de Militares.
 
     def __init__(self, *args, **kwargs):
@@ -50,7 +72,7 @@ class MilitarForm(forms.ModelForm):
         fields = [
             'posto', 'quad', 'especializacao', 'saram', 'nome_completo', 'nome_guerra',
             'turma', 'situacao', 'tlp', 'om', 'setor', 'subsetor', 'oficial', 'observacao',
-            'assinatura', 'unidade_prestacao_servico', 'data_inicio_prestacao',
+            'unidade_prestacao_servico', 'data_inicio_prestacao',
             'data_vencimento_prestacao', 'portaria_prestacao', 'data_portaria_prestacao',
             'boletim_prestacao', 'data_boletim_prestacao',
             'data_desligamento', 'motivo_desligamento', 'documento_desligamento', 'funcao_desligamento',
@@ -76,7 +98,6 @@ class MilitarForm(forms.ModelForm):
             'nome_guerra': forms.TextInput(attrs={'placeholder': 'Nome de guerra'}),
             'turma': forms.TextInput(attrs={'placeholder': 'Ex: 2024'}),
             'observacao': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Observações sobre a situação do militar (ex: motivo da baixa, período de férias).'}),
-            'assinatura': forms.HiddenInput(),
             'unidade_prestacao_servico': forms.TextInput(attrs={'placeholder': 'Ex: BAGL'}),
             'portaria_prestacao': forms.TextInput(attrs={'placeholder': 'Ex: Portaria Nº 123'}),
             'boletim_prestacao': forms.TextInput(attrs={'placeholder': 'Ex: BCA Nº 45'}),
@@ -0,0 +1,323 @@
+"""
+Importação em massa do Efetivo a partir da planilha Excel.
+
+Em vez de um update_or_create/save() por linha (com a detecção de oficial e os
+sinais de auditoria disparando a cada militar), a importação:
+  1. normaliza as colunas com pandas, aplicando as regras de posto/nome de
+     guerra/turma uma vez por valor distinto;
+  2. compara em memória com o efetivo atual, casando por SARAM ou, sem SARAM,
+     pelo nome completo normalizado;
+  3. grava com bulk_create/bulk_update em lotes, numa única transação;
+  4. registra um único log de auditoria com o resumo.
+
+As regras de casamento são as mesmas da importação linha a linha: linhas
+repetidas na planilha atualizam o mesmo militar, e militares na lixeira são
+restaurados ao reaparecer.
+"""
+import logging
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from . import painel
+from .models import (
+    OM, Efetivo, Especializacao, Posto, Quad, Setor, Subsetor,
+    categoria_situacao, chave_setor, eh_posto_de_oficial, texto_busca,
+)
+
+logger = logging.getLogger(__name__)
+
+_TAMANHO_LOTE = 500
+
+# Aceita variações de acentuação/maiúsculas/abreviação/pontuação no cabeçalho.
+# 'ESPC' é a abreviação usada no novo modelo; 'OBSERVAÇÕES' é nova.
+ALIASES_COLUNAS_EFETIVO = {
+    'SARAM': ['SARAM'],
+    'NOME COMPLETO': ['NOME COMPLETO', 'NOME'],
+    'PST.': ['PST', 'POSTO', 'POSTOGRAD', 'POSTO GRAD'],
+    'QUAD.': ['QUAD', 'QUADRO'],
+    'ESP.': ['ESP', 'ESPC', 'ESPECIALIZACAO', 'ESPECIALIDADE'],
+    'NOME DE GUERRA': ['NOME DE GUERRA', 'NOME GUERRA', 'GUERRA'],
+    'TURMA': ['TURMA'],
+    'SITUAÇÃO': ['SITUACAO'],
+    'OM': ['OM'],
+    'SETOR': ['SETOR'],
+    'SUBSETOR': ['SUBSETOR'],
+    'OBSERVAÇÃO': ['OBSERVACOES', 'OBSERVACAO', 'OBSERVACOES'],
+}
+
+# Campos gravados pela importação (além dos derivados: oficial, situacao_categoria, setor_chave, busca)
+CAMPOS_IMPORTADOS = [
+    'posto', 'quad', 'especializacao', 'saram', 'nome_completo', 'nome_guerra', 'turma',
+    'situacao', 'om', 'setor', 'subsetor', 'observacao', 'deleted', 'deleted_at',
+]
+
+# Opções do controle geral alimentadas pela planilha
+_OPCOES_CONTROLE_GERAL = (
+    (Posto, 'posto'), (Quad, 'quad'), (Especializacao, 'especializacao'),
+    (OM, 'om'), (Setor, 'setor'), (Subsetor, 'subsetor'),
+)
+
+
+def ler_planilha(excel_file):
+    """
+    Lê a planilha (tudo como texto) com as colunas renomeadas para os nomes
+    canônicos e vazios como ''.
+    """
+    from .views import normalize_name
+
+    # header=2 → linhas 1-2 são título, a linha 3 é o cabeçalho real (novo modelo).
+    # Se não encontrar colunas conhecidas, tenta header=0 (planilhas antigas).
+    df = pd.read_excel(excel_file, dtype=str, header=2)
+    df.columns = df.columns.str.strip()
+    _cols_norm = {re.sub(r'\s+', ' ', normalize_name(str(c))).strip() for c in df.columns}
+    if 'SARAM' not in _cols_norm and 'NOME COMPLETO' not in _cols_norm:
+        df = pd.read_excel(excel_file, dtype=str, header=0)
+        df.columns = df.columns.str.strip()
+
+    colunas_normalizadas = {
+        re.sub(r'\s+', ' ', re.sub(r'[.\/]', '', normalize_name(str(c)))).strip(): c
+        for c in df.columns
+    }
+    renomear = {}
+    for canonico, aliases in ALIASES_COLUNAS_EFETIVO.items():
+        for alias in aliases:
+            col_real = colunas_normalizadas.get(alias)
+            if col_real:
+                renomear[col_real] = canonico
+                break
+    df = df.rename(columns=renomear)
+    return df.fillna('')
+
+
+def _coluna(df, nome):
+    if nome in df.columns:
+        return df[nome].astype(str).str.strip()
+    return pd.Series('', index=df.index, dtype=object)
+
+
+def _por_valor(serie, fn):
+    """Aplica `fn` uma vez por valor distinto (posto, setor, turma etc. se repetem muito)."""
+    distintos = serie.unique()
+    return serie.map(dict(zip(distintos, map(fn, distintos))))
+
+
+def normalizar(df, postos_filtro=None):
+    """
+    Converte a planilha em registros prontos para `aplicar()`.
+    Retorna (registros, ten_rows): ten_rows são as linhas com posto TEN/TENENTE
+    ambíguo, no formato guardado na sessão para a tela de esclarecimento.
+    """
+    from .views import _extrair_ano_turma, _normalizar_posto, _strip_posto_de_nome
+
+    saram_txt = _coluna(df, 'SARAM')
+    nome_completo = _coluna(df, 'NOME COMPLETO')
+    # Sem SARAM e sem nome a linha é inútil
+    uteis = (saram_txt != '') | (nome_completo != '')
+    df, saram_txt, nome_completo = df[uteis], saram_txt[uteis], nome_completo[uteis]
+    if df.empty:
+        # Planilha só com cabeçalho (ou colunas erradas): a view aborta a sincronização
+        return [], []
+
+    # "12345.0" (pandas leu como float) → 12345; inválido → None
+    saram = pd.to_numeric(saram_txt, errors='coerce')
+    saram = np.trunc(saram.where(np.isfinite(saram))).astype('Int64')
+
+    guerra = _por_valor(_coluna(df, 'NOME DE GUERRA'), _strip_posto_de_nome)
+    nome_guerra, posto_de_nome = guerra.str[0], guerra.str[1]
+
+    posto_raw = _coluna(df, 'PST.')
+    posto_norm = _por_valor(posto_raw, lambda v: _normalizar_posto(v) if v else (None, False))
+    is_ten = posto_norm.str[1].astype(bool)
+    # Com posto na planilha: normalizado (ou o texto original); sem: o detectado no nome de guerra
+    posto = posto_norm.str[0].where(posto_norm.str[0].notna(), posto_raw)
+    posto = posto.where(posto_raw != '', posto_de_nome.fillna(''))
+
+    dados = pd.DataFrame({
+        'posto': posto,
+        'quad': _coluna(df, 'QUAD.'),
+        'especializacao': _coluna(df, 'ESP.'),
+        'nome_completo': nome_completo,
+        'nome_guerra': nome_guerra,
+        'turma': _por_valor(_coluna(df, 'TURMA'), _extrair_ano_turma),
+        'situacao': _coluna(df, 'SITUAÇÃO'),
+        'om': _coluna(df, 'OM'),
+        'setor': _coluna(df, 'SETOR'),
+        'subsetor': _coluna(df, 'SUBSETOR'),
+        'observacao': _coluna(df, 'OBSERVAÇÃO'),
+    })
+
+    # Pula postos não selecionados pelo usuário
+    if postos_filtro:
+        selecionados = posto.isin(postos_filtro)
+        dados, saram, saram_txt, posto_raw, is_ten = (
+            dados[selecionados], saram[selecionados], saram_txt[selecionados],
+            posto_raw[selecionados], is_ten[selecionados],
+        )
+
+    sarams = [int(v) if pd.notna(v) else None for v in saram]
+    registros, ten_rows = [], []
+    for linha, saram_db, texto, raw, ten in zip(dados.to_dict('records'), sarams, saram_txt, posto_raw, is_ten):
+        if ten:
+            ten_rows.append({
+                'saram': texto,
+                'nome_completo': linha['nome_completo'],
+                'nome_guerra': linha['nome_guerra'],
+                'posto_raw': raw,
+                'quad': linha['quad'],
+                'especializacao': linha['especializacao'],
+                'turma': linha['turma'],
+                'situacao': linha['situacao'],
+                'om': linha['om'],
+                'setor': linha['setor'],
+                'subsetor': linha['subsetor'],
+                'observacao': linha['observacao'],
+                'saram_db': saram_db,
+                'is_ten': True,
+            })
+            continue
+        linha['saram'] = saram_db
+        # Reimportar um militar da lixeira o restaura para o efetivo ativo
+        linha['deleted'] = False
+        linha['deleted_at'] = None
+        registros.append(linha)
+    return registros, ten_rows
+
+
+def _garantir_opcoes(registros):
+    """Cria no controle geral os valores novos de posto, quadro, OM, setor etc."""
+    for model, campo in _OPCOES_CONTROLE_GERAL:
+        valores = {r[campo] for r in registros if r.get(campo)}
+        if valores:
+            model.objects.bulk_create([model(nome=v) for v in valores], ignore_conflicts=True)
+
+
+def aplicar(registros, usuario=None, sincronizar=False, pks_anteriores=()):
+    """
+    Grava os `registros` (dicts com CAMPOS_IMPORTADOS) em uma transação.
+
+    sincronizar: move para a lixeira os militares ativos que não estão na
+    planilha (nem em `pks_anteriores`, os já importados numa etapa anterior).
+    Não sincroniza se nada foi reconhecido, para não esvaziar o efetivo.
+
+    Retorna dict com criados, atualizados, alterados, removidos,
+    sincronizar_abortada e pks (militares presentes na planilha).
+    """
+    from auditoria.utils import registrar, resolver_label
+    from .views import _PESSOAL_PERMISSAO_MAP, normalize_name
+
+    campos = CAMPOS_IMPORTADOS + ['oficial', 'situacao_categoria', 'setor_chave', 'busca']
+    originais = {}
+    for linha in Efetivo.all_objects.order_by('pk').values('pk', *campos):
+        originais[linha.pop('pk')] = linha
+
+    # Estado final de cada militar, indexado por pk (ou ('novo', n) para os criados)
+    estados = {pk: dict(linha) for pk, linha in originais.items()}
+    por_saram = {linha['saram']: pk for pk, linha in originais.items() if linha['saram'] is not None}
+    por_nome = {}
+    for pk, linha in originais.items():
+        chave_nome = normalize_name(linha['nome_completo']).strip()
+        if chave_nome:
+            por_nome[chave_nome] = pk
+
+    novos = []
+    presentes = {}
+    criados = atualizados = 0
+    for dados in registros:
+        dados = dict(
+            dados,
+            oficial=eh_posto_de_oficial(dados['posto']),
+            situacao_categoria=categoria_situacao(dados['situacao']),
+            setor_chave=chave_setor(dados['setor']),
+            busca=texto_busca(dados['nome_guerra'], dados['nome_completo'], dados['saram']),
+        )
+        saram = dados['saram']
+        if saram:
+            chave = por_saram.get(saram)
+        else:
+            chave_nome = normalize_name(dados['nome_completo']).strip()
+            chave = por_nome.get(chave_nome)
+
+        if chave is None:
+            chave = ('novo', len(novos))
+            novos.append(chave)
+            estados[chave] = dados
+            criados += 1
+            if saram:
+                por_saram[saram] = chave
+            else:
+                por_nome[chave_nome] = chave
+        else:
+            estado = estados[chave]
+            saram_anterior = estado['saram']
+            estado.update(dados)
+            atualizados += 1
+            if saram_anterior != estado['saram']:
+                if por_saram.get(saram_anterior) == chave:
+                    del por_saram[saram_anterior]
+                if estado['saram']:
+                    por_saram[estado['saram']] = chave
+        presentes[chave] = None
+
+    # Só vão para o UPDATE os militares com algum campo realmente diferente
+    alteracoes = Counter()
+    para_atualizar = []
+    for chave in presentes:
+        if chave not in originais:
+            continue
+        diferentes = [c for c in campos if estados[chave][c] != originais[chave][c]]
+        if diferentes:
+            alteracoes.update(diferentes)
+            para_atualizar.append(Efetivo(pk=chave, **estados[chave]))
+
+    removidos = 0
+    sincronizar_abortada = False
+    with transaction.atomic():
+        if para_atualizar:
+            Efetivo.all_objects.bulk_update(para_atualizar, sorted(alteracoes), batch_size=_TAMANHO_LOTE)
+        criados_objs = Efetivo.all_objects.bulk_create(
+            [Efetivo(**estados[chave]) for chave in novos], batch_size=_TAMANHO_LOTE,
+        )
+        _garantir_opcoes(registros)
+
+        pks = {chave for chave in presentes if chave in originais}
+        pks.update(obj.pk for obj in criados_objs)
+        if sincronizar:
+            pks_planilha = pks | set(pks_anteriores)
+            if not pks_planilha:
+                sincronizar_abortada = True
+            else:
+                removidos = Efetivo.objects.exclude(pk__in=pks_planilha).update(
+                    deleted=True, deleted_at=timezone.now(),
+                )
+
+    # bulk_create/bulk_update não disparam sinais: painel e auditoria tratados aqui
+    if criados or para_atualizar or removidos:
+        painel.invalidar()
+    if criados or atualizados or removidos:
+        descricao = f"importação Excel: {criados} militar(es) criado(s), {atualizados} atualizado(s)"
+        if alteracoes:
+            campos_txt = ', '.join(f"{campo}: {n}" for campo, n in alteracoes.most_common())
+            descricao += f" ({len(para_atualizar)} com alterações — {campos_txt})"
+        if removidos:
+            descricao += f"; {removidos} movido(s) para a lixeira por não constar(em) na planilha"
+        registrar(
+            usuario, secao='pessoal',
+            permissao=resolver_label(usuario, _PESSOAL_PERMISSAO_MAP) if usuario else '',
+            acao='importou', descricao=descricao, objeto_tipo='Efetivo', objeto_id='',
+        )
+    logger.info("Importação de efetivo: %d criados, %d atualizados (%d alterados), %d removidos",
+                criados, atualizados, len(para_atualizar), removidos)
+
+    return {
+        'criados': criados,
+        'atualizados': atualizados,
+        'alterados': len(para_atualizar),
+        'removidos': removidos,
+        'sincronizar_abortada': sincronizar_abortada,
+        'pks': pks,
+    }
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from Secao_pessoal.models import Efetivo, AssinaturaEfetivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a largura média da linha de Efetivo e o tempo de listagem, '
+        'comparando com o custo de trazer a assinatura junto (layout antigo).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=5, help='Execuções por medição (default: 5)')
+
+    def _tempo(self, fn, repeticoes):
+        melhores = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            fn()
+            melhores.append(time.perf_counter() - inicio)
+        return min(melhores) * 1000
+
+    def handle(self, *args, **options):
+        repeticoes = options['repeticoes']
+        total = Efetivo.all_objects.count()
+        com_assinatura = AssinaturaEfetivo.objects.count()
+        self.stdout.write(f"Efetivo: {total} registro(s), {com_assinatura} com assinatura.")
+
+        # ── Largura da linha ─────────────────────────────────────────────────
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT avg(pg_column_size(e.*)) FROM "Efetivo" e')
+                largura = cursor.fetchone()[0] or 0
+                cursor.execute('SELECT coalesce(sum(pg_column_size(a.imagem)), 0) FROM "EfetivoAssinatura" a')
+                bytes_assinaturas = cursor.fetchone()[0] or 0
+            largura_antiga = largura + (bytes_assinaturas / total if total else 0)
+            self.stdout.write(f"Largura média da linha Efetivo: {largura:.0f} bytes")
+            self.stdout.write(f"Largura equivalente com a assinatura na linha: {largura_antiga:.0f} bytes")
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Largura de linha só é medida no PostgreSQL (banco atual: {connection.vendor})."
+            ))
+
+        # ── Listagem ─────────────────────────────────────────────────────────
+        t_sem = self._tempo(lambda: list(Efetivo.objects.all()), repeticoes)
+        t_com = self._tempo(lambda: list(Efetivo.objects.com_assinatura()), repeticoes)
+        self.stdout.write(f"list(Efetivo.objects.all()):              {t_sem:8.1f} ms")
+        self.stdout.write(f"list(Efetivo.objects.com_assinatura()):   {t_com:8.1f} ms  (equivale ao layout antigo)")
+
+        # ── View de listagem (render completo) ───────────────────────────────
+        from django.contrib.auth import get_user_model
+        from Secao_pessoal.views import MilitarListView
+
+        usuario = get_user_model().objects.filter(groups__name='Seção de Pessoal (S1)').first()
+        if usuario is None:
+            self.stdout.write(self.style.WARNING("Nenhum usuário da S1: medição da view de listagem ignorada."))
+            return
+        request = RequestFactory().get('/secao_pessoal/efetivo/')
+        request.user = usuario
+        view = MilitarListView.as_view()
+        t_view = self._tempo(lambda: view(request).render(), repeticoes)
+        self.stdout.write(f"MilitarListView (render):                 {t_view:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS("Benchmark concluído."))
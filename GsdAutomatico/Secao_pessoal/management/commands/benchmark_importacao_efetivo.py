@@ -0,0 +1,131 @@
+import io
+import random
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from Secao_pessoal import importacao
+from Secao_pessoal.models import OM, Efetivo, Especializacao, Posto, Quad, Setor, Subsetor
+
+_POSTOS = ['TC', 'MJ', 'CP', '1T', '2T', 'SO', '1S', '2S', '3S', 'CB', 'S1', 'S2']
+_SETORES = ['SOP', 'S1', 'S2', 'S3', 'S4', 'ESI', 'EPA', 'INFORMATICA', 'OUVIDORIA', 'SAUDE']
+_NOMES = ['SILVA', 'SOUZA', 'OLIVEIRA', 'SANTOS', 'PEREIRA', 'COSTA', 'RODRIGUES', 'ALMEIDA', 'CORRÊA', 'LIMA']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a importação do Efetivo por planilha (Secao_pessoal.importacao) com uma '
+        'planilha sintética: carga inicial e reimportação com alterações. Tudo é '
+        'desfeito ao final (rollback).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=3000, help='Linhas da planilha (default: 3000)')
+        parser.add_argument('--alterar', type=float, default=0.1,
+                            help='Fração das linhas alteradas na reimportação (default: 0.1)')
+        parser.add_argument('--por-linha', action='store_true',
+                            help='Compara com a gravação antiga, um update_or_create por linha')
+
+    def _planilha(self, linhas, alterar, semente):
+        rnd = random.Random(semente)
+        dados = []
+        for i in range(linhas):
+            sobrenome = _NOMES[i % len(_NOMES)]
+            dados.append({
+                'SARAM': str(1000000 + i) if i % 20 else '',  # 5% sem SARAM (casa pelo nome)
+                'NOME COMPLETO': f"MILITAR {i:05d} {sobrenome}",
+                'PST.': _POSTOS[i % len(_POSTOS)],
+                'QUAD.': 'QSS',
+                'ESPC': 'BMB',
+                'NOME DE GUERRA': f"{sobrenome} {i}",
+                'TURMA': str(2000 + i % 20),
+                'SITUAÇÃO': 'ATIVO',
+                'OM': 'BINFAE-GL',
+                'SETOR': _SETORES[i % len(_SETORES)],
+                'SUBSETOR': '',
+                'OBSERVAÇÕES': '',
+            })
+        for linha in rnd.sample(dados, int(linhas * alterar)):
+            linha['SETOR'] = rnd.choice(_SETORES) + '-B'
+        buffer = io.BytesIO()
+        # Modelo novo: duas linhas de título antes do cabeçalho
+        pd.DataFrame(dados).to_excel(buffer, index=False, startrow=2)
+        buffer.seek(0)
+        return buffer
+
+    def _medir(self, rotulo, fn):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            resultado = fn()
+            duracao = time.perf_counter() - inicio
+        self.stdout.write(f"{rotulo:<44} {duracao:8.2f} s  {len(consultas.captured_queries):6d} consultas")
+        return resultado
+
+    def _importar(self, planilha):
+        inicio = time.perf_counter()
+        df = importacao.ler_planilha(planilha)
+        lida = time.perf_counter()
+        registros, _ = importacao.normalizar(df)
+        normalizada = time.perf_counter()
+        resultado = importacao.aplicar(registros)
+        fim = time.perf_counter()
+        resultado['etapas'] = (
+            f"leitura {lida - inicio:.2f} s, normalização {normalizada - lida:.2f} s, "
+            f"gravação {fim - normalizada:.2f} s"
+        )
+        return resultado
+
+    def _importar_por_linha(self, planilha):
+        """Referência: o laço antigo da view (update_or_create/save() e get_or_create por valor)."""
+        from Secao_pessoal.views import normalize_name
+
+        df = importacao.ler_planilha(planilha)
+        registros, _ = importacao.normalizar(df)
+        existentes_por_nome = {
+            normalize_name(e.nome_completo).strip(): e for e in Efetivo.all_objects.all()
+        }
+        for dados in registros:
+            if dados['saram']:
+                Efetivo.all_objects.update_or_create(saram=dados['saram'], defaults=dados)
+                continue
+            chave = normalize_name(dados['nome_completo']).strip()
+            existente = existentes_por_nome.get(chave)
+            if existente:
+                for campo, valor in dados.items():
+                    setattr(existente, campo, valor)
+                existente.save()
+            else:
+                existentes_por_nome[chave] = Efetivo.all_objects.create(**dados)
+        for model, campo in ((Posto, 'posto'), (Quad, 'quad'), (Especializacao, 'especializacao'),
+                             (OM, 'om'), (Setor, 'setor'), (Subsetor, 'subsetor')):
+            for valor in {r[campo] for r in registros if r[campo]}:
+                model.objects.get_or_create(nome=valor)
+
+    def handle(self, *args, **options):
+        linhas = options['linhas']
+        self.stdout.write(f"Planilha sintética: {linhas} linha(s); banco: {connection.vendor}; "
+                          f"efetivo atual: {Efetivo.all_objects.count()}")
+
+        try:
+            with transaction.atomic():
+                carga = self._planilha(linhas, 0, semente=1)
+                r = self._medir("Importação em massa — carga inicial", lambda: self._importar(carga))
+                self.stdout.write(f"  {r['criados']} criados, {r['atualizados']} atualizados ({r['etapas']})")
+                reimportacao = self._planilha(linhas, options['alterar'], semente=2)
+                r = self._medir("Importação em massa — reimportação", lambda: self._importar(reimportacao))
+                self.stdout.write(f"  {r['atualizados']} atualizados, {r['alterados']} com alterações ({r['etapas']})")
+                if options['por_linha']:
+                    reimportacao = self._planilha(linhas, options['alterar'], semente=3)
+                    self._medir("Por linha (antigo) — reimportação",
+                                lambda: self._importar_por_linha(reimportacao))
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Benchmark concluído (alterações desfeitas)."))
@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copiar_assinaturas(apps, schema_editor):
+    """
+    Move Efetivo.assinatura (data URI base64) para a tabela EfetivoAssinatura.
+    Lê em lotes só (id, assinatura) para não carregar a tabela inteira.
+    """
+    Efetivo = apps.get_model('Secao_pessoal', 'Efetivo')
+    AssinaturaEfetivo = apps.get_model('Secao_pessoal', 'AssinaturaEfetivo')
+
+    qs = (Efetivo.objects.exclude(assinatura__isnull=True).exclude(assinatura='')
+          .order_by('pk').values_list('pk', 'assinatura'))
+    lote = []
+    total = 0
+    for pk, assinatura in qs.iterator(chunk_size=200):
+        lote.append(AssinaturaEfetivo(efetivo_id=pk, imagem=assinatura))
+        if len(lote) >= 200:
+            AssinaturaEfetivo.objects.bulk_create(lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        AssinaturaEfetivo.objects.bulk_create(lote)
+        total += len(lote)
+    print(f"\n  [0028] {total} assinatura(s) movida(s) para EfetivoAssinatura.")
+
+
+def restaurar_assinaturas(apps, schema_editor):
+    Efetivo = apps.get_model('Secao_pessoal', 'Efetivo')
+    AssinaturaEfetivo = apps.get_model('Secao_pessoal', 'AssinaturaEfetivo')
+    for registro in AssinaturaEfetivo.objects.iterator(chunk_size=200):
+        Efetivo.objects.filter(pk=registro.efetivo_id).update(assinatura=registro.imagem)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Secao_pessoal', '0027_efetivo_tlp_om_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssinaturaEfetivo',
+            fields=[
+                ('efetivo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='assinatura_registro', serialize=False, to='Secao_pessoal.efetivo', verbose_name='Militar')),
+                ('imagem', models.TextField(verbose_name='Assinatura Padrão (Base64)')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Assinatura de Militar',
+                'verbose_name_plural': 'Assinaturas de Militares',
+                'db_table': 'EfetivoAssinatura',
+            },
+        ),
+        migrations.RunPython(copiar_assinaturas, restaurar_assinaturas),
+        migrations.RemoveField(
+            model_name='efetivo',
+            name='assinatura',
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.24 on 2026-10-17 09:07
+
+from django.db import migrations, models
+
+
+def preencher_codificados(apps, schema_editor):
+    """
+    Deriva situacao_categoria e setor_chave do texto atual. Um UPDATE por valor
+    distinto de situação/setor (poucas dezenas), não por militar.
+    """
+    from Secao_pessoal.models import categoria_situacao, chave_setor
+
+    Efetivo = apps.get_model('Secao_pessoal', 'Efetivo')
+    for situacao in Efetivo.objects.values_list('situacao', flat=True).distinct():
+        Efetivo.objects.filter(situacao=situacao).update(situacao_categoria=categoria_situacao(situacao))
+    for setor in Efetivo.objects.values_list('setor', flat=True).distinct():
+        chave = chave_setor(setor)
+        if chave:
+            Efetivo.objects.filter(setor=setor).update(setor_chave=chave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Secao_pessoal', '0028_efetivo_assinatura_tabela_separada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='efetivo',
+            name='setor_chave',
+            field=models.CharField(blank=True, choices=[('ESI', 'ESI'), ('EPA', 'EPA (inclui PCG, Carceragem e Canil)'), ('EFSD', 'EFSD'), ('SAP', 'SAP'), ('SOP', 'SOP / Operações'), ('CMD', 'CMD'), ('S1', 'S1 / Pessoal'), ('INFORMATICA', 'Informática'), ('OUVIDORIA', 'Ouvidoria')], default='', editable=False, max_length=20, verbose_name='Setor (chave)'),
+        ),
+        migrations.AddField(
+            model_name='efetivo',
+            name='situacao_categoria',
+            field=models.CharField(choices=[('ativo', 'Ativo / Pronto'), ('sem', 'Sem situação'), ('psv', 'PSV (serviço externo)'), ('psv_gsd', 'PSV GSD-GL'), ('agd_deslig', 'Aguardando desligamento'), ('junta', 'De Junta'), ('justica', 'Justiça'), ('desertor', 'Desertor'), ('baixado', 'Baixado'), ('indisponivel', 'Afastado / Licença / Dispensa / Hospitalizado / Inativo'), ('outra', 'Outra')], default='sem', editable=False, max_length=20, verbose_name='Categoria da Situação'),
+        ),
+        migrations.RunPython(preencher_codificados, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='efetivo',
+            index=models.Index(fields=['deleted', 'situacao_categoria'], name='efetivo_del_situacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='efetivo',
+            index=models.Index(fields=['deleted', 'setor_chave', 'situacao_categoria'], name='efetivo_del_setor_sit_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.24 on 2026-10-17 09:10
+# Índice criado com CONCURRENTLY para não travar o Efetivo em produção.
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+def preencher_busca(apps, schema_editor):
+    """Preenche Efetivo.busca (mesma normalização do save()) em lotes."""
+    from Secao_pessoal.models import texto_busca
+
+    Efetivo = apps.get_model('Secao_pessoal', 'Efetivo')
+    qs = Efetivo.objects.order_by('pk').values_list('pk', 'nome_guerra', 'nome_completo', 'saram')
+    lote = []
+    for pk, nome_guerra, nome_completo, saram in qs.iterator(chunk_size=1000):
+        lote.append(Efetivo(pk=pk, busca=texto_busca(nome_guerra, nome_completo, saram)))
+        if len(lote) >= 1000:
+            Efetivo.objects.bulk_update(lote, ['busca'])
+            lote = []
+    if lote:
+        Efetivo.objects.bulk_update(lote, ['busca'])
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('Secao_pessoal', '0029_efetivo_situacao_setor_codificados'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='efetivo',
+            name='busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(preencher_busca, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='efetivo',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busca'], name='efetivo_busca_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,9 +1,145 @@
+import unicodedata
+
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils import timezone
 
 DIAS_RETENCAO_LIXEIRA_EFETIVO = 30
 
-class EfetivoManager(models.Manager):
+# Sentinela para "assinatura não alterada nesta instância" (None é um valor válido)
+_ASSINATURA_NAO_ALTERADA = object()
+
+POSTOS_DE_OFICIAIS = frozenset([
+    'ASP', 'ASPIRANTE',
+    '2T', '2º TENENTE', '2º TEN',
+    '1T', '1º TENENTE', '1º TEN',
+    'CAP', 'CAPITÃO', 'CAPITAO', 'CP',
+    'MAJ', 'MAJOR', 'MJ',
+    'TC', 'TENENTE CORONEL', 'TEN CEL',
+    'CEL', 'CORONEL', 'CL',
+    'BRIG', 'BRIGADEIRO', 'BG',
+])
+
+
+def eh_posto_de_oficial(posto):
+    """Regra de Efetivo.oficial (usada no save() e na importação em massa, que não chama save())."""
+    return bool(posto) and posto.upper() in POSTOS_DE_OFICIAIS
+
+
+# Situação e setor são texto livre. As consultas filtram pelas colunas
+# codificadas abaixo (situacao_categoria, setor_chave), derivadas no save() e na
+# importação em massa, em vez de icontains sobre o texto.
+SITUACAO_ATIVO = 'ativo'
+SITUACAO_SEM = 'sem'
+SITUACAO_PSV = 'psv'
+SITUACAO_PSV_GSD = 'psv_gsd'
+SITUACAO_AGD_DESLIGAMENTO = 'agd_deslig'
+SITUACAO_JUNTA = 'junta'
+SITUACAO_JUSTICA = 'justica'
+SITUACAO_DESERTOR = 'desertor'
+SITUACAO_BAIXADO = 'baixado'
+SITUACAO_INDISPONIVEL = 'indisponivel'
+SITUACAO_OUTRA = 'outra'
+
+CATEGORIAS_SITUACAO = [
+    (SITUACAO_ATIVO, 'Ativo / Pronto'),
+    (SITUACAO_SEM, 'Sem situação'),
+    (SITUACAO_PSV, 'PSV (serviço externo)'),
+    (SITUACAO_PSV_GSD, 'PSV GSD-GL'),
+    (SITUACAO_AGD_DESLIGAMENTO, 'Aguardando desligamento'),
+    (SITUACAO_JUNTA, 'De Junta'),
+    (SITUACAO_JUSTICA, 'Justiça'),
+    (SITUACAO_DESERTOR, 'Desertor'),
+    (SITUACAO_BAIXADO, 'Baixado'),
+    (SITUACAO_INDISPONIVEL, 'Afastado / Licença / Dispensa / Hospitalizado / Inativo'),
+    (SITUACAO_OUTRA, 'Outra'),
+]
+
+# Situações que tornam o militar indisponível para escala/missão (além de Baixado)
+_TERMOS_INDISPONIVEL = ('BAIXADO', 'AFASTADO', 'LICENCA', 'DISPENSA', 'HOSPITALIZADO', 'INATIVO')
+
+SETOR_ESI = 'ESI'
+SETOR_EPA = 'EPA'
+SETOR_EFSD = 'EFSD'
+SETOR_SAP = 'SAP'
+SETOR_SOP = 'SOP'
+SETOR_CMD = 'CMD'
+SETOR_S1 = 'S1'
+SETOR_INFORMATICA = 'INFORMATICA'
+SETOR_OUVIDORIA = 'OUVIDORIA'
+
+CHAVES_SETOR = [
+    (SETOR_ESI, 'ESI'),
+    (SETOR_EPA, 'EPA (inclui PCG, Carceragem e Canil)'),
+    (SETOR_EFSD, 'EFSD'),
+    (SETOR_SAP, 'SAP'),
+    (SETOR_SOP, 'SOP / Operações'),
+    (SETOR_CMD, 'CMD'),
+    (SETOR_S1, 'S1 / Pessoal'),
+    (SETOR_INFORMATICA, 'Informática'),
+    (SETOR_OUVIDORIA, 'Ouvidoria'),
+]
+
+
+def _sem_acento(texto):
+    texto = unicodedata.normalize('NFKD', (texto or '').strip().upper())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def categoria_situacao(situacao):
+    """Categoria (SITUACAO_*) de uma situação em texto livre."""
+    s = _sem_acento(situacao)
+    if not s:
+        return SITUACAO_SEM
+    exatas = {'BAIXADO': SITUACAO_BAIXADO, 'DESERTOR': SITUACAO_DESERTOR,
+              'PSV': SITUACAO_PSV, 'PSV GSD-GL': SITUACAO_PSV_GSD}
+    if s in exatas:
+        return exatas[s]
+    if 'DESLIGAMENTO' in s:
+        return SITUACAO_AGD_DESLIGAMENTO
+    if 'JUNTA' in s:
+        return SITUACAO_JUNTA
+    if 'JUSTI' in s:
+        return SITUACAO_JUSTICA
+    if any(t in s for t in _TERMOS_INDISPONIVEL):
+        return SITUACAO_INDISPONIVEL
+    if 'ATIV' in s or 'PRONTO' in s:
+        return SITUACAO_ATIVO
+    return SITUACAO_OUTRA
+
+
+def chave_setor(setor):
+    """Chave canônica (SETOR_*) de um setor em texto livre; '' se não for um setor conhecido."""
+    s = _sem_acento(setor)
+    if 'ESI' in s: return SETOR_ESI
+    if 'PCG' in s or 'CARCERAGEM' in s or 'CANIL' in s or 'EPA' in s: return SETOR_EPA
+    if 'EFSD' in s: return SETOR_EFSD
+    if 'SAP' in s: return SETOR_SAP
+    if 'SOP' in s or 'OPERAC' in s: return SETOR_SOP
+    if 'CMD' in s: return SETOR_CMD
+    if 'OUVIDORIA' in s: return SETOR_OUVIDORIA
+    if 'INFORMATICA' in s: return SETOR_INFORMATICA
+    if 'PESSOAL' in s or 'S1' in s: return SETOR_S1
+    return ''
+
+
+def texto_busca(*partes):
+    """Texto normalizado da busca de militares: minúsculas, sem acentos, espaços simples."""
+    texto = ' '.join(str(p) for p in partes if p not in (None, ''))
+    return ' '.join(_sem_acento(texto).lower().split())
+
+
+class EfetivoQuerySet(models.QuerySet):
+    def com_assinatura(self):
+        """Traz a assinatura (tabela EfetivoAssinatura) no mesmo SELECT, para listas que a exibem."""
+        return self.select_related('assinatura_registro')
+
+    def assinados(self):
+        """Só militares com assinatura padrão cadastrada (e não vazia)."""
+        return self.filter(assinatura_registro__isnull=False).exclude(assinatura_registro__imagem='')
+
+
+class EfetivoManager(models.Manager.from_queryset(EfetivoQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(deleted=False)
 
@@ -22,7 +158,6 @@ class Efetivo(models.Model):
     setor = models.CharField(max_length=100, blank=True, verbose_name="Setor")
     subsetor = models.CharField(max_length=100, blank=True, verbose_name="Subsetor")
     oficial = models.BooleanField(default=False, verbose_name="É Oficial?")
-    assinatura = models.TextField(blank=True, null=True, verbose_name="Assinatura Padrão (Base64)")
     senha_unica = models.CharField(max_length=128, blank=True, null=True, verbose_name="Senha Única")
     inspsau_finalidade = models.CharField(max_length=5, blank=True, null=True, verbose_name="Finalidade INSPSAU")
     inspsau_validade = models.DateField(null=True, blank=True, verbose_name="Validade da INSPSAU")
@@ -31,6 +166,13 @@ class Efetivo(models.Model):
     deleted = models.BooleanField(default=False, db_index=True, verbose_name="Excluído")
     deleted_at = models.DateTimeField(null=True, blank=True, verbose_name="Data de Exclusão")
 
+    # Derivados de situacao/setor no save() (categoria_situacao, chave_setor)
+    situacao_categoria = models.CharField(max_length=20, choices=CATEGORIAS_SITUACAO, default=SITUACAO_SEM, editable=False, verbose_name="Categoria da Situação")
+    setor_chave = models.CharField(max_length=20, choices=CHAVES_SETOR, blank=True, default='', editable=False, verbose_name="Setor (chave)")
+    # Nome de guerra, nome completo e SARAM normalizados (texto_busca), com índice
+    # trigram: a busca dos autocompletes (Secao_pessoal.busca) usa só esta coluna
+    busca = models.TextField(blank=True, default='', editable=False)
+
     # Campos de Prestação de Serviço
     unidade_prestacao_servico = models.CharField(max_length=100, blank=True, null=True, verbose_name="Unidade de Prestação de Serviço")
     data_inicio_prestacao = models.DateField(null=True, blank=True, verbose_name="Data de Início da Apresentação")
@@ -69,37 +211,63 @@ class Efetivo(models.Model):
     bairro = models.CharField(max_length=100, blank=True, null=True, verbose_name="Bairro")
 
     objects = EfetivoManager()
-    all_objects = models.Manager()
+    all_objects = models.Manager.from_queryset(EfetivoQuerySet)()
 
-    def save(self, *args, **kwargs):
-        postos_de_oficiais = [
-            'ASP', 'ASPIRANTE',
-            '2T', '2º TENENTE', '2º TEN',
-            '1T', '1º TENENTE', '1º TEN',
-            'CAP', 'CAPITÃO', 'CAPITAO','CP',
-            'MAJ', 'MAJOR','MJ',
-            'TC', 'TENENTE CORONEL', 'TEN CEL',
-            'CEL', 'CORONEL','CL',
-            'BRIG', 'BRIGADEIRO', 'BG'
-        ]
-        
-        if self.posto and self.posto.upper() in postos_de_oficiais:
-            self.oficial = True
+    # A assinatura (imagem base64, dezenas de KB) fica em EfetivoAssinatura para
+    # que as consultas de efetivo não tragam o blob. A propriedade mantém a API
+    # antiga: leitura via relação 1-1 e escrita persistida no save().
+    @property
+    def assinatura(self):
+        pendente = self.__dict__.get('_assinatura_pendente', _ASSINATURA_NAO_ALTERADA)
+        if pendente is not _ASSINATURA_NAO_ALTERADA:
+            return pendente
+        try:
+            return self.assinatura_registro.imagem
+        except AssinaturaEfetivo.DoesNotExist:
+            return None
+
+    @assinatura.setter
+    def assinatura(self, valor):
+        self.__dict__['_assinatura_pendente'] = valor
+
+    def _salvar_assinatura(self):
+        valor = self.__dict__.pop('_assinatura_pendente', _ASSINATURA_NAO_ALTERADA)
+        if valor is _ASSINATURA_NAO_ALTERADA:
+            return
+        if valor:
+            registro, _ = AssinaturaEfetivo.objects.update_or_create(efetivo=self, defaults={'imagem': valor})
+            self.assinatura_registro = registro
         else:
-            # Caso queira desmarcar automaticamente se não for oficial:
-            self.oficial = False
+            AssinaturaEfetivo.objects.filter(efetivo=self).delete()
+            self._state.fields_cache.pop('assinatura_registro', None)
+
+    def save(self, *args, **kwargs):
+        self.oficial = eh_posto_de_oficial(self.posto)
+        self.situacao_categoria = categoria_situacao(self.situacao)
+        self.setor_chave = chave_setor(self.setor)
+        self.busca = texto_busca(self.nome_guerra, self.nome_completo, self.saram)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derivados = {
+                'situacao': 'situacao_categoria', 'setor': 'setor_chave',
+                'nome_guerra': 'busca', 'nome_completo': 'busca', 'saram': 'busca',
+            }
+            kwargs['update_fields'] = set(update_fields) | {derivados[c] for c in update_fields if c in derivados}
 
         # --- INÍCIO DA PROTEÇÃO DE ASSINATURA ---
-        if self.assinatura:
+        pendente = self.__dict__.get('_assinatura_pendente', _ASSINATURA_NAO_ALTERADA)
+        if pendente is not _ASSINATURA_NAO_ALTERADA and pendente:
             # 1. Limpa quebras de linha ou espaços que o HTML ou JSON possam ter injetado
-            self.assinatura = self.assinatura.strip().replace('\n', '').replace('\r', '').replace(' ', '+')
+            pendente = pendente.strip().replace('\n', '').replace('\r', '').replace(' ', '+')
             
             # 2. Se a assinatura chegar apenas com o código puro (sem o prefixo), o Django adiciona!
-            if not self.assinatura.startswith('data:image'):
-                self.assinatura = f'data:image/jpeg;base64,{self.assinatura}'
+            if not pendente.startswith('data:image'):
+                pendente = f'data:image/jpeg;base64,{pendente}'
+            self.assinatura = pendente
         # --- FIM DA PROTEÇÃO DE ASSINATURA ---
 
         super(Efetivo, self).save(*args, **kwargs)
+        self._salvar_assinatura()
 
     def __str__(self):
         return f"{self.posto} {self.nome_guerra}"
@@ -113,6 +281,26 @@ class Efetivo(models.Model):
 
     class Meta:
         db_table = 'Efetivo'
+        indexes = [
+            models.Index(fields=['deleted', 'situacao_categoria'], name='efetivo_del_situacao_idx'),
+            models.Index(fields=['deleted', 'setor_chave', 'situacao_categoria'], name='efetivo_del_setor_sit_idx'),
+            GinIndex(fields=['busca'], opclasses=['gin_trgm_ops'], name='efetivo_busca_trgm'),
+        ]
+
+
+class AssinaturaEfetivo(models.Model):
+    """Assinatura padrão do militar (data URI base64), fora da tabela Efetivo."""
+    efetivo = models.OneToOneField(
+        Efetivo, on_delete=models.CASCADE, primary_key=True,
+        related_name='assinatura_registro', verbose_name="Militar",
+    )
+    imagem = models.TextField(verbose_name="Assinatura Padrão (Base64)")
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    class Meta:
+        db_table = 'EfetivoAssinatura'
+        verbose_name = "Assinatura de Militar"
+        verbose_name_plural = "Assinaturas de Militares"
 
 # Novas models para as opções
 class Posto(models.Model):
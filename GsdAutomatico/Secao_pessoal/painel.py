@@ -0,0 +1,207 @@
+"""
+Quantitativos do painel da S1 (Secao_pessoal.views.index).
+
+O painel fazia mais de quinze consultas (cinco GROUP BY por posto, a tabela
+posto × setor, especialidades e sete COUNT, vários com `situacao__icontains`).
+Aqui o Efetivo é lido numa única varredura agrupada pelas colunas que o painel
+usa (posto, chave do setor, categoria da situação, especialidade, lixeira e PSV
+vencida); cada agrupamento tem poucas linhas e todos os contadores e tabelas
+cruzadas são somados em Python a partir dele. A TLP é uma segunda consulta, na tabela
+LotacaoPessoal.
+
+O resultado fica no cache por PAINEL_S1_CACHE_SEGUNDOS (chave por dia, já que
+"PSV vencida" depende da data) e é descartado pelos sinais de Efetivo e
+LotacaoPessoal (Secao_pessoal.signals) e pelas gravações em massa que não
+disparam sinais (importação, QuerySet.update). Com o cache quente o painel
+não consulta o Efetivo.
+"""
+import json
+from collections import Counter
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q, Sum
+
+from .models import (
+    SETOR_CMD, SETOR_EFSD, SETOR_EPA, SETOR_ESI, SETOR_SAP, SETOR_SOP,
+    SITUACAO_AGD_DESLIGAMENTO, SITUACAO_ATIVO, SITUACAO_BAIXADO, SITUACAO_DESERTOR,
+    SITUACAO_JUNTA, SITUACAO_JUSTICA, SITUACAO_PSV, SITUACAO_PSV_GSD,
+    Efetivo, LotacaoPessoal,
+)
+
+POSTOS = ['TC', 'MJ', 'CP', '1T', '2T', 'ASP', 'SO', '1S', '2S', '3S', 'CB', 'S1', 'S2', 'REC']
+POSTOS_SETOR = ['TC', 'MJ', 'CP', '1T', '2T', 'ASP', 'SO', '1S', '2S', '3S', 'CB', 'S1', 'S2']
+DISPLAY = {'ASP': 'AP'}
+SETORES = [SETOR_ESI, SETOR_EPA, SETOR_EFSD, SETOR_SAP, SETOR_SOP, SETOR_CMD]
+
+_SITUACOES_OPERACIONAIS = {SITUACAO_ATIVO, SITUACAO_PSV_GSD}
+
+
+def _chave(dia):
+    return f'painel_s1:{dia.isoformat()}'
+
+
+def _normalizar(valor):
+    return (valor or '').strip().upper()
+
+
+def _por_posto(raw):
+    rows = [(DISPLAY.get(p, p), raw.get(p, 0)) for p in POSTOS]
+    total_srec = sum(v for p, v in rows if p != 'REC')
+    total = sum(v for _, v in rows)
+    return {'rows': rows, 'total_srec': total_srec, 'total': total}
+
+
+def _categorias(dados):
+    m = {label: count for label, count in dados['rows']}
+    return [
+        ('OF',   sum(m.get(p, 0) for p in ['TC', 'MJ', 'CP', '1T', '2T', 'AP'])),
+        ('SO',   m.get('SO', 0)),
+        ('SGT',  sum(m.get(p, 0) for p in ['1S', '2S', '3S'])),
+        ('CABO', m.get('CB', 0)),
+        ('S1',   m.get('S1', 0)),
+        ('S2',   m.get('S2', 0)),
+        ('REC',  m.get('REC', 0)),
+    ]
+
+
+def _grupos_efetivo(hoje):
+    """A única leitura do Efetivo: contagem por combinação das colunas do painel."""
+    return (
+        Efetivo.all_objects
+        .annotate(psv_vencida=ExpressionWrapper(Q(data_vencimento_prestacao__lt=hoje), output_field=BooleanField()))
+        .values('deleted', 'situacao_categoria', 'posto', 'setor_chave', 'especializacao', 'psv_vencida')
+        .annotate(c=Count('id'))
+        .order_by()
+    )
+
+
+def calcular(hoje=None):
+    """Monta o contexto do painel (sem cache)."""
+    hoje = hoje or date.today()
+    geral, operac, psv_ext, psv_gsd, baixados, desertores = (Counter() for _ in range(6))
+    setor_grid = {s: Counter() for s in SETORES}
+    esp = Counter()
+    cards = Counter()
+    por_categoria = Counter()
+
+    for g in _grupos_efetivo(hoje):
+        c = g['c']
+        categoria = g['situacao_categoria']
+        posto = _normalizar(g['posto'])
+
+        # Baixados e desertores contam também os que estão na lixeira (all_objects)
+        if categoria == SITUACAO_BAIXADO:
+            baixados[posto] += c
+        elif categoria == SITUACAO_DESERTOR:
+            desertores[posto] += c
+            cards['desertores'] += c
+        if g['deleted']:
+            continue
+
+        if categoria != SITUACAO_BAIXADO:
+            geral[posto] += c
+            esp[g['especializacao']] += c
+        vencida = categoria == SITUACAO_PSV and bool(g['psv_vencida'])
+        if categoria in _SITUACOES_OPERACIONAIS or vencida:
+            operac[posto] += c
+            if g['setor_chave'] in setor_grid and posto in POSTOS_SETOR:
+                setor_grid[g['setor_chave']][DISPLAY.get(posto, posto)] += c
+        if categoria == SITUACAO_PSV:
+            psv_ext[posto] += c
+        elif categoria == SITUACAO_PSV_GSD:
+            psv_gsd[posto] += c
+        if vencida:
+            cards['psv_vencida'] += c
+        por_categoria[categoria] += c
+
+    # --- Tabela cruzada: postos × setores ---
+    disp_set = [DISPLAY.get(p, p) for p in POSTOS_SETOR]
+    setor_rows = []
+    for p in disp_set:
+        valores = [setor_grid[s][p] for s in SETORES]
+        setor_rows.append({'posto': p, 'valores': valores, 'total': sum(valores)})
+    setor_totals = [sum(setor_grid[s].values()) for s in SETORES]
+    total_operac = sum(operac.values())
+    setor_pie_pct = [round(v / total_operac * 100, 1) if total_operac else 0 for v in setor_totals]
+
+    # --- Por Especialidade (agrupado só pela especialidade, sem posto) ---
+    esp_rows = []
+    for valor in sorted(esp, key=lambda v: (v is None, v or '')):
+        e = _normalizar(valor)
+        esp_rows.append((e if e else '(sem especialidade)', esp[valor]))
+
+    tlp_raw = (
+        LotacaoPessoal.objects
+        .values('posto', 'especializacao')
+        .annotate(total=Sum('vagas_previstas'))
+        .order_by('posto', 'especializacao')
+    )
+    tlp_rows = []
+    for item in tlp_raw:
+        p = DISPLAY.get(_normalizar(item['posto']), _normalizar(item['posto']))
+        e = _normalizar(item['especializacao'])
+        tlp_rows.append((f"{p} {e}".strip() if e else p, item['total'] or 0))
+
+    dados_geral = _por_posto(geral)
+    dados_operac = _por_posto(operac)
+    dados_psv_ext = _por_posto(psv_ext)
+
+    return {
+        'tabelas': [
+            {'titulo': 'Quantitativo de Efetivo Total',
+             'subtitulo': 'Efetivo do GSD-GL',
+             'data': dados_geral},
+            {'titulo': 'Quantitativo de Efetivo Operacional Total',
+             'subtitulo': 'Efetivo do GSD-GL',
+             'data': dados_operac},
+            {'titulo': 'Quantitativo de Efetivo Prestando Serviço Externo',
+             'subtitulo': 'Militares Prestando Serviço',
+             'data': dados_psv_ext},
+            {'titulo': 'Quantitativo de Efetivo Prestando Serviço para o GSD-GL',
+             'subtitulo': 'Efetivo do GSD-GL',
+             'data': _por_posto(psv_gsd)},
+            {'titulo': 'Quantitativo de Desligados',
+             'subtitulo': 'Desligados',
+             'data': _por_posto(baixados)},
+        ],
+        'desertores': _por_posto(desertores),
+        'setores_dash': SETORES,
+        'setor_rows': setor_rows,
+        'setor_totals': setor_totals,
+        'total_setor': sum(setor_totals),
+        'total_operac': total_operac,
+        'setor_pie_labels': json.dumps(SETORES),
+        'setor_pie_data': json.dumps(setor_totals),
+        'setor_pie_pct': json.dumps(setor_pie_pct),
+        'esp_rows': esp_rows,
+        'tlp_rows': tlp_rows,
+        # Cards rápidos
+        'total_geral':       sum(geral.values()),
+        'total_agd':         por_categoria[SITUACAO_AGD_DESLIGAMENTO],
+        'total_psv_servico': sum(psv_ext.values()),
+        'total_desertores_n':cards['desertores'],
+        'total_junta':       por_categoria[SITUACAO_JUNTA],
+        'total_justica':     por_categoria[SITUACAO_JUSTICA],
+        'total_psv_vencida': cards['psv_vencida'],
+        # Tabelas por categoria
+        'cat_geral':  _categorias(dados_geral),
+        'cat_operac': _categorias(dados_operac),
+    }
+
+
+def resumo():
+    """Contexto do painel, do cache quando disponível."""
+    hoje = date.today()
+    dados = cache.get(_chave(hoje))
+    if dados is None:
+        dados = calcular(hoje)
+        cache.set(_chave(hoje), dados, settings.PAINEL_S1_CACHE_SEGUNDOS)
+    return dados
+
+
+def invalidar():
+    """Descarta o painel em cache após o commit (um rollback não deixa o cache divergente)."""
+    transaction.on_commit(lambda: cache.delete(_chave(date.today())))
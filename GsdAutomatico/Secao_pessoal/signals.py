@@ -15,3 +15,21 @@ registrar_modelo(
     campo_id=lambda e: e.nome_guerra or e.nome_completo,
     campos_monitorados=['posto', 'situacao', 'setor', 'subsetor', 'om'],
 )
+
+
+# ==========================================
+# PAINEL DA S1 (cache de Secao_pessoal.painel)
+# ==========================================
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import painel
+from .models import LotacaoPessoal
+
+
+@receiver(post_save, sender=Efetivo, dispatch_uid='painel_s1_efetivo_save')
+@receiver(post_delete, sender=Efetivo, dispatch_uid='painel_s1_efetivo_delete')
+@receiver(post_save, sender=LotacaoPessoal, dispatch_uid='painel_s1_lotacao_save')
+@receiver(post_delete, sender=LotacaoPessoal, dispatch_uid='painel_s1_lotacao_delete')
+def invalidar_painel(sender, **kwargs):
+    painel.invalidar()
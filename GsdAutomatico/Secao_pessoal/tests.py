@@ -1,3 +1,25 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .busca import buscar_militares
+from .models import Efetivo
+
+
+class BuscarMilitaresTests(TestCase):
+
+    def setUp(self):
+        self.so = Efetivo.objects.create(posto='SO', nome_guerra='SILVA', nome_completo='JOAO SILVA', situacao='ATIVO')
+        self.cb = Efetivo.objects.create(posto='CB', nome_guerra='SILVA', nome_completo='PEDRO SILVA', situacao='ATIVO')
+        self.soares = Efetivo.objects.create(posto='CB', nome_guerra='SOARES', nome_completo='ANA SOARES', situacao='ATIVO')
+
+    def _ids(self, q):
+        return {m['id'] for m in buscar_militares(q)}
+
+    def test_posto_seguido_de_nome_filtra_o_posto(self):
+        self.assertEqual(self._ids('cb silva'), {self.cb.pk})
+
+    def test_termo_sozinho_que_e_posto_tambem_busca_o_nome(self):
+        self.assertEqual(self._ids('so'), {self.so.pk, self.soares.pk})
+
+    def test_so_o_primeiro_termo_e_posto(self):
+        self.assertEqual(self._ids('silva so'), set())
+        self.assertEqual(self._ids('ana soares'), {self.soares.pk})
@@ -21,10 +21,13 @@ from django.contrib.auth.models import Group
 from Secao_pessoal.models import (
     Efetivo, Posto, Quad, Especializacao, OM, Setor, Subsetor, SolicitacaoTrocaSetor,
     HistoricoInspsau, MovimentacaoEfetivo, LotacaoPessoal,
+    SITUACAO_ATIVO, SITUACAO_BAIXADO, SITUACAO_JUNTA, SITUACAO_SEM,
 )
 from django.contrib.auth import get_user_model as _get_user_model
 from caixa_entrada.models import Notificacao, Mensagem as _Mensagem
 from auditoria.utils import registrar, resolver_label
+from login.grupos import pertence
+from GsdAutomatico import exportacao_xlsx
 
 _PESSOAL_PERMISSAO_MAP = {
     'Seção de Pessoal (S1)': 'S1- Efetivo',
@@ -44,14 +47,15 @@ def _enviar_mensagem_sistema(remetente_militar, destinatario_militar, assunto, c
     except Exception:
         pass
 from .forms import MilitarForm, LotacaoPessoalForm
+from . import importacao, painel
+from .busca import buscar_militares
 import docx
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from django.contrib import messages
-from django.db.models import Q, Max, Case, When, Value, IntegerField, Count, Sum
+from django.db.models import Q, Max, Case, When, Value, IntegerField, Count
 from difflib import SequenceMatcher
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from openpyxl.utils import get_column_letter
+from openpyxl.styles import Font, PatternFill, Alignment
 from datetime import datetime, date, timedelta
 try:
     import pytesseract
@@ -70,7 +74,7 @@ from chamada.models import RegistroChamada as ChamadaRegistro
 logger = logging.getLogger(__name__)
 
 def is_s1_member(user):
-    return user.groups.filter(name='Seção de Pessoal (S1)').exists()
+    return pertence(user, 'Seção de Pessoal (S1)')
 
 s1_required = user_passes_test(is_s1_member)
 
@@ -116,173 +120,15 @@ def obter_situacao_inspsau(letra):
 
 @s1_required
 def index(request):
-    _POSTOS      = ['TC', 'MJ', 'CP', '1T', '2T', 'ASP', 'SO', '1S', '2S', '3S', 'CB', 'S1', 'S2', 'REC']
-    _POSTOS_SET  = ['TC', 'MJ', 'CP', '1T', '2T', 'ASP', 'SO', '1S', '2S', '3S', 'CB', 'S1', 'S2']
-    _DISPLAY     = {'ASP': 'AP'}
-    _SETORES     = ['ESI', 'EPA', 'EFSD', 'SAP', 'SOP', 'CMD']
-    hoje         = date.today()
-
-    def _por_posto(qs):
-        raw = {}
-        for item in qs.values('posto').annotate(c=Count('id')):
-            p = (item['posto'] or '').strip().upper()
-            raw[p] = raw.get(p, 0) + item['c']
-        rows = [(_DISPLAY.get(p, p), raw.get(p, 0)) for p in _POSTOS]
-        total_srec = sum(v for p, v in rows if p != 'REC')
-        total = sum(v for _, v in rows)
-        return {'rows': rows, 'total_srec': total_srec, 'total': total}
-
-    def _setor_key(s):
-        s = (s or '').upper().strip()
-        if 'ESI' in s: return 'ESI'
-        if 'PCG' in s or 'CARCERAGEM' in s or 'CANIL' in s or 'EPA' in s: return 'EPA'
-        if 'EFSD' in s: return 'EFSD'
-        if 'SAP' in s: return 'SAP'
-        if 'SOP' in s: return 'SOP'
-        if 'CMD' in s: return 'CMD'
-        return None
-
-    qs_geral      = Efetivo.objects.exclude(situacao__iexact='Baixado')
-    qs_operac     = Efetivo.objects.filter(
-        Q(situacao__iexact='Ativo') | Q(situacao__iexact='Ativa') |
-        Q(situacao__iexact='PSV GSD-GL') |
-        Q(situacao__iexact='PSV', data_vencimento_prestacao__lt=hoje)
-    )
-    qs_psv_ext    = Efetivo.objects.filter(situacao__iexact='PSV')
-    qs_psv_gsd    = Efetivo.objects.filter(situacao__iexact='PSV GSD-GL')
-    qs_baixados   = Efetivo.all_objects.filter(situacao__iexact='Baixado')
-    qs_desertores = Efetivo.all_objects.filter(situacao__iexact='Desertor')
-
-    # --- Tabelas por posto ---
-    tabelas = [
-        {'titulo': 'Quantitativo de Efetivo Total',
-         'subtitulo': 'Efetivo do GSD-GL',
-         'data': _por_posto(qs_geral)},
-        {'titulo': 'Quantitativo de Efetivo Operacional Total',
-         'subtitulo': 'Efetivo do GSD-GL',
-         'data': _por_posto(qs_operac)},
-        {'titulo': 'Quantitativo de Efetivo Prestando Serviço Externo',
-         'subtitulo': 'Militares Prestando Serviço',
-         'data': _por_posto(qs_psv_ext)},
-        {'titulo': 'Quantitativo de Efetivo Prestando Serviço para o GSD-GL',
-         'subtitulo': 'Efetivo do GSD-GL',
-         'data': _por_posto(qs_psv_gsd)},
-        {'titulo': 'Quantitativo de Desligados',
-         'subtitulo': 'Desligados',
-         'data': _por_posto(qs_baixados)},
-    ]
-
-    # --- Tabela cruzada: postos × setores ---
-    _disp_set = [_DISPLAY.get(p, p) for p in _POSTOS_SET]
-    setor_grid = {s: {p: 0 for p in _disp_set} for s in _SETORES}
-    setor_totals_d = {s: 0 for s in _SETORES}
-
-    for item in qs_operac.values('posto', 'setor').annotate(c=Count('id')):
-        sk = _setor_key(item['setor'])
-        if sk is None:
-            continue
-        p_disp = _DISPLAY.get((item['posto'] or '').strip().upper(), (item['posto'] or '').strip().upper())
-        if p_disp in setor_grid[sk]:
-            setor_grid[sk][p_disp] += item['c']
-            setor_totals_d[sk] += item['c']
-
-    setor_rows = []
-    for p in _disp_set:
-        valores = [setor_grid[s][p] for s in _SETORES]
-        setor_rows.append({'posto': p, 'valores': valores, 'total': sum(valores)})
-    setor_totals = [setor_totals_d[s] for s in _SETORES]
-    total_setor  = sum(setor_totals)
-    total_operac = qs_operac.count()
-    setor_pie_pct = [
-        round(v / total_operac * 100, 1) if total_operac else 0 for v in setor_totals
-    ]
-
-    # --- Por Especialidade (agrupado só pela especialidade, sem posto) ---
-    esp_raw = (
-        qs_geral.values('especializacao')
-        .annotate(c=Count('id'))
-        .order_by('especializacao')
-    )
-    esp_rows = []
-    for item in esp_raw:
-        e = (item['especializacao'] or '').strip().upper()
-        esp_rows.append((e if e else '(sem especialidade)', item['c']))
-
-    tlp_raw = (
-        LotacaoPessoal.objects
-        .values('posto', 'especializacao')
-        .annotate(total=Sum('vagas_previstas'))
-        .order_by('posto', 'especializacao')
-    )
-    tlp_rows = []
-    for item in tlp_raw:
-        p = _DISPLAY.get((item['posto'] or '').strip().upper(), (item['posto'] or '').strip().upper())
-        e = (item['especializacao'] or '').strip().upper()
-        tlp_rows.append((f"{p} {e}".strip() if e else p, item['total'] or 0))
-
-    # --- Cards de quantitativos rápidos ---
-    total_geral       = qs_geral.count()
-    total_agd         = Efetivo.objects.filter(
-        Q(situacao__icontains='desligamento') | Q(situacao__iexact='AGD. DESLIGAMENTO')
-    ).count()
-    total_psv_servico = qs_psv_ext.count()
-    total_desertores_n= qs_desertores.count()
-    total_junta       = Efetivo.objects.filter(
-        Q(situacao__icontains='junta') | Q(situacao__iexact='De Junta')
-    ).count()
-    total_justica     = Efetivo.objects.filter(situacao__icontains='justi').count()
-    total_psv_vencida = Efetivo.objects.filter(
-        situacao__iexact='PSV', data_vencimento_prestacao__lt=hoje
-    ).count()
-
-    # --- Tabelas resumo por categoria (Efetivo Total e Operacional) ---
-    _dados_geral  = _por_posto(qs_geral)
-    _dados_operac_cat = _por_posto(qs_operac)
-
-    def _categorias(dados):
-        m = {label: count for label, count in dados['rows']}
-        return [
-            ('OF',   sum(m.get(p, 0) for p in ['TC', 'MJ', 'CP', '1T', '2T', 'AP'])),
-            ('SO',   m.get('SO', 0)),
-            ('SGT',  sum(m.get(p, 0) for p in ['1S', '2S', '3S'])),
-            ('CABO', m.get('CB', 0)),
-            ('S1',   m.get('S1', 0)),
-            ('S2',   m.get('S2', 0)),
-            ('REC',  m.get('REC', 0)),
-        ]
-
-    context = {
-        'tabelas': tabelas,
-        'desertores': _por_posto(qs_desertores),
-        'setores_dash': _SETORES,
-        'setor_rows': setor_rows,
-        'setor_totals': setor_totals,
-        'total_setor': total_setor,
-        'total_operac': total_operac,
-        'setor_pie_labels': json.dumps(_SETORES),
-        'setor_pie_data': json.dumps(setor_totals),
-        'setor_pie_pct': json.dumps(setor_pie_pct),
-        'esp_rows': esp_rows,
-        'tlp_rows': tlp_rows,
-        # Cards rápidos
-        'total_geral':       total_geral,
-        'total_agd':         total_agd,
-        'total_psv_servico': total_psv_servico,
-        'total_desertores_n':total_desertores_n,
-        'total_junta':       total_junta,
-        'total_justica':     total_justica,
-        'total_psv_vencida': total_psv_vencida,
-        # Tabelas por categoria
-        'cat_geral':  _categorias(_dados_geral),
-        'cat_operac': _categorias(_dados_operac_cat),
-    }
-    return render(request, 'Secao_pessoal/index.html', context)
+    # Todos os quantitativos saem de uma única varredura do Efetivo, em cache (ver painel.py)
+    return render(request, 'Secao_pessoal/index.html', painel.resumo())
 
 @s1_required
 @require_POST
 def tornar_recrutas_soldados(request):
     updated = Efetivo.objects.filter(posto='REC').update(posto='S2', especializacao='NE')
     if updated:
+        painel.invalidar()  # QuerySet.update não dispara post_save
         messages.success(request, f'{updated} recruta(s) promovido(s) para S2 (especialidade → NE) com sucesso.')
     else:
         messages.info(request, 'Nenhum recruta (REC) encontrado no efetivo ativo.')
@@ -291,22 +137,22 @@ def tornar_recrutas_soldados(request):
 
 @s1_required
 def painel_chefe(request):
-    efetivo = Efetivo.objects.exclude(situacao__iexact='Baixado')
+    efetivo = Efetivo.objects.exclude(situacao_categoria=SITUACAO_BAIXADO)
     
     # EFETIVO GERAL
     total_efetivo = efetivo.count()
-    total_indisponiveis = efetivo.exclude(Q(situacao__iexact='Ativo') | Q(situacao__exact='') | Q(situacao__isnull=True)).count()
+    total_indisponiveis = efetivo.exclude(situacao_categoria__in=[SITUACAO_ATIVO, SITUACAO_SEM]).count()
     
     # SAÚDE (INSPSAU)
     hoje = timezone.now().date()
     daqui_30_dias = hoje + timedelta(days=30)
     inspsau_vencidas = efetivo.filter(inspsau_validade__lt=hoje).count()
     inspsau_a_vencer = efetivo.filter(inspsau_validade__gte=hoje, inspsau_validade__lte=daqui_30_dias).count()
-    total_junta = efetivo.filter(situacao__iexact='De Junta').count()
+    total_junta = efetivo.filter(situacao_categoria=SITUACAO_JUNTA).count()
 
     # CONTROLE
     trocas_pendentes = SolicitacaoTrocaSetor.objects.filter(status__in=['pendente_atual', 'pendente_destino']).count()
-    total_baixados = Efetivo.objects.filter(situacao__iexact='Baixado').count()
+    total_baixados = Efetivo.objects.filter(situacao_categoria=SITUACAO_BAIXADO).count()
 
     context = {
         'total_efetivo': total_efetivo,
@@ -1057,253 +903,25 @@ def importar_excel(request):
             postos_filtro = None
 
         try:
-            # Lê o arquivo Excel e converte tudo para string para evitar erros de tipo.
-            # header=2 → linhas 1-2 são título, a linha 3 é o cabeçalho real (novo modelo).
-            # Tenta header=2 primeiro; se não encontrar colunas conhecidas, tenta header=0
-            # para compatibilidade com planilhas antigas.
-            df = pd.read_excel(excel_file, dtype=str, header=2)
-            df.columns = df.columns.str.strip()
-            # Detecta se o cabeçalho correto foi lido: deve ter ao menos SARAM ou NOME COMPLETO
-            _cols_norm = {re.sub(r'\s+', ' ', normalize_name(str(c))).strip() for c in df.columns}
-            if 'SARAM' not in _cols_norm and 'NOME COMPLETO' not in _cols_norm:
-                # Fallback: planilha antiga sem linhas de título
-                df = pd.read_excel(excel_file, dtype=str, header=0)
-                df.columns = df.columns.str.strip()
-
-            # Renomeia as colunas para os nomes canônicos esperados abaixo, aceitando
-            # variações de acentuação/maiúsculas/abreviação/pontuação no cabeçalho da
-            # planilha. 'ESPC' é a abreviação usada no novo modelo; 'OBSERVAÇÕES' é nova.
-            ALIASES_COLUNAS_EFETIVO = {
-                'SARAM': ['SARAM'],
-                'NOME COMPLETO': ['NOME COMPLETO', 'NOME'],
-                'PST.': ['PST', 'POSTO', 'POSTOGRAD', 'POSTO GRAD'],
-                'QUAD.': ['QUAD', 'QUADRO'],
-                'ESP.': ['ESP', 'ESPC', 'ESPECIALIZACAO', 'ESPECIALIDADE'],
-                'NOME DE GUERRA': ['NOME DE GUERRA', 'NOME GUERRA', 'GUERRA'],
-                'TURMA': ['TURMA'],
-                'SITUAÇÃO': ['SITUACAO'],
-                'OM': ['OM'],
-                'SETOR': ['SETOR'],
-                'SUBSETOR': ['SUBSETOR'],
-                'OBSERVAÇÃO': ['OBSERVACOES', 'OBSERVACAO', 'OBSERVACOES'],
-            }
-            colunas_normalizadas = {
-                re.sub(r'\s+', ' ', re.sub(r'[.\/]', '', normalize_name(str(c)))).strip(): c
-                for c in df.columns
-            }
-            renomear = {}
-            for canonico, aliases in ALIASES_COLUNAS_EFETIVO.items():
-                for alias in aliases:
-                    col_real = colunas_normalizadas.get(alias)
-                    if col_real:
-                        renomear[col_real] = canonico
-                        break
-            df.rename(columns=renomear, inplace=True)
-
-            # Substitui valores 'nan' (vazios) do pandas por string vazia
-            df.fillna('', inplace=True)
-
-            criados = 0
-            atualizados = 0
-
-            # Coleta valores únicos para criar no controle geral ao final
-            postos_excel = set()
-            quads_excel = set()
-            especs_excel = set()
-            oms_excel = set()
-            setores_excel = set()
-            subsetores_excel = set()
-
-            # Mapa de militares já existentes sem SARAM confiável, indexado pelo nome
-            # normalizado (sem acentos, maiúsculas, espaços colapsados), para evitar
-            # criar registros duplicados quando o nome da planilha não é idêntico
-            # byte-a-byte ao nome já salvo no banco.
-            existentes_por_nome = {}
-            for efetivo_existente in Efetivo.all_objects.all():
-                chave = normalize_name(efetivo_existente.nome_completo).strip()
-                if chave:
-                    existentes_por_nome[chave] = efetivo_existente
-
-            # IDs dos militares encontrados/criados nesta planilha, usados pelo modo
-            # "importar e sincronizar" para saber quem NÃO está na planilha.
-            pks_na_planilha = set()
-
-            # Linhas com posto TEN/TENENTE que precisam de clarificação
-            ten_rows_efetivo = []
-
-            for index, row in df.iterrows():
-                # Pega valores essenciais
-                saram_valor = str(row.get('SARAM', '')).strip()
-                nome_completo_valor = row.get('NOME COMPLETO', '').strip()
-
-                # Se não tem SARAM E não tem nome, aí sim a linha é inútil e pulamos
-                if not saram_valor and not nome_completo_valor:
-                    continue
-
-                # Tratamento do SARAM para salvar no banco (IntegerField exige número ou None)
-                saram_db = None
-                if saram_valor:
-                    try:
-                        # Converte de "12345.0" para 12345 caso o pandas tenha lido como float
-                        saram_db = int(float(saram_valor))
-                    except ValueError:
-                        saram_db = None
-
-                # Extrai nome_guerra e strip de posto prefixo
-                nome_guerra_raw = row.get('NOME DE GUERRA', '').strip()
-                posto_raw = row.get('PST.', '').strip()
-
-                nome_guerra_limpo, posto_de_nome = _strip_posto_de_nome(nome_guerra_raw)
-
-                # Determina posto final
-                if posto_raw:
-                    posto_norm, is_ten = _normalizar_posto(posto_raw)
-                    if posto_norm is None:
-                        posto_norm = posto_raw  # fallback (sem normalização)
-                else:
-                    # Usa posto detectado no nome_guerra se posto_raw estiver vazio
-                    posto_norm = posto_de_nome or ''
-                    is_ten = False
-
-                # Pula postos não selecionados pelo usuário
-                if postos_filtro and posto_norm not in postos_filtro:
-                    continue
-
-                # Se posto é TEN/TENENTE, guarda para clarificação e passa para a próxima
-                if is_ten:
-                    if postos_filtro and posto_norm not in postos_filtro:
-                        continue
-                    ten_rows_efetivo.append({
-                        'saram': saram_valor,
-                        'nome_completo': nome_completo_valor,
-                        'nome_guerra': nome_guerra_limpo,
-                        'posto_raw': posto_raw,
-                        'quad': row.get('QUAD.', '').strip(),
-                        'especializacao': row.get('ESP.', '').strip(),
-                        'turma': _extrair_ano_turma(row.get('TURMA', '')),
-                        'situacao': row.get('SITUAÇÃO', '').strip(),
-                        'om': row.get('OM', '').strip(),
-                        'setor': row.get('SETOR', '').strip(),
-                        'subsetor': row.get('SUBSETOR', '').strip(),
-                        'observacao': row.get('OBSERVAÇÃO', '').strip(),
-                        'saram_db': saram_db,
-                        'is_ten': True,
-                    })
-                    continue
-
-                # Dicionário com os dados a serem salvos/atualizados
-                dados_militar = {
-                    'posto': posto_norm,
-                    'quad': row.get('QUAD.', '').strip(),
-                    'especializacao': row.get('ESP.', '').strip(),
-                    'saram': saram_db,
-                    'nome_completo': nome_completo_valor,
-                    'nome_guerra': nome_guerra_limpo,
-                    'turma': _extrair_ano_turma(row.get('TURMA', '')),
-                    'situacao': row.get('SITUAÇÃO', '').strip(),
-                    'om': row.get('OM', '').strip(),
-                    'setor': row.get('SETOR', '').strip(),
-                    'subsetor': row.get('SUBSETOR', '').strip(),
-                    'observacao': row.get('OBSERVAÇÃO', '').strip(),
-                    # Se o militar estava na lixeira, reimportá-lo via planilha deve
-                    # restaurá-lo para o efetivo ativo — caso contrário ele continua
-                    # "atualizado" mas invisível na lista geral.
-                    'deleted': False,
-                    'deleted_at': None,
-                }
-
-                # Acumula valores não-vazios para criar no controle geral
-                if dados_militar['posto']:
-                    postos_excel.add(dados_militar['posto'])
-                if dados_militar['quad']:
-                    quads_excel.add(dados_militar['quad'])
-                if dados_militar['especializacao']:
-                    especs_excel.add(dados_militar['especializacao'])
-                if dados_militar['om']:
-                    oms_excel.add(dados_militar['om'])
-                if dados_militar['setor']:
-                    setores_excel.add(dados_militar['setor'])
-                if dados_militar['subsetor']:
-                    subsetores_excel.add(dados_militar['subsetor'])
-
-                # LÓGICA DE SALVAMENTO INTELIGENTE:
-                if saram_db:
-                    # Se tem SARAM, a chave principal é o SARAM
-                    obj, created = Efetivo.all_objects.update_or_create(
-                        saram=saram_db,
-                        defaults=dados_militar
-                    )
-                else:
-                    # Se é um recruta sem SARAM, casa pelo nome normalizado (ignora
-                    # acentos/maiúsculas/espaços) para não criar duplicado quando o
-                    # nome da planilha não é idêntico ao já salvo no banco.
-                    chave_nome = normalize_name(nome_completo_valor).strip()
-                    existente = existentes_por_nome.get(chave_nome)
-                    if existente:
-                        for campo, valor in dados_militar.items():
-                            setattr(existente, campo, valor)
-                        existente.save()
-                        obj, created = existente, False
-                    else:
-                        obj = Efetivo.all_objects.create(**dados_militar)
-                        created = True
-                        existentes_por_nome[chave_nome] = obj
-
-                if created:
-                    criados += 1
-                else:
-                    atualizados += 1
+            # Normalização com pandas e gravação em massa (Secao_pessoal.importacao)
+            df = importacao.ler_planilha(excel_file)
+            registros, ten_rows_efetivo = importacao.normalizar(df, postos_filtro)
 
-                pks_na_planilha.add(obj.pk)
-
-            removidos = 0
-            sincronizar_abortada = False
-            if sincronizar:
-                if criados == 0 and atualizados == 0:
-                    # Nenhuma linha da planilha foi reconhecida (provável incompatibilidade
-                    # de colunas) — não sincroniza para não apagar todo o efetivo existente.
-                    sincronizar_abortada = True
-                else:
-                    agora = timezone.now()
-                    nao_encontrados = Efetivo.objects.exclude(pk__in=pks_na_planilha)
-                    removidos = nao_encontrados.update(deleted=True, deleted_at=agora)
-                    if removidos:
-                        # bulk update não dispara signal — log explícito
-                        registrar(
-                            request.user, secao='pessoal',
-                            permissao=resolver_label(request.user, _PESSOAL_PERMISSAO_MAP),
-                            acao='excluiu',
-                            descricao=f"importação Excel (sincronizar): {removidos} militar(es) movidos para lixeira por não constar na planilha",
-                            objeto_tipo='Efetivo', objeto_id='',
-                        )
-
-            # Cria opções do controle geral sem duplicar (get_or_create é idempotente)
-            for v in postos_excel:
-                Posto.objects.get_or_create(nome=v)
-            for v in quads_excel:
-                Quad.objects.get_or_create(nome=v)
-            for v in especs_excel:
-                Especializacao.objects.get_or_create(nome=v)
-            for v in oms_excel:
-                OM.objects.get_or_create(nome=v)
-            for v in setores_excel:
-                Setor.objects.get_or_create(nome=v)
-            for v in subsetores_excel:
-                Subsetor.objects.get_or_create(nome=v)
+            # Com linhas TEN/TENENTE a sincronização fica para a tela de esclarecimento
+            resultado = importacao.aplicar(
+                registros, request.user, sincronizar=sincronizar and not ten_rows_efetivo,
+            )
+            criados, atualizados = resultado['criados'], resultado['atualizados']
+            removidos = resultado['removidos']
+            sincronizar_abortada = resultado['sincronizar_abortada']
 
             # Se há linhas com TEN/TENENTE ambíguo, redireciona para clarificação
             if ten_rows_efetivo:
                 request.session['ten_rows_efetivo'] = ten_rows_efetivo
                 request.session['efetivo_criados'] = criados
                 request.session['efetivo_atualizados'] = atualizados
-                request.session['efetivo_pks_na_planilha'] = list(pks_na_planilha)
+                request.session['efetivo_pks_na_planilha'] = list(resultado['pks'])
                 request.session['efetivo_sincronizar'] = sincronizar
-                request.session['efetivo_postos'] = list(postos_excel)
-                request.session['efetivo_quads'] = list(quads_excel)
-                request.session['efetivo_especs'] = list(especs_excel)
-                request.session['efetivo_oms'] = list(oms_excel)
-                request.session['efetivo_setores'] = list(setores_excel)
-                request.session['efetivo_subsetores'] = list(subsetores_excel)
                 messages.info(request, f'{criados + atualizados} militar(es) processado(s). Esclareça o posto dos {len(ten_rows_efetivo)} militar(es) com TEN/TENENTE.')
                 return redirect('Secao_pessoal:esclarecer_importacao_efetivo')
 
@@ -1371,30 +989,17 @@ def esclarecer_importacao_efetivo(request):
     if request.method == 'POST':
         criados    = request.session.pop('efetivo_criados', 0)
         atualizados= request.session.pop('efetivo_atualizados', 0)
-        pks_na_planilha = set(request.session.pop('efetivo_pks_na_planilha', []))
+        pks_na_planilha = request.session.pop('efetivo_pks_na_planilha', [])
         sincronizar = request.session.pop('efetivo_sincronizar', False)
-        postos_excel   = set(request.session.pop('efetivo_postos', []))
-        quads_excel    = set(request.session.pop('efetivo_quads', []))
-        especs_excel   = set(request.session.pop('efetivo_especs', []))
-        oms_excel      = set(request.session.pop('efetivo_oms', []))
-        setores_excel  = set(request.session.pop('efetivo_setores', []))
-        subsetores_excel = set(request.session.pop('efetivo_subsetores', []))
         request.session.pop('ten_rows_efetivo', None)
 
-        existentes_por_nome = {}
-        for efetivo_existente in Efetivo.all_objects.all():
-            chave = normalize_name(efetivo_existente.nome_completo).strip()
-            if chave:
-                existentes_por_nome[chave] = efetivo_existente
-
+        registros = []
         for i, r in enumerate(ten_rows):
-            posto_escolhido = request.POST.get(f'posto_{i}', '')
-            saram_db = r.get('saram_db')
-            dados_militar = {
-                'posto': posto_escolhido,
+            registros.append({
+                'posto': request.POST.get(f'posto_{i}', ''),
                 'quad': r.get('quad', ''),
                 'especializacao': r.get('especializacao', ''),
-                'saram': saram_db,
+                'saram': r.get('saram_db'),
                 'nome_completo': r.get('nome_completo', ''),
                 'nome_guerra': r.get('nome_guerra', ''),
                 'turma': r.get('turma', ''),
@@ -1405,43 +1010,14 @@ def esclarecer_importacao_efetivo(request):
                 'observacao': r.get('observacao', ''),
                 'deleted': False,
                 'deleted_at': None,
-            }
-            if posto_escolhido:
-                postos_excel.add(posto_escolhido)
+            })
 
-            if saram_db:
-                obj, created = Efetivo.all_objects.update_or_create(saram=saram_db, defaults=dados_militar)
-            else:
-                chave_nome = normalize_name(r.get('nome_completo', '')).strip()
-                existente = existentes_por_nome.get(chave_nome)
-                if existente:
-                    for campo, valor in dados_militar.items():
-                        setattr(existente, campo, valor)
-                    existente.save()
-                    obj, created = existente, False
-                else:
-                    obj = Efetivo.all_objects.create(**dados_militar)
-                    created = True
-                    existentes_por_nome[chave_nome] = obj
-            if created:
-                criados += 1
-            else:
-                atualizados += 1
-            pks_na_planilha.add(obj.pk)
-
-        # Sincronizar se necessário
-        removidos = 0
-        if sincronizar and pks_na_planilha:
-            agora = timezone.now()
-            nao_enc = Efetivo.objects.exclude(pk__in=pks_na_planilha)
-            removidos = nao_enc.update(deleted=True, deleted_at=agora)
-
-        for v in postos_excel: Posto.objects.get_or_create(nome=v)
-        for v in quads_excel: Quad.objects.get_or_create(nome=v)
-        for v in especs_excel: Especializacao.objects.get_or_create(nome=v)
-        for v in oms_excel: OM.objects.get_or_create(nome=v)
-        for v in setores_excel: Setor.objects.get_or_create(nome=v)
-        for v in subsetores_excel: Subsetor.objects.get_or_create(nome=v)
+        resultado = importacao.aplicar(
+            registros, request.user, sincronizar=sincronizar, pks_anteriores=pks_na_planilha,
+        )
+        criados += resultado['criados']
+        atualizados += resultado['atualizados']
+        removidos = resultado['removidos']
 
         if sincronizar and removidos:
             messages.success(request, f'Sucesso! {criados} militares criados, {atualizados} atualizados e {removidos} removidos por não constarem na planilha.')
@@ -2108,27 +1684,6 @@ def exportar_efetivo(request):
         setor_f  = [v.strip() for v in request.POST.get('setor_f', '').split(',') if v.strip()]
         usa_filtro_avancado = any([q, posto_f, esp_f, sit_f, obs_f, setor_f])
 
-        # Cria o Workbook e a planilha ativa
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Efetivo Exportado"
-
-        # Estilos
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        alignment_center = Alignment(horizontal="center", vertical="center")
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-        # Define os cabeçalhos solicitados
-        headers = ["POSTO", "NOME DE GUERRA", "NOME COMPLETO", "SARAM"]
-        ws.append(headers)
-
-        # Aplica estilo ao cabeçalho
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = alignment_center
-
         # Base da query com ordenação hierárquica (Mesma lógica da MilitarListView)
         rank_order = Case(
             When(posto='CL', then=Value(0)), When(posto='TC', then=Value(1)), When(posto='MJ', then=Value(2)), When(posto='CP', then=Value(3)),
@@ -2182,31 +1737,20 @@ def exportar_efetivo(request):
             elif filtro:
                 queryset = queryset.filter(posto=filtro)
 
-        # Preenche os dados
-        for militar in queryset:
-            ws.append([
-                str(militar.posto),
-                militar.nome_guerra,
-                militar.nome_completo,
-                militar.saram if militar.saram else ""
-            ])
-
-        # Aplica bordas e alinhamento em todas as células de dados
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=4):
-            for cell in row:
-                cell.border = thin_border
-                cell.alignment = Alignment(vertical="center")
-        
-        # Ajuste automático de largura das colunas
-        for column_cells in ws.columns:
-            length = max(len(str(cell.value)) if cell.value else 0 for cell in column_cells)
-            ws.column_dimensions[get_column_letter(column_cells[0].column)].width = length + 2
-
-        # Configura a resposta HTTP para download do arquivo
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename=efetivo_exportado.xlsx'
-        wb.save(response)
-        return response
+        # Planilha em fluxo: linhas lidas em lotes e gravadas direto na aba
+        colunas = [
+            exportacao_xlsx.Coluna("POSTO", 10),
+            exportacao_xlsx.Coluna("NOME DE GUERRA", 28),
+            exportacao_xlsx.Coluna("NOME COMPLETO", 50),
+            exportacao_xlsx.Coluna("SARAM", 12),
+        ]
+        linhas = (
+            [m['posto'], m['nome_guerra'], m['nome_completo'], m['saram'] or ""]
+            for m in queryset.values('posto', 'nome_guerra', 'nome_completo', 'saram')
+                             .iterator(chunk_size=exportacao_xlsx.LOTE)
+        )
+        return exportacao_xlsx.resposta_xlsx(
+            'efetivo_exportado.xlsx', "Efetivo Exportado", colunas, linhas)
 
     # GET: Renderiza a página de seleção
     postos_db = Efetivo.objects.values_list('posto', flat=True).distinct()
@@ -2433,33 +1977,36 @@ def retornar_psv(request, pk):
 # ── Exportar PSV ────────────────────────────────────────────────────────────
 @s1_required
 def exportar_psv(request):
-    import io
     qs = Efetivo.objects.filter(
         Q(unidade_prestacao_servico__isnull=False) & ~Q(unidade_prestacao_servico='')
     ).order_by('posto', 'nome_completo')
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = 'PSV'
-    headers = ['Posto', 'Espec', 'Quad', 'Nome Completo', 'Nome de Guerra', 'SARAM', 'Turma', 'OM', 'Início', 'Término', 'Sigad', 'Boletim', 'Observações']
-    ws.append(headers)
-    for m in qs:
-        ws.append([
-            m.posto, m.especializacao, m.quad, m.nome_completo, m.nome_guerra,
-            m.saram, m.turma,
-            m.unidade_prestacao_servico or '',
-            m.data_inicio_prestacao.strftime('%d/%m/%Y') if m.data_inicio_prestacao else '',
-            m.data_vencimento_prestacao.strftime('%d/%m/%Y') if m.data_vencimento_prestacao else '',
-            m.sigad_prestacao or '',
-            m.boletim_prestacao or '',
-            m.observacao or '',
-        ])
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    resp = HttpResponse(buffer, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    resp['Content-Disposition'] = 'attachment; filename="PSV_GSD_GL.xlsx"'
-    return resp
+    Coluna = exportacao_xlsx.Coluna
+    colunas = [
+        Coluna('Posto', 8), Coluna('Espec', 10), Coluna('Quad', 8), Coluna('Nome Completo', 45),
+        Coluna('Nome de Guerra', 25), Coluna('SARAM', 12), Coluna('Turma', 8), Coluna('OM', 20),
+        Coluna('Início', 12), Coluna('Término', 12), Coluna('Sigad', 15), Coluna('Boletim', 15),
+        Coluna('Observações', 40),
+    ]
+    campos = (
+        'posto', 'especializacao', 'quad', 'nome_completo', 'nome_guerra', 'saram', 'turma',
+        'unidade_prestacao_servico', 'data_inicio_prestacao', 'data_vencimento_prestacao',
+        'sigad_prestacao', 'boletim_prestacao', 'observacao',
+    )
+    linhas = (
+        [
+            m['posto'], m['especializacao'], m['quad'], m['nome_completo'], m['nome_guerra'],
+            m['saram'], m['turma'],
+            m['unidade_prestacao_servico'] or '',
+            m['data_inicio_prestacao'].strftime('%d/%m/%Y') if m['data_inicio_prestacao'] else '',
+            m['data_vencimento_prestacao'].strftime('%d/%m/%Y') if m['data_vencimento_prestacao'] else '',
+            m['sigad_prestacao'] or '',
+            m['boletim_prestacao'] or '',
+            m['observacao'] or '',
+        ]
+        for m in qs.values(*campos).iterator(chunk_size=exportacao_xlsx.LOTE)
+    )
+    return exportacao_xlsx.resposta_xlsx('PSV_GSD_GL.xlsx', 'PSV', colunas, linhas)
 
 
 # ── Importar PSV ────────────────────────────────────────────────────────────
@@ -2642,15 +2189,7 @@ def api_search_militares(request):
     if not query or len(query) < 2:
         return JsonResponse([], safe=False)
 
-    militares = Efetivo.objects.filter(
-        Q(nome_completo__icontains=query) |
-        Q(nome_guerra__icontains=query) |
-        Q(saram__icontains=query)
-    ).order_by('posto', 'nome_guerra')[:15]
-
-    data = [{'id': m.id, 'posto': m.posto, 'nome_guerra': m.nome_guerra, 'nome_completo': m.nome_completo} for m in militares]
-
-    return JsonResponse(data, safe=False)
+    return JsonResponse(buscar_militares(query, limite=15), safe=False)
 
 
 @s1_required
@@ -2696,17 +2235,6 @@ def download_modelo_desligamento(request):
 def exportar_desligados(request):
     if request.method != 'POST':
         return redirect('Secao_pessoal:desligados_list')
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Desligados"
-    hf = Font(bold=True, color='FFFFFF')
-    hfill = PatternFill(start_color='4F81BD', end_color='4F81BD', fill_type='solid')
-    ac = Alignment(horizontal='center', vertical='center')
-    thin = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-    headers = ['POSTO', 'NOME DE GUERRA', 'NOME COMPLETO', 'SARAM', 'ESPECIALIZAÇÃO', 'SETOR', 'OBSERVAÇÃO']
-    ws.append(headers)
-    for cell in ws[1]:
-        cell.font = hf; cell.fill = hfill; cell.alignment = ac
     rank_order = Case(
         When(posto='TC', then=Value(1)), When(posto='MJ', then=Value(2)), When(posto='CP', then=Value(3)),
         When(posto='1T', then=Value(4)), When(posto='2T', then=Value(5)), When(posto='ASP', then=Value(6)),
@@ -2719,18 +2247,18 @@ def exportar_desligados(request):
     q = request.POST.get('q', '').strip()
     if q:
         qs = qs.filter(Q(nome_completo__icontains=q) | Q(nome_guerra__icontains=q))
-    for mil in qs:
-        ws.append([mil.posto, mil.nome_guerra, mil.nome_completo, mil.saram or '', mil.especializacao or '', mil.setor or '', mil.observacao or ''])
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.border = thin; cell.alignment = Alignment(vertical='center')
-    for col in ws.columns:
-        width = max(len(str(c.value)) if c.value else 0 for c in col) + 2
-        ws.column_dimensions[col[0].column_letter].width = width
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=desligados_exportados.xlsx'
-    wb.save(response)
-    return response
+    Coluna = exportacao_xlsx.Coluna
+    colunas = [
+        Coluna('POSTO', 10), Coluna('NOME DE GUERRA', 28), Coluna('NOME COMPLETO', 50), Coluna('SARAM', 12),
+        Coluna('ESPECIALIZAÇÃO', 18), Coluna('SETOR', 20), Coluna('OBSERVAÇÃO', 40),
+    ]
+    campos = ('posto', 'nome_guerra', 'nome_completo', 'saram', 'especializacao', 'setor', 'observacao')
+    linhas = (
+        [m['posto'], m['nome_guerra'], m['nome_completo'], m['saram'] or '',
+         m['especializacao'] or '', m['setor'] or '', m['observacao'] or '']
+        for m in qs.values(*campos).iterator(chunk_size=exportacao_xlsx.LOTE)
+    )
+    return exportacao_xlsx.resposta_xlsx('desligados_exportados.xlsx', "Desligados", colunas, linhas)
 
 
 @s1_required
@@ -0,0 +1,92 @@
+"""
+Lote de auditoria: acumula as entradas de LogAuditoria em memória e as envia
+em uma única task (registrar_logs_task -> bulk_create) em vez de uma task por
+ação auditada.
+
+O lote é aberto por requisição (CurrentUserMiddleware) ou explicitamente com
+`with lote_auditoria():` (tasks, comandos, threads). Ele é descarregado:
+  - ao atingir AUDITORIA_LOTE_MAX entradas;
+  - quando a entrada mais antiga tiver mais de AUDITORIA_LOTE_SEGUNDOS
+    (ex.: uma importação Excel longa não segura tudo até o fim);
+  - no fim da requisição/bloco.
+
+Fora de um lote, registrar() despacha a entrada sozinha, como antes.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lote_atual = contextvars.ContextVar('auditoria_lote_atual', default=None)
+
+
+def despachar(entradas):
+    """
+    Envia as entradas ao Celery. Se o broker estiver fora, grava direto no
+    banco — a auditoria não pode se perder por indisponibilidade do Redis.
+    """
+    from .tasks import gravar_logs, registrar_logs_task
+
+    if not entradas:
+        return
+    try:
+        registrar_logs_task.delay(entradas)
+        logger.debug("[AUDITORIA] lote de %d entrada(s) despachado", len(entradas))
+    except Exception:
+        logger.exception("[AUDITORIA] falha ao despachar lote (%d entradas); gravando de forma síncrona",
+                         len(entradas))
+        try:
+            gravar_logs(entradas)
+        except Exception:
+            logger.exception("[AUDITORIA] falha ao gravar lote de auditoria de forma síncrona")
+
+
+class LoteAuditoria:
+    """Buffer thread-safe (threads do mesmo request compartilham o lote via copy_context)."""
+
+    def __init__(self):
+        self._entradas = []
+        self._desde = None
+        self._lock = threading.Lock()
+
+    def adicionar(self, entrada):
+        pendentes = None
+        with self._lock:
+            if not self._entradas:
+                self._desde = time.monotonic()
+            self._entradas.append(entrada)
+            if (len(self._entradas) >= settings.AUDITORIA_LOTE_MAX
+                    or time.monotonic() - self._desde >= settings.AUDITORIA_LOTE_SEGUNDOS):
+                pendentes, self._entradas = self._entradas, []
+        if pendentes:
+            despachar(pendentes)
+
+    def descarregar(self):
+        with self._lock:
+            pendentes, self._entradas = self._entradas, []
+        despachar(pendentes)
+
+
+def lote_atual():
+    return _lote_atual.get()
+
+
+@contextmanager
+def lote_auditoria():
+    """Agrupa os registros de auditoria do bloco. Aninhado, reaproveita o lote externo."""
+    atual = _lote_atual.get()
+    if atual is not None:
+        yield atual
+        return
+    lote = LoteAuditoria()
+    token = _lote_atual.set(lote)
+    try:
+        yield lote
+    finally:
+        _lote_atual.reset(token)
+        lote.descarregar()
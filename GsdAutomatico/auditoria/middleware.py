@@ -1,5 +1,7 @@
 import contextvars
 
+from .lote import lote_auditoria
+
 # Sinais (post_save/post_delete) não recebem `request`, então a única forma de saber
 # "quem fez essa ação" dentro de um signal é guardar o usuário da requisição atual aqui.
 _usuario_atual = contextvars.ContextVar('auditoria_usuario_atual', default=None)
@@ -17,6 +19,8 @@ class CurrentUserMiddleware:
         user = getattr(request, 'user', None)
         token = _usuario_atual.set(user if user and user.is_authenticated else None)
         try:
-            return self.get_response(request)
+            # Logs de auditoria da requisição vão juntos em um único bulk_create
+            with lote_auditoria():
+                return self.get_response(request)
         finally:
             _usuario_atual.reset(token)
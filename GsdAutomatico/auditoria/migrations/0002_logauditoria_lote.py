@@ -0,0 +1,24 @@
+# Generated by Django 4.2.24 on 2026-10-17 08:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logauditoria',
+            name='chave',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='logauditoria',
+            name='criado_em',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.24 on 2026-10-17 08:44
+# Índices criados com CONCURRENTLY para não travar a gravação de logs em produção.
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('auditoria', '0002_logauditoria_lote'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='logauditoria',
+            name='busca',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        # Mesma expressão de LogAuditoria.preencher_busca()
+        migrations.RunSQL(
+            sql=(
+                "UPDATE auditoria_logauditoria SET busca = lower(concat_ws(' ', "
+                "descricao, objeto_tipo, objeto_id, username, nome_guerra))"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='logauditoria',
+            index=models.Index(fields=['-criado_em', '-id'], name='auditoria_log_cursor_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='logauditoria',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busca'], name='auditoria_log_busca_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='logauditoria',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['username', 'nome_guerra'], name='auditoria_log_usuario_trgm', opclasses=['gin_trgm_ops', 'gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.24 on 2026-10-17 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0003_logauditoria_busca_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpcaoFiltroAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(max_length=20)),
+                ('valor', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Opção de Filtro da Auditoria',
+                'verbose_name_plural': 'Opções de Filtro da Auditoria',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='opcaofiltroauditoria',
+            constraint=models.UniqueConstraint(fields=('campo', 'valor'), name='auditoria_opcao_filtro_unica'),
+        ),
+        # Carga inicial com os valores já presentes nos logs (mesmos filtros de OpcaoFiltroAuditoria.registrar)
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO auditoria_opcaofiltroauditoria (campo, valor)
+                SELECT DISTINCT o.campo, o.valor
+                FROM auditoria_logauditoria l
+                CROSS JOIN LATERAL (VALUES
+                    ('secao', l.secao), ('acao', l.acao),
+                    ('objeto_tipo', l.objeto_tipo), ('permissao', l.permissao)
+                ) AS o (campo, valor)
+                WHERE o.valor <> '' AND NOT (o.campo = 'permissao' AND o.valor = '—')
+                ON CONFLICT DO NOTHING
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Converte auditoria_logauditoria em tabela particionada por mês (RANGE em criado_em).
+# Manutenção posterior (novas partições, arquivamento): auditoria.particoes.
+
+from django.db import migrations
+
+CONVERTER = r"""
+DO $$
+DECLARE
+    ddl text[];
+    comando text;
+    inicio timestamptz;
+    fim timestamptz;
+    proximo_id bigint;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'auditoria_logauditoria'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    -- Índices comuns e FKs são recriados com os mesmos nomes depois da cópia.
+    -- Em tabela particionada toda restrição única precisa conter a chave de
+    -- partição: as UNIQUE viram (colunas..., criado_em).
+    SELECT coalesce(array_agg(pg_get_indexdef(i.indexrelid)), '{}') INTO ddl
+    FROM pg_index i
+    WHERE i.indrelid = 'auditoria_logauditoria'::regclass AND NOT i.indisprimary AND NOT i.indisunique;
+
+    SELECT ddl || coalesce(array_agg(format(
+        'ALTER TABLE auditoria_logauditoria ADD CONSTRAINT %I %s', conname, pg_get_constraintdef(oid))), '{}')
+    INTO ddl
+    FROM pg_constraint
+    WHERE conrelid = 'auditoria_logauditoria'::regclass AND contype = 'f';
+
+    SELECT ddl || coalesce(array_agg(u.comando), '{}') INTO ddl
+    FROM (
+        SELECT format('ALTER TABLE auditoria_logauditoria ADD CONSTRAINT %I UNIQUE (%s, criado_em)',
+                      c.conname, string_agg(quote_ident(a.attname), ', ' ORDER BY k.ord)) AS comando
+        FROM pg_constraint c
+        CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k (attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+        WHERE c.conrelid = 'auditoria_logauditoria'::regclass AND c.contype = 'u'
+        GROUP BY c.conname
+    ) u;
+
+    ALTER TABLE auditoria_logauditoria RENAME TO auditoria_logauditoria_legado;
+    CREATE TABLE auditoria_logauditoria (
+        LIKE auditoria_logauditoria_legado INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+    ) PARTITION BY RANGE (criado_em);
+
+    -- id deixa de ser IDENTITY (amarrada à tabela antiga): sequência própria a partir do último id
+    SELECT coalesce(max(id), 0) + 1 INTO proximo_id FROM auditoria_logauditoria_legado;
+    EXECUTE format('CREATE SEQUENCE auditoria_logauditoria_part_id_seq START WITH %s', proximo_id);
+    ALTER TABLE auditoria_logauditoria ALTER COLUMN id SET DEFAULT nextval('auditoria_logauditoria_part_id_seq');
+    ALTER SEQUENCE auditoria_logauditoria_part_id_seq OWNED BY auditoria_logauditoria.id;
+
+    -- Uma partição por mês, do log mais antigo até dois meses à frente
+    -- (mesma janela de particoes.garantir_particoes), mais a DEFAULT de segurança.
+    inicio := date_trunc('month', coalesce((SELECT min(criado_em) FROM auditoria_logauditoria_legado), now()));
+    fim := date_trunc('month', now()) + interval '3 months';
+    WHILE inicio < fim LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF auditoria_logauditoria FOR VALUES FROM (%L) TO (%L)',
+                       'auditoria_logauditoria_' || to_char(inicio, 'YYYY_MM'), inicio, inicio + interval '1 month');
+        inicio := inicio + interval '1 month';
+    END LOOP;
+    CREATE TABLE auditoria_logauditoria_padrao PARTITION OF auditoria_logauditoria DEFAULT;
+
+    INSERT INTO auditoria_logauditoria SELECT * FROM auditoria_logauditoria_legado;
+    DROP TABLE auditoria_logauditoria_legado;
+
+    -- Índices só depois da carga (e já com os nomes livres)
+    ALTER TABLE auditoria_logauditoria ADD CONSTRAINT auditoria_logauditoria_pkey PRIMARY KEY (id, criado_em);
+    FOREACH comando IN ARRAY ddl LOOP
+        EXECUTE comando;
+    END LOOP;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0004_opcaofiltroauditoria'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CONVERTER, reverse_sql=migrations.RunSQL.noop),
+    ]
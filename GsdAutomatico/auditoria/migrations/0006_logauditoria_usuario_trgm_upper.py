@@ -0,0 +1,66 @@
+# Generated by Django 4.2.24 on 2026-10-17 09:28
+# O índice trigram do filtro "usuário" era das colunas puras, mas o icontains
+# compila para UPPER(col::text) LIKE UPPER(...) e nunca o usava. Passa a ser
+# um índice da mesma expressão.
+#
+# A tabela é particionada (0005) e CREATE INDEX CONCURRENTLY não vale para a
+# tabela-mãe: o índice é criado ON ONLY na mãe e, em cada partição,
+# CONCURRENTLY + ATTACH PARTITION, sem bloquear a gravação de logs.
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+INDICE = 'auditoria_log_usuario_trgm'
+TABELA = 'auditoria_logauditoria'
+EXPRESSAO = 'USING gin (upper((username)::text) gin_trgm_ops, upper((nome_guerra)::text) gin_trgm_ops)'
+
+
+def recriar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(f'DROP INDEX IF EXISTS "{INDICE}"')
+        cur.execute(f'CREATE INDEX "{INDICE}" ON ONLY "{TABELA}" {EXPRESSAO}')
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [TABELA],
+        )
+        for (particao,) in cur.fetchall():
+            nome = f'{particao}_usuario_trgm'
+            cur.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{nome}" ON "{particao}" {EXPRESSAO}')
+            cur.execute(f'ALTER INDEX "{INDICE}" ATTACH PARTITION "{nome}"')
+
+
+def desfazer(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cur:
+        cur.execute(f'DROP INDEX IF EXISTS "{INDICE}"')
+        cur.execute(f'CREATE INDEX "{INDICE}" ON "{TABELA}" USING gin (username gin_trgm_ops, nome_guerra gin_trgm_ops)')
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('auditoria', '0005_logauditoria_particionada'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(recriar_indice, desfazer)],
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='logauditoria',
+                    name='auditoria_log_usuario_trgm',
+                ),
+                migrations.AddIndex(
+                    model_name='logauditoria',
+                    index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nome_guerra'), name='gin_trgm_ops'), name='auditoria_log_usuario_trgm'),
+                ),
+            ],
+        ),
+    ]
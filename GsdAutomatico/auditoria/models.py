@@ -1,5 +1,8 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 
 class LogAuditoria(models.Model):
@@ -20,7 +23,14 @@ class LogAuditoria(models.Model):
     objeto_id = models.CharField(max_length=60, blank=True, verbose_name="ID/Número do Objeto")
     descricao = models.TextField(verbose_name="Descrição")
 
-    criado_em = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Momento da ação (não da gravação, que acontece depois, em lote)
+    criado_em = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+    # Identificador gerado em registrar(): torna a regravação de um lote idempotente.
+    # Com a tabela particionada (migração 0005) a unicidade no banco é (chave, criado_em).
+    chave = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # Texto da busca livre (descrição, objeto e usuário em minúsculas), com índice
+    # trigram: o ILIKE '%termo%' usa o índice em vez de varrer a tabela
+    busca = models.TextField(blank=True, editable=False)
 
     class Meta:
         verbose_name = "Log de Auditoria"
@@ -29,8 +39,28 @@ class LogAuditoria(models.Model):
         indexes = [
             models.Index(fields=['secao', 'criado_em']),
             models.Index(fields=['username']),
+            # Paginação por cursor (criado_em, id) da tela de auditoria
+            models.Index(fields=['-criado_em', '-id'], name='auditoria_log_cursor_idx'),
+            GinIndex(fields=['busca'], opclasses=['gin_trgm_ops'], name='auditoria_log_busca_trgm'),
+            # Filtro "usuário" (username/nome_guerra__icontains): no Postgres o icontains
+            # vira UPPER(col::text) LIKE UPPER(...), então o índice é dessa expressão
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'),
+                     OpClass(Upper('nome_guerra'), name='gin_trgm_ops'),
+                     name='auditoria_log_usuario_trgm'),
         ]
 
+    def preencher_busca(self):
+        # Mesma expressão do backfill da migração 0003 (concat_ws + lower)
+        self.busca = ' '.join([
+            self.descricao or '', self.objeto_tipo or '', self.objeto_id or '',
+            self.username or '', self.nome_guerra or '',
+        ]).lower()
+
+    def save(self, *args, **kwargs):
+        self.preencher_busca()
+        super().save(*args, **kwargs)
+        OpcaoFiltroAuditoria.registrar([self])
+
     @property
     def linha_formatada(self) -> str:
         nome = self.nome_guerra or self.username
@@ -38,3 +68,49 @@ class LogAuditoria(models.Model):
 
     def __str__(self):
         return self.linha_formatada
+
+
+class OpcaoFiltroAuditoria(models.Model):
+    """
+    Valores distintos de seção/ação/tipo de objeto/permissão já vistos nos logs,
+    mantidos na gravação. Alimenta os selects de filtro da tela de Auditoria sem
+    DISTINCT sobre a tabela (particionada) de LogAuditoria.
+    """
+
+    CAMPOS = ('secao', 'acao', 'objeto_tipo', 'permissao')
+
+    campo = models.CharField(max_length=20)
+    valor = models.CharField(max_length=100)
+
+    # Pares já garantidos neste processo: evita um INSERT por lote para valores repetidos
+    _conhecidos = set()
+
+    class Meta:
+        verbose_name = "Opção de Filtro da Auditoria"
+        verbose_name_plural = "Opções de Filtro da Auditoria"
+        constraints = [
+            models.UniqueConstraint(fields=['campo', 'valor'], name='auditoria_opcao_filtro_unica'),
+        ]
+
+    @classmethod
+    def registrar(cls, logs):
+        """Garante as opções usadas pelos `logs` (vazios e permissão '—' ficam de fora)."""
+        novos = set()
+        for log in logs:
+            for campo in cls.CAMPOS:
+                valor = getattr(log, campo) or ''
+                if not valor or (campo == 'permissao' and valor == '—'):
+                    continue
+                if (campo, valor) not in cls._conhecidos:
+                    novos.add((campo, valor))
+        if novos:
+            cls.objects.bulk_create([cls(campo=c, valor=v) for c, v in novos], ignore_conflicts=True)
+            cls._conhecidos.update(novos)
+
+    @classmethod
+    def opcoes(cls):
+        """{campo: [valores ordenados]} para todos os CAMPOS."""
+        resultado = {campo: [] for campo in cls.CAMPOS}
+        for campo, valor in cls.objects.order_by('campo', 'valor').values_list('campo', 'valor'):
+            resultado[campo].append(valor)
+        return resultado
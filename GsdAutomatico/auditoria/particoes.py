@@ -0,0 +1,145 @@
+"""
+Particionamento mensal de LogAuditoria (Postgres, RANGE em criado_em).
+
+A migração 0005 converte a tabela em particionada; daqui em diante:
+  - garantir_particoes cria com antecedência as partições dos próximos meses
+    (a partição DEFAULT só recebe algo se o Beat ficar parado por meses; as
+    linhas que caírem nela são movidas quando a partição do mês é criada);
+  - arquivar_particoes_antigas exporta as partições além de
+    AUDITORIA_RETENCAO_MESES para `auditoria_<AAAA>_<MM>.csv.zst` em
+    AUDITORIA_ARQUIVO_DIR e só então as desanexa e remove (DROP é
+    instantâneo, sem DELETE em massa nem VACUUM).
+
+Fora do Postgres (ex.: SQLite em desenvolvimento) tudo aqui é no-op.
+"""
+import datetime
+import logging
+import os
+import re
+
+import zstandard
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+TABELA = 'auditoria_logauditoria'
+PADRAO = f'{TABELA}_padrao'
+_PADRAO_NOME = re.compile(rf'^{TABELA}_(\d{{4}})_(\d{{2}})$')
+_NIVEL_ZSTD = 10
+
+
+def _inicio_mes(data, deslocamento=0):
+    indice = data.year * 12 + (data.month - 1) + deslocamento
+    return datetime.date(indice // 12, indice % 12 + 1, 1)
+
+
+def nome_particao(mes):
+    return f'{TABELA}_{mes:%Y_%m}'
+
+
+def particionada():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABELA])
+        linha = cursor.fetchone()
+    return bool(linha) and linha[0] == 'p'
+
+
+def particoes_mensais():
+    """{data do 1º dia do mês: nome} das partições mensais existentes."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)", [TABELA],
+        )
+        nomes = [linha[0] for linha in cursor.fetchall()]
+    particoes = {}
+    for nome in nomes:
+        m = _PADRAO_NOME.match(nome)
+        if m:
+            particoes[datetime.date(int(m.group(1)), int(m.group(2)), 1)] = nome
+    return particoes
+
+
+def garantir_particoes(meses_a_frente=2):
+    """Cria as partições do mês atual e dos próximos `meses_a_frente`. Retorna as criadas."""
+    if not particionada():
+        return []
+    existentes = particoes_mensais()
+    hoje = datetime.date.today()
+    criadas = []
+    for deslocamento in range(meses_a_frente + 1):
+        mes = _inicio_mes(hoje, deslocamento)
+        if mes in existentes:
+            continue
+        nome = nome_particao(mes)
+        movidas = _criar_particao(nome, mes, _inicio_mes(mes, 1))
+        criadas.append(nome)
+        logger.info("Partição de auditoria criada: %s (%d linha(s) movidas da DEFAULT)", nome, movidas)
+    return criadas
+
+
+def _criar_particao(nome, inicio, fim):
+    """
+    Cria a partição [inicio, fim). Se a DEFAULT já tiver linhas desse intervalo
+    (Beat parado), o CREATE ... PARTITION OF falharia; então, numa transação:
+    desanexa a DEFAULT, cria a partição, move as linhas e reanexa a DEFAULT.
+    Retorna quantas linhas foram movidas.
+    """
+    intervalo = "criado_em >= %s AND criado_em < %s"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [PADRAO])
+        tem_padrao = cursor.fetchone()[0]
+        movidas = 0
+        if tem_padrao:
+            cursor.execute(f'SELECT count(*) FROM "{PADRAO}" WHERE {intervalo}', [inicio, fim])
+            movidas = cursor.fetchone()[0]
+        if movidas:
+            cursor.execute(f'ALTER TABLE "{TABELA}" DETACH PARTITION "{PADRAO}"')
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{nome}" PARTITION OF "{TABELA}" '
+            f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+        )
+        if movidas:
+            cursor.execute(f'INSERT INTO "{nome}" SELECT * FROM "{PADRAO}" WHERE {intervalo}', [inicio, fim])
+            cursor.execute(f'DELETE FROM "{PADRAO}" WHERE {intervalo}', [inicio, fim])
+            cursor.execute(f'ALTER TABLE "{TABELA}" ATTACH PARTITION "{PADRAO}" DEFAULT')
+    return movidas
+
+
+def _exportar(nome, destino):
+    """COPY da partição para CSV comprimido com zstd (gravação atômica via .tmp)."""
+    tmp = destino + '.tmp'
+    compressor = zstandard.ZstdCompressor(level=_NIVEL_ZSTD)
+    with open(tmp, 'wb') as arquivo, compressor.stream_writer(arquivo) as saida:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY (SELECT * FROM "{nome}" ORDER BY criado_em, id) TO STDOUT WITH CSV HEADER', saida)
+    os.replace(tmp, destino)
+
+
+def arquivar_particoes_antigas(retencao_meses=None, destino_dir=None):
+    """
+    Exporta e remove as partições mensais anteriores à janela de retenção.
+    Retorna os caminhos dos arquivos gerados.
+    """
+    if not particionada():
+        return []
+    retencao_meses = retencao_meses or settings.AUDITORIA_RETENCAO_MESES
+    destino_dir = destino_dir or settings.AUDITORIA_ARQUIVO_DIR
+    os.makedirs(destino_dir, exist_ok=True)
+
+    limite = _inicio_mes(datetime.date.today(), -retencao_meses)
+    arquivos = []
+    for mes, nome in sorted(particoes_mensais().items()):
+        if mes >= limite:
+            continue
+        destino = os.path.join(destino_dir, f'auditoria_{mes:%Y_%m}.csv.zst')
+        _exportar(nome, destino)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{TABELA}" DETACH PARTITION "{nome}"')
+            cursor.execute(f'DROP TABLE "{nome}"')
+        arquivos.append(destino)
+        logger.info("Partição de auditoria %s arquivada em %s e removida.", nome, destino)
+    return arquivos
@@ -4,6 +4,11 @@ Auto-instrumentação genérica de auditoria via post_save/post_delete.
 Registrar um modelo aqui cobre TODA criação/edição/exclusão dele — não importa
 se aconteceu numa view normal, no admin do Django ou numa ação em lote — sem
 precisar tocar em cada view que salva esse modelo.
+
+O diff de "editou" não consulta o banco: os valores dos campos monitorados são
+guardados quando a instância é carregada (from_db/refresh_from_db) e depois de
+cada save, e comparados em memória. Só instâncias montadas à mão com pk (ou
+carregadas com .only()/.defer() sem esses campos) caem num SELECT.
 """
 import logging
 
@@ -15,6 +20,61 @@ from .utils import registrar
 logger = logging.getLogger(__name__)
 
 _SNAPSHOT_ATTR = '_auditoria_snapshot_anterior'
+_CARREGADOS_ATTR = '_auditoria_valores_carregados'
+_CAMPOS_ATTR = '_auditoria_campos_rastreados'
+
+
+def _marcar_carregados(instance, somente=None):
+    campos = getattr(type(instance), _CAMPOS_ATTR, ())
+    carregados = instance.__dict__.setdefault(_CARREGADOS_ATTR, {})
+    if somente is not None:
+        # save(update_fields=...)/refresh_from_db(fields=...) só tocaram esses campos
+        nomes = {instance._meta.get_field(f).attname for f in somente}
+        campos = [c for c in campos if c in nomes]
+    # Campos adiados (.only()/.defer()) não estão em __dict__ e ficam de fora
+    carregados.update({c: instance.__dict__[c] for c in campos if c in instance.__dict__})
+
+
+def _rastrear_campos(model, campos):
+    """Passa a guardar os valores de `campos` (attnames) sempre que uma instância de `model` é carregada."""
+    if _CAMPOS_ATTR in model.__dict__:
+        getattr(model, _CAMPOS_ATTR).update(campos)
+        return
+    setattr(model, _CAMPOS_ATTR, set(campos))
+
+    from_db_original = model.from_db.__func__
+    refresh_original = model.refresh_from_db
+
+    def from_db(cls, db, field_names, values):
+        instance = from_db_original(cls, db, field_names, values)
+        _marcar_carregados(instance)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        refresh_original(self, using=using, fields=fields)
+        _marcar_carregados(self, fields)
+
+    model.from_db = classmethod(from_db)
+    model.refresh_from_db = refresh_from_db
+
+
+def valores_originais(instance, campos):
+    """
+    Valores de `campos` (attnames) como estavam no banco quando a instância foi
+    carregada ou salva pela última vez. Sem SELECT quando todos foram
+    rastreados; None se a instância não existe no banco.
+    """
+    if instance.pk is None:
+        return None
+    carregados = instance.__dict__.get(_CARREGADOS_ATTR) or {}
+    faltando = [c for c in campos if c not in carregados]
+    valores = dict(carregados)
+    if faltando:
+        linha = type(instance)._base_manager.filter(pk=instance.pk).values(*faltando).first()
+        if linha is None:
+            return None
+        valores.update(linha)
+    return {c: valores[c] for c in campos}
 
 
 def registrar_modelo(model, *, secao, objeto_tipo, permissao_resolver, campo_id,
@@ -33,10 +93,12 @@ def registrar_modelo(model, *, secao, objeto_tipo, permissao_resolver, campo_id,
     logger.info("[AUDITORIA] registrar_modelo: %s (secao=%s objeto_tipo=%s campos=%s)",
                 model.__name__, secao, objeto_tipo, campos_monitorados)
 
+    _rastrear_campos(model, campos_monitorados)
+
     def _pre_save(sender, instance, **kwargs):
         logger.debug("[AUDITORIA] pre_save: %s pk=%s", sender.__name__, instance.pk)
         if instance.pk and campos_monitorados:
-            anterior = sender.objects.filter(pk=instance.pk).values(*campos_monitorados).first()
+            anterior = valores_originais(instance, campos_monitorados)
             logger.debug("[AUDITORIA] pre_save snapshot: %s", anterior)
         else:
             anterior = None
@@ -81,6 +143,9 @@ def registrar_modelo(model, *, secao, objeto_tipo, permissao_resolver, campo_id,
                       descricao=descricao, objeto_tipo=objeto_tipo, objeto_id=obj_id)
         except Exception:
             logger.exception("registry.post_save: falha ao auditar %s", sender)
+        finally:
+            # O próximo save desta instância compara com o que acabou de ser gravado
+            _marcar_carregados(instance, kwargs.get('update_fields'))
 
     def _post_delete(sender, instance, **kwargs):
         logger.debug("[AUDITORIA] post_delete: %s pk=%s", sender.__name__, instance.pk)
@@ -1,30 +1,80 @@
 import logging
 
 from celery import shared_task
+from django.db import DatabaseError
+from django.utils.dateparse import parse_datetime
 
 logger = logging.getLogger(__name__)
 
 
+def gravar_logs(entradas):
+    """
+    Grava as entradas com um único bulk_create. `chave` é única: se o mesmo lote
+    for entregue de novo (worker reiniciado antes do ack), nada é duplicado.
+    """
+    from .models import LogAuditoria, OpcaoFiltroAuditoria
+
+    logs = []
+    for entrada in entradas:
+        dados = dict(entrada)
+        if dados.get('criado_em'):
+            dados['criado_em'] = parse_datetime(dados['criado_em'])
+        else:
+            dados.pop('criado_em', None)
+        dados['objeto_id'] = str(dados['objeto_id']) if dados.get('objeto_id') is not None else ''
+        log = LogAuditoria(**dados)
+        log.preencher_busca()  # bulk_create não chama save()
+        logs.append(log)
+    LogAuditoria.objects.bulk_create(logs, batch_size=500, ignore_conflicts=True)
+    OpcaoFiltroAuditoria.registrar(logs)
+    return len(logs)
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=5, default_retry_delay=10)
+def registrar_logs_task(self, entradas):
+    """
+    Grava um lote de LogAuditoria em background — a auditoria nunca pode
+    atrasar/derrubar a ação principal. acks_late + reject_on_worker_lost: se o
+    worker morrer no meio, o lote volta para a fila em vez de se perder.
+    """
+    logger.info("[AUDITORIA] registrar_logs_task: %d entrada(s)", len(entradas))
+    try:
+        return gravar_logs(entradas)
+    except DatabaseError as exc:
+        logger.warning("registrar_logs_task: banco indisponível, tentando de novo: %s", exc)
+        raise self.retry(exc=exc)
+
+
 @shared_task
 def registrar_log_task(usuario_id, username, nome_guerra, permissao, secao, acao,
                         objeto_tipo, objeto_id, descricao):
-    """Grava o LogAuditoria em background — a auditoria nunca pode atrasar/derrubar a ação principal."""
-    from .models import LogAuditoria
-
-    logger.info("[AUDITORIA] registrar_log_task: user=%s secao=%s acao=%s objeto=%s/%s",
-                username, secao, acao, objeto_tipo, objeto_id)
+    """Formato antigo (uma task por log) — mantido para mensagens ainda na fila durante o deploy."""
     try:
-        log = LogAuditoria.objects.create(
-            usuario_id=usuario_id,
-            username=username,
-            nome_guerra=nome_guerra,
-            permissao=permissao,
-            secao=secao,
-            acao=acao,
-            objeto_tipo=objeto_tipo,
-            objeto_id=str(objeto_id) if objeto_id is not None else '',
-            descricao=descricao,
-        )
-        logger.info("[AUDITORIA] log gravado: id=%s", log.pk)
+        gravar_logs([{
+            'usuario_id': usuario_id,
+            'username': username,
+            'nome_guerra': nome_guerra,
+            'permissao': permissao,
+            'secao': secao,
+            'acao': acao,
+            'objeto_tipo': objeto_tipo,
+            'objeto_id': objeto_id,
+            'descricao': descricao,
+        }])
     except Exception:
         logger.exception("registrar_log_task: falha ao gravar log de auditoria (%s / %s)", secao, descricao)
+
+
+@shared_task
+def manter_particoes_auditoria_task():
+    """
+    Diária (Beat): cria as partições mensais dos próximos meses e arquiva/remove
+    as que passaram de AUDITORIA_RETENCAO_MESES. No-op fora do Postgres.
+    """
+    from .particoes import arquivar_particoes_antigas, garantir_particoes
+
+    criadas = garantir_particoes()
+    arquivadas = arquivar_particoes_antigas()
+    if criadas or arquivadas:
+        logger.info("[AUDITORIA] partições criadas: %s; arquivadas: %s", criadas, arquivadas)
+    return {'criadas': criadas, 'arquivadas': arquivadas}
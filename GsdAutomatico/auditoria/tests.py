@@ -0,0 +1,140 @@
+import datetime
+import unittest
+import uuid
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import particoes
+from .lote import LoteAuditoria, lote_atual
+from .middleware import CurrentUserMiddleware
+from .models import LogAuditoria
+from .tasks import gravar_logs
+
+
+def _contar(tabela, inicio, fim):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT count(*) FROM "{tabela}" WHERE criado_em >= %s AND criado_em < %s', [inicio, fim],
+        )
+        return cursor.fetchone()[0]
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Particionamento só existe no Postgres')
+class GarantirParticoesTests(TestCase):
+
+    def test_move_linhas_da_default_ao_criar_particao_do_mes(self):
+        # Um mês além da janela criada pela migração: simula o Beat parado
+        mes = particoes._inicio_mes(datetime.date.today(), 6)
+        fim = particoes._inicio_mes(mes, 1)
+        self.assertNotIn(mes, particoes.particoes_mensais())
+        criado_em = timezone.make_aware(datetime.datetime.combine(mes, datetime.time(12)))
+        log = LogAuditoria.objects.create(username='teste', descricao='na default', criado_em=criado_em)
+        self.assertEqual(_contar(particoes.PADRAO, mes, fim), 1)
+
+        criadas = particoes.garantir_particoes(meses_a_frente=6)
+
+        nome = particoes.nome_particao(mes)
+        self.assertIn(nome, criadas)
+        self.assertEqual(_contar(nome, mes, fim), 1)
+        self.assertEqual(_contar(particoes.PADRAO, mes, fim), 0)
+        self.assertTrue(LogAuditoria.objects.filter(pk=log.pk, descricao='na default').exists())
+
+        # A DEFAULT continua anexada: um mês ainda sem partição volta a cair nela
+        depois = particoes._inicio_mes(mes, 3)
+        LogAuditoria.objects.create(
+            username='teste', descricao='depois',
+            criado_em=timezone.make_aware(datetime.datetime.combine(depois, datetime.time(12))),
+        )
+        self.assertEqual(_contar(particoes.PADRAO, depois, particoes._inicio_mes(depois, 1)), 1)
+
+    def test_sem_linhas_na_default_so_cria(self):
+        mes = particoes._inicio_mes(datetime.date.today(), 7)
+        criadas = particoes.garantir_particoes(meses_a_frente=7)
+        self.assertIn(particoes.nome_particao(mes), criadas)
+        self.assertEqual(particoes.garantir_particoes(meses_a_frente=7), [])
+
+
+def _entrada(descricao='ação'):
+    """Mesmo formato montado por auditoria.utils.registrar()."""
+    return {
+        'chave': uuid.uuid4().hex, 'criado_em': timezone.now().isoformat(), 'usuario_id': None,
+        'username': 'teste', 'nome_guerra': 'TESTE', 'permissao': '—', 'secao': 'pessoal',
+        'acao': 'editar', 'objeto_tipo': 'Efetivo', 'objeto_id': '1', 'descricao': descricao,
+    }
+
+
+@mock.patch('auditoria.lote.despachar')
+@override_settings(AUDITORIA_LOTE_MAX=3, AUDITORIA_LOTE_SEGUNDOS=3600)
+class LoteAuditoriaTests(SimpleTestCase):
+
+    def test_descarrega_ao_atingir_o_maximo(self, despachar):
+        lote = LoteAuditoria()
+        entradas = [_entrada(str(i)) for i in range(7)]
+        for entrada in entradas:
+            lote.adicionar(entrada)
+
+        self.assertEqual([c.args[0] for c in despachar.call_args_list], [entradas[:3], entradas[3:6]])
+        lote.descarregar()
+        self.assertEqual(despachar.call_args.args[0], entradas[6:])
+
+    @override_settings(AUDITORIA_LOTE_SEGUNDOS=5)
+    def test_descarrega_quando_a_entrada_mais_antiga_passa_do_tempo(self, despachar):
+        lote = LoteAuditoria()
+        primeira, segunda = _entrada('1'), _entrada('2')
+        # 1ª entrada: início do lote e checagem em t=100; 2ª: checagem em t=106
+        with mock.patch('auditoria.lote.time.monotonic', side_effect=[100, 100, 106]):
+            lote.adicionar(primeira)
+            despachar.assert_not_called()
+            lote.adicionar(segunda)
+
+        despachar.assert_called_once_with([primeira, segunda])
+
+    def test_middleware_descarrega_no_fim_da_requisicao(self, despachar):
+        entradas = [_entrada('1'), _entrada('2')]
+
+        def view(request):
+            for entrada in entradas:
+                lote_atual().adicionar(entrada)
+            despachar.assert_not_called()  # nada sai no meio da requisição
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        CurrentUserMiddleware(view)(request)
+
+        despachar.assert_called_once_with(entradas)
+        self.assertIsNone(lote_atual())
+
+
+class DespacharTests(SimpleTestCase):
+
+    def test_grava_de_forma_sincrona_se_o_broker_falhar(self):
+        from .lote import despachar
+
+        entradas = [_entrada()]
+        with mock.patch('auditoria.tasks.registrar_logs_task.delay', side_effect=OSError('broker fora')), \
+                mock.patch('auditoria.tasks.gravar_logs') as gravar:
+            despachar(entradas)
+
+        gravar.assert_called_once_with(entradas)
+
+
+class GravarLogsTests(TestCase):
+
+    def test_reentrega_do_mesmo_lote_nao_duplica(self):
+        entradas = [_entrada('1'), _entrada('2')]
+
+        gravar_logs(entradas)
+        # Worker reiniciado antes do ack: o mesmo lote é entregue de novo
+        gravar_logs(entradas)
+
+        self.assertEqual(LogAuditoria.objects.count(), 2)
+        self.assertEqual(
+            set(LogAuditoria.objects.values_list('chave', flat=True)),
+            {uuid.UUID(e['chave']) for e in entradas},
+        )
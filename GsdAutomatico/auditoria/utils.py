@@ -1,5 +1,11 @@
 import logging
+import uuid
 
+from django.utils import timezone
+
+from login.grupos import grupos_do_usuario
+
+from .lote import despachar, lote_atual
 from .middleware import get_usuario_atual
 
 logger = logging.getLogger(__name__)
@@ -19,7 +25,7 @@ def resolver_label(user, mapeamento: dict) -> str:
         return '—'
     if user.is_superuser:
         return 'Superusuário'
-    nomes_grupos = set(user.groups.values_list('name', flat=True))
+    nomes_grupos = grupos_do_usuario(user)
     for nome_grupo, label in mapeamento.items():
         if nome_grupo in nomes_grupos:
             return label
@@ -28,12 +34,11 @@ def resolver_label(user, mapeamento: dict) -> str:
 
 def registrar(user, secao, permissao, acao, descricao, objeto_tipo='', objeto_id=''):
     """
-    Registra uma ação de auditoria de forma assíncrona (Celery).
+    Registra uma ação de auditoria de forma assíncrona (Celery), agrupada no
+    lote da requisição atual quando houver um (ver auditoria.lote).
     `user` pode ser omitido (None) — nesse caso usa o usuário da requisição atual,
     capturado pela CurrentUserMiddleware (útil dentro de signals post_save/post_delete).
     """
-    from .tasks import registrar_log_task
-
     if user is None:
         user = get_usuario_atual()
     if user is None or not getattr(user, 'is_authenticated', False):
@@ -43,17 +48,23 @@ def registrar(user, secao, permissao, acao, descricao, objeto_tipo='', objeto_id
     logger.debug("[AUDITORIA] registrar: user=%s secao=%s acao=%s descricao='%s'",
                  user.username, secao, acao, descricao)
     try:
-        registrar_log_task.delay(
-            usuario_id=user.id,
-            username=user.username,
-            nome_guerra=_nome_guerra(user),
-            permissao=permissao or '—',
-            secao=secao or '',
-            acao=acao or '',
-            objeto_tipo=objeto_tipo or '',
-            objeto_id=objeto_id,
-            descricao=descricao,
-        )
-        logger.debug("[AUDITORIA] task despachada para user=%s", user.username)
+        entrada = {
+            'chave': uuid.uuid4().hex,
+            'criado_em': timezone.now().isoformat(),
+            'usuario_id': user.id,
+            'username': user.username,
+            'nome_guerra': _nome_guerra(user),
+            'permissao': permissao or '—',
+            'secao': secao or '',
+            'acao': acao or '',
+            'objeto_tipo': objeto_tipo or '',
+            'objeto_id': str(objeto_id) if objeto_id is not None else '',
+            'descricao': descricao,
+        }
+        lote = lote_atual()
+        if lote is not None:
+            lote.adicionar(entrada)
+        else:
+            despachar([entrada])
     except Exception:
         logger.exception("registrar: falha ao despachar log de auditoria (%s / %s)", secao, descricao)
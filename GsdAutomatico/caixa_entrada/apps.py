@@ -11,8 +11,15 @@ class CaixaEntradaConfig(AppConfig):
 
         from django.db.models.signals import m2m_changed
         from .models import Mensagem
-        from .signals import limpar_notificacao_ao_excluir_permanentemente
+        from .signals import (
+            contador_destinatarios, contador_excluida, contador_excluida_permanente,
+            limpar_notificacao_ao_excluir_permanentemente,
+        )
         m2m_changed.connect(
             limpar_notificacao_ao_excluir_permanentemente,
             sender=Mensagem.permanentemente_excluida_por.through,
         )
+        # Contador de mensagens não lidas (notificacoes.contadores)
+        m2m_changed.connect(contador_destinatarios, sender=Mensagem.destinatarios.through)
+        m2m_changed.connect(contador_excluida, sender=Mensagem.excluida_por.through)
+        m2m_changed.connect(contador_excluida_permanente, sender=Mensagem.permanentemente_excluida_por.through)
@@ -5,8 +5,10 @@ Responsabilidades:
   1. Enviar e-mail quando uma Mensagem é criada (opcional, depende de EMAIL_HOST)
   2. Marcar a Notificacao (legacy) como lida quando a Mensagem relacionada é excluída
   3. Marcar Notificacao como lida quando a Mensagem é permanentemente excluída (M2M)
+  4. Manter o contador de mensagens não lidas (notificacoes.contadores) e
+     empurrá-lo pelo WebSocket do destinatário
 """
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.conf import settings
@@ -128,6 +130,98 @@ def notificar_mudanca_status_chamado(sender, instance, created, **kwargs):
         pass
 
 
+# ── 5. Contador de mensagens não lidas ───────────────────────────────────────
+# Cada transição soma/subtrai só para quem a mensagem contava (ou passa a contar)
+# como não lida; casos raros (lado reverso do M2M, clear) recalculam o contador.
+
+def _alterar_contador(user_pks, delta=None):
+    from notificacoes import contadores
+    contadores.alterar(list(user_pks), contadores.MENSAGENS, delta)
+
+
+def _nao_lida_para(mensagem_id, user_pks, ignorar):
+    """
+    Usuários de `user_pks` para os quais a mensagem conta como não lida,
+    desconsiderando a relação `ignorar` ('lida', 'excluida' ou 'permanente'),
+    que é justamente a que acabou de mudar.
+    """
+    from django.contrib.auth import get_user_model
+    qs = get_user_model().objects.filter(
+        pk__in=user_pks,
+        mensagens_recebidas__pk=mensagem_id,
+        mensagens_recebidas__eh_rascunho=False,
+    )
+    for relacao, lookup in (('lida', 'mensagens_lidas__pk'),
+                            ('excluida', 'mensagens_excluidas__pk'),
+                            ('permanente', 'mensagens_perm_excluidas__pk')):
+        if relacao != ignorar:
+            qs = qs.exclude(**{lookup: mensagem_id})
+    return list(qs.values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender='caixa_entrada.Mensagem')
+def marcar_envio_de_rascunho(sender, instance, **kwargs):
+    """Rascunho enviado: os destinatários já gravados não passam por destinatarios.add()."""
+    instance._enviando_rascunho = False
+    if instance._state.adding or instance.eh_rascunho:
+        return
+    from auditoria.registry import valores_originais
+    originais = valores_originais(instance, ['eh_rascunho'])
+    instance._enviando_rascunho = bool(originais and originais['eh_rascunho'])
+
+
+@receiver(post_save, sender='caixa_entrada.Mensagem')
+def contador_ao_enviar_rascunho(sender, instance, created, **kwargs):
+    if getattr(instance, '_enviando_rascunho', False):
+        _alterar_contador(instance.destinatarios.values_list('pk', flat=True))
+
+
+def contador_destinatarios(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed de Mensagem.destinatarios."""
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _alterar_contador([instance.pk])
+    elif action == 'pre_clear':
+        instance._destinatarios_antes = list(instance.destinatarios.values_list('pk', flat=True))
+    elif instance.eh_rascunho:
+        return
+    elif action == 'post_add' and pk_set:
+        _alterar_contador(pk_set, +1)
+    elif action == 'post_remove' and pk_set:
+        _alterar_contador(pk_set)
+    elif action == 'post_clear':
+        _alterar_contador(getattr(instance, '_destinatarios_antes', []))
+
+
+def _contador_exclusao(relacao):
+    """m2m_changed de excluida_por / permanentemente_excluida_por."""
+    def receptor(sender, instance, action, reverse, pk_set, **kwargs):
+        if action not in ('post_add', 'post_remove'):
+            return
+        if reverse:
+            _alterar_contador([instance.pk])
+            return
+        if pk_set:
+            afetados = _nao_lida_para(instance.pk, pk_set, ignorar=relacao)
+            _alterar_contador(afetados, -1 if action == 'post_add' else +1)
+    return receptor
+
+
+contador_excluida = _contador_exclusao('excluida')
+contador_excluida_permanente = _contador_exclusao('permanente')
+
+
+@receiver(post_save, sender='caixa_entrada.LeituraMensagem')
+def contador_ao_ler(sender, instance, created, **kwargs):
+    if created:
+        _alterar_contador(_nao_lida_para(instance.mensagem_id, [instance.usuario_id], ignorar='lida'), -1)
+
+
+@receiver(post_delete, sender='caixa_entrada.LeituraMensagem')
+def contador_ao_marcar_nao_lida(sender, instance, **kwargs):
+    _alterar_contador(_nao_lida_para(instance.mensagem_id, [instance.usuario_id], ignorar='lida'), +1)
+
+
 # ==========================================
 # AUDITORIA (Fase 3)
 # ==========================================
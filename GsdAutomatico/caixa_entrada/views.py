@@ -16,7 +16,10 @@ from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 
+from Secao_pessoal.busca import ids_militares
 from Secao_pessoal.models import Efetivo, SolicitacaoTrocaSetor
+from login.grupos import grupos_em_ordem
+from notificacoes import contadores
 from .models import Notificacao, Mensagem, LeituraMensagem, Anexo
 from .forms import NotificacaoForm, MensagemForm, FiltroInboxForm
 
@@ -59,7 +62,7 @@ def _resolve_base_template(request):
     if secao and secao in _SECAO_TEMPLATES:
         return _SECAO_TEMPLATES[secao]
     if request.user.is_authenticated and not request.user.is_superuser:
-        for group in request.user.groups.values_list('name', flat=True):
+        for group in grupos_em_ordem(request.user):
             if group in _GROUP_SECAO:
                 return _SECAO_TEMPLATES[_GROUP_SECAO[group]]
     return 'Secao_pessoal/base.html'
@@ -74,15 +77,7 @@ def _sidebar_counts(user):
 
     base_qs = Mensagem.objects.filter(eh_rascunho=False)
 
-    nao_lidas = base_qs.filter(
-        destinatarios=user
-    ).exclude(
-        excluida_por=user
-    ).exclude(
-        permanentemente_excluida_por=user
-    ).exclude(
-        lida_por=user
-    ).count()
+    nao_lidas = contadores.nao_lidas(user.pk, contadores.MENSAGENS)
 
     chamados_abertos = base_qs.filter(
         tipo='chamado', status_chamado='aberto'
@@ -673,30 +668,32 @@ def api_notificacoes_check(request):
                     'url': reverse('caixa_entrada:comunicacoes') + f'?ler={n.id}',
                 })
 
-        # Mensagens da nova caixa de entrada
-        msgs_nao_lidas = Mensagem.objects.filter(
-            destinatarios=user, eh_rascunho=False
-        ).exclude(lida_por=user).exclude(excluida_por=user).exclude(permanentemente_excluida_por=user)
-        total += msgs_nao_lidas.count()
+        # Mensagens da nova caixa de entrada (contador mantido pelos sinais)
+        unread_mensagens = contadores.nao_lidas(user.pk, contadores.MENSAGENS)
+        total += unread_mensagens
 
         remaining = 5 - len(data)
-        for m in msgs_nao_lidas[:remaining]:
-            try:
-                nome = m.remetente.profile.militar.nome_guerra
-            except Exception:
-                nome = m.remetente.get_full_name() or m.remetente.username
-            data.append({
-                'id': m.id,
-                'titulo': m.assunto,
-                'remetente': nome,
-                'data': m.data_envio.strftime('%d/%m %H:%M'),
-                'is_autorizacao': False,
-                'is_mensagem': True,
-                'url': reverse('caixa_entrada:detalhe', kwargs={'pk': m.pk}),
-            })
+        if unread_mensagens and remaining > 0:
+            msgs_nao_lidas = Mensagem.objects.filter(
+                destinatarios=user, eh_rascunho=False
+            ).exclude(lida_por=user).exclude(excluida_por=user).exclude(permanentemente_excluida_por=user)
+            for m in msgs_nao_lidas.select_related('remetente__profile__militar')[:remaining]:
+                try:
+                    nome = m.remetente.profile.militar.nome_guerra
+                except Exception:
+                    nome = m.remetente.get_full_name() or m.remetente.username
+                data.append({
+                    'id': m.id,
+                    'titulo': m.assunto,
+                    'remetente': nome,
+                    'data': m.data_envio.strftime('%d/%m %H:%M'),
+                    'is_autorizacao': False,
+                    'is_mensagem': True,
+                    'url': reverse('caixa_entrada:detalhe', kwargs={'pk': m.pk}),
+                })
 
         return HttpResponse(
-            json.dumps({'count': total, 'unread_mensagens': msgs_nao_lidas.count(), 'notifications': data}),
+            json.dumps({'count': total, 'unread_mensagens': unread_mensagens, 'notifications': data}),
             content_type='application/json'
         )
     except Exception as e:
@@ -749,15 +746,15 @@ def api_buscar_usuarios(request):
         return HttpResponse(json.dumps({'results': []}), content_type='application/json')
 
     from django.db.models import Q as Qdb
+    # Militares pela busca compartilhada (índice trigram), só entre os que têm usuário
+    militares = ids_militares(term, queryset=Efetivo.objects.filter(profile__user__is_active=True))
     users = User.objects.filter(
         is_active=True
     ).filter(
         Qdb(username__icontains=term) |
         Qdb(first_name__icontains=term) |
         Qdb(last_name__icontains=term) |
-        Qdb(profile__militar__posto__icontains=term) |
-        Qdb(profile__militar__nome_guerra__icontains=term) |
-        Qdb(profile__militar__nome_completo__icontains=term)
+        Qdb(profile__militar__in=militares)
     ).exclude(pk=request.user.pk).distinct()[:20]
 
     results = []
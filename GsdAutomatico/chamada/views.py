@@ -9,10 +9,25 @@ from django.db.models import Q, Case, When, Value, IntegerField
 from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model
 
-from Secao_pessoal.models import Efetivo
+from Secao_pessoal.models import (
+    Efetivo, SETOR_INFORMATICA, SETOR_OUVIDORIA, SETOR_S1, SETOR_SOP,
+    SITUACAO_ATIVO, SITUACAO_SEM, chave_setor,
+)
 from .models import RegistroChamada
 
 
+def _filtro_setor(nome):
+    """
+    Militares do setor `nome` (seção, grupo ou setor do militar): igualdade na
+    coluna indexada setor_chave quando `nome` corresponde a um setor conhecido;
+    senão, busca pelo texto do setor.
+    """
+    chave = chave_setor(nome)
+    if chave:
+        return Q(setor_chave=chave)
+    return Q(setor__icontains=nome)
+
+
 @login_required
 def chamada_index(request):
     militar_logado = getattr(request.user, 'profile', None) and request.user.profile.militar
@@ -78,12 +93,18 @@ def chamada_index(request):
             's1': ['S1', 'Seção de Pessoal', 'Secao de Pessoal', 'Pessoal']
         }
         termos_busca = mapa_termos_busca.get(secao_url.lower(), [secao_url])
+        mapa_chaves_setor = {
+            'ouvidoria': SETOR_OUVIDORIA,
+            'operacoes': SETOR_SOP,
+            'informatica': SETOR_INFORMATICA,
+            's1': SETOR_S1,
+        }
+        query_efetivo_setor = _filtro_setor(mapa_chaves_setor.get(secao_url.lower()) or secao_url)
         
         query_grupos = Q()
         for termo in termos_busca:
             if termo:
                 query_grupos |= Q(name__icontains=termo)
-                query_efetivo_setor |= Q(setor__icontains=termo)
         grupos_secao = Group.objects.filter(query_grupos)
     else:
         if not request.user.is_superuser:
@@ -97,15 +118,11 @@ def chamada_index(request):
                 else: base_template = 'Secao_pessoal/base.html'
                 
                 for g in grupos_secao:
-                    query_efetivo_setor |= Q(setor__icontains=g.name)
-                    if 'S1' in g.name.upper() or 'PESSOAL' in g.name.upper():
-                        query_efetivo_setor |= Q(setor__icontains='S1') | Q(setor__icontains='Pessoal')
-                    if 'OPERA' in g.name.upper():
-                        query_efetivo_setor |= Q(setor__icontains='Operações') | Q(setor__icontains='Operacoes')
+                    query_efetivo_setor |= _filtro_setor(g.name)
             else:
                 nome_setor_exibicao = militar_logado.setor if militar_logado else 'Geral'
                 if militar_logado and militar_logado.setor:
-                    query_efetivo_setor |= Q(setor__icontains=militar_logado.setor)
+                    query_efetivo_setor |= _filtro_setor(militar_logado.setor)
         else:
             nome_setor_exibicao = "Geral (Todos os Setores)"
 
@@ -122,8 +139,8 @@ def chamada_index(request):
 
     filtro_secao = query_efetivo_setor | Q(id__in=militares_ids_grupo)
 
-    # Filtro ultra-tolerante para abranger militares ativos (cobre "ATIVO", "Ativo ", "Pronto", etc.)
-    filtro_ativo = Q(situacao__icontains='Ativ') | Q(situacao__exact='') | Q(situacao__isnull=True) | Q(situacao__exact=' ') | Q(situacao__icontains='Pronto')
+    # Militares ativos: a categoria cobre "ATIVO", "Ativo ", "Pronto" e situação em branco
+    filtro_ativo = Q(situacao_categoria__in=[SITUACAO_ATIVO, SITUACAO_SEM])
 
     # Filtra os militares apenas da seção do usuário logado (se não for admin)
     if request.user.is_superuser and not secao_url and not grupos_secao.exists():
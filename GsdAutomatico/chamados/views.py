@@ -25,6 +25,7 @@ from django.utils import timezone
 from django.views.generic import CreateView, DetailView, ListView
 
 from caixa_entrada.views import InboxMixin, _sidebar_counts
+from login.grupos import pertence
 
 from .models import AnexoChamado, Chamado, MensagemChamado
 
@@ -35,7 +36,7 @@ _INFORMATICA_GROUPS = ['informatica-admin', 'informatica-secao']
 
 def _is_informatica(user):
     """Verifica se o usuário pertence ao grupo de suporte ou é superuser."""
-    return user.is_superuser or user.groups.filter(name__in=_INFORMATICA_GROUPS).exists()
+    return user.is_superuser or pertence(user, *_INFORMATICA_GROUPS)
 
 
 # ── Mixin para injetar contexto da inbox no chamado ──────────────────────────
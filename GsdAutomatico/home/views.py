@@ -11,6 +11,7 @@ from django.db.models import Q
 
 from caixa_entrada.models import Mensagem
 from login.models import UserProfile
+from login.grupos import grupos_do_usuario
 from .models import CarouselSlide, Tutorial, TutorialImage, TutorialAttachment
 from .forms import (
     ProfileEditForm, CarouselSlideForm, TutorialForm,
@@ -66,7 +67,7 @@ _APPS = [
 
 
 def _get_available_apps(user):
-    user_group_names = set(user.groups.values_list('name', flat=True))
+    user_group_names = grupos_do_usuario(user)
     apps = []
     for app_def in _APPS:
         if user.is_superuser or any(g in user_group_names for g in app_def['groups']):
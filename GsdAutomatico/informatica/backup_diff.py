@@ -1,12 +1,14 @@
 """
 Restauração/comparação de registros individuais a partir de um backup antigo.
 
-Funciona restaurando o dump (.dump, formato pg_dump -F c) escolhido em um banco
-Postgres temporário isolado (via pg_restore), consultando o registro desejado
-por SQL bruto (psycopg2) e comparando campo a campo com o registro atual no
-banco em produção — sem nunca tocar o banco em produção até o admin confirmar
+Funciona lendo o registro desejado de uma "fonte" do backup — o índice SQLite
+gravado ao lado do dump (backup_indice.IndiceBackup) ou, para backups sem
+índice, um banco Postgres temporário com o dump restaurado (nome do banco,
+ver backup_snapshots) — e comparando campo a campo com o registro atual no
+banco em produção, sem nunca tocar o banco em produção até o admin confirmar
 a restauração de um registro específico.
 """
+import logging
 import subprocess
 import uuid
 
@@ -19,6 +21,9 @@ from Secao_operacoes.models import Missao, Escala
 from EPA.models import EscalaMissaoEPA
 from caixa_entrada.models import Mensagem
 from .models import Material, Cautela
+from .backup_indice import IndiceBackup
+
+logger = logging.getLogger(__name__)
 
 # Modelos disponíveis para comparação/restauração individual.
 # 'colunas_lista': colunas exibidas na listagem do backup — (campo_db, label, tipo)
@@ -160,10 +165,17 @@ def buscar_registro_atual(model, busca_campo: str, valor: str):
     return model.objects.filter(**{busca_campo: valor}).first()
 
 
-def restaurar_dump_temp(arquivo_db: str) -> str:
-    """Cria um banco Postgres temporário e restaura o dump dentro dele. Retorna o nome do banco."""
+def tabelas_diff() -> list[str]:
+    return [cfg['model']._meta.db_table for cfg in MODELOS_DIFF.values()]
+
+
+def restaurar_dump_temp(arquivo_db: str, tempdb: str | None = None, tabelas: list[str] | None = None) -> str:
+    """
+    Cria um banco Postgres temporário e restaura o dump dentro dele. Retorna o nome do banco.
+    Com `tabelas`, restaura só essas tabelas (pg_restore -t), sem índices nem constraints.
+    """
     db_conf = _db_conf()
-    tempdb = f"restore_tmp_{uuid.uuid4().hex[:12]}"
+    tempdb = tempdb or f"restore_tmp_{uuid.uuid4().hex[:12]}"
 
     import os
     env = os.environ.copy()
@@ -173,24 +185,91 @@ def restaurar_dump_temp(arquivo_db: str) -> str:
         ['createdb', '-h', db_conf['HOST'], '-p', str(db_conf['PORT']), '-U', db_conf['USER'], tempdb],
         env=env, check=True, capture_output=True, text=True, timeout=60,
     )
+    seletor = []
+    for tabela in tabelas or []:
+        seletor += ['-t', tabela]
     subprocess.run(
         ['pg_restore', '-h', db_conf['HOST'], '-p', str(db_conf['PORT']), '-U', db_conf['USER'],
-         '-d', tempdb, '--no-owner', '--no-privileges', arquivo_db],
+         '-d', tempdb, '--no-owner', '--no-privileges', *seletor, arquivo_db],
         env=env, check=False, capture_output=True, text=True, timeout=280,
         # check=False: pg_restore retorna != 0 com avisos não-fatais (ex.: extensões já existentes)
     )
     return tempdb
 
 
-def dropar_temp(tempdb: str):
+def resolver_arquivo_db(execucao, arquivo_local: str | None = None) -> tuple[str | None, str | None]:
+    """
+    Retorna (caminho_para_usar, caminho_temp_ou_None).
+    1. Se o arquivo local existe → (arquivo_local, None)
+    2. Se não existe mas foi enviado ao remoto → baixa via SFTP para /tmp,
+       retorna (caminho_tmp, caminho_tmp) — o chamador deve apagar o tmp ao final
+       (remover_temp, pois dumps em formato diretório vêm como pasta).
+    3. Se nenhum dos dois → (None, None)
+    `arquivo_local` permite resolver outro arquivo do mesmo backup (ex.: o índice).
+    """
+    import os
+    import tempfile
+
+    arquivo_local = arquivo_local or execucao.arquivo_db or ''
+    if arquivo_local and os.path.exists(arquivo_local):
+        return arquivo_local, None
+
+    if not execucao.enviado_remoto or not arquivo_local:
+        return None, None
+
+    try:
+        from . import backup_server as _bs
+        from .models import BackupDestino
+        destino = BackupDestino.get_instance()
+        if not destino.host or not destino.usuario:
+            return None, None
+
+        nome_arquivo = os.path.basename(arquivo_local.rstrip('/'))
+        caminho_remoto = f"{destino.diretorio_destino.rstrip('/')}/{nome_arquivo}"
+
+        if nome_arquivo.endswith('.dir'):
+            # Dump em formato diretório (pg_dump -F d)
+            tmp_dir = tempfile.mkdtemp(suffix='.dir')
+            _bs.baixar_diretorio(destino, caminho_remoto, tmp_dir)
+            return tmp_dir, tmp_dir
+
+        conteudo = _bs.baixar_arquivo(destino, caminho_remoto)
+        sufixo = os.path.splitext(nome_arquivo)[-1]
+        fd, tmp_path = tempfile.mkstemp(suffix=sufixo)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(conteudo)
+        return tmp_path, tmp_path
+    except Exception as exc:
+        logger.warning("resolver_arquivo_db: falha ao baixar do remoto: %s", exc)
+        return None, None
+
+
+def remover_temp(caminho: str | None):
+    """Apaga o arquivo (ou diretório, no caso de dump -F d) baixado por resolver_arquivo_db."""
+    import os
+    import shutil
+
+    if not caminho or not os.path.exists(caminho):
+        return
+    try:
+        if os.path.isdir(caminho):
+            shutil.rmtree(caminho)
+        else:
+            os.remove(caminho)
+    except OSError as exc:
+        logger.warning("remover_temp: não foi possível apagar %s: %s", caminho, exc)
+
+
+def dropar_temp(tempdb: str) -> bool:
     db_conf = _db_conf()
     import os
     env = os.environ.copy()
     env['PGPASSWORD'] = db_conf['PASSWORD'] or ''
-    subprocess.run(
+    resultado = subprocess.run(
         ['dropdb', '--if-exists', '-h', db_conf['HOST'], '-p', str(db_conf['PORT']), '-U', db_conf['USER'], tempdb],
         env=env, check=False, capture_output=True, text=True, timeout=60,
     )
+    return resultado.returncode == 0
 
 
 def _conectar_temp(tempdb: str):
@@ -201,8 +280,10 @@ def _conectar_temp(tempdb: str):
     )
 
 
-def buscar_registro_temp(tempdb: str, model, pk: int) -> dict | None:
-    """Busca o registro pelo id na tabela correspondente do banco temporário restaurado."""
+def buscar_registro_temp(tempdb, model, pk: int) -> dict | None:
+    """Busca o registro pelo id na tabela correspondente do backup (índice ou banco restaurado)."""
+    if isinstance(tempdb, IndiceBackup):
+        return tempdb.buscar(model, pk)
     tabela = model._meta.db_table
     conn = _conectar_temp(tempdb)
     try:
@@ -218,8 +299,10 @@ def buscar_registro_temp(tempdb: str, model, pk: int) -> dict | None:
         conn.close()
 
 
-def listar_todos_temp(tempdb: str, model, limit: int = 500) -> list[dict]:
-    """Retorna todos os registros da tabela no banco temporário, até `limit` linhas."""
+def listar_todos_temp(tempdb, model, limit: int = 500) -> list[dict]:
+    """Retorna todos os registros da tabela no backup (índice ou banco restaurado), até `limit` linhas."""
+    if isinstance(tempdb, IndiceBackup):
+        return tempdb.listar(model, limit)
     tabela = model._meta.db_table
     conn = _conectar_temp(tempdb)
     try:
@@ -318,7 +401,7 @@ def aplicar_restore(live_obj, old_dict: dict, campos_selecionados: list):
     return alterados
 
 
-def listar_ausentes_no_sistema(tempdb: str, model, limit: int = 2000) -> list[dict]:
+def listar_ausentes_no_sistema(tempdb, model, limit: int = 2000) -> list[dict]:
     """
     Retorna registros presentes no backup cujo ID não existe no banco de produção —
     nem como registro ativo, nem como soft-deleted.
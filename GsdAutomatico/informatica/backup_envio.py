@@ -0,0 +1,373 @@
+"""
+Envio dos backups ao servidor reserva (SFTP) em paralelo à geração do backup.
+
+EnvioBackup mantém uma fila consumida por uma thread própria: o backup
+enfileira cada arquivo assim que ele fica pronto (arquivos do dump, índice,
+cada bloco novo de mídia, manifesto), e o envio acontece enquanto o restante
+do backup ainda está sendo produzido. Os blocos de mídia reaproveitados de
+execuções anteriores entram como `se_ausente`: são conferidos pela listagem
+da pasta remota e só enviados se faltarem (ex.: envio anterior que falhou).
+
+  - escrita pipelined (sem esperar o ACK de cada pacote) e janelas SSH grandes;
+  - cada arquivo vai primeiro para `<nome>.part`; numa queda de rede a conexão
+    é refeita e o envio continua do offset já gravado no servidor;
+  - ao final é enviado `backup_<ts>.sha256` (formato do sha256sum) e conferido
+    no servidor reserva (`sha256sum -c` via SSH ou, sem shell, relendo os
+    arquivos pelo SFTP); arquivos divergentes são reenviados uma vez.
+
+Com BACKUP_SFTP_LOCAL_DIR definido, o "servidor reserva" passa a ser um
+diretório local (SFTPLocal) — útil em desenvolvimento e em testes.
+"""
+import hashlib
+import logging
+import os
+import queue
+import shlex
+import threading
+import time
+
+import paramiko
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_BLOCO_LEITURA = 1024 * 1024
+_JANELA_SSH = 32 * 1024 * 1024
+_PACOTE_SSH = 64 * 1024
+_TENTATIVAS = 5
+_FIM = object()
+
+
+class SFTPLocal:
+    """Subconjunto da API do paramiko.SFTPClient sobre um diretório local."""
+
+    def __init__(self, raiz):
+        self.raiz = os.path.abspath(raiz)
+
+    def _local(self, caminho):
+        local = os.path.abspath(os.path.join(self.raiz, caminho.lstrip('/')))
+        if local != self.raiz and not local.startswith(self.raiz + os.sep):
+            raise PermissionError(caminho)
+        return local
+
+    def stat(self, caminho):
+        return os.stat(self._local(caminho))
+
+    def listdir_attr(self, caminho):
+        return [
+            paramiko.SFTPAttributes.from_stat(entry.stat(), entry.name)
+            for entry in os.scandir(self._local(caminho))
+        ]
+
+    def mkdir(self, caminho):
+        os.mkdir(self._local(caminho))
+
+    def open(self, caminho, modo='r'):
+        arquivo = open(self._local(caminho), modo if 'b' in modo else modo + 'b')
+        arquivo.set_pipelined = lambda pipelined=True: None
+        return arquivo
+
+    def posix_rename(self, origem, destino):
+        os.replace(self._local(origem), self._local(destino))
+
+    def remove(self, caminho):
+        os.remove(self._local(caminho))
+
+    def close(self):
+        pass
+
+
+def _conectar(destino):
+    """
+    Abre (transport, sftp). A chave do host é fixada na primeira conexão
+    (modelo "trust on first use", como o known_hosts do SSH) e validada nas
+    conexões seguintes — sem isso, paramiko aceitaria qualquer chave e o
+    envio (incluindo a senha) ficaria vulnerável a man-in-the-middle.
+    """
+    local_dir = getattr(settings, 'BACKUP_SFTP_LOCAL_DIR', '')
+    if local_dir:
+        os.makedirs(local_dir, exist_ok=True)
+        return None, SFTPLocal(local_dir)
+
+    transport = paramiko.Transport(
+        (destino.host, destino.porta),
+        default_window_size=_JANELA_SSH,
+        default_max_packet_size=_PACOTE_SSH,
+    )
+    try:
+        transport.connect(username=destino.usuario, password=destino.get_senha())
+
+        host_key = transport.get_remote_server_key()
+        fingerprint = f"{host_key.get_name()}:{host_key.get_fingerprint().hex()}"
+        if destino.host_key_fingerprint:
+            if fingerprint != destino.host_key_fingerprint:
+                raise ValueError(
+                    "A chave SSH do servidor reserva mudou desde a última conexão "
+                    "(possível troca de servidor ou ataque man-in-the-middle). "
+                    "Envio cancelado. Se a troca foi esperada, limpe "
+                    "BackupDestino.host_key_fingerprint para confiar na nova chave."
+                )
+        else:
+            destino.host_key_fingerprint = fingerprint
+            destino.save(update_fields=['host_key_fingerprint'])
+
+        return transport, paramiko.SFTPClient.from_transport(transport)
+    except Exception:
+        transport.close()
+        raise
+
+
+def _mkdir_p(sftp, remote_dir):
+    partes = [p for p in remote_dir.split('/') if p]
+    caminho = ''
+    for parte in partes:
+        caminho += f'/{parte}'
+        try:
+            sftp.stat(caminho)
+        except FileNotFoundError:
+            sftp.mkdir(caminho)
+
+
+def _tamanho_remoto(sftp, caminho):
+    try:
+        return sftp.stat(caminho).st_size
+    except FileNotFoundError:
+        # Só "não existe" vale como ausente; erro de rede sobe para a retentativa
+        return None
+
+
+def _sha256_local(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(_BLOCO_LEITURA), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def enviar_arquivo(sftp, caminho_local, remoto):
+    """
+    Envia um arquivo retomando do offset de `<remoto>.part`, se existir.
+    Arquivo final já presente com o mesmo tamanho não é reenviado (os blocos
+    de mídia e os dumps têm nomes únicos). Retorna os bytes transferidos.
+    """
+    tamanho = os.path.getsize(caminho_local)
+    if _tamanho_remoto(sftp, remoto) == tamanho:
+        return 0
+
+    parcial = remoto + '.part'
+    offset = _tamanho_remoto(sftp, parcial) or 0
+    if offset > tamanho:
+        offset = 0
+
+    with open(caminho_local, 'rb') as origem:
+        with sftp.open(parcial, 'r+b' if offset else 'wb') as saida:
+            saida.set_pipelined(True)
+            if offset:
+                origem.seek(offset)
+                saida.seek(offset)
+            for bloco in iter(lambda: origem.read(_BLOCO_LEITURA), b''):
+                saida.write(bloco)
+    try:
+        sftp.remove(remoto)  # posix_rename sobrescreve, mas nem todo servidor o suporta
+    except FileNotFoundError:
+        pass
+    sftp.posix_rename(parcial, remoto)
+    return tamanho - offset
+
+
+class EnvioBackup:
+    """Fila de envio SFTP consumida em background durante a execução do backup."""
+
+    def __init__(self, destino, ts):
+        self.destino = destino
+        self.ts = ts
+        self.base_remota = destino.diretorio_destino.rstrip('/')
+        self.nome_manifesto = f'backup_{ts}.sha256'
+        self.bytes_enviados = 0
+        self.arquivos_enviados = 0
+        self.arquivos_presentes = 0
+        self.segundos_transferindo = 0.0
+        self.verificado = False
+        self._fila = queue.Queue()
+        self._checksums = []
+        self._locais = {}
+        self._erro = None
+        self._transport = None
+        self._sftp = None
+        self._dirs_criados = set()
+        self._listagens = {}
+        self._thread = threading.Thread(target=self._consumir, daemon=True, name='backup-envio-sftp')
+
+    # ── API usada por _executar_backup ────────────────────────────────────────
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def adicionar(self, caminho_local, relativo, se_ausente=False):
+        """
+        Enfileira um arquivo. Com `se_ausente`, ele só é enviado se não estiver
+        no servidor reserva com o mesmo tamanho (blocos de mídia já existentes).
+        """
+        if self._erro is None:
+            self._fila.put((caminho_local, relativo, se_ausente))
+
+    def concluir(self):
+        """Aguarda a fila, envia e confere o manifesto. Relança o erro do envio, se houver."""
+        self._fila.put(_FIM)
+        self._thread.join()
+        try:
+            if self._erro is not None:
+                raise self._erro
+            self._enviar_manifesto()
+            divergentes = self._divergentes()
+            if divergentes:
+                # Arquivo remoto corrompido com o tamanho certo: apaga e reenvia uma vez
+                self._reenviar(divergentes)
+                divergentes = self._divergentes()
+            if divergentes:
+                raise ValueError(
+                    f'Checksum divergente no servidor reserva (manifesto SHA-256): {", ".join(divergentes[:5])}'
+                )
+            self.verificado = True
+        finally:
+            self._desconectar()
+
+    def abortar(self):
+        self._erro = self._erro or RuntimeError('Envio abortado.')
+        self._fila.put(_FIM)
+        self._thread.join()
+        self._desconectar()
+
+    # ── Conexão ──────────────────────────────────────────────────────────────
+    def _conectar(self):
+        self._desconectar()
+        self._transport, self._sftp = _conectar(self.destino)
+        self._dirs_criados = set()
+        self._listagens = {}
+
+    def _desconectar(self):
+        for recurso in (self._sftp, self._transport):
+            if recurso is not None:
+                try:
+                    recurso.close()
+                except Exception:
+                    pass
+        self._sftp = self._transport = None
+
+    def _remoto(self, relativo):
+        remoto = f'{self.base_remota}/{relativo}'
+        pasta = remoto.rsplit('/', 1)[0]
+        if pasta not in self._dirs_criados:
+            _mkdir_p(self._sftp, pasta)
+            self._dirs_criados.add(pasta)
+        return remoto
+
+    def _presente_remoto(self, caminho_local, relativo):
+        """Arquivo final já no servidor com o tamanho local (uma listagem por pasta)."""
+        pasta, nome = f'{self.base_remota}/{relativo}'.rsplit('/', 1)
+        if pasta not in self._listagens:
+            try:
+                self._listagens[pasta] = {a.filename: a.st_size for a in self._sftp.listdir_attr(pasta)}
+            except FileNotFoundError:
+                self._listagens[pasta] = {}
+        return self._listagens[pasta].get(nome) == os.path.getsize(caminho_local)
+
+    def _com_retentativa(self, func, descricao):
+        """Executa `func`, reconectando e retomando após falhas de rede/SSH."""
+        for tentativa in range(1, _TENTATIVAS + 1):
+            try:
+                if self._sftp is None:
+                    self._conectar()
+                return func()
+            except (FileNotFoundError, PermissionError):
+                raise
+            except (OSError, EOFError, paramiko.SSHException) as exc:
+                if tentativa == _TENTATIVAS:
+                    raise
+                logger.warning("Envio SFTP de %s falhou (tentativa %d): %s; retomando.", descricao, tentativa, exc)
+            self._desconectar()
+            time.sleep(min(2 ** tentativa, 30))
+
+    # ── Thread de envio ──────────────────────────────────────────────────────
+    def _consumir(self):
+        while True:
+            item = self._fila.get()
+            if item is _FIM:
+                return
+            if self._erro is not None:
+                continue
+            caminho_local, relativo, se_ausente = item
+            try:
+                if se_ausente and self._com_retentativa(
+                    lambda: self._presente_remoto(caminho_local, relativo), relativo,
+                ):
+                    self.arquivos_presentes += 1
+                    continue
+                self._checksums.append((_sha256_local(caminho_local), relativo))
+                self._locais[relativo] = caminho_local
+                inicio = time.monotonic()
+                enviados = self._com_retentativa(
+                    lambda: enviar_arquivo(self._sftp, caminho_local, self._remoto(relativo)),
+                    relativo,
+                )
+                self.segundos_transferindo += time.monotonic() - inicio
+                self.bytes_enviados += enviados
+                self.arquivos_enviados += 1
+            except Exception as exc:
+                logger.error("Envio SFTP interrompido em %s: %s", relativo, exc)
+                self._erro = exc
+
+    # ── Manifesto ────────────────────────────────────────────────────────────
+    def _enviar_manifesto(self):
+        conteudo = ''.join(f'{digest}  {relativo}\n' for digest, relativo in self._checksums)
+
+        def _gravar():
+            remoto = self._remoto(self.nome_manifesto)
+            with self._sftp.open(remoto, 'wb') as f:
+                f.write(conteudo.encode('utf-8'))
+        self._com_retentativa(_gravar, self.nome_manifesto)
+
+    def _reenviar(self, relativos):
+        for relativo in relativos:
+            def _enviar(relativo=relativo):
+                remoto = self._remoto(relativo)
+                try:
+                    self._sftp.remove(remoto)
+                except FileNotFoundError:
+                    pass
+                return enviar_arquivo(self._sftp, self._locais[relativo], remoto)
+            self.bytes_enviados += self._com_retentativa(_enviar, relativo)
+
+    def _divergentes(self):
+        """
+        Confere o manifesto no servidor reserva (sha256sum via SSH ou, sem
+        shell, relendo os arquivos pelo SFTP). Retorna os arquivos divergentes.
+        """
+        if self._transport is not None:
+            try:
+                canal = self._transport.open_session()
+                try:
+                    canal.exec_command(
+                        f"cd {shlex.quote(self.base_remota)} && "
+                        f"sha256sum -c --quiet {shlex.quote(self.nome_manifesto)}"
+                    )
+                    if canal.recv_exit_status() == 0:
+                        return []
+                finally:
+                    canal.close()
+            except paramiko.SSHException as exc:
+                logger.info("Servidor reserva sem shell para sha256sum (%s); conferindo via SFTP.", exc)
+
+        # Sem sha256sum (ou com divergência): a releitura via SFTP aponta quais arquivos
+        divergentes = []
+        for digest, relativo in self._checksums:
+            h = hashlib.sha256()
+            with self._sftp.open(f'{self.base_remota}/{relativo}', 'rb') as f:
+                if hasattr(f, 'prefetch'):
+                    f.prefetch()
+                for bloco in iter(lambda: f.read(_BLOCO_LEITURA), b''):
+                    h.update(bloco)
+            if h.hexdigest() != digest:
+                logger.error("Checksum divergente no servidor reserva: %s", relativo)
+                divergentes.append(relativo)
+        return divergentes
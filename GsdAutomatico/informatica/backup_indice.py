@@ -0,0 +1,144 @@
+"""
+Índice compacto (SQLite) das tabelas de MODELOS_DIFF gravado ao lado de cada dump.
+
+O backup grava `backup_db_<ts>.indice.sqlite3` com as mesmas linhas que
+foram para o dump (mesmo snapshot de transação do pg_dump). Listar ou
+comparar registros de um backup lê esse arquivo diretamente, sem precisar
+restaurar nada no Postgres; só backups sem índice (anteriores a ele)
+continuam caindo para o pool de snapshots restaurados (backup_snapshots).
+
+Os valores são gravados em tipos nativos do SQLite (datas em ISO 8601,
+JSON como texto) e reconvertidos com os campos do model na leitura, de modo
+que os dicts devolvidos equivalem aos lidos do Postgres via psycopg2.
+"""
+import datetime
+import decimal
+import json
+import logging
+import os
+import sqlite3
+import uuid
+
+from django.db.models import JSONField
+
+logger = logging.getLogger(__name__)
+
+SUFIXO = '.indice.sqlite3'
+_LOTE = 1000
+
+
+def caminho_indice(arquivo_db: str) -> str:
+    base = arquivo_db.rstrip('/')
+    for ext in ('.dump', '.dir'):
+        if base.endswith(ext):
+            base = base[:-len(ext)]
+    return base + SUFIXO
+
+
+def _codificar(valor):
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, (decimal.Decimal, uuid.UUID)):
+        return str(valor)
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    if isinstance(valor, memoryview):
+        return bytes(valor)
+    return valor
+
+
+def gerar_indice(conn, destino: str, modelos) -> int:
+    """
+    Copia as tabelas dos `modelos` para um SQLite em `destino` usando a conexão
+    psycopg2 `conn` (normalmente dentro da transação cujo snapshot o pg_dump usa).
+    Retorna o total de linhas gravadas.
+    """
+    tmp = destino + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    total = 0
+    sq = sqlite3.connect(tmp)
+    try:
+        for model in modelos:
+            tabela = model._meta.db_table
+            with conn.cursor(name=f'indice_{uuid.uuid4().hex[:8]}') as cur:
+                cur.itersize = _LOTE
+                # Aspas duplas obrigatórias: db_table tem maiúsculas (ex: Ouvidoria_patd)
+                cur.execute(f'SELECT * FROM "{tabela}" ORDER BY id')
+                linhas = cur.fetchmany(_LOTE)
+                colunas = [c.name for c in cur.description]
+                definicao = ', '.join(
+                    f'"{c}" INTEGER PRIMARY KEY' if c == 'id' else f'"{c}"' for c in colunas
+                )
+                sq.execute(f'CREATE TABLE "{tabela}" ({definicao})')
+                insert = (f'INSERT INTO "{tabela}" VALUES ('
+                          + ', '.join('?' for _ in colunas) + ')')
+                while linhas:
+                    sq.executemany(insert, [[_codificar(v) for v in linha] for linha in linhas])
+                    total += len(linhas)
+                    linhas = cur.fetchmany(_LOTE)
+        sq.commit()
+    finally:
+        sq.close()
+    os.replace(tmp, destino)
+    return total
+
+
+class IndiceBackup:
+    """Leitura do índice SQLite de um backup, com a mesma forma de retorno do banco restaurado."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+
+    def _conectar(self):
+        return sqlite3.connect(f'file:{self.caminho}?mode=ro', uri=True)
+
+    def tabelas(self) -> set:
+        conn = self._conectar()
+        try:
+            return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            conn.close()
+
+    def contem(self, model) -> bool:
+        return model._meta.db_table in self.tabelas()
+
+    @staticmethod
+    def _decodificadores(model):
+        decod = {}
+        for f in model._meta.concrete_fields:
+            if isinstance(f, JSONField):
+                decod[f.column] = json.loads
+            else:
+                decod[f.column] = f.to_python
+        return decod
+
+    def _linhas(self, model, sql, params):
+        decod = self._decodificadores(model)
+        conn = self._conectar()
+        try:
+            cur = conn.execute(sql, params)
+            colunas = [c[0] for c in cur.description]
+            resultado = []
+            for linha in cur.fetchall():
+                registro = {}
+                for coluna, valor in zip(colunas, linha):
+                    if valor is not None and coluna in decod:
+                        try:
+                            valor = decod[coluna](valor)
+                        except Exception:
+                            pass  # mantém o valor bruto se o campo mudou de tipo desde o backup
+                    registro[coluna] = valor
+                resultado.append(registro)
+            return resultado
+        finally:
+            conn.close()
+
+    def buscar(self, model, pk: int) -> dict | None:
+        linhas = self._linhas(model, f'SELECT * FROM "{model._meta.db_table}" WHERE id = ?', [pk])
+        return linhas[0] if linhas else None
+
+    def listar(self, model, limit: int) -> list[dict]:
+        return self._linhas(model, f'SELECT * FROM "{model._meta.db_table}" ORDER BY id LIMIT ?', [limit])
@@ -0,0 +1,216 @@
+"""
+Backup incremental do MEDIA_ROOT em um repositório de blocos endereçados por conteúdo.
+
+Cada arquivo é dividido em blocos de até _TAMANHO_BLOCO; cada bloco é gravado
+uma única vez em backups/media_chunks/<aa>/<sha256>.zst (comprimido com zstd).
+Cada execução grava apenas um manifesto (backup_media_<ts>.manifest.json.zst)
+listando, por arquivo, tamanho, mtime e a sequência de blocos.
+
+Arquivos cujo (tamanho, mtime) não mudou desde o manifesto anterior
+reaproveitam os blocos sem serem relidos, de modo que o tempo e o espaço de
+cada backup acompanham o que mudou — não o tamanho total da mídia.
+Blocos que nenhum manifesto retido referencia são removidos por
+coletar_blocos_orfaos (chamado junto da retenção de backups antigos).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_BLOCOS = 'media_chunks'
+SUFIXO_MANIFESTO = '.manifest.json.zst'
+_TAMANHO_BLOCO = 4 * 1024 * 1024
+_NIVEL_ZSTD = 3
+_VERSAO_MANIFESTO = 1
+# Blocos mais novos que isto nunca são coletados: podem pertencer a um backup
+# em andamento cujo manifesto ainda não foi gravado.
+_CARENCIA_ORFAOS_SEGUNDOS = 6 * 3600
+
+
+def _caminho_bloco(dir_blocos, digest):
+    return os.path.join(dir_blocos, digest[:2], f'{digest}.zst')
+
+
+def _gravar_atomico(caminho, dados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dados)
+        os.replace(tmp, caminho)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def ler_manifesto(caminho):
+    with open(caminho, 'rb') as f:
+        return json.loads(zstandard.ZstdDecompressor().decompress(f.read()))
+
+
+def _ultimo_manifesto(backups_dir):
+    manifestos = sorted(
+        n for n in os.listdir(backups_dir)
+        if n.startswith('backup_media_') and n.endswith(SUFIXO_MANIFESTO)
+    )
+    for nome in reversed(manifestos):
+        try:
+            return ler_manifesto(os.path.join(backups_dir, nome))
+        except Exception as exc:
+            logger.warning("backup_media: manifesto %s ilegível (%s); ignorando.", nome, exc)
+    return None
+
+
+def backup_incremental(media_root, backups_dir, ts, ao_gravar_bloco=None):
+    """
+    Faz o backup incremental de `media_root`. Retorna (caminho_manifesto,
+    bytes_gravados, blocos_novos) — blocos_novos são os caminhos dos blocos
+    criados nesta execução (os demais já existiam em disco, mas podem faltar
+    no servidor reserva; ver blocos_do_manifesto).
+    `ao_gravar_bloco(caminho)`, se informado, é chamado assim que cada bloco
+    novo é gravado (o envio remoto começa antes do fim do backup).
+    """
+    dir_blocos = os.path.join(backups_dir, DIRETORIO_BLOCOS)
+    os.makedirs(dir_blocos, exist_ok=True)
+
+    anterior = _ultimo_manifesto(backups_dir)
+    anteriores = {a['caminho']: a for a in anterior['arquivos']} if anterior else {}
+
+    compressor = zstandard.ZstdCompressor(level=_NIVEL_ZSTD)
+    arquivos = []
+    blocos_novos = []
+    bytes_gravados = 0
+    reaproveitados = 0
+
+    for raiz, dirs, nomes in os.walk(media_root):
+        dirs.sort()
+        for nome in sorted(nomes):
+            caminho = os.path.join(raiz, nome)
+            relativo = os.path.relpath(caminho, media_root).replace(os.sep, '/')
+            try:
+                st = os.stat(caminho)
+            except OSError:
+                continue
+
+            ant = anteriores.get(relativo)
+            if (ant and ant['tamanho'] == st.st_size and ant['mtime_ns'] == st.st_mtime_ns
+                    and all(os.path.exists(_caminho_bloco(dir_blocos, d)) for d in ant['blocos'])):
+                arquivos.append(ant)
+                reaproveitados += 1
+                continue
+
+            blocos = []
+            try:
+                with open(caminho, 'rb') as f:
+                    for bloco in iter(lambda: f.read(_TAMANHO_BLOCO), b''):
+                        digest = hashlib.sha256(bloco).hexdigest()
+                        destino = _caminho_bloco(dir_blocos, digest)
+                        if not os.path.exists(destino):
+                            dados = compressor.compress(bloco)
+                            _gravar_atomico(destino, dados)
+                            blocos_novos.append(destino)
+                            if ao_gravar_bloco is not None:
+                                ao_gravar_bloco(destino)
+                            bytes_gravados += len(dados)
+                        blocos.append(digest)
+            except OSError as exc:
+                logger.warning("backup_media: não foi possível ler %s: %s", caminho, exc)
+                continue
+            arquivos.append({
+                'caminho': relativo,
+                'tamanho': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'modo': st.st_mode & 0o777,
+                'blocos': blocos,
+            })
+
+    manifesto = {'versao': _VERSAO_MANIFESTO, 'ts': ts, 'arquivos': arquivos}
+    caminho_manifesto = os.path.join(backups_dir, f'backup_media_{ts}{SUFIXO_MANIFESTO}')
+    dados = compressor.compress(json.dumps(manifesto, separators=(',', ':')).encode('utf-8'))
+    _gravar_atomico(caminho_manifesto, dados)
+    bytes_gravados += len(dados)
+
+    logger.info(
+        "backup_media: %d arquivo(s), %d reaproveitado(s), %d bloco(s) novo(s), %d bytes gravados.",
+        len(arquivos), reaproveitados, len(blocos_novos), bytes_gravados,
+    )
+    return caminho_manifesto, bytes_gravados, blocos_novos
+
+
+def blocos_do_manifesto(caminho_manifesto, dir_blocos=None):
+    """Caminhos locais (sem repetição) de todos os blocos que o manifesto referencia."""
+    dir_blocos = dir_blocos or os.path.join(os.path.dirname(caminho_manifesto), DIRETORIO_BLOCOS)
+    digests = {d for arquivo in ler_manifesto(caminho_manifesto)['arquivos'] for d in arquivo['blocos']}
+    return [_caminho_bloco(dir_blocos, d) for d in sorted(digests)]
+
+
+def restaurar_media(caminho_manifesto, destino, dir_blocos=None):
+    """Reconstrói em `destino` os arquivos do manifesto. Retorna a quantidade de arquivos."""
+    dir_blocos = dir_blocos or os.path.join(os.path.dirname(caminho_manifesto), DIRETORIO_BLOCOS)
+    manifesto = ler_manifesto(caminho_manifesto)
+    descompressor = zstandard.ZstdDecompressor()
+    destino_abs = os.path.abspath(destino)
+    for arquivo in manifesto['arquivos']:
+        caminho = os.path.abspath(os.path.join(destino_abs, arquivo['caminho']))
+        if not caminho.startswith(destino_abs + os.sep):
+            raise ValueError(f"Caminho inválido no manifesto: {arquivo['caminho']}")
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'wb') as f:
+            for digest in arquivo['blocos']:
+                with open(_caminho_bloco(dir_blocos, digest), 'rb') as b:
+                    bloco = descompressor.decompress(b.read())
+                if hashlib.sha256(bloco).hexdigest() != digest:
+                    raise ValueError(f'Bloco corrompido: {digest}')
+                f.write(bloco)
+        os.chmod(caminho, arquivo.get('modo', 0o644))
+        os.utime(caminho, ns=(arquivo['mtime_ns'], arquivo['mtime_ns']))
+    return len(manifesto['arquivos'])
+
+
+def coletar_blocos_orfaos(backups_dir, carencia=_CARENCIA_ORFAOS_SEGUNDOS):
+    """
+    Remove blocos não referenciados por nenhum manifesto presente e gravados
+    há mais de `carencia` segundos. Retorna quantos removeu.
+    """
+    dir_blocos = os.path.join(backups_dir, DIRETORIO_BLOCOS)
+    if not os.path.isdir(dir_blocos):
+        return 0
+    limite = time.time() - carencia
+    referenciados = set()
+    for nome in os.listdir(backups_dir):
+        if nome.startswith('backup_media_') and nome.endswith(SUFIXO_MANIFESTO):
+            try:
+                manifesto = ler_manifesto(os.path.join(backups_dir, nome))
+            except Exception as exc:
+                # Manifesto ilegível: não arrisca apagar blocos que ele poderia usar
+                logger.warning("backup_media: manifesto %s ilegível (%s); coleta cancelada.", nome, exc)
+                return 0
+            for arquivo in manifesto['arquivos']:
+                referenciados.update(arquivo['blocos'])
+
+    removidos = 0
+    for sub in os.scandir(dir_blocos):
+        if not sub.is_dir():
+            continue
+        for entry in os.scandir(sub.path):
+            if not entry.name.endswith('.zst'):
+                continue
+            digest = entry.name[:-len('.zst')]
+            if digest not in referenciados:
+                try:
+                    if entry.stat().st_mtime > limite:
+                        continue
+                    os.remove(entry.path)
+                    removidos += 1
+                except OSError:
+                    pass
+    if removidos:
+        logger.info("backup_media: %d bloco(s) órfão(s) removido(s).", removidos)
+    return removidos
@@ -98,6 +98,29 @@ def baixar_arquivo(destino, caminho: str) -> bytes:
         client.close()
 
 
+def baixar_diretorio(destino, caminho: str, destino_local: str):
+    """Baixa recursivamente o diretório remoto `caminho` para `destino_local` (ex.: dump -F d)."""
+    import os
+
+    client = _client(destino)
+    try:
+        sftp = client.open_sftp()
+        try:
+            pendentes = [(caminho.rstrip('/'), destino_local)]
+            while pendentes:
+                remoto, local = pendentes.pop()
+                os.makedirs(local, exist_ok=True)
+                for e in sftp.listdir_attr(remoto):
+                    if stat.S_ISDIR(e.st_mode):
+                        pendentes.append((f'{remoto}/{e.filename}', os.path.join(local, e.filename)))
+                    else:
+                        sftp.get(f'{remoto}/{e.filename}', os.path.join(local, e.filename))
+        finally:
+            sftp.close()
+    finally:
+        client.close()
+
+
 def excluir_arquivo(destino, caminho: str):
     client = _client(destino)
     try:
@@ -0,0 +1,236 @@
+"""
+Pool de bancos temporários com backups já restaurados (BackupSnapshot).
+
+Restaurar um dump inteiro (createdb + pg_restore) custa minutos; antes isso
+era feito — e desfeito — a cada clique na exploração de backups. Agora o
+primeiro acesso a uma BackupExecucao restaura o dump num banco `snap_<pk>_*`
+que é reaproveitado pelos acessos seguintes, de modo que paginar a listagem
+ou comparar registros só faz consultas SQL.
+
+Backups com índice SQLite (backup_indice) nem chegam aqui: obter_fonte
+devolve o índice. Para os demais, a restauração é seletiva (pg_restore -t)
+apenas das tabelas de MODELOS_DIFF.
+
+Política de descarte (aplicada a cada nova restauração e pelo Celery Beat):
+  - snapshots sem acesso há mais de BACKUP_SNAPSHOT_TTL_MINUTOS;
+  - além de BACKUP_SNAPSHOT_MAX, os menos usados recentemente.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import psycopg2
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.utils import timezone
+
+from .backup_diff import (_db_conf, dropar_temp, remover_temp, resolver_arquivo_db,
+                          restaurar_dump_temp, tabelas_diff)
+from .backup_indice import IndiceBackup, caminho_indice
+from .models import BackupSnapshot
+
+logger = logging.getLogger(__name__)
+
+_PREFIXO = 'snap_'
+# Tempo máximo que uma requisição espera a restauração feita por outra
+_RESTAURACAO_MAX_SEGUNDOS = 330
+# A restauração renova batimento_em a cada _BATIMENTO_SEGUNDOS; sem sinal há mais
+# de _BATIMENTO_LIMITE_SEGUNDOS o snapshot 'restaurando' é considerado abandonado
+# (worker morto). O download e o pg_restore podem levar mais que a espera acima.
+_BATIMENTO_SEGUNDOS = 15
+_BATIMENTO_LIMITE_SEGUNDOS = 90
+# Acessos só atualizam ultimo_acesso se o último registro tiver mais que isto
+_TOQUE_MIN_SEGUNDOS = 30
+
+
+class BackupIndisponivel(Exception):
+    """O arquivo do dump não existe em disco nem no servidor remoto."""
+
+
+def _ttl():
+    return timedelta(minutes=settings.BACKUP_SNAPSHOT_TTL_MINUTOS)
+
+
+def _tocar(snapshot):
+    agora = timezone.now()
+    if (agora - snapshot.ultimo_acesso).total_seconds() > _TOQUE_MIN_SEGUNDOS:
+        BackupSnapshot.objects.filter(pk=snapshot.pk).update(ultimo_acesso=agora)
+
+
+def _bater(pk, parar):
+    """Thread que mantém batimento_em atualizado até `parar` ser sinalizado."""
+    try:
+        while not parar.wait(_BATIMENTO_SEGUNDOS):
+            BackupSnapshot.objects.filter(pk=pk, status='restaurando').update(batimento_em=timezone.now())
+    finally:
+        connection.close()
+
+
+def _restaurar(execucao):
+    """Cria o registro 'restaurando', restaura o dump e marca como pronto."""
+    snapshot = BackupSnapshot.objects.create(
+        execucao=execucao,
+        nome_banco=f'{_PREFIXO}{execucao.pk}_{uuid.uuid4().hex[:8]}',
+    )
+    parar = threading.Event()
+    batimento = threading.Thread(target=_bater, args=(snapshot.pk, parar), daemon=True,
+                                 name=f'snapshot-batimento-{snapshot.pk}')
+    batimento.start()
+    arquivo_temp = None
+    try:
+        arquivo_local, arquivo_temp = resolver_arquivo_db(execucao)
+        if not arquivo_local:
+            raise BackupIndisponivel('Arquivo de backup não encontrado em disco nem no servidor remoto.')
+        inicio = time.monotonic()
+        restaurar_dump_temp(arquivo_local, tempdb=snapshot.nome_banco, tabelas=tabelas_diff())
+        logger.info("Snapshot %s restaurado em %.1fs (backup #%s).",
+                    snapshot.nome_banco, time.monotonic() - inicio, execucao.pk)
+    except Exception:
+        snapshot.delete()
+        dropar_temp(snapshot.nome_banco)
+        raise
+    finally:
+        parar.set()
+        batimento.join()
+        remover_temp(arquivo_temp)
+
+    snapshot.status = 'pronto'
+    snapshot.ultimo_acesso = timezone.now()
+    marcados = BackupSnapshot.objects.filter(pk=snapshot.pk, status='restaurando').update(
+        status=snapshot.status, ultimo_acesso=snapshot.ultimo_acesso,
+    )
+    if not marcados:
+        # Descartado durante a restauração (ex.: pela limpeza): o banco não é de mais ninguém
+        dropar_temp(snapshot.nome_banco)
+        raise BackupIndisponivel('O snapshot foi descartado durante a restauração. Tente novamente.')
+    aplicar_politica(manter=snapshot.pk)
+    return snapshot
+
+
+def obter_snapshot(execucao) -> str:
+    """
+    Nome do banco com o dump da execução restaurado, restaurando-o apenas se
+    ainda não houver um snapshot pronto. Se outra requisição (ou o aquecimento
+    em background) já estiver restaurando, aguarda ela terminar.
+    """
+    limite = time.monotonic() + _RESTAURACAO_MAX_SEGUNDOS
+    while True:
+        snapshot = BackupSnapshot.objects.filter(execucao=execucao).first()
+        if snapshot is None:
+            try:
+                return _restaurar(execucao).nome_banco
+            except IntegrityError:
+                continue  # outra requisição começou a restaurar ao mesmo tempo
+        if snapshot.status == 'pronto':
+            _tocar(snapshot)
+            return snapshot.nome_banco
+
+        silencio = (timezone.now() - snapshot.batimento_em).total_seconds()
+        if silencio > _BATIMENTO_LIMITE_SEGUNDOS:
+            logger.warning("Snapshot %s abandonado durante a restauração; descartando.", snapshot.nome_banco)
+            descartar(snapshot)
+            continue
+        if time.monotonic() > limite:
+            raise TimeoutError('A restauração do backup ainda está em andamento. Tente novamente em instantes.')
+        time.sleep(1)
+
+
+def obter_indice(execucao):
+    """
+    IndiceBackup da execução, ou None se o backup não tiver índice. Se só
+    existir no servidor reserva, é baixado de volta para a pasta de backups.
+    """
+    if not execucao.arquivo_db:
+        return None
+    caminho = caminho_indice(execucao.arquivo_db)
+    if not os.path.exists(caminho):
+        chave_ausente = f'backup_indice_ausente:{execucao.pk}'
+        if cache.get(chave_ausente):
+            return None
+        baixado, arquivo_temp = resolver_arquivo_db(execucao, caminho)
+        if not baixado:
+            # Backups anteriores ao índice: evita tentar o SFTP a cada clique
+            cache.set(chave_ausente, True, 600)
+            return None
+        if arquivo_temp:
+            try:
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                os.replace(arquivo_temp, caminho)
+            except OSError:
+                caminho = arquivo_temp
+    return IndiceBackup(caminho)
+
+
+def obter_fonte(execucao, model=None):
+    """
+    Fonte de leitura do backup para backup_diff: o índice SQLite quando ele
+    contém a tabela do model, senão o nome do snapshot restaurado.
+    """
+    try:
+        indice = obter_indice(execucao)
+        if indice is not None and (model is None or indice.contem(model)):
+            return indice
+    except Exception as exc:
+        logger.warning("Índice do backup #%s ilegível, usando restauração: %s", execucao.pk, exc)
+    return obter_snapshot(execucao)
+
+
+def precisa_aquecer(execucao) -> bool:
+    """True se a exploração desse backup vai precisar de um snapshot ainda não restaurado."""
+    if execucao.arquivo_db and os.path.exists(caminho_indice(execucao.arquivo_db)):
+        return False
+    return not BackupSnapshot.objects.filter(execucao=execucao, status='pronto').exists()
+
+
+def descartar(snapshot):
+    """Remove o registro (para que ninguém mais o use) e dropa o banco."""
+    BackupSnapshot.objects.filter(pk=snapshot.pk).delete()
+    if not dropar_temp(snapshot.nome_banco):
+        # Ainda em uso por alguma conexão — limpar_orfaos tenta de novo depois
+        logger.warning("Não foi possível dropar %s agora; ficará para a limpeza de órfãos.", snapshot.nome_banco)
+
+
+def aplicar_politica(manter=None):
+    """Descarta snapshots expirados (TTL) e os excedentes (LRU). Retorna quantos foram descartados."""
+    prontos = list(BackupSnapshot.objects.filter(status='pronto').order_by('-ultimo_acesso'))
+    limite_acesso = timezone.now() - _ttl()
+    descartados = 0
+    vagas = settings.BACKUP_SNAPSHOT_MAX
+    for snapshot in prontos:
+        if snapshot.pk == manter:
+            vagas -= 1
+            continue
+        if snapshot.ultimo_acesso >= limite_acesso and vagas > 0:
+            vagas -= 1
+            continue
+        descartar(snapshot)
+        descartados += 1
+    return descartados
+
+
+def limpar_orfaos():
+    """Dropa bancos snap_* que não pertencem a nenhum BackupSnapshot (ex.: drop que falhou)."""
+    db_conf = _db_conf()
+    conn = psycopg2.connect(
+        host=db_conf['HOST'], port=db_conf['PORT'], user=db_conf['USER'],
+        password=db_conf['PASSWORD'], dbname=db_conf['NAME'],
+    )
+    try:
+        with conn.cursor() as cur:
+            # '_' é curinga no LIKE: sem escapar, 'snap_%' casaria também 'snapshot', 'snapX'...
+            cur.execute(
+                "SELECT datname FROM pg_database WHERE datname LIKE %s", [_PREFIXO.replace('_', r'\_') + '%'],
+            )
+            existentes = {row[0] for row in cur.fetchall()}
+    finally:
+        conn.close()
+    conhecidos = set(BackupSnapshot.objects.values_list('nome_banco', flat=True))
+    removidos = 0
+    for nome in existentes - conhecidos:
+        if dropar_temp(nome):
+            removidos += 1
+    return removidos
@@ -0,0 +1,21 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from informatica.backup_media import restaurar_media
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a mídia de um backup incremental (backup_media_<ts>.manifest.json.zst) em um diretório'
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifesto', help='Caminho do manifesto da execução de backup')
+        parser.add_argument('destino', help='Diretório onde os arquivos serão recriados')
+        parser.add_argument('--blocos', default=None,
+                            help='Diretório media_chunks (padrão: ao lado do manifesto)')
+
+    def handle(self, *args, **options):
+        if not os.path.isfile(options['manifesto']):
+            raise CommandError(f"Manifesto não encontrado: {options['manifesto']}")
+        total = restaurar_media(options['manifesto'], options['destino'], options['blocos'])
+        self.stdout.write(self.style.SUCCESS(f'{total} arquivo(s) restaurado(s) em {options["destino"]}.'))
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.24 on 2026-10-17 08:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informatica', '0015_cautela_fk_set_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_banco', models.CharField(max_length=63, unique=True)),
+                ('status', models.CharField(choices=[('restaurando', 'Restaurando'), ('pronto', 'Pronto')], default='restaurando', max_length=20)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('ultimo_acesso', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('execucao', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='informatica.backupexecucao')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Restaurado de Backup',
+                'verbose_name_plural': 'Snapshots Restaurados de Backup',
+                'ordering': ['-ultimo_acesso'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-17 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informatica', '0016_backupsnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backupexecucao',
+            name='arquivo_media',
+            field=models.CharField(blank=True, max_length=500, verbose_name='Manifesto local do backup de mídia'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.24 on 2026-10-17 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informatica', '0017_backupexecucao_manifesto_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupexecucao',
+            name='bytes_enviados',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='backupexecucao',
+            name='duracao_envio_segundos',
+            field=models.FloatField(blank=True, null=True, verbose_name='Tempo de transferência (s)'),
+        ),
+        migrations.AddField(
+            model_name='backupexecucao',
+            name='envio_verificado',
+            field=models.BooleanField(default=False, verbose_name='Checksums conferidos no servidor reserva'),
+        ),
+        migrations.AddField(
+            model_name='backupexecucao',
+            name='offsite_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Cópia remota concluída em'),
+        ),
+    ]
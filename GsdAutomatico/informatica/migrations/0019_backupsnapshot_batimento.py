@@ -0,0 +1,19 @@
+# Generated by Django 4.2.24 on 2026-10-17 09:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('informatica', '0018_backupexecucao_envio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupsnapshot',
+            name='batimento_em',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Último sinal da restauração'),
+        ),
+    ]
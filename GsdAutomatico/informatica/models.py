@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import Group
 from Secao_pessoal.models import Efetivo
 from .crypto import encrypt_text, decrypt_text
@@ -221,11 +222,15 @@ class BackupExecucao(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='em_andamento')
 
     arquivo_db = models.CharField(max_length=500, blank=True, verbose_name="Arquivo local do dump do banco")
-    arquivo_media = models.CharField(max_length=500, blank=True, verbose_name="Arquivo local do tar de mídia")
+    arquivo_media = models.CharField(max_length=500, blank=True, verbose_name="Manifesto local do backup de mídia")
     tamanho_db_bytes = models.BigIntegerField(default=0)
     tamanho_media_bytes = models.BigIntegerField(default=0)
 
     enviado_remoto = models.BooleanField(default=False)
+    envio_verificado = models.BooleanField(default=False, verbose_name="Checksums conferidos no servidor reserva")
+    bytes_enviados = models.BigIntegerField(default=0)
+    duracao_envio_segundos = models.FloatField(null=True, blank=True, verbose_name="Tempo de transferência (s)")
+    offsite_em = models.DateTimeField(null=True, blank=True, verbose_name="Cópia remota concluída em")
     erro_detalhe = models.TextField(blank=True)
 
     class Meta:
@@ -236,6 +241,48 @@ class BackupExecucao(models.Model):
     def __str__(self):
         return f"Backup {self.iniciado_em:%d/%m/%Y %H:%M} ({self.get_status_display()})"
 
+    @property
+    def vazao_envio_mb_s(self):
+        """Vazão média do envio SFTP em MB/s (None se nada foi transferido)."""
+        if not self.bytes_enviados or not self.duracao_envio_segundos:
+            return None
+        return self.bytes_enviados / self.duracao_envio_segundos / (1024 * 1024)
+
+    @property
+    def tempo_ate_offsite(self):
+        """Intervalo entre o início do backup e a cópia remota verificada."""
+        if not self.offsite_em:
+            return None
+        return self.offsite_em - self.iniciado_em
+
+
+class BackupSnapshot(models.Model):
+    """
+    Banco Postgres temporário com o dump de uma BackupExecucao já restaurado,
+    reaproveitado entre requisições da exploração de backups (ver backup_snapshots).
+    """
+
+    STATUS_CHOICES = [
+        ('restaurando', 'Restaurando'),
+        ('pronto', 'Pronto'),
+    ]
+
+    execucao = models.OneToOneField(BackupExecucao, on_delete=models.CASCADE, related_name='snapshot')
+    nome_banco = models.CharField(max_length=63, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='restaurando')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    ultimo_acesso = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Renovado periodicamente enquanto a restauração está viva (ver backup_snapshots)
+    batimento_em = models.DateTimeField(default=timezone.now, verbose_name="Último sinal da restauração")
+
+    class Meta:
+        verbose_name = "Snapshot Restaurado de Backup"
+        verbose_name_plural = "Snapshots Restaurados de Backup"
+        ordering = ['-ultimo_acesso']
+
+    def __str__(self):
+        return f"{self.nome_banco} ({self.get_status_display()})"
+
 
 class CautelaItem(models.Model):
     cautela = models.ForeignKey(Cautela, on_delete=models.CASCADE, related_name='itens')
@@ -102,15 +102,81 @@ def executar_backup_manual_task(self, execucao_id=None):
     return _executar_backup(execucao_id=execucao_id)
 
 
+@shared_task
+def aquecer_snapshot_task(execucao_id):
+    """Restaura em background o snapshot de um backup que o admin começou a explorar."""
+    from .backup_snapshots import obter_snapshot
+    from .models import BackupExecucao
+
+    execucao = BackupExecucao.objects.filter(pk=execucao_id).first()
+    if execucao is None:
+        return None
+    try:
+        return obter_snapshot(execucao)
+    except Exception as exc:
+        logger.warning("aquecer_snapshot_task: falha ao restaurar backup #%s: %s", execucao_id, exc)
+        return None
+
+
+@shared_task
+def expirar_snapshots_task():
+    """Descarta snapshots de backup expirados/excedentes e bancos órfãos (Celery Beat)."""
+    from .backup_snapshots import aplicar_politica, limpar_orfaos
+
+    descartados = aplicar_politica()
+    try:
+        descartados += limpar_orfaos()
+    except Exception as exc:
+        logger.warning("expirar_snapshots_task: falha ao limpar bancos órfãos: %s", exc)
+    return descartados
+
+
+# Chave do pg_advisory_lock que serializa as execuções de backup
+_TRAVA_BACKUP = 0x42414B50
+
+
 def _executar_backup(execucao_id=None):
     """
-    Backup diário (banco via pg_dump -F c + mídia via tar.gz) salvo em /app/backups,
-    com envio opcional via SFTP para o servidor reserva configurado em BackupDestino.
+    Executa _fazer_backup com exclusividade. Um backup manual ("executar agora")
+    pode coincidir com o do Beat; em paralelo, a coleta de blocos órfãos de um
+    apagaria blocos que o outro acabou de gravar e ainda não estão no manifesto.
+    A trava é de sessão no Postgres, liberada também se o worker morrer.
+    """
+    from django.db import connection
+    from django.utils import timezone
+
+    from .models import BackupExecucao
+
+    with connection.cursor() as cur:
+        cur.execute('SELECT pg_try_advisory_lock(%s)', [_TRAVA_BACKUP])
+        obtida = cur.fetchone()[0]
+    if not obtida:
+        logger.warning("executar_backup_task: outro backup já está em andamento; execução ignorada.")
+        if execucao_id:
+            BackupExecucao.objects.filter(pk=execucao_id, status='em_andamento').update(
+                status='erro', erro_detalhe='Outro backup já está em andamento.', finalizado_em=timezone.now(),
+            )
+        return None
+    try:
+        return _fazer_backup(execucao_id)
+    finally:
+        with connection.cursor() as cur:
+            cur.execute('SELECT pg_advisory_unlock(%s)', [_TRAVA_BACKUP])
+
+
+def _fazer_backup(execucao_id=None):
+    """
+    Backup diário salvo em /app/backups, com envio opcional via SFTP para o
+    servidor reserva configurado em BackupDestino:
+      - banco: pg_dump em formato diretório (-F d) com BACKUP_PG_JOBS jobs paralelos;
+      - mídia: backup incremental em blocos deduplicados com zstd (backup_media);
+      - envio: cada arquivo entra na fila de EnvioBackup assim que fica pronto,
+        então o upload do dump corre junto com o backup da mídia (backup_envio).
     """
     import os
     import subprocess
-    import tarfile
 
+    import psycopg2
     from django.conf import settings
     from django.utils import timezone
 
@@ -130,33 +196,75 @@ def _executar_backup(execucao_id=None):
     else:
         execucao = BackupExecucao.objects.create()
 
-    arquivo_db = os.path.join(backups_dir, f'backup_db_{ts}.dump')
-    arquivo_media = os.path.join(backups_dir, f'backup_media_{ts}.tar.gz')
+    arquivo_db = os.path.join(backups_dir, f'backup_db_{ts}.dir')
+    arquivo_media = ''
+    arquivo_indice = ''
+
+    destino = BackupDestino.get_instance()
+    envio = None
+    if destino.ativo and destino.host:
+        from .backup_envio import EnvioBackup
+        envio = EnvioBackup(destino, ts).iniciar()
+
+    def _enfileirar(caminho):
+        if envio is not None:
+            envio.adicionar(caminho, os.path.relpath(caminho, backups_dir).replace(os.sep, '/'))
 
     try:
         env = os.environ.copy()
         env['PGPASSWORD'] = db_conf['PASSWORD'] or ''
-        subprocess.run(
-            [
-                'pg_dump', '-h', db_conf['HOST'], '-p', str(db_conf['PORT']),
-                '-U', db_conf['USER'], '-d', db_conf['NAME'], '-F', 'c', '-f', arquivo_db,
-            ],
-            env=env, check=True, capture_output=True, text=True, timeout=270,
+        # Transação REPEATABLE READ cujo snapshot é exportado para o pg_dump:
+        # o índice SQLite (backup_indice) é lido nela e fica idêntico ao dump.
+        conn_snapshot = psycopg2.connect(
+            host=db_conf['HOST'], port=db_conf['PORT'], user=db_conf['USER'],
+            password=db_conf['PASSWORD'], dbname=db_conf['NAME'],
         )
+        try:
+            conn_snapshot.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            with conn_snapshot.cursor() as cur:
+                cur.execute('SELECT pg_export_snapshot()')
+                snapshot_id = cur.fetchone()[0]
+            subprocess.run(
+                [
+                    'pg_dump', '-h', db_conf['HOST'], '-p', str(db_conf['PORT']),
+                    '-U', db_conf['USER'], '-d', db_conf['NAME'], '-F', 'd', '-f', arquivo_db,
+                    '-j', str(settings.BACKUP_PG_JOBS), f'--snapshot={snapshot_id}',
+                ],
+                env=env, check=True, capture_output=True, text=True, timeout=settings.BACKUP_PG_DUMP_TIMEOUT,
+            )
+            arquivo_indice = _gerar_indice_backup(conn_snapshot, arquivo_db)
+        finally:
+            conn_snapshot.close()
+        for caminho in _arquivos_do_artefato(arquivo_db) + ([arquivo_indice] if arquivo_indice else []):
+            _enfileirar(caminho)
 
+        tamanho_media = 0
         media_root = settings.MEDIA_ROOT
         if os.path.isdir(media_root):
-            with tarfile.open(arquivo_media, 'w:gz') as tar:
-                tar.add(media_root, arcname='media')
-        else:
-            arquivo_media = ''
+            from .backup_media import backup_incremental, blocos_do_manifesto
+            arquivo_media, tamanho_media, blocos_novos = backup_incremental(
+                media_root, backups_dir, ts, ao_gravar_bloco=_enfileirar,
+            )
+            if envio is not None:
+                # Blocos reaproveitados também precisam estar no servidor reserva:
+                # um envio anterior que falhou pode ter deixado algum para trás.
+                novos = set(blocos_novos)
+                for caminho in blocos_do_manifesto(arquivo_media):
+                    if caminho not in novos:
+                        envio.adicionar(
+                            caminho, os.path.relpath(caminho, backups_dir).replace(os.sep, '/'), se_ausente=True,
+                        )
+            _enfileirar(arquivo_media)
 
         execucao.arquivo_db = arquivo_db
         execucao.arquivo_media = arquivo_media
-        execucao.tamanho_db_bytes = os.path.getsize(arquivo_db)
-        execucao.tamanho_media_bytes = os.path.getsize(arquivo_media) if arquivo_media else 0
+        execucao.tamanho_db_bytes = _tamanho_em_disco(arquivo_db)
+        # Incremental: só o que esta execução gravou (manifesto + blocos novos)
+        execucao.tamanho_media_bytes = tamanho_media
         execucao.status = 'sucesso_local'
     except subprocess.CalledProcessError as exc:
+        if envio is not None:
+            envio.abortar()
         execucao.status = 'erro'
         execucao.erro_detalhe = exc.stderr or str(exc)
         execucao.finalizado_em = timezone.now()
@@ -164,6 +272,8 @@ def _executar_backup(execucao_id=None):
         logger.error("executar_backup_task: pg_dump falhou: %s", execucao.erro_detalhe)
         raise
     except Exception as exc:
+        if envio is not None:
+            envio.abortar()
         execucao.status = 'erro'
         execucao.erro_detalhe = str(exc)
         execucao.finalizado_em = timezone.now()
@@ -173,15 +283,18 @@ def _executar_backup(execucao_id=None):
 
     # O backup local já está garantido a partir daqui — uma falha no envio remoto
     # (rede, credencial errada etc.) não pode apagar o sucesso do backup local.
-    destino = BackupDestino.get_instance()
-    if destino.ativo and destino.host:
+    if envio is not None:
         try:
-            _enviar_sftp(destino, [arquivo_db] + ([arquivo_media] if arquivo_media else []))
+            envio.concluir()
             execucao.enviado_remoto = True
+            execucao.envio_verificado = envio.verificado
+            execucao.offsite_em = timezone.now()
             execucao.status = 'sucesso_remoto'
         except Exception as exc:
             execucao.erro_detalhe = f'Backup local ok, mas envio remoto falhou: {exc}'
             logger.error("executar_backup_task: envio SFTP falhou: %s", exc)
+        execucao.bytes_enviados = envio.bytes_enviados
+        execucao.duracao_envio_segundos = envio.segundos_transferindo
 
     execucao.finalizado_em = timezone.now()
     execucao.save()
@@ -190,63 +303,62 @@ def _executar_backup(execucao_id=None):
     return execucao.id
 
 
-def _enviar_sftp(destino, arquivos_locais):
+def _tamanho_em_disco(caminho):
+    import os
+
+    if os.path.isdir(caminho):
+        return sum(
+            os.path.getsize(os.path.join(raiz, nome))
+            for raiz, _dirs, nomes in os.walk(caminho) for nome in nomes
+        )
+    return os.path.getsize(caminho)
+
+
+def _arquivos_do_artefato(artefato):
+    """Arquivos de um artefato do backup (o dump em formato diretório é expandido)."""
+    import os
+
+    if not os.path.isdir(artefato):
+        return [artefato]
+    return [
+        os.path.join(raiz, nome)
+        for raiz, _dirs, nomes in sorted(os.walk(artefato)) for nome in sorted(nomes)
+    ]
+
+
+def _gerar_indice_backup(conn, arquivo_db):
     """
-    Envia os arquivos via SFTP. A chave do host é fixada na primeira conexão
-    (modelo "trust on first use", como o known_hosts do SSH) e validada nas
-    conexões seguintes — sem isso, paramiko aceitaria qualquer chave e o
-    envio (incluindo a senha) ficaria vulnerável a man-in-the-middle.
+    Grava o índice SQLite das tabelas de MODELOS_DIFF ao lado do dump.
+    Opcional: sem ele a exploração do backup cai para a restauração do dump.
     """
-    import paramiko
+    from .backup_diff import MODELOS_DIFF
+    from .backup_indice import caminho_indice, gerar_indice
 
-    transport = paramiko.Transport((destino.host, destino.porta))
+    destino = caminho_indice(arquivo_db)
     try:
-        transport.connect(username=destino.usuario, password=destino.get_senha())
-
-        host_key = transport.get_remote_server_key()
-        fingerprint = f"{host_key.get_name()}:{host_key.get_fingerprint().hex()}"
-        if destino.host_key_fingerprint:
-            if fingerprint != destino.host_key_fingerprint:
-                raise ValueError(
-                    "A chave SSH do servidor reserva mudou desde a última conexão "
-                    "(possível troca de servidor ou ataque man-in-the-middle). "
-                    "Envio cancelado. Se a troca foi esperada, limpe "
-                    "BackupDestino.host_key_fingerprint para confiar na nova chave."
-                )
-        else:
-            destino.host_key_fingerprint = fingerprint
-            destino.save(update_fields=['host_key_fingerprint'])
-
-        sftp = paramiko.SFTPClient.from_transport(transport)
-        try:
-            _sftp_mkdir_p(sftp, destino.diretorio_destino)
-            for caminho_local in arquivos_locais:
-                nome = caminho_local.replace('\\', '/').rsplit('/', 1)[-1]
-                destino_remoto = f"{destino.diretorio_destino.rstrip('/')}/{nome}"
-                sftp.put(caminho_local, destino_remoto)
-        finally:
-            sftp.close()
-    finally:
-        transport.close()
-
-
-def _sftp_mkdir_p(sftp, remote_dir):
-    partes = [p for p in remote_dir.split('/') if p]
-    caminho = ''
-    for parte in partes:
-        caminho += f'/{parte}'
-        try:
-            sftp.stat(caminho)
-        except FileNotFoundError:
-            sftp.mkdir(caminho)
+        total = gerar_indice(conn, destino, [cfg['model'] for cfg in MODELOS_DIFF.values()])
+        logger.info("executar_backup_task: índice %s gravado (%d linhas).", destino, total)
+        return destino
+    except Exception as exc:
+        logger.warning("executar_backup_task: falha ao gerar índice do backup: %s", exc)
+        return ''
 
 
 def _limpar_backups_antigos(backups_dir, dias_retencao):
     import os
+    import shutil
     import time
 
+    from .backup_media import DIRETORIO_BLOCOS, coletar_blocos_orfaos
+
     cutoff = time.time() - dias_retencao * 86400
     for nome in os.listdir(backups_dir):
         caminho = os.path.join(backups_dir, nome)
-        if os.path.isfile(caminho) and os.path.getmtime(caminho) < cutoff:
+        if nome == DIRETORIO_BLOCOS or os.path.getmtime(caminho) >= cutoff:
+            continue
+        if os.path.isfile(caminho):
             os.remove(caminho)
+        elif os.path.isdir(caminho):
+            shutil.rmtree(caminho, ignore_errors=True)  # dump em formato diretório
+    # Blocos de mídia só saem quando nenhum manifesto retido os referencia
+    coletar_blocos_orfaos(backups_dir)
@@ -1,3 +1,272 @@
-from django.test import TestCase
+import errno
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import backup_snapshots
+from .backup_envio import EnvioBackup, SFTPLocal, _tamanho_remoto, enviar_arquivo
+from .backup_media import (DIRETORIO_BLOCOS, backup_incremental, blocos_do_manifesto,
+                           coletar_blocos_orfaos, restaurar_media)
+from .models import BackupExecucao, BackupSnapshot
+
+
+class _DiretorioTemporario:
+    def setUp(self):
+        super().setUp()
+        self.base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base, ignore_errors=True)
+
+    def caminho(self, *partes):
+        return os.path.join(self.base, *partes)
+
+    def gravar(self, caminho, dados):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'wb') as f:
+            f.write(dados)
+
+    def ler(self, caminho):
+        with open(caminho, 'rb') as f:
+            return f.read()
+
+
+class EnviarArquivoTests(_DiretorioTemporario, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.sftp = SFTPLocal(self.caminho('remoto'))
+        os.makedirs(self.caminho('remoto'))
+        self.dados = os.urandom(3 * 1024 * 1024 + 17)
+        self.local = self.caminho('dump.bin')
+        self.gravar(self.local, self.dados)
+
+    def test_retoma_do_offset_do_part(self):
+        self.gravar(self.caminho('remoto', 'dump.bin.part'), self.dados[:1024 * 1024])
+
+        enviados = enviar_arquivo(self.sftp, self.local, '/dump.bin')
+
+        self.assertEqual(enviados, len(self.dados) - 1024 * 1024)
+        self.assertEqual(self.ler(self.caminho('remoto', 'dump.bin')), self.dados)
+        self.assertFalse(os.path.exists(self.caminho('remoto', 'dump.bin.part')))
+
+    def test_part_maior_que_o_arquivo_recomeca_do_zero(self):
+        self.gravar(self.caminho('remoto', 'dump.bin.part'), os.urandom(len(self.dados) + 10))
+
+        self.assertEqual(enviar_arquivo(self.sftp, self.local, '/dump.bin'), len(self.dados))
+        self.assertEqual(self.ler(self.caminho('remoto', 'dump.bin')), self.dados)
+
+    def test_arquivo_final_ja_presente_nao_e_reenviado(self):
+        self.gravar(self.caminho('remoto', 'dump.bin'), self.dados)
+        self.assertEqual(enviar_arquivo(self.sftp, self.local, '/dump.bin'), 0)
+
+    def test_erro_de_rede_no_stat_nao_vale_como_ausente(self):
+        class SFTPInstavel(SFTPLocal):
+            def stat(self, caminho):
+                raise OSError(errno.ECONNRESET, 'conexão reiniciada')
+
+        with self.assertRaises(ConnectionResetError):
+            _tamanho_remoto(SFTPInstavel(self.caminho('remoto')), '/dump.bin')
+        self.assertIsNone(_tamanho_remoto(self.sftp, '/inexistente.bin'))
+
+
+class EnvioBackupTests(_DiretorioTemporario, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remoto = self.caminho('remoto')
+        self.backups = self.caminho('backups')
+        self.media = self.caminho('media')
+        override = override_settings(BACKUP_SFTP_LOCAL_DIR=self.remoto)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.destino = SimpleNamespace(diretorio_destino='/reserva')
+
+    def _relativo(self, caminho):
+        return os.path.relpath(caminho, self.backups).replace(os.sep, '/')
+
+    def _enviar_media(self, ts, manifesto, novos):
+        """Mesma ordem de _fazer_backup: blocos novos, reaproveitados (se ausentes) e manifesto."""
+        envio = EnvioBackup(self.destino, ts).iniciar()
+        for caminho in novos:
+            envio.adicionar(caminho, self._relativo(caminho))
+        for caminho in blocos_do_manifesto(manifesto):
+            if caminho not in novos:
+                envio.adicionar(caminho, self._relativo(caminho), se_ausente=True)
+        envio.adicionar(manifesto, self._relativo(manifesto))
+        envio.concluir()
+        return envio
+
+    def test_manifesto_sha256_enviado_e_conferido(self):
+        arquivo = self.caminho('backups', 'backup_db_1.dir', 'toc.dat')
+        self.gravar(arquivo, b'conteudo do dump')
+
+        envio = EnvioBackup(self.destino, '1').iniciar()
+        envio.adicionar(arquivo, self._relativo(arquivo))
+        envio.concluir()
+
+        self.assertTrue(envio.verificado)
+        with open(os.path.join(self.remoto, 'reserva', 'backup_1.sha256')) as f:
+            self.assertTrue(f.read().endswith('  backup_db_1.dir/toc.dat\n'))
+
+    def test_arquivo_remoto_divergente_e_reenviado(self):
+        arquivo = self.caminho('backups', 'indice.sqlite3')
+        self.gravar(arquivo, b'A' * 100)
+        # Mesmo tamanho, conteúdo diferente: passa pelo envio, é pego pela conferência
+        self.gravar(os.path.join(self.remoto, 'reserva', 'indice.sqlite3'), b'B' * 100)
+
+        envio = EnvioBackup(self.destino, '1').iniciar()
+        envio.adicionar(arquivo, 'indice.sqlite3')
+        envio.concluir()
+
+        self.assertTrue(envio.verificado)
+        self.assertEqual(self.ler(os.path.join(self.remoto, 'reserva', 'indice.sqlite3')), b'A' * 100)
+
+    def test_blocos_de_envio_anterior_que_falhou_sao_enviados(self):
+        for i in range(3):
+            self.gravar(self.caminho('media', f'anexo_{i}.pdf'), os.urandom(2048))
+        os.makedirs(self.backups)
+        # Primeira execução: blocos gravados localmente, envio nunca concluído
+        backup_incremental(self.media, self.backups, '1')
+
+        manifesto, _, novos = backup_incremental(self.media, self.backups, '2')
+        self.assertEqual(novos, [])
+        envio = self._enviar_media('2', manifesto, novos)
+
+        self.assertTrue(envio.verificado)
+        blocos = blocos_do_manifesto(manifesto)
+        self.assertEqual(envio.arquivos_enviados, len(blocos) + 1)
+        for caminho in blocos:
+            self.assertEqual(
+                self.ler(os.path.join(self.remoto, 'reserva', self._relativo(caminho))), self.ler(caminho),
+            )
+
+        # Execução seguinte: os blocos já estão no servidor e não são reenviados
+        manifesto, _, novos = backup_incremental(self.media, self.backups, '3')
+        envio = self._enviar_media('3', manifesto, novos)
+        self.assertEqual(envio.arquivos_presentes, len(blocos))
+        self.assertEqual(envio.arquivos_enviados, 1)
+
+
+class BackupMediaTests(_DiretorioTemporario, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media = self.caminho('media')
+        self.backups = self.caminho('backups')
+        os.makedirs(self.backups)
+        self.gravar(self.caminho('media', 'a.bin'), os.urandom(5000))
+        self.gravar(self.caminho('media', 'sub', 'b.bin'), os.urandom(5000))
+
+    def test_incremental_so_grava_o_que_mudou_e_restaura(self):
+        backup_incremental(self.media, self.backups, '1')
+        self.gravar(self.caminho('media', 'a.bin'), os.urandom(6000))
+
+        manifesto, _, novos = backup_incremental(self.media, self.backups, '2')
+
+        self.assertEqual(len(novos), 1)
+        self.assertEqual(restaurar_media(manifesto, self.caminho('restaurado')), 2)
+        for relativo in ('a.bin', os.path.join('sub', 'b.bin')):
+            self.assertEqual(self.ler(self.caminho('restaurado', relativo)), self.ler(self.caminho('media', relativo)))
+
+    def test_coleta_de_orfaos_respeita_manifestos_e_carencia(self):
+        primeiro, _, _ = backup_incremental(self.media, self.backups, '1')
+        self.gravar(self.caminho('media', 'a.bin'), os.urandom(6000))
+        segundo, _, _ = backup_incremental(self.media, self.backups, '2')
+        antigos = set(blocos_do_manifesto(primeiro)) - set(blocos_do_manifesto(segundo))
+        self.assertEqual(len(antigos), 1)
+
+        # Com os dois manifestos retidos nada é órfão
+        self.assertEqual(coletar_blocos_orfaos(self.backups, carencia=0), 0)
+
+        os.remove(primeiro)
+        # Bloco recém-gravado fica (pode ser de um backup em andamento)...
+        self.assertEqual(coletar_blocos_orfaos(self.backups), 0)
+        # ...e sai depois da carência
+        self.assertEqual(coletar_blocos_orfaos(self.backups, carencia=0), 1)
+        self.assertFalse(any(os.path.exists(c) for c in antigos))
+        self.assertTrue(all(os.path.exists(c) for c in blocos_do_manifesto(segundo)))
+        self.assertTrue(os.path.isdir(self.caminho('backups', DIRETORIO_BLOCOS)))
+
+
+@mock.patch.object(backup_snapshots, 'aplicar_politica', return_value=0)
+@mock.patch.object(backup_snapshots, 'dropar_temp', return_value=True)
+@mock.patch.object(backup_snapshots, 'resolver_arquivo_db', return_value=('/backups/backup_db_1.dir', None))
+@mock.patch.object(backup_snapshots, 'restaurar_dump_temp')
+class ObterSnapshotTests(TestCase):
+    """Transições de BackupSnapshot (createdb/pg_restore/dropdb substituídos)."""
+
+    def setUp(self):
+        self.execucao = BackupExecucao.objects.create(arquivo_db='/backups/backup_db_1.dir')
+
+    def test_restauracao_marca_pronto_e_reaproveita(self, restaurar, resolver, dropar, politica):
+        nome = backup_snapshots.obter_snapshot(self.execucao)
+
+        snapshot = BackupSnapshot.objects.get(execucao=self.execucao)
+        self.assertEqual((snapshot.nome_banco, snapshot.status), (nome, 'pronto'))
+        self.assertEqual(backup_snapshots.obter_snapshot(self.execucao), nome)
+        restaurar.assert_called_once()
+
+    def test_falha_na_restauracao_remove_registro_e_banco(self, restaurar, resolver, dropar, politica):
+        restaurar.side_effect = RuntimeError('pg_restore falhou')
+
+        with self.assertRaises(RuntimeError):
+            backup_snapshots.obter_snapshot(self.execucao)
+
+        self.assertFalse(BackupSnapshot.objects.exists())
+        dropar.assert_called_once()
+
+    def test_restauracao_longa_com_batimento_nao_e_descartada(self, restaurar, resolver, dropar, politica):
+        snapshot = BackupSnapshot.objects.create(execucao=self.execucao, nome_banco='snap_longo')
+        # Começou há muito tempo, mas ainda dá sinal de vida
+        BackupSnapshot.objects.filter(pk=snapshot.pk).update(
+            criado_em=timezone.now() - timedelta(hours=1), batimento_em=timezone.now(),
+        )
+
+        with mock.patch.object(backup_snapshots, '_RESTAURACAO_MAX_SEGUNDOS', 0), \
+                self.assertRaises(TimeoutError):
+            backup_snapshots.obter_snapshot(self.execucao)
+
+        self.assertTrue(BackupSnapshot.objects.filter(pk=snapshot.pk, status='restaurando').exists())
+        dropar.assert_not_called()
+        restaurar.assert_not_called()
+
+    def test_restauracao_sem_batimento_e_descartada_e_refeita(self, restaurar, resolver, dropar, politica):
+        snapshot = BackupSnapshot.objects.create(execucao=self.execucao, nome_banco='snap_morto')
+        BackupSnapshot.objects.filter(pk=snapshot.pk).update(batimento_em=timezone.now() - timedelta(minutes=10))
+
+        nome = backup_snapshots.obter_snapshot(self.execucao)
+
+        self.assertNotEqual(nome, 'snap_morto')
+        dropar.assert_called_once_with('snap_morto')
+        self.assertEqual(BackupSnapshot.objects.get(execucao=self.execucao).status, 'pronto')
+
+    def test_snapshot_descartado_durante_a_restauracao(self, restaurar, resolver, dropar, politica):
+        restaurar.side_effect = lambda *args, **kwargs: BackupSnapshot.objects.all().delete()
+
+        with self.assertRaises(backup_snapshots.BackupIndisponivel):
+            backup_snapshots.obter_snapshot(self.execucao)
+
+        self.assertFalse(BackupSnapshot.objects.exists())
+        dropar.assert_called_once()
+
+
+class LimparOrfaosTests(TestCase):
+
+    @mock.patch.object(backup_snapshots, 'dropar_temp', return_value=True)
+    @mock.patch.object(backup_snapshots, '_db_conf', return_value=dict.fromkeys(['HOST', 'PORT', 'USER', 'PASSWORD', 'NAME']))
+    @mock.patch.object(backup_snapshots.psycopg2, 'connect')
+    def test_dropa_so_snapshots_sem_registro(self, connect, db_conf, dropar):
+        BackupSnapshot.objects.create(execucao=BackupExecucao.objects.create(), nome_banco='snap_1_conhecido')
+        cur = connect.return_value.cursor.return_value.__enter__.return_value
+        cur.fetchall.return_value = [('snap_1_conhecido',), ('snap_2_orfao',)]
+
+        self.assertEqual(backup_snapshots.limpar_orfaos(), 1)
+
+        # O '_' do prefixo vai escapado: sem isso o LIKE também casaria 'snapshot...'
+        self.assertEqual(cur.execute.call_args.args[1], [r'snap\_%'])
+        dropar.assert_called_once_with('snap_2_orfao')
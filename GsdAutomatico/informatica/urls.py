@@ -92,6 +92,7 @@ urlpatterns = [
     path('api/ouvidoria/patd/<int:pk>/', views.ouvidoria_admin_patd_detail, name='ouvidoria_admin_patd_detail'),
     path('api/ouvidoria/patd/<int:pk>/update/', views.ouvidoria_admin_update, name='ouvidoria_admin_update'),
     path('api/ouvidoria/patd/<int:patd_pk>/anexo/<int:anexo_pk>/delete/', views.ouvidoria_admin_delete_anexo, name='ouvidoria_admin_delete_anexo'),
+    path('api/ouvidoria/render-cache/', views.ouvidoria_render_cache_stats, name='ouvidoria_render_cache_stats'),
 
     # Lixeira admin
     path('api/ouvidoria/lixeira/config/', views.ouvidoria_lixeira_config, name='ouvidoria_lixeira_config'),
@@ -8,6 +8,7 @@ from django.contrib.auth.models import User, Group
 from Ouvidoria.models import PATD, Anexo, Configuracao, AlegacaoDefesaLog
 from Secao_pessoal.models import Efetivo, Setor # ATUALIZADO
 from login.models import UserProfile
+from login.grupos import pertence
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from .forms import (
@@ -42,10 +43,10 @@ _INFORMATICA_PERMISSAO_MAP = {
 }
 
 def is_informatica_admin(user):
-    return user.is_superuser or user.groups.filter(name='informatica-admin').exists()
+    return user.is_superuser or pertence(user, 'informatica-admin')
 
 def is_informatica_secao(user):
-    return user.is_superuser or user.groups.filter(name__in=['informatica-admin', 'informatica-secao']).exists()
+    return user.is_superuser or pertence(user, 'informatica-admin', 'informatica-secao')
 
 class InformaticaAdminMixin(LoginRequiredMixin, UserPassesTestMixin):
     def test_func(self): return is_informatica_admin(self.request.user)
@@ -546,10 +547,11 @@ def backup_explorar(request, pk):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden()
     from .backup_diff import (MODELOS_DIFF, PATD_STATUS_LABELS,
-                               restaurar_dump_temp, dropar_temp,
                                buscar_registro_temp, montar_diff,
                                buscar_registro_atual, listar_todos_temp,
                                listar_ausentes_no_sistema)
+    from .backup_snapshots import obter_fonte, precisa_aquecer, BackupIndisponivel
+    from .tasks import aquecer_snapshot_task
 
     execucao = get_object_or_404(BackupExecucao, pk=pk)
     modelo_key = request.GET.get('modelo', '')
@@ -564,24 +566,32 @@ def backup_explorar(request, pk):
     lista_registros = None
     colunas_lista = []
     config = MODELOS_DIFF.get(modelo_key)
-    arquivo_local = None
-    arquivo_temp = None
+
+    if not config and precisa_aquecer(execucao):
+        # Abrir a página já começa a restaurar o snapshot em background
+        try:
+            aquecer_snapshot_task.delay(execucao.pk)
+        except Exception as exc:
+            logger.warning("backup_explorar: não foi possível agendar o aquecimento: %s", exc)
 
     if config:
         model = config['model']
         colunas_lista = config.get('colunas_lista', [])
 
-        arquivo_local, arquivo_temp = _resolver_arquivo_db(execucao)
-        if not arquivo_local:
-            erro = 'Arquivo de backup não encontrado em disco nem no servidor remoto.'
-        elif valor:
+        tempdb = None
+        try:
+            tempdb = obter_fonte(execucao, model)
+        except BackupIndisponivel as exc:
+            erro = str(exc)
+        except Exception as exc:
+            erro = f'Erro ao restaurar o backup: {exc}'
+
+        if tempdb and valor:
             # ── Modo detalhe: busca individual e diff ──
             live_obj = buscar_registro_atual(model, config['busca_campo'], valor)
             if not live_obj:
                 # tenta apenas pelo backup sem registro atual (PATD deletada)
-                tempdb = None
                 try:
-                    tempdb = restaurar_dump_temp(arquivo_local)
                     pk_int = int(valor) if valor.isdigit() else None
                     old_dict_destaque = buscar_registro_temp(tempdb, model, pk_int) if pk_int else None
                     if old_dict_destaque is None:
@@ -597,13 +607,8 @@ def backup_explorar(request, pk):
                         registro_ausente = True
                 except Exception as exc:
                     erro = f'Erro ao ler o backup: {exc}'
-                finally:
-                    if tempdb:
-                        dropar_temp(tempdb)
             else:
-                tempdb = None
                 try:
-                    tempdb = restaurar_dump_temp(arquivo_local)
                     old_dict = buscar_registro_temp(tempdb, model, live_obj.pk)
                     if old_dict is None:
                         erro = 'Este registro ainda não existia nesse backup.'
@@ -613,14 +618,9 @@ def backup_explorar(request, pk):
                         registro_pk = live_obj.pk
                 except Exception as exc:
                     erro = f'Erro ao restaurar/ler o backup: {exc}'
-                finally:
-                    if tempdb:
-                        dropar_temp(tempdb)
-        else:
+        elif tempdb:
             # ── Modo listagem (todos ou apenas ausentes no sistema) ──
-            tempdb = None
             try:
-                tempdb = restaurar_dump_temp(arquivo_local)
                 if modo_ausentes:
                     raw = listar_ausentes_no_sistema(tempdb, model)
                 else:
@@ -672,16 +672,6 @@ def backup_explorar(request, pk):
                 lista_registros = registros
             except Exception as exc:
                 erro = f'Erro ao ler o backup: {exc}'
-            finally:
-                if tempdb:
-                    dropar_temp(tempdb)
-
-    # Limpa arquivo temporário baixado do servidor remoto (se houver)
-    if arquivo_temp and os.path.exists(arquivo_temp):
-        try:
-            os.remove(arquivo_temp)
-        except Exception:
-            pass
 
     # Campos de destaque para a view de detalhe
     campos_destaque = []
@@ -714,7 +704,8 @@ def backup_restaurar_registro(request, pk):
     if not is_informatica_admin(request.user):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden()
-    from .backup_diff import MODELOS_DIFF, restaurar_dump_temp, dropar_temp, buscar_registro_temp, aplicar_restore
+    from .backup_diff import MODELOS_DIFF, buscar_registro_temp, aplicar_restore
+    from .backup_snapshots import obter_fonte, BackupIndisponivel
 
     execucao = get_object_or_404(BackupExecucao, pk=pk)
     modelo_key = request.POST.get('modelo', '')
@@ -731,14 +722,16 @@ def backup_restaurar_registro(request, pk):
     manager = getattr(model, 'all_objects', model.objects)
     live_obj = manager.filter(pk=registro_pk).first()  # None se não existe (registro apagado)
 
-    arquivo_local, arquivo_temp = _resolver_arquivo_db(execucao)
-    if not arquivo_local:
-        messages.error(request, 'Arquivo de backup não encontrado em disco nem no servidor remoto.')
+    try:
+        tempdb = obter_fonte(execucao, model)
+    except BackupIndisponivel as exc:
+        messages.error(request, str(exc))
+        return redirect(redirect_url)
+    except Exception as exc:
+        messages.error(request, f'Erro ao restaurar o backup: {exc}')
         return redirect(redirect_url)
 
-    tempdb = None
     try:
-        tempdb = restaurar_dump_temp(arquivo_local)
         old_dict = buscar_registro_temp(tempdb, model, int(registro_pk))
         if old_dict is None:
             messages.error(request, 'Registro não encontrado no backup.')
@@ -781,14 +774,6 @@ def backup_restaurar_registro(request, pk):
     except Exception as exc:
         logger.exception("[BACKUP RESTORE] Erro ao restaurar %s #%s: %s", model.__name__, registro_pk, exc)
         messages.error(request, f'Erro ao restaurar: {exc}')
-    finally:
-        if tempdb:
-            dropar_temp(tempdb)
-        if arquivo_temp and os.path.exists(arquivo_temp):
-            try:
-                os.remove(arquivo_temp)
-            except Exception:
-                pass
 
     return redirect(redirect_url)
 
@@ -805,9 +790,9 @@ def backup_restaurar_em_lote(request, pk):
     if not is_informatica_admin(request.user):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden()
-    from .backup_diff import (MODELOS_DIFF, restaurar_dump_temp, dropar_temp,
-                               buscar_registro_temp, aplicar_restore,
+    from .backup_diff import (MODELOS_DIFF, buscar_registro_temp, aplicar_restore,
                                campos_comparaveis, recriar_registro)
+    from .backup_snapshots import obter_fonte, BackupIndisponivel
 
     execucao = get_object_or_404(BackupExecucao, pk=pk)
     modelo_key = request.POST.get('modelo', '')
@@ -833,17 +818,19 @@ def backup_restaurar_em_lote(request, pk):
     manager = getattr(model, 'all_objects', model.objects)
     todos_campos = [f.name for f in campos_comparaveis(model)]
 
-    arquivo_local, arquivo_temp = _resolver_arquivo_db(execucao)
-    if not arquivo_local:
-        messages.error(request, 'Arquivo de backup não encontrado em disco nem no servidor remoto.')
+    try:
+        tempdb = obter_fonte(execucao, model)
+    except BackupIndisponivel as exc:
+        messages.error(request, str(exc))
+        return redirect(redirect_url)
+    except Exception as exc:
+        messages.error(request, f'Erro ao restaurar o backup: {exc}')
         return redirect(redirect_url)
 
     criados = 0
     atualizados = 0
     erros = []
-    tempdb = None
     try:
-        tempdb = restaurar_dump_temp(arquivo_local)
         for reg_pk in pks_int:
             old_dict = buscar_registro_temp(tempdb, model, reg_pk)
             if old_dict is None:
@@ -865,14 +852,6 @@ def backup_restaurar_em_lote(request, pk):
                 erros.append(f'ID {reg_pk}: {exc}')
     except Exception as exc:
         messages.error(request, f'Erro ao ler backup: {exc}')
-    finally:
-        if tempdb:
-            dropar_temp(tempdb)
-        if arquivo_temp and os.path.exists(arquivo_temp):
-            try:
-                os.remove(arquivo_temp)
-            except Exception:
-                pass
 
     partes = []
     if criados:
@@ -891,43 +870,6 @@ def backup_restaurar_em_lote(request, pk):
 # GERENCIADOR DE ARQUIVOS E TERMINAL DO SERVIDOR DE BACKUP
 # ==========================================
 
-def _resolver_arquivo_db(execucao) -> tuple[str | None, str | None]:
-    """
-    Retorna (caminho_para_usar, caminho_temp_ou_None).
-    1. Se o arquivo local existe → (arquivo_local, None)
-    2. Se não existe mas foi enviado ao remoto → baixa via SFTP para /tmp,
-       retorna (caminho_tmp, caminho_tmp) — o chamador deve apagar o tmp ao final.
-    3. Se nenhum dos dois → (None, None)
-    """
-    import tempfile
-
-    arquivo_local = execucao.arquivo_db or ''
-    if arquivo_local and os.path.exists(arquivo_local):
-        return arquivo_local, None
-
-    if not execucao.enviado_remoto or not arquivo_local:
-        return None, None
-
-    try:
-        from . import backup_server as _bs
-        destino = BackupDestino.get_instance()
-        if not destino.host or not destino.usuario:
-            return None, None
-
-        nome_arquivo = os.path.basename(arquivo_local)
-        caminho_remoto = f"{destino.diretorio_destino.rstrip('/')}/{nome_arquivo}"
-
-        conteudo = _bs.baixar_arquivo(destino, caminho_remoto)
-        sufixo = os.path.splitext(nome_arquivo)[-1]
-        fd, tmp_path = tempfile.mkstemp(suffix=sufixo)
-        with os.fdopen(fd, 'wb') as f:
-            f.write(conteudo)
-        return tmp_path, tmp_path
-    except Exception as exc:
-        logger.warning("_resolver_arquivo_db: falha ao baixar do remoto: %s", exc)
-        return None, None
-
-
 def _caminho_seguro(caminho: str) -> str:
     """Normaliza e impede directory traversal (../) no caminho informado pelo usuário."""
     import posixpath
@@ -1106,7 +1048,7 @@ def gestao_materiais_view(request):
         return HttpResponseForbidden()
     militares = Efetivo.objects.all().order_by('posto', 'nome_guerra')
     
-    militares_info = Efetivo.objects.filter(
+    militares_info = Efetivo.objects.com_assinatura().filter(
         Q(setor__icontains='informática') | Q(subsetor__icontains='informática') |
         Q(setor__icontains='informatica') | Q(subsetor__icontains='informatica')
     ).order_by('posto', 'nome_guerra')
@@ -1615,146 +1557,73 @@ from django.http import HttpResponse
 
 @staff_member_required
 def exportar_armarios_excel(request):
-    try:
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-    except ImportError:
-        return HttpResponse("Erro: A biblioteca 'openpyxl' não está instalada. Execute 'pip install openpyxl' no ambiente do servidor.", status=500)
+    from GsdAutomatico import exportacao_xlsx
+    from GsdAutomatico.exportacao_xlsx import Coluna, DADO_CENTRO, DADO_ESQUERDA
 
     armarios_ids = request.GET.get('armarios', '')
     is_completo = request.GET.get('completo') == 'true'
 
-    query = Armario.objects.all().prefetch_related('prateleiras__materiais')
-    
+    query = Armario.objects.all()
     if armarios_ids:
         ids = [int(i) for i in armarios_ids.split(',') if i.isdigit()]
         if ids:
             query = query.filter(id__in=ids)
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Inventário de Armários"
-    
-    # Estilos de Formatação
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_fill = PatternFill(start_color="1F4E78", end_color="1F4E78", fill_type="solid")
-    title_font = Font(bold=True, size=16, color="1F4E78")
-    
-    align_center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    align_left = Alignment(horizontal="left", vertical="center", wrap_text=True)
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-    
-    # Título do Relatório (Linha 1)
-    max_col = 10 if is_completo else 8
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=max_col)
-    title_cell = ws.cell(row=1, column=1, value=f"Relatório de Inventário de Armários - {'Completo' if is_completo else 'Simplificado'} ({timezone.now().strftime('%d/%m/%Y')})")
-    title_cell.font = title_font
-    title_cell.alignment = align_center
-    ws.row_dimensions[1].height = 30
-    
-    # Cabeçalhos (Linha 2)
+
+    colunas = [
+        Coluna('Armário', 20, DADO_CENTRO), Coluna('Localização', 25, DADO_CENTRO),
+        Coluna('Prateleira', 18, DADO_CENTRO), Coluna('Material', 40, DADO_ESQUERDA),
+        Coluna('S/N', 20, DADO_CENTRO), Coluna('Código Interno', 16, DADO_CENTRO),
+        Coluna('Qtd', 7, DADO_CENTRO), Coluna('Status', 15, DADO_CENTRO),
+    ]
     if is_completo:
-        headers = ['Armário', 'Localização', 'Prateleira', 'Material', 'S/N', 'Código Interno', 'Qtd', 'Status', 'Atributos Técnicos', 'Observações/Defeito']
-    else:
-        headers = ['Armário', 'Localização', 'Prateleira', 'Material', 'S/N', 'Código Interno', 'Qtd', 'Status']
-        
-    ws.append(headers)
-    
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col_num)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = align_center
-        cell.border = thin_border
-        
-    current_row = 3
-    for armario in query:
-        prateleiras = armario.prateleiras.all()
-        if not prateleiras:
-            row_data = [armario.nome, armario.localizacao or '-', 'Sem Prateleiras', '-', '-', '-', '-', '-']
-            if is_completo: row_data.extend(['-', '-'])
-            ws.append(row_data)
-            for col_num in range(1, len(row_data) + 1):
-                ws.cell(row=current_row, column=col_num).border = thin_border
-                ws.cell(row=current_row, column=col_num).alignment = align_center
-            current_row += 1
-            continue
-            
-        for prateleira in prateleiras:
-            materiais = prateleira.materiais.all()
-            if not materiais:
-                row_data = [armario.nome, armario.localizacao or '-', prateleira.nome, 'Vazia', '-', '-', '-', '-']
+        colunas += [Coluna('Atributos Técnicos', 45, DADO_ESQUERDA), Coluna('Observações/Defeito', 45, DADO_ESQUERDA)]
+
+    # Uma linha por material; armários sem prateleira e prateleiras vazias vêm
+    # do LEFT JOIN com os campos da prateleira/material nulos.
+    campos = [
+        'nome', 'localizacao', 'prateleiras__id', 'prateleiras__nome', 'prateleiras__materiais__id',
+        'prateleiras__materiais__nome', 'prateleiras__materiais__serial', 'prateleiras__materiais__codigo',
+        'prateleiras__materiais__quantidade', 'prateleiras__materiais__funcionando',
+    ]
+    if is_completo:
+        campos += ['prateleiras__materiais__atributos_extras', 'prateleiras__materiais__motivo_defeito']
+    registros = (
+        query.order_by('id', 'prateleiras__id', 'prateleiras__materiais__id')
+        .values(*campos).iterator(chunk_size=exportacao_xlsx.LOTE)
+    )
+
+    def linhas():
+        for r in registros:
+            base = [r['nome'], r['localizacao'] or '-']
+            if r['prateleiras__id'] is None:
+                row_data = base + ['Sem Prateleiras', '-', '-', '-', '-', '-']
                 if is_completo: row_data.extend(['-', '-'])
-                ws.append(row_data)
-                for col_num in range(1, len(row_data) + 1):
-                    ws.cell(row=current_row, column=col_num).border = thin_border
-                    ws.cell(row=current_row, column=col_num).alignment = align_center
-                current_row += 1
-                continue
-                
-            for mat in materiais:
-                status = 'Funcionando' if mat.funcionando else 'Com Defeito'
-                row_data = [
-                    armario.nome,
-                    armario.localizacao or '-',
-                    prateleira.nome,
-                    mat.nome,
-                    mat.serial or '-',
-                    mat.codigo or '-',
-                    mat.quantidade,
-                    status
+            elif r['prateleiras__materiais__id'] is None:
+                row_data = base + [r['prateleiras__nome'], 'Vazia', '-', '-', '-', '-']
+                if is_completo: row_data.extend(['-', '-'])
+            else:
+                row_data = base + [
+                    r['prateleiras__nome'],
+                    r['prateleiras__materiais__nome'],
+                    r['prateleiras__materiais__serial'] or '-',
+                    r['prateleiras__materiais__codigo'] or '-',
+                    r['prateleiras__materiais__quantidade'],
+                    'Funcionando' if r['prateleiras__materiais__funcionando'] else 'Com Defeito',
                 ]
-                
                 if is_completo:
-                    attrs_str = "-"
-                    if mat.atributos_extras:
-                        # Junta os atributos com quebras de linha
-                        attrs_str = "\n".join([f"• {k}: {v}" for k, v in mat.atributos_extras.items()])
-                    row_data.append(attrs_str)
-                    row_data.append(mat.motivo_defeito or '-')
-                    
-                ws.append(row_data)
-                
-                # Aplica estilos nas células inseridas
-                for col_num, val in enumerate(row_data, 1):
-                    cell = ws.cell(row=current_row, column=col_num)
-                    cell.border = thin_border
-                    # Alinha à esquerda apenas colunas de texto descritivo
-                    if col_num in [4, 9, 10]:
-                        cell.alignment = align_left
-                    else:
-                        cell.alignment = align_center
-                
-                current_row += 1
-                
-    # Auto-ajuste de largura das colunas
-    for col_idx, col in enumerate(ws.columns, 1):
-        max_length = 0
-        column = get_column_letter(col_idx)
-        for cell in col:
-            try:
-                # Ignora a linha do título principal na contagem de largura
-                if cell.row > 1: 
-                    lines = str(cell.value).split('\n')
-                    for line in lines:
-                        if len(line) > max_length:
-                            max_length = len(line)
-            except:
-                pass
-        
-        # Define largura máxima de 45 para não criar colunas absurdamente gigantes
-        adjusted_width = min(max_length + 2, 45) 
-        ws.column_dimensions[column].width = adjusted_width
-
-    # Adiciona Filtros (Setinhas) na tabela (A2:J[ultima_linha])
-    ws.auto_filter.ref = f"A2:{get_column_letter(max_col)}{current_row - 1}"
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                    attrs = r['prateleiras__materiais__atributos_extras']
+                    # Junta os atributos com quebras de linha
+                    row_data.append("\n".join(f"• {k}: {v}" for k, v in attrs.items()) if attrs else '-')
+                    row_data.append(r['prateleiras__materiais__motivo_defeito'] or '-')
+            yield row_data
+
+    titulo = (f"Relatório de Inventário de Armários - {'Completo' if is_completo else 'Simplificado'} "
+              f"({timezone.now().strftime('%d/%m/%Y')})")
     filename = "Inventario_Completo.xlsx" if is_completo else "Inventario_Simplificado.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    wb.save(response)
-    return response
+    return exportacao_xlsx.resposta_xlsx(
+        filename, "Inventário de Armários", colunas, linhas(),
+        cor_cabecalho='1F4E78', tamanho_cabecalho=12, titulo=titulo, filtro=True,
+    )
 
 @staff_member_required
 def imprimir_cautela(request, pk):
@@ -1861,6 +1730,13 @@ def ouvidoria_admin_search(request):
     return JsonResponse(data, safe=False)
 
 
+@staff_member_required
+def ouvidoria_render_cache_stats(request):
+    """Hits/misses do cache de documentos renderizados das PATDs."""
+    from Ouvidoria.views.helpers import render_cache_stats
+    return JsonResponse(render_cache_stats())
+
+
 @staff_member_required
 def ouvidoria_admin_patd_detail(request, pk):
     """Retorna detalhes completos de uma PATD para o painel admin."""
@@ -1925,8 +1801,7 @@ def ouvidoria_admin_patd_detail(request, pk):
 
     # Oficiais disponíveis (para troca)
     oficiais = list(
-        Efetivo.objects.filter(oficial=True)
-        .exclude(assinatura__isnull=True).exclude(assinatura__exact='')
+        Efetivo.objects.filter(oficial=True).assinados()
         .order_by('posto', 'nome_guerra')
         .values('id', 'posto', 'nome_guerra')
     )
@@ -2194,23 +2069,57 @@ def auditoria_page(request):
     return render(request, 'informatica/auditoria.html')
 
 
+# Até este total a contagem é exata; acima, vem da estimativa do planner do Postgres
+_AUDITORIA_CONTAGEM_EXATA_MAX = 1000
+_AUDITORIA_POR_PAGINA = 50
+
+
+def _contagem_auditoria(qs):
+    """(total, exato). Evita o COUNT(*) completo, que varre todos os logs filtrados."""
+    from django.db import connection
+
+    total = qs.order_by()[:_AUDITORIA_CONTAGEM_EXATA_MAX + 1].count()
+    if total <= _AUDITORIA_CONTAGEM_EXATA_MAX or connection.vendor != 'postgresql':
+        return (total if total <= _AUDITORIA_CONTAGEM_EXATA_MAX else qs.count()), True
+    sql, params = qs.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return max(int(plano[0]['Plan']['Plan Rows']), total), False
+
+
 @login_required
 def auditoria_search(request):
+    """
+    Busca paginada por cursor (criado_em, id): `cursor` é o `next_cursor` da
+    página anterior, então cada página custa o mesmo independentemente da
+    profundidade. A busca livre usa o campo `busca` (índice trigram).
+    """
     if not is_informatica_secao(request.user):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden()
 
+    from django.utils.dateparse import parse_date, parse_datetime
     from auditoria.models import LogAuditoria
 
-    qs = LogAuditoria.objects.select_related('usuario').all()
+    def _data(param):
+        try:
+            return parse_date(request.GET.get(param, '').strip())
+        except ValueError:
+            return None
+
+    qs = LogAuditoria.objects.all()
     usuario = request.GET.get('usuario', '').strip()
     secao = request.GET.get('secao', '').strip()
     acao = request.GET.get('acao', '').strip()
     objeto_tipo = request.GET.get('objeto_tipo', '').strip()
     permissao = request.GET.get('permissao', '').strip()
     busca = request.GET.get('busca', '').strip()
-    data_inicio = request.GET.get('data_inicio', '').strip()
-    data_fim = request.GET.get('data_fim', '').strip()
+    data_inicio = _data('data_inicio')
+    data_fim = _data('data_fim')
+    cursor = request.GET.get('cursor', '').strip()
 
     if usuario:
         qs = qs.filter(Q(username__icontains=usuario) | Q(nome_guerra__icontains=usuario))
@@ -2223,21 +2132,27 @@ def auditoria_search(request):
     if permissao:
         qs = qs.filter(permissao__icontains=permissao)
     if busca:
-        qs = qs.filter(
-            Q(descricao__icontains=busca) |
-            Q(objeto_tipo__icontains=busca) |
-            Q(objeto_id__icontains=busca) |
-            Q(username__icontains=busca) |
-            Q(nome_guerra__icontains=busca)
-        )
+        qs = qs.filter(busca__contains=busca.lower())
+    # Intervalos em criado_em (e não criado_em__date) para o índice ser usado
     if data_inicio:
-        qs = qs.filter(criado_em__date__gte=data_inicio)
+        qs = qs.filter(criado_em__gte=timezone.make_aware(datetime.datetime.combine(data_inicio, datetime.time.min)))
     if data_fim:
-        qs = qs.filter(criado_em__date__lte=data_fim)
+        qs = qs.filter(criado_em__lt=timezone.make_aware(
+            datetime.datetime.combine(data_fim + datetime.timedelta(days=1), datetime.time.min)
+        ))
 
-    from django.core.paginator import Paginator
-    paginator = Paginator(qs, 50)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    total, exato = _contagem_auditoria(qs)
+
+    if cursor:
+        criado_em_str, _, id_str = cursor.rpartition('|')
+        cursor_data = parse_datetime(criado_em_str)
+        if cursor_data and id_str.isdigit():
+            qs = qs.filter(Q(criado_em__lt=cursor_data) | Q(criado_em=cursor_data, id__lt=int(id_str)))
+
+    logs = list(qs.order_by('-criado_em', '-id')[:_AUDITORIA_POR_PAGINA + 1])
+    has_next = len(logs) > _AUDITORIA_POR_PAGINA
+    logs = logs[:_AUDITORIA_POR_PAGINA]
+    next_cursor = f'{logs[-1].criado_em.isoformat()}|{logs[-1].id}' if has_next else None
 
     return JsonResponse({
         'results': [{
@@ -2252,12 +2167,11 @@ def auditoria_search(request):
             'objeto_id': log.objeto_id,
             'descricao': log.descricao,
             'criado_em': log.criado_em.isoformat(),
-        } for log in page_obj],
-        'has_next': page_obj.has_next(),
-        'has_previous': page_obj.has_previous(),
-        'page': page_obj.number,
-        'num_pages': page_obj.paginator.num_pages,
-        'count': page_obj.paginator.count,
+        } for log in logs],
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+        'count': total,
+        'count_exato': exato,
     })
 
 
@@ -2268,9 +2182,11 @@ def auditoria_filtros(request):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden()
 
-    from auditoria.models import LogAuditoria
-    secoes = list(LogAuditoria.objects.exclude(secao='').values_list('secao', flat=True).distinct().order_by('secao'))
-    acoes = list(LogAuditoria.objects.exclude(acao='').values_list('acao', flat=True).distinct().order_by('acao'))
-    objeto_tipos = list(LogAuditoria.objects.exclude(objeto_tipo='').values_list('objeto_tipo', flat=True).distinct().order_by('objeto_tipo'))
-    permissoes = list(LogAuditoria.objects.exclude(permissao__in=['', '—']).values_list('permissao', flat=True).distinct().order_by('permissao'))
-    return JsonResponse({'secoes': secoes, 'acoes': acoes, 'objeto_tipos': objeto_tipos, 'permissoes': permissoes})
\ No newline at end of file
+    from auditoria.models import OpcaoFiltroAuditoria
+    opcoes = OpcaoFiltroAuditoria.opcoes()
+    return JsonResponse({
+        'secoes': opcoes['secao'],
+        'acoes': opcoes['acao'],
+        'objeto_tipos': opcoes['objeto_tipo'],
+        'permissoes': opcoes['permissao'],
+    })
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Grupos do usuário resolvidos uma vez e reaproveitados por todos os helpers de
+permissão (Ouvidoria.permissions, filtros de template, _is_sop_*, etc.).
+
+- Na mesma requisição: os nomes ficam guardados no próprio objeto do usuário.
+- Entre requisições: ficam no cache do Django por GRUPOS_CACHE_SEGUNDOS.
+
+Os nomes são guardados na ordem em que o banco os devolve (a mesma de
+user.groups.values_list), para quem escolhe pelo primeiro grupo (grupos_em_ordem).
+
+O cache é invalidado pelos sinais de login.signals quando User.groups muda
+(m2m_changed) ou quando um grupo é renomeado/excluído, após o commit.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+_ATTR = '_grupos_cache'
+_ATTR_ORDEM = '_grupos_ordem_cache'
+
+
+def _chave(user_pk):
+    return f'grupos_usuario_ordem:{user_pk}'
+
+
+def grupos_em_ordem(user) -> tuple:
+    """Nomes dos grupos do usuário na ordem do banco (tupla vazia para anônimo/None)."""
+    if user is None or not user.is_authenticated:
+        return ()
+    ordem = getattr(user, _ATTR_ORDEM, None)
+    if ordem is None:
+        ordem = cache.get(_chave(user.pk))
+        if ordem is None:
+            ordem = tuple(user.groups.values_list('name', flat=True))
+            cache.set(_chave(user.pk), ordem, settings.GRUPOS_CACHE_SEGUNDOS)
+        setattr(user, _ATTR_ORDEM, ordem)
+        setattr(user, _ATTR, frozenset(ordem))
+    return ordem
+
+
+def grupos_do_usuario(user) -> frozenset:
+    """Nomes dos grupos do usuário (frozenset vazio para anônimo/None)."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, _ATTR, None)
+    if grupos is None:
+        grupos_em_ordem(user)
+        grupos = getattr(user, _ATTR)
+    return grupos
+
+
+def pertence(user, *nomes) -> bool:
+    """True se o usuário está em algum dos grupos `nomes` (sem consultar o banco após o 1º acesso)."""
+    return not grupos_do_usuario(user).isdisjoint(nomes)
+
+
+def invalidar(user_pks, instancia=None):
+    """
+    Descarta o cache dos usuários `user_pks` (e o guardado em `instancia`, se
+    informada). O cache compartilhado só é apagado após o commit: antes disso,
+    outra requisição ainda leria (e recolocaria no cache) os grupos antigos.
+    """
+    chaves = [_chave(pk) for pk in user_pks]
+    if chaves:
+        transaction.on_commit(lambda: cache.delete_many(chaves))
+    if instancia is not None:
+        instancia.__dict__.pop(_ATTR, None)
+        instancia.__dict__.pop(_ATTR_ORDEM, None)
@@ -1,8 +1,9 @@
 # GsdAutomatico/login/signals.py
 
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, User
+from .grupos import invalidar
 from .models import UserProfile
 from Ouvidoria.models import Configuracao
 
@@ -27,3 +28,24 @@ def on_user_profile_save(sender, instance, **kwargs):
 
     except Exception:
         pass
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def on_user_groups_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalida o cache de grupos (login.grupos) dos usuários afetados."""
+    if reverse:
+        # instance é o Group; no clear, pk_set é None e os membros são lidos antes
+        if action == 'pre_clear':
+            invalidar(instance.user_set.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            invalidar(pk_set or ())
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar([instance.pk], instancia=instance)
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def on_group_change(sender, instance, **kwargs):
+    """Renomear ou excluir um grupo muda o conjunto de nomes cacheado dos seus membros."""
+    if instance.pk:
+        invalidar(instance.user_set.values_list('pk', flat=True))
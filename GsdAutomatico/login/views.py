@@ -7,6 +7,7 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django_ratelimit.decorators import ratelimit
 from GsdAutomatico.ratelimit_utils import rate_if_external
 from .forms import CustomUserCreationForm, CustomSetPasswordForm
+from .grupos import grupos_do_usuario
 from django.contrib import messages
 from django.urls import reverse
 
@@ -73,7 +74,7 @@ def select_app_view(request):
         'SOP - Operações': _sop_app,
         'SOP- Escalas': _sop_app,
     }
-    user_groups = set(request.user.groups.values_list('name', flat=True))
+    user_groups = grupos_do_usuario(request.user)
 
     seen_urls = set()
     available_apps = []
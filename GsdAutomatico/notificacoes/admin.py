@@ -1,7 +1,24 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count
+
+from . import contadores
 from .models import Notificacao
 
 
+def _marcar(qs, lida):
+    """
+    Marca as notificações como lidas/não lidas e ajusta o contador de não lidas
+    de cada usuário afetado (o update em massa não passa pelos sinais).
+    """
+    with transaction.atomic():
+        alteradas = qs.filter(lida=not lida)
+        por_usuario = list(alteradas.values('usuario_id').annotate(n=Count('id')).order_by())
+        alteradas.update(lida=lida)
+        for item in por_usuario:
+            contadores.alterar([item['usuario_id']], contadores.NOTIFICACOES, -item['n'] if lida else item['n'])
+
+
 @admin.register(Notificacao)
 class NotificacaoAdmin(admin.ModelAdmin):
     list_display   = ('usuario', 'tipo', 'titulo', 'lida', 'criado_em')
@@ -12,8 +29,8 @@ class NotificacaoAdmin(admin.ModelAdmin):
 
     @admin.action(description='Marcar como lida')
     def marcar_lida(self, request, qs):
-        qs.update(lida=True)
+        _marcar(qs, lida=True)
 
     @admin.action(description='Marcar como não lida')
     def marcar_nao_lida(self, request, qs):
-        qs.update(lida=False)
+        _marcar(qs, lida=False)
@@ -19,6 +19,8 @@ class NotificacoesConfig(AppConfig):
                 if action == 'post_add' and pk_set:
                     _notificar_mensagem(instance, pk_set)
 
-            m2m_changed.connect(_handler, sender=Mensagem.destinatarios.through)
+            # weak=False: _handler é local e seria coletado ao sair de ready()
+            m2m_changed.connect(_handler, sender=Mensagem.destinatarios.through, weak=False,
+                                dispatch_uid='notificacoes_mensagem_destinatarios')
         except Exception:
             pass
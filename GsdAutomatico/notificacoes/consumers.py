@@ -0,0 +1,67 @@
+"""
+WebSocket consumer das notificações do usuário (sino do cabeçalho e badge de e-mails).
+
+Cada usuário tem seu próprio "group" no channel layer:
+    notificacoes_{user_pk}
+
+Ao conectar, envia o estado atual uma vez; depois só recebe o que for empurrado
+por notificacoes.contadores (notificar(), sinais da caixa de entrada):
+    estado   — contadores + itens não lidos (na conexão)
+    nova     — nova Notificacao
+    contador — novo valor de um contador ('notificacoes' ou 'mensagens')
+    lidas    — notificações marcadas como lidas em outra aba (ids ou todas)
+"""
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from . import contadores
+
+
+class NotificacaoConsumer(AsyncWebsocketConsumer):
+
+    # ── Lifecycle ────────────────────────────────────────────────────────────
+
+    async def connect(self):
+        user = self.scope["user"]
+
+        # Rejeita conexões não autenticadas
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = contadores.grupo(user.pk)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send(text_data=json.dumps(await self._estado(user.pk)))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    # ── Handlers de eventos do group ─────────────────────────────────────────
+
+    async def notificacao_evento(self, event):
+        """Repassa ao browser o evento enviado por notificacoes.contadores.enviar()."""
+        await self.send(text_data=json.dumps(event["payload"]))
+
+    # ── Helpers de banco de dados (sync → async) ──────────────────────────────
+
+    @database_sync_to_async
+    def _estado(self, user_pk):
+        from .models import Notificacao
+        from .utils import serializar_notificacao
+        from .views import MAX_LIST
+
+        total = contadores.nao_lidas(user_pk, contadores.NOTIFICACOES)
+        items = []
+        if total:
+            qs = Notificacao.objects.filter(usuario_id=user_pk, lida=False)
+            items = [serializar_notificacao(n) for n in qs[:MAX_LIST]]
+        return {
+            "tipo": "estado",
+            "count": total,
+            "mensagens": contadores.nao_lidas(user_pk, contadores.MENSAGENS),
+            "notifications": items,
+        }
@@ -0,0 +1,99 @@
+"""
+Contadores de não lidas por usuário e envio de eventos ao NotificacaoConsumer.
+
+Os contadores ficam no cache (chave `nao_lidas:<tipo>:<user_pk>`):
+  - 'notificacoes': Notificacao unificada com lida=False;
+  - 'mensagens':    Mensagem da caixa de entrada recebida e não lida
+                    (sem rascunhos, excluídas e excluídas permanentemente).
+
+São calculados com COUNT só quando a chave não existe; depois disso os sinais
+(notificar(), caixa_entrada.signals) somam/subtraem o delta e empurram o novo
+valor pelo WebSocket do usuário (group `notificacoes_<user_pk>`). Abas ociosas
+não consultam o banco.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+NOTIFICACOES = 'notificacoes'
+MENSAGENS = 'mensagens'
+
+
+def _chave(tipo, user_pk):
+    return f'nao_lidas:{tipo}:{user_pk}'
+
+
+def grupo(user_pk):
+    return f'notificacoes_{user_pk}'
+
+
+def _contar(tipo, user_pk):
+    if tipo == NOTIFICACOES:
+        from .models import Notificacao
+        return Notificacao.objects.filter(usuario_id=user_pk, lida=False).count()
+    from caixa_entrada.models import Mensagem
+    return (
+        Mensagem.objects.filter(destinatarios=user_pk, eh_rascunho=False)
+        .exclude(lida_por=user_pk).exclude(excluida_por=user_pk).exclude(permanentemente_excluida_por=user_pk)
+        .count()
+    )
+
+
+def nao_lidas(user_pk, tipo):
+    """Valor atual do contador (COUNT apenas se ainda não estiver no cache)."""
+    valor = cache.get(_chave(tipo, user_pk))
+    if valor is None:
+        valor = _contar(tipo, user_pk)
+        cache.set(_chave(tipo, user_pk), valor, settings.NOTIFICACOES_CONTADOR_SEGUNDOS)
+    return valor
+
+
+def enviar(user_pks, payload):
+    """Empurra `payload` para os WebSockets abertos dos usuários. Nunca lança exceção."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for pk in set(user_pks):
+        try:
+            async_to_sync(channel_layer.group_send)(grupo(pk), {"type": "notificacao_evento", "payload": payload})
+        except Exception:
+            logger.exception("Falha ao enviar evento de notificação ao usuário %s", pk)
+
+
+def _aplicar(user_pks, tipo, delta):
+    for pk in set(user_pks):
+        chave = _chave(tipo, pk)
+        if delta is None:
+            cache.delete(chave)
+        else:
+            try:
+                if cache.incr(chave, delta) < 0:
+                    cache.delete(chave)
+            except ValueError:
+                pass  # ainda não calculado: será contado na próxima leitura
+        enviar([pk], {"tipo": "contador", "contador": tipo, "valor": nao_lidas(pk, tipo)})
+
+
+def alterar(user_pks, tipo, delta=None):
+    """
+    Soma `delta` ao contador `tipo` dos usuários e envia o novo valor; com
+    delta=None o contador é recalculado (transições raras, como excluir/restaurar).
+    Aplicado só após o commit: um rollback não deixa o contador divergente.
+    """
+    user_pks = [pk for pk in user_pks if pk is not None]
+    if not user_pks or delta == 0:
+        return
+
+    def _executar():
+        try:
+            _aplicar(user_pks, tipo, delta)
+        except Exception:
+            logger.exception("Falha ao atualizar contador %s de %s", tipo, user_pks)
+
+    transaction.on_commit(_executar)
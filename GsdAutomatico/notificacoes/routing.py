@@ -0,0 +1,8 @@
+"""URL routing para WebSockets das notificações."""
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    # ws://host/ws/notificacoes/
+    re_path(r"^ws/notificacoes/$", consumers.NotificacaoConsumer.as_asgi()),
+]
@@ -5,6 +5,20 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+def serializar_notificacao(n) -> dict:
+    """Formato de item usado pela API do painel e pelos eventos do WebSocket."""
+    return {
+        'id':          n.pk,
+        'tipo':        n.tipo,
+        'titulo':      n.titulo,
+        'corpo':       n.corpo[:120] if n.corpo else '',
+        'url':         n.url,
+        'criado_em':   n.criado_em.strftime('%d/%m %H:%M'),
+        'origem_id':   n.origem_id,
+        'origem_tipo': n.origem_tipo,
+    }
+
+
 def notificar(usuario, titulo: str, *, corpo: str = '', url: str = '',
               tipo: str = 'sistema', origem_id: int = None, origem_tipo: str = '') -> None:
     """
@@ -48,3 +62,26 @@ def notificar(usuario, titulo: str, *, corpo: str = '', url: str = '',
         Notificacao.objects.bulk_create(objs)
     except Exception as exc:
         logger.exception("notificar() falhou: %s", exc)
+        return
+
+    _enviar_novas(objs)
+
+
+def _enviar_novas(objs):
+    """Incrementa o contador e empurra cada nova notificação ao WebSocket do destinatário."""
+    from collections import Counter
+    from django.db import transaction
+    from . import contadores
+
+    def _executar():
+        for n in objs:
+            if n.pk is None:  # bulk_create sem RETURNING (ex.: SQLite antigo): só o contador
+                continue
+            contadores.enviar([n.usuario_id], {'tipo': 'nova', 'notificacao': serializar_notificacao(n)})
+
+    try:
+        for user_pk, quantidade in Counter(n.usuario_id for n in objs).items():
+            contadores.alterar([user_pk], contadores.NOTIFICACOES, quantidade)
+        transaction.on_commit(_executar)
+    except Exception:
+        logger.exception("notificar(): falha ao enviar notificações em tempo real")
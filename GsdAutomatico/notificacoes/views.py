@@ -2,7 +2,9 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET, require_POST
 
+from . import contadores
 from .models import Notificacao
+from .utils import serializar_notificacao
 
 MAX_LIST = 20
 
@@ -10,20 +12,12 @@ MAX_LIST = 20
 @login_required
 @require_GET
 def api_notificacoes(request):
-    qs = Notificacao.objects.filter(usuario=request.user, lida=False)
-    total = qs.count()
+    # Usado na abertura do painel e como fallback quando o WebSocket não conecta
+    total = contadores.nao_lidas(request.user.pk, contadores.NOTIFICACOES)
     items = []
-    for n in qs[:MAX_LIST]:
-        items.append({
-            'id':          n.pk,
-            'tipo':        n.tipo,
-            'titulo':      n.titulo,
-            'corpo':       n.corpo[:120] if n.corpo else '',
-            'url':         n.url,
-            'criado_em':   n.criado_em.strftime('%d/%m %H:%M'),
-            'origem_id':   n.origem_id,
-            'origem_tipo': n.origem_tipo,
-        })
+    if total:
+        qs = Notificacao.objects.filter(usuario=request.user, lida=False)
+        items = [serializar_notificacao(n) for n in qs[:MAX_LIST]]
     return JsonResponse({'count': total, 'notifications': items})
 
 
@@ -31,8 +25,12 @@ def api_notificacoes(request):
 @require_POST
 def api_limpar(request):
     notif_id = request.POST.get('id', '').strip()
+    qs = Notificacao.objects.filter(usuario=request.user, lida=False)
     if notif_id:
-        Notificacao.objects.filter(pk=notif_id, usuario=request.user).update(lida=True)
-    else:
-        Notificacao.objects.filter(usuario=request.user, lida=False).update(lida=True)
+        qs = qs.filter(pk=notif_id)
+    lidas = qs.update(lida=True)
+    contadores.alterar([request.user.pk], contadores.NOTIFICACOES, -lidas)
+    if lidas:
+        # Outras abas abertas do mesmo usuário tiram os itens do painel
+        contadores.enviar([request.user.pk], {'tipo': 'lidas', 'ids': [int(notif_id)] if notif_id else None})
     return JsonResponse({'ok': True})